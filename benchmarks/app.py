@@ -0,0 +1,21 @@
+"""
+ASGI entry point for benchmark runs: the real server app, with the
+scripted model in place of Gemini
+
+    BENCH_TRACES=benchmarks/traces/sample_conversations.jsonl \
+    BENCH_MODEL_LATENCY_MS=800 uvicorn benchmarks.app:app --workers 4
+
+Each uvicorn worker imports this module, so every worker gets the fake model.
+"""
+
+import os
+
+from benchmarks.fake_model import install_fake_model
+from benchmarks.traces import load_traces, DEFAULT_TRACES
+
+install_fake_model(
+    load_traces(os.getenv("BENCH_TRACES", DEFAULT_TRACES)),
+    latency_seconds=float(os.getenv("BENCH_MODEL_LATENCY_MS", "0")) / 1000,
+)
+
+from server import app  # noqa: E402
@@ -0,0 +1,99 @@
+"""
+Booking analytics micro-benchmark
+
+Generates a synthetic booking list (stays spread over two years, several
+categories and channels, creation dates before check-in) and times the
+column load and the analytics report for a month and a year, with the
+NumPy engine and with the plain Python loops used when NumPy is missing.
+
+Usage:
+    python -m benchmarks.bench_analytics --bookings 100000
+"""
+
+import json
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional
+
+from services import analytics_service
+from services.analytics_service import BookingColumns
+
+CATEGORIES = ("Deluxe", "Luxury Cottage", "basic")
+CHANNELS = ("whatsapp", "direct", "booking.com", "airbnb", "phone")
+RATES = {"deluxe": 5000.0, "luxury cottage": 9000.0, "basic": 2500.0}
+
+
+def synthetic_bookings(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=365)
+    bookings = []
+    for number in range(count):
+        check_in = start + timedelta(days=rng.randint(0, 730))
+        nights = rng.randint(1, 5)
+        booking = {
+            "booking_id": f"BK{number:06d}",
+            "status": "cancelled" if rng.random() < 0.05 else "confirmed",
+            "room_category": rng.choice(CATEGORIES),
+            "booking_channel": rng.choice(CHANNELS),
+            "check_in_date": f"{check_in.isoformat()}T14:00:00.000Z",
+            "check_out_date": f"{(check_in + timedelta(days=nights)).isoformat()}T10:00:00.000Z",
+            "created_at": f"{(check_in - timedelta(days=rng.randint(0, 120))).isoformat()}T09:30:00.000Z",
+        }
+        if rng.random() < 0.5:
+            booking["total_amount"] = str(RATES[booking["room_category"].lower()] * nights)
+        bookings.append(booking)
+    return bookings
+
+
+def _time(fn, repeat: int) -> float:
+    """Best of `repeat` runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 2)
+
+
+def run(count: int, rooms: int, repeat: int) -> Dict[str, Any]:
+    bookings = synthetic_bookings(count)
+    rooms_by_category = {name.lower(): rooms // len(CATEGORIES) for name in CATEGORIES}
+    today = date.today()
+    ranges = {
+        "month": (today.isoformat(), (today + timedelta(days=30)).isoformat()),
+        "year": ((today - timedelta(days=365)).isoformat(), today.isoformat()),
+    }
+
+    engines = {"python": False}
+    if analytics_service.np is not None:
+        engines["numpy"] = True
+
+    report: Dict[str, Any] = {"bookings": count, "rooms": rooms, "engines": {}}
+    for engine, use_numpy in engines.items():
+        result: Dict[str, Any] = {"load_ms": _time(lambda: BookingColumns(bookings, RATES, use_numpy), repeat)}
+        columns = BookingColumns(bookings, RATES, use_numpy)
+        for label, (start_date, end_date) in ranges.items():
+            result[f"report_{label}_ms"] = _time(lambda: columns.report(start_date, end_date, rooms_by_category), repeat)
+        summary = columns.report(*ranges["year"], rooms_by_category)
+        result["year"] = {key: summary[key] for key in ("occupancy", "adr", "revpar")}
+        report["engines"][engine] = result
+
+    if "numpy" in report["engines"]:
+        numpy_result, python_result = report["engines"]["numpy"], report["engines"]["python"]
+        report["report_year_speedup"] = round(python_result["report_year_ms"] / numpy_result["report_year_ms"], 1)
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark booking analytics")
+    parser.add_argument("--bookings", type=int, default=100000)
+    parser.add_argument("--rooms", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.bookings, args.rooms, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
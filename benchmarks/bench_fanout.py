@@ -0,0 +1,97 @@
+"""
+Travel Studio fan-out benchmark
+
+Serves /api/hocc/rooms/{id}/bookings from a local threaded HTTP server
+that answers after a fixed delay (the backend round trip), then fetches
+every room's bookings one request after another and with
+get_room_bookings_batch at several concurrency levels. Batched wall time
+should approach RTT x rooms / concurrency, until the rate limit binds.
+
+Usage:
+    python -m benchmarks.bench_fanout --rooms 60 --rtt-ms 50 --concurrency 1 4 8 16
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+from services.travel_studio_service import TravelStudioService
+from utils.rate_limit import RateLimiter
+
+
+def start_backend(rtt: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(rtt)
+            room_id = self.path.split("/")[-2]
+            body = json.dumps({"success": True, "data": [{"booking_id": f"{room_id}-1", "status": "confirmed"}]})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 128  # the default of 5 drops connects under fan-out
+
+    server = Server(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(rooms: int, rtt_ms: float, levels: List[int], rate: float) -> Dict[str, Any]:
+    server = start_backend(rtt_ms / 1000)
+    service = TravelStudioService()
+    service.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    service.client_initialized = True
+    service.bearer_token = "bench"
+    service.rate_limiter = RateLimiter(rate)
+    room_ids = [f"room-{index:03d}" for index in range(rooms)]
+
+    service.get_room_bookings(room_ids[0])  # warm up the HTTP stack
+    started = time.perf_counter()
+    for room_id in room_ids:
+        service.get_room_bookings(room_id)
+    sequential = time.perf_counter() - started
+
+    report: Dict[str, Any] = {
+        "rooms": rooms,
+        "rtt_ms": rtt_ms,
+        "rate_limit_per_second": rate,
+        "sequential_ms": round(sequential * 1000, 1),
+        "batched": {},
+    }
+    for level in levels:
+        service.rate_limiter = RateLimiter(rate)
+        started = time.perf_counter()
+        batch = service.get_room_bookings_batch(room_ids, concurrency=level)
+        elapsed = time.perf_counter() - started
+        report["batched"][str(level)] = {
+            "wall_ms": round(elapsed * 1000, 1),
+            "ideal_ms": round(rtt_ms * -(-rooms // level), 1),
+            "speedup": round(sequential / elapsed, 1),
+            "errors": len(batch["errors"]),
+        }
+    server.shutdown()
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark concurrent Travel Studio lookups")
+    parser.add_argument("--rooms", type=int, default=60)
+    parser.add_argument("--rtt-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--rate", type=float, default=0, help="Rate limit per second (0: unlimited)")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.rooms, args.rtt_ms, args.concurrency, args.rate), indent=2))
+
+
+if __name__ == "__main__":
+    main()
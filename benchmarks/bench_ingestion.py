@@ -0,0 +1,142 @@
+"""
+Webhook ingestion micro-benchmark: previous path vs the ingestion fast path
+
+Both paths decode a webhook body, parse it and publish to a local QStash
+stand-in (ack only). The previous path builds a WhatsAppService (and its
+Twilio client) per request and opens a fresh httpx.AsyncClient per publish;
+the fast path uses the stateless parser and the pooled QStashPublisher.
+
+Reports, per request, mean wall time, peak traced allocation and young
+generation GC collections per 1k requests (a proxy for how many objects a
+request allocates), for AiSensy (JSON) and Twilio (form) bodies.
+
+Usage:
+    python -m benchmarks.bench_ingestion --requests 300
+"""
+
+import os
+import gc
+import json
+import logging
+import time
+import asyncio
+import argparse
+import tracemalloc
+from urllib.parse import urlencode
+from typing import Dict, Any, Callable, Awaitable
+
+import httpx
+
+from benchmarks.stubs import StubLatency, StubServer, create_stub_app
+from benchmarks.webhook_load import build_request
+from services.ingestion_service import QStashPublisher, decode_json, decode_form, parse_webhook_payload
+
+DESTINATION = "http://127.0.0.1:1/process-async"
+
+
+def _body(fmt: str, sequence: int) -> bytes:
+    request = build_request(fmt, sequence)
+    if fmt == "aisensy":
+        return json.dumps(request["json"]).encode("utf-8")
+    return urlencode(request["data"]).encode("utf-8")
+
+
+def _payload(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "phone": parsed["from_number"],
+        "message": parsed["body"],
+        "message_sid": parsed["message_sid"],
+        "user_name": parsed.get("profile_name", ""),
+        "queued_at": time.time(),
+    }
+
+
+async def previous_path(fmt: str, body: bytes, qstash_url: str, publisher: QStashPublisher):
+    """What /webhook did before the ingestion module"""
+    from services.whatsapp_service import WhatsAppService
+
+    data = json.loads(body.decode("utf-8")) if fmt == "aisensy" else decode_form(body)
+    parsed = WhatsAppService().parse_incoming_message(data)
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        response = await client.post(
+            f"{qstash_url}/v2/publish/{DESTINATION}",
+            headers={"Authorization": "Bearer bench", "Content-Type": "application/json"},
+            json=_payload(parsed),
+        )
+    response.json()
+
+
+async def fast_path(fmt: str, body: bytes, qstash_url: str, publisher: QStashPublisher):
+    """services.ingestion_service"""
+    data = decode_json(body) if fmt == "aisensy" else decode_form(body)
+    parsed = parse_webhook_payload(data)
+    response = await publisher.publish(DESTINATION, _payload(parsed))
+    decode_json(response.content)
+
+
+async def measure(path: Callable[..., Awaitable[None]], fmt: str, requests: int,
+                  qstash_url: str, publisher: QStashPublisher) -> Dict[str, float]:
+    bodies = [_body(fmt, i) for i in range(requests)]
+
+    # Warm up (imports, first connection)
+    for body in bodies[:10]:
+        await path(fmt, body, qstash_url, publisher)
+
+    collections = gc.get_stats()[0]["collections"]
+    started = time.perf_counter()
+    for body in bodies:
+        await path(fmt, body, qstash_url, publisher)
+    elapsed = time.perf_counter() - started
+    collections = gc.get_stats()[0]["collections"] - collections
+
+    # Allocation pass separately; tracing slows everything down
+    tracemalloc.start()
+    peaks = []
+    for body in bodies[:50]:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await path(fmt, body, qstash_url, publisher)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "mean_ms": round(elapsed / requests * 1000, 3),
+        "peak_alloc_kib": round(sum(peaks) / len(peaks) / 1024, 1),
+        "gc_gen0_per_1k": round(collections / requests * 1000, 1),
+    }
+
+
+async def run(requests: int, port: int) -> Dict[str, Any]:
+    os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACbench")
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "bench")
+    logging.getLogger("services.whatsapp_service").setLevel(logging.ERROR)
+
+    stubs = StubServer(create_stub_app(StubLatency(0, 0, 0, 0), deliver_published=False), port=port)
+    await stubs.start()
+    publisher = QStashPublisher(base_url=stubs.url, token="bench")
+    report = {}
+    try:
+        for fmt in ("aisensy", "twilio"):
+            before = await measure(previous_path, fmt, requests, stubs.url, publisher)
+            after = await measure(fast_path, fmt, requests, stubs.url, publisher)
+            report[fmt] = {
+                "previous": before,
+                "fast_path": after,
+                "speedup": round(before["mean_ms"] / after["mean_ms"], 2) if after["mean_ms"] else None,
+            }
+    finally:
+        await publisher.close()
+        await stubs.stop()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare webhook ingestion paths")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--stub-port", type=int, default=8090)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.stub_port)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
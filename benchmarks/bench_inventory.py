@@ -0,0 +1,124 @@
+"""
+Inventory mirror micro-benchmark
+
+Builds an InventoryMirror over a synthetic hotel (rooms with booked stays
+spread over a year) and reports the time of a full index build, a delta
+sync where a few rooms changed, and availability queries for random date
+ranges and categories, answered in-process. For comparison, --remote-ms
+is the latency of the /rooms/available call the mirror replaces.
+
+Usage:
+    python -m benchmarks.bench_inventory --rooms 200 --bookings-per-room 40 --queries 20000
+"""
+
+import json
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional
+
+from benchmarks.replay import percentile
+from services.inventory_service import InventoryMirror
+
+CATEGORIES = ("Deluxe", "Luxury Cottage", "basic")
+
+
+class SyntheticTravelStudio:
+    """Rooms and non-overlapping stays, served like the Travel Studio client"""
+
+    def __init__(self, rooms: int, bookings_per_room: int, seed: int = 7):
+        rng = random.Random(seed)
+        start = date.today()
+        self.rooms = []
+        for index in range(rooms):
+            bookings, day = [], rng.randint(0, 5)
+            for number in range(bookings_per_room):
+                nights = rng.randint(1, 4)
+                check_in = start + timedelta(days=day)
+                bookings.append({
+                    "booking_id": f"BK{index:04d}-{number:03d}",
+                    "status": "confirmed",
+                    "check_in_date": f"{check_in.isoformat()}T14:00:00.000Z",
+                    "check_out_date": f"{(check_in + timedelta(days=nights)).isoformat()}T10:00:00.000Z",
+                })
+                day += nights + rng.randint(0, 6)
+            self.rooms.append({
+                "id": f"room-{index:04d}",
+                "category": CATEGORIES[index % len(CATEGORIES)],
+                "base_rate": "5000.00",
+                "booking_list": bookings,
+            })
+
+    def add_booking_listener(self, listener):
+        pass
+
+    def get_all_rooms(self) -> List[Dict[str, Any]]:
+        return self.rooms
+
+    def get_room_bookings(self, room_id: str) -> Optional[List[Dict[str, Any]]]:
+        return next(room["booking_list"] for room in self.rooms if room["id"] == room_id)
+
+    def get_room_bookings_batch(self, room_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {"results": {room_id: self.get_room_bookings(room_id) for room_id in room_ids}, "errors": {}}
+
+
+def run(rooms: int, bookings_per_room: int, queries: int, changed_rooms: int) -> Dict[str, Any]:
+    travel_studio = SyntheticTravelStudio(rooms, bookings_per_room)
+    mirror = InventoryMirror(travel_studio, sync_interval=60, enabled=True)
+
+    started = time.perf_counter()
+    mirror.load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    for room in travel_studio.rooms[:changed_rooms]:
+        room["booking_list"] = room["booking_list"][1:]
+    started = time.perf_counter()
+    updated = mirror.sync()
+    sync_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(11)
+    today = date.today()
+    latencies = []
+    free = 0
+    for _ in range(queries):
+        check_in = today + timedelta(days=rng.randint(0, 300))
+        check_out = check_in + timedelta(days=rng.randint(1, 5))
+        category = rng.choice(CATEGORIES + (None,))
+        started = time.perf_counter()
+        result = mirror.available_rooms(check_in.isoformat(), check_out.isoformat(), category)
+        latencies.append(time.perf_counter() - started)
+        free += len(result)
+
+    return {
+        "rooms": rooms,
+        "bookings": rooms * bookings_per_room,
+        "full_load_ms": round(load_ms, 2),
+        "delta_sync_ms": round(sync_ms, 2),
+        "delta_sync_rooms_updated": updated,
+        "queries": queries,
+        "query_us": {
+            "p50": round(percentile(latencies, 50) * 1e6, 1),
+            "p99": round(percentile(latencies, 99) * 1e6, 1),
+        },
+        "mean_free_rooms": round(free / queries, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the local inventory mirror")
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--bookings-per-room", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--changed-rooms", type=int, default=5, help="Rooms changed before the delta sync")
+    parser.add_argument("--remote-ms", type=float, default=None, help="Measured /rooms/available latency to compare")
+    args = parser.parse_args(argv)
+
+    report = run(args.rooms, args.bookings_per_room, args.queries, args.changed_rooms)
+    if args.remote_ms:
+        report["speedup_vs_remote"] = round(args.remote_ms * 1000 / report["query_us"]["p50"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
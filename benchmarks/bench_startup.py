@@ -0,0 +1,161 @@
+"""
+Cold start benchmark
+
+Imports the server in fresh interpreters under `python -X importtime` and
+reports the median total import time, the cumulative time of the heaviest
+top-level packages, and any SDK that was supposed to stay lazy but got
+imported at startup. Also times init_db() on a new and on an up-to-date
+SQLite database.
+
+The result is compared against benchmarks/startup_baseline.json; the run
+fails (exit code 1) when an SDK that should be lazy is imported or the
+import time grows past the tolerance.
+
+Usage:
+    python -m benchmarks.bench_startup                 # check against the baseline
+    python -m benchmarks.bench_startup --update-baseline
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+from typing import Dict, Any, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "startup_baseline.json")
+
+# Must not be imported by `import server`; they load on the paths that use them
+LAZY_MODULES = ("google.generativeai", "twilio.rest", "requests", "numpy")
+
+# Reported so regressions can be traced to a package
+TRACKED_MODULES = ("fastapi", "sqlalchemy", "httpx", "jinja2", "dotenv", "services", "database", "prompts")
+
+INIT_DB_SCRIPT = """
+import json, time
+from database import init_db
+started = time.perf_counter(); created = init_db(); first = time.perf_counter() - started
+started = time.perf_counter(); again = init_db(); second = time.perf_counter() - started
+print(json.dumps({"cold_ms": first * 1000, "warm_ms": second * 1000, "created": created, "recreated": again}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds per module from -X importtime output"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative[parts[2].strip()] = int(parts[1])
+    return cumulative
+
+
+def _env(database_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url
+    return env
+
+
+def measure_imports(runs: int, database_url: str) -> Dict[str, Any]:
+    totals: List[float] = []
+    modules: Dict[str, List[float]] = {}
+    lazy_imported = set()
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import server"],
+            cwd=REPO_ROOT, env=_env(database_url), capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import server failed:\n{result.stderr[-2000:]}")
+
+        cumulative = parse_importtime(result.stderr)
+        totals.append(cumulative.get("server", 0) / 1000)
+        for name in TRACKED_MODULES + LAZY_MODULES:
+            if name in cumulative:
+                modules.setdefault(name, []).append(cumulative[name] / 1000)
+        lazy_imported.update(name for name in LAZY_MODULES if name in cumulative)
+
+    return {
+        "import_server_ms": round(statistics.median(totals), 1),
+        "modules_ms": {name: round(statistics.median(values), 1) for name, values in sorted(modules.items())},
+        "lazy_modules_imported": sorted(lazy_imported),
+    }
+
+
+def measure_init_db(database_url: str) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-c", INIT_DB_SCRIPT],
+        cwd=REPO_ROOT, env=_env(database_url), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"init_db failed:\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "init_db_new_ms": round(timings["cold_ms"], 1),
+        "init_db_up_to_date_ms": round(timings["warm_ms"], 1),
+        "init_db_skips_when_current": timings["created"] and not timings["recreated"],
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions against the baseline, as messages"""
+    problems = []
+    if report["lazy_modules_imported"]:
+        problems.append(f"imported at startup but should be lazy: {', '.join(report['lazy_modules_imported'])}")
+    if not report["init_db_skips_when_current"]:
+        problems.append("init_db() ran create_all on an up-to-date database")
+
+    limit = baseline.get("import_server_ms", 0) * (1 + tolerance)
+    if limit and report["import_server_ms"] > limit:
+        problems.append(
+            f"import server took {report['import_server_ms']} ms, "
+            f"baseline {baseline['import_server_ms']} ms (+{int(tolerance * 100)}% allowed)"
+        )
+    return problems
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure server cold start")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to median over")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed import time growth")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    database_url = f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+
+    report = measure_imports(args.runs, database_url)
+    report.update(measure_init_db(database_url))
+    report["python"] = sys.version.split()[0]
+    print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    problems = compare(report, baseline, args.tolerance)
+    for problem in problems:
+        print(f"REGRESSION: {problem}")
+    if problems:
+        sys.exit(1)
+    print("Startup within baseline")
+
+
+if __name__ == "__main__":
+    main()
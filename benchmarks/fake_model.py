@@ -0,0 +1,98 @@
+"""
+Scripted stand-in for google.generativeai.GenerativeModel
+
+Plays back the tool calls and reply recorded for each user message in a
+trace, sleeping a configurable latency per call like a real model round
+trip. Responses have the same shape the agent reads from Gemini
+(candidates[0].content.parts with function_call/text, and usage_metadata).
+
+Install with install_fake_model(); AgentService builds its model through
+AgentService.model_factory.
+"""
+
+import time
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+
+from benchmarks.traces import iter_turns
+
+
+def _part(text: str = "", function_call=None):
+    return SimpleNamespace(text=text, function_call=function_call)
+
+
+def _response(parts: List[Any], prompt_chars: int, response_chars: int):
+    prompt_tokens = max(1, prompt_chars // 4)
+    response_tokens = max(1, response_chars // 4)
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=response_tokens,
+            thoughts_token_count=0,
+            cached_content_token_count=0,
+            total_token_count=prompt_tokens + response_tokens,
+        ),
+    )
+
+
+class ScriptedChat:
+    def __init__(self, model: "ScriptedModel", history: Optional[List[Dict[str, Any]]]):
+        self.model = model
+        self.prompt_chars = len(model.system_instruction or "") + len(str(history or []))
+        self.rounds: List[List[Dict[str, Any]]] = []
+        self.reply = ""
+
+    def send_message(self, content, tool_config=None, **kwargs):
+        if self.model.latency_seconds:
+            time.sleep(self.model.latency_seconds)
+
+        self.prompt_chars += len(str(content))
+        if isinstance(content, str):
+            script = self.model.scripts.get(content.strip(), {})
+            self.rounds = [list(calls) for calls in script.get("rounds", [])]
+            self.reply = script.get("reply") or "Thank you! Our team will get back to you shortly."
+
+        if tool_config and tool_config.get("function_calling_config", {}).get("mode") == "NONE":
+            # Function calling disabled: answer now
+            self.rounds = []
+
+        if self.rounds:
+            calls = self.rounds.pop(0)
+            parts = [
+                _part(function_call=SimpleNamespace(name=call["name"], args=dict(call.get("args", {}))))
+                for call in calls
+            ]
+            return _response(parts, self.prompt_chars, len(str(calls)))
+
+        return _response([_part(text=self.reply)], self.prompt_chars, len(self.reply))
+
+
+class ScriptedModel:
+    """Drop-in for genai.GenerativeModel(model_name=..., system_instruction=..., tools=...)"""
+
+    scripts: Dict[str, Dict[str, Any]] = {}
+    latency_seconds: float = 0.0
+
+    def __init__(self, model_name: str = "", system_instruction: Optional[str] = None, tools=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.tools = tools
+
+    def start_chat(self, history=None):
+        return ScriptedChat(self, history)
+
+
+def install_fake_model(traces: List[Dict[str, Any]], latency_seconds: float = 0.0):
+    """
+    Make AgentService use the scripted model
+
+    Args:
+        traces: Conversation traces (see benchmarks.traces)
+        latency_seconds: Delay per model call
+    """
+    from services.agent_service import AgentService
+
+    ScriptedModel.scripts = {turn["user"].strip(): turn for _, turn in iter_turns(traces)}
+    ScriptedModel.latency_seconds = latency_seconds
+    AgentService.model_factory = ScriptedModel
@@ -0,0 +1,320 @@
+"""
+Conversation replay benchmark
+
+Starts the stand-in services (benchmarks.stubs), launches the real server
+under uvicorn with the scripted model (benchmarks.app), then replays
+conversation traces against POST /webhook at a target rate. A turn is
+timed from the webhook request until its reply reaches the Twilio stand-in,
+so it covers queueing, the agent loop, tools, DB writes and the send.
+
+--qstash-failure-rate makes the QStash stand-in reject that fraction of
+publishes, so the server's fallback path (inline pool, busy replies and the
+on-disk journal) carries the rest; busy replies are counted, not treated as
+the turn's answer.
+
+Usage:
+    python -m benchmarks.replay --rate 5 --repeat 10 --workers 2 --model-latency-ms 800
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+from benchmarks.stubs import StubLatency, StubServer, create_stub_app
+from benchmarks.traces import load_traces, DEFAULT_TRACES
+from services.fallback_service import DEFAULT_BUSY_MESSAGE
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_NUMBER = "+10000000000"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(round(pct / 100 * len(ordered), 9)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class RatePacer:
+    """Hands out send slots no faster than the target rate"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        now = time.perf_counter()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def server_environment(server_url: str, stub_url: str, database_url: str,
+                       traces_path: str, model_latency_ms: float,
+                       journal_path: Optional[str] = None) -> Dict[str, str]:
+    """Environment that points the server at the stand-ins"""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "BASE_URL": server_url,
+        "QSTASH_URL": stub_url,
+        "QSTASH_TOKEN": "bench",
+        "TRAVEL_STUDIO_API_URL": stub_url,
+        "TRAVEL_STUDIO_BEARER_TOKEN": "bench",
+        "TOOLS_API_BASE_URL": f"{stub_url}/tools",
+        "TWILIO_API_BASE_URL": stub_url,
+        "TWILIO_ACCOUNT_SID": "ACbench",
+        "TWILIO_AUTH_TOKEN": "bench",
+        "TWILIO_PHONE_NUMBER": BOT_NUMBER,
+        "AISENSY_PROJECT_ID": "bench",
+        "AISENSY_PROJECT_API_PWD": "bench",
+        "WHATSAPP_PHONE_NUMBER_ID": "bench",
+        "WHATSAPP_ACCESS_TOKEN": "bench",
+        "OWNER_EMAIL": "owner@example.com",
+        "EMAIL_OUTBOX_WORKER_ENABLED": "false",
+        "OTEL_TRACES_EXPORTER": env.get("OTEL_TRACES_EXPORTER", "none"),
+        "BENCH_TRACES": traces_path,
+        "BENCH_MODEL_LATENCY_MS": str(model_latency_ms),
+        "WEBHOOK_JOURNAL_PATH": journal_path or os.path.join(tempfile.gettempdir(), "bench_webhook_journal.jsonl"),
+        "CATALOGUE_SNAPSHOT_PATH": "",
+        "FALLBACK_BUSY_MESSAGE": DEFAULT_BUSY_MESSAGE,
+        "FALLBACK_REPLAY_INTERVAL_SECONDS": env.get("FALLBACK_REPLAY_INTERVAL_SECONDS", "1"),
+    })
+    return env
+
+
+async def wait_until_healthy(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"Server at {url} did not become healthy")
+
+
+class Replayer:
+    def __init__(self, server_url: str, rate: float, turn_timeout: float):
+        self.server_url = server_url
+        self.pacer = RatePacer(rate)
+        self.turn_timeout = turn_timeout
+        self.waiting: Dict[str, asyncio.Future] = {}
+        self.turn_latencies: List[float] = []
+        self.ack_latencies: List[float] = []
+        self.timeouts = 0
+        self.errors = 0
+        self.busy_replies = 0
+
+    def on_message(self, phone: str, body: str):
+        """Called by the Twilio stand-in for every outbound reply"""
+        if body == DEFAULT_BUSY_MESSAGE:
+            # The real answer follows once the journal is replayed
+            self.busy_replies += 1
+            return
+        future = self.waiting.pop(phone, None)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+
+    async def replay_conversation(self, client: httpx.AsyncClient, conversation: Dict[str, Any], phone: str):
+        for turn in conversation.get("turns", []):
+            await self.pacer.wait()
+
+            future = asyncio.get_running_loop().create_future()
+            self.waiting[phone] = future
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{self.server_url}/webhook", data={
+                    "From": f"whatsapp:+{phone}",
+                    "To": f"whatsapp:{BOT_NUMBER}",
+                    "Body": turn["user"],
+                    "MessageSid": f"SM{uuid.uuid4().hex}",
+                    "ProfileName": conversation.get("user_name", ""),
+                })
+                self.ack_latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                self.errors += 1
+                self.waiting.pop(phone, None)
+                return
+
+            try:
+                replied_at = await asyncio.wait_for(future, timeout=self.turn_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.waiting.pop(phone, None)
+                return
+            self.turn_latencies.append(replied_at - started)
+
+    async def run(self, traces: List[Dict[str, Any]], repeat: int) -> float:
+        """Replay every trace `repeat` times in parallel; returns wall time"""
+        jobs = []
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            for copy in range(repeat):
+                for index, conversation in enumerate(traces):
+                    phone = f"91{7000000000 + copy * len(traces) + index}"
+                    jobs.append(self.replay_conversation(client, conversation, phone))
+            started = time.perf_counter()
+            await asyncio.gather(*jobs)
+            return time.perf_counter() - started
+
+
+def counter_values(metrics_text: str, name: str, label: str, **match: str) -> Dict[str, float]:
+    """Values of a counter from Prometheus text, keyed by one label, for series matching `match`"""
+    values: Dict[str, float] = {}
+    prefix = f"{name}{{"
+    for line in metrics_text.splitlines():
+        if not line.startswith(prefix):
+            continue
+        raw_labels, _, value = line[len(prefix):].partition("} ")
+        labels = dict(pair.partition("=")[::2] for pair in raw_labels.split(","))
+        labels = {key: raw.strip('"') for key, raw in labels.items()}
+        if label in labels and all(labels.get(key) == wanted for key, wanted in match.items()):
+            values[labels[label]] = values.get(labels[label], 0.0) + float(value)
+    return values
+
+
+def hit_rate(values: Dict[str, float]) -> Dict[str, Any]:
+    hits, misses = values.get("hit", 0.0), values.get("miss", 0.0)
+    total = hits + misses
+    return {"hits": int(hits), "misses": int(misses), "hit_rate": round(hits / total, 3) if total else None}
+
+
+async def scrape_cache_stats(server_url: str) -> Dict[str, Any]:
+    """Availability prefetch, cache and inventory mirror hit rates (one worker's view with --workers > 1)"""
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        text = (await client.get(f"{server_url}/metrics")).text
+    return {
+        "availability_prefetch": hit_rate(counter_values(text, "availability_prefetch_total", "outcome")),
+        "availability_cache": hit_rate(counter_values(text, "cache_requests_total", "result", cache="availability")),
+        # hit: answered by the local inventory mirror, miss: fell back to Travel Studio
+        "inventory_mirror": hit_rate(counter_values(text, "cache_requests_total", "result", cache="inventory_mirror")),
+    }
+
+
+def build_report(replayer: Replayer, elapsed: float, workers: int, args) -> Dict[str, Any]:
+    completed = len(replayer.turn_latencies)
+    throughput = completed / elapsed if elapsed else 0.0
+    return {
+        "workers": workers,
+        "target_rate": args.rate,
+        "model_latency_ms": args.model_latency_ms,
+        "turns_completed": completed,
+        "timeouts": replayer.timeouts,
+        "errors": replayer.errors,
+        "busy_replies": replayer.busy_replies,
+        "qstash_failure_rate": args.qstash_failure_rate,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(throughput, 3),
+        "throughput_per_worker": round(throughput / workers, 3),
+        "turn_latency_ms": {
+            "p50": round(percentile(replayer.turn_latencies, 50) * 1000, 1),
+            "p95": round(percentile(replayer.turn_latencies, 95) * 1000, 1),
+            "p99": round(percentile(replayer.turn_latencies, 99) * 1000, 1),
+        },
+        "webhook_ack_ms": {
+            "p50": round(percentile(replayer.ack_latencies, 50) * 1000, 1),
+            "p99": round(percentile(replayer.ack_latencies, 99) * 1000, 1),
+        },
+    }
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    server_url = f"http://127.0.0.1:{args.port}"
+    latency = StubLatency(
+        travel_studio=args.travel_studio_latency_ms / 1000,
+        tools_api=args.tools_latency_ms / 1000,
+        messaging=args.send_latency_ms / 1000,
+        queue=args.queue_latency_ms / 1000,
+    )
+
+    replayer = Replayer(server_url, args.rate, args.turn_timeout)
+    stubs = StubServer(
+        create_stub_app(latency, replayer.on_message, qstash_failure_rate=args.qstash_failure_rate),
+        port=args.stub_port,
+    )
+    await stubs.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env = server_environment(server_url, stubs.url, database_url,
+                             os.path.abspath(args.traces), args.model_latency_ms,
+                             journal_path=os.path.join(workdir, "webhook_journal.jsonl"))
+
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.app:app",
+             "--host", "127.0.0.1", "--port", str(args.port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        await wait_until_healthy(server_url, process)
+        elapsed = await replayer.run(load_traces(args.traces), args.repeat)
+        cache_stats = await scrape_cache_stats(server_url)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        await stubs.stop()
+
+    report = build_report(replayer, elapsed, args.workers, args)
+    report["qstash_rejected"] = stubs.app.state.stats["rejected"]
+    report.update(cache_stats)
+    report["server_log"] = log_path
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay conversation traces against /webhook")
+    parser.add_argument("--traces", default=DEFAULT_TRACES)
+    parser.add_argument("--rate", type=float, default=5.0, help="Target turns per second")
+    parser.add_argument("--repeat", type=int, default=5, help="Parallel copies of each conversation")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--stub-port", type=int, default=8090)
+    parser.add_argument("--model-latency-ms", type=float, default=800)
+    parser.add_argument("--travel-studio-latency-ms", type=float, default=150)
+    parser.add_argument("--tools-latency-ms", type=float, default=100)
+    parser.add_argument("--send-latency-ms", type=float, default=200)
+    parser.add_argument("--queue-latency-ms", type=float, default=20)
+    parser.add_argument("--qstash-failure-rate", type=float, default=0.0,
+                        help="Fraction of QStash publishes the stand-in rejects (partial outage)")
+    parser.add_argument("--turn-timeout", type=float, default=120)
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report here")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+
+    print(json.dumps(report, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Local stand-ins for the external services the agent talks to
+
+One FastAPI app serves:
+- Travel Studio:  /api/hocc/*           (rooms, availability, bookings, profile)
+- Tools API:      /tools/<tool_name>    (remote tool calls)
+- Twilio:         /2010-04-01/Accounts/<sid>/Messages.json
+- QStash:         /v2/publish/<url>     (acks, then delivers to <url> like QStash)
+                  /v2/batch             (same, for a list of messages)
+
+Every route waits a configurable latency first, so runs can model slow
+upstreams. Outbound WhatsApp messages are reported to an on_message
+callback, which is how the replayer knows a turn has finished.
+"""
+
+import re
+import uuid
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StubLatency:
+    """Per-service delay in seconds"""
+    travel_studio: float = 0.05
+    tools_api: float = 0.05
+    messaging: float = 0.1
+    queue: float = 0.01
+
+
+ROOM_INVENTORY = (
+    [("Deluxe", "4725.00")] * 2
+    + [("Luxury Cottage", "7350.00")] * 4
+    + [("Luxury Cottage", "7875.00")] * 4
+)
+
+
+def _rooms() -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": f"room-{index:03d}",
+            "roomNumber": f"{index:03d}",
+            "category": category,
+            "isOccupiable": True,
+            "booking_list": [],
+            "base_rate": rate,
+            "status": "vacant",
+        }
+        for index, (category, rate) in enumerate(ROOM_INVENTORY, start=1)
+    ]
+
+
+def create_stub_app(latency: StubLatency, on_message: Optional[Callable[[str, str], None]] = None,
+                    deliver_published: bool = True, qstash_failure_rate: float = 0.0) -> FastAPI:
+    """
+    Build the stand-in app
+
+    Args:
+        latency: Delay per service
+        on_message: Called with (phone_digits, body) for every outbound WhatsApp message
+        deliver_published: Deliver QStash messages to their destination
+            (False just acks them, for load tests of the publishing side)
+        qstash_failure_rate: Fraction of QStash publish calls answered with
+            503, to model a partial queue outage
+    """
+    app = FastAPI(title="Benchmark stubs")
+    bookings: Dict[str, Dict[str, Any]] = {}
+    delivery_client = httpx.AsyncClient(timeout=120.0)
+    app.state.stats = {"travel_studio": 0, "tools_api": 0, "messages": 0,
+                       "published": 0, "batches": 0, "rejected": 0, "delivered": 0}
+    pending_deliveries = set()
+
+    # Travel Studio
+
+    room_list = _rooms()
+    room_index = {room["id"]: room for room in room_list}
+
+    def room_free(room: Dict[str, Any], check_in: str, check_out: str) -> bool:
+        return all(
+            booking["check_out_date"][:10] <= check_in or booking["check_in_date"][:10] >= check_out
+            for booking in room["booking_list"]
+        )
+
+    @app.get("/api/hocc/rooms")
+    async def rooms():
+        await asyncio.sleep(latency.travel_studio)
+        app.state.stats["travel_studio"] += 1
+        return {"success": True, "data": {"items": room_list}}
+
+    @app.get("/api/hocc/rooms/{room_id}/bookings")
+    async def room_bookings(room_id: str):
+        await asyncio.sleep(latency.travel_studio)
+        app.state.stats["travel_studio"] += 1
+        if room_id not in room_index:
+            return JSONResponse(status_code=404, content={"success": False, "error": "Room not found"})
+        return {"success": True, "data": room_index[room_id]["booking_list"]}
+
+    @app.post("/api/hocc/rooms/available")
+    async def available_rooms(request: Request):
+        await asyncio.sleep(latency.travel_studio)
+        app.state.stats["travel_studio"] += 1
+        data = await request.json()
+        check_in = str(data.get("check_in_date", ""))[:10]
+        check_out = str(data.get("check_out_date", ""))[:10]
+        rooms = [room for room in room_list if room_free(room, check_in, check_out)]
+        if data.get("category"):
+            rooms = [room for room in rooms if room["category"] == data["category"]]
+        return {"success": True, "data": rooms}
+
+    @app.get("/api/hocc/bookings")
+    async def list_bookings(page: int = 1, limit: int = 100):
+        await asyncio.sleep(latency.travel_studio)
+        app.state.stats["travel_studio"] += 1
+        items = list(bookings.values())
+        total_pages = max((len(items) + limit - 1) // limit, 1)
+        return {"success": True, "data": {
+            "items": items[(page - 1) * limit:page * limit],
+            "pagination": {"page": page, "limit": limit, "total": len(items), "total_pages": total_pages},
+        }}
+
+    @app.post("/api/hocc/bookings")
+    async def create_booking(request: Request):
+        await asyncio.sleep(latency.travel_studio)
+        app.state.stats["travel_studio"] += 1
+        data = await request.json()
+        booking = {"id": f"BK{uuid.uuid4().hex[:8]}", "status": "confirmed",
+                   "created_at": datetime.utcnow().isoformat(), **data}
+        # Assign the first free room of the category, like the real backend
+        check_in = str(data.get("check_in_date", ""))[:10]
+        check_out = str(data.get("check_out_date", ""))[:10]
+        for room in room_list:
+            if room["category"] == data.get("room_category") and room_free(room, check_in, check_out):
+                booking["room_id"] = room["id"]
+                room["booking_list"].append(booking)
+                break
+        bookings[booking["id"]] = booking
+        return {"success": True, "data": booking}
+
+    @app.get("/api/hocc/bookings/{booking_id}")
+    async def get_booking(booking_id: str):
+        await asyncio.sleep(latency.travel_studio)
+        app.state.stats["travel_studio"] += 1
+        if booking_id not in bookings:
+            return JSONResponse(status_code=404, content={"success": False, "error": "Booking not found"})
+        return {"success": True, "data": bookings[booking_id]}
+
+    @app.get("/api/hocc/profile")
+    async def profile():
+        await asyncio.sleep(latency.travel_studio)
+        app.state.stats["travel_studio"] += 1
+        return {"success": True, "data": {"name": "Maldevta Farms"}}
+
+    # Tools API
+
+    @app.post("/tools/{tool_name}")
+    async def tool(tool_name: str):
+        await asyncio.sleep(latency.tools_api)
+        app.state.stats["tools_api"] += 1
+        return {"success": True, "message": f"{tool_name} done"}
+
+    # Twilio
+
+    @app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+    async def twilio_message(account_sid: str, request: Request):
+        await asyncio.sleep(latency.messaging)
+        form = await request.form()
+        to = str(form.get("To", "")).replace("whatsapp:", "")
+        body = str(form.get("Body", ""))
+        app.state.stats["messages"] += 1
+        if on_message is not None:
+            on_message(re.sub(r"\D", "", to), body)
+        return JSONResponse(status_code=201, content={
+            "sid": f"SM{uuid.uuid4().hex}",
+            "account_sid": account_sid,
+            "to": form.get("To"),
+            "from": form.get("From"),
+            "body": body,
+            "status": "queued",
+        })
+
+    # QStash
+
+    async def deliver(destination: str, body: bytes, headers: Dict[str, str]):
+        await asyncio.sleep(latency.queue)
+        try:
+            await delivery_client.post(destination, content=body, headers=headers)
+            app.state.stats["delivered"] += 1
+        except httpx.HTTPError as e:
+            logger.error(f"Stub QStash delivery to {destination} failed: {e}")
+
+    def qstash_unavailable() -> Optional[JSONResponse]:
+        if qstash_failure_rate and random.random() < qstash_failure_rate:
+            app.state.stats["rejected"] += 1
+            return JSONResponse(status_code=503, content={"error": "service unavailable"})
+        return None
+
+    @app.post("/v2/publish/{destination:path}")
+    async def publish(destination: str, request: Request):
+        unavailable = qstash_unavailable()
+        if unavailable is not None:
+            return unavailable
+        # Clients and proxies may squash the "//" of the embedded URL
+        destination = re.sub(r"^(https?):/+", r"\1://", destination)
+        body = await request.body()
+        headers = {"Content-Type": request.headers.get("content-type", "application/json")}
+        for name, value in request.headers.items():
+            if name.lower().startswith("upstash-forward-"):
+                headers[name[len("upstash-forward-"):]] = value
+
+        app.state.stats["published"] += 1
+        if not deliver_published:
+            await asyncio.sleep(latency.queue)
+            return JSONResponse(status_code=201, content={"messageId": f"msg_{uuid.uuid4().hex}"})
+
+        task = asyncio.create_task(deliver(destination, body, headers))
+        pending_deliveries.add(task)
+        task.add_done_callback(pending_deliveries.discard)
+        return JSONResponse(status_code=201, content={"messageId": f"msg_{uuid.uuid4().hex}"})
+
+    @app.post("/v2/batch")
+    async def batch(request: Request):
+        unavailable = qstash_unavailable()
+        if unavailable is not None:
+            return unavailable
+        messages = await request.json()
+        await asyncio.sleep(latency.queue)
+        app.state.stats["batches"] += 1
+        results = []
+        for message in messages:
+            app.state.stats["published"] += 1
+            results.append({"messageId": f"msg_{uuid.uuid4().hex}"})
+            if not deliver_published:
+                continue
+            headers = {}
+            for name, value in (message.get("headers") or {}).items():
+                if name.lower().startswith("upstash-forward-"):
+                    headers[name[len("upstash-forward-"):]] = value
+                elif name.lower() == "content-type":
+                    headers["Content-Type"] = value
+            task = asyncio.create_task(deliver(message["destination"], message.get("body", "").encode(), headers))
+            pending_deliveries.add(task)
+            task.add_done_callback(pending_deliveries.discard)
+        return JSONResponse(status_code=200, content=results)
+
+    @app.on_event("shutdown")
+    async def close_client():
+        await delivery_client.aclose()
+
+    return app
+
+
+class StubServer:
+    """Runs the stand-in app on the current event loop"""
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 8090):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.05)
+
+    async def stop(self):
+        self.server.should_exit = True
+        if self._task is not None:
+            await self._task
@@ -0,0 +1,124 @@
+"""
+Conversation traces for the replay benchmark
+
+A trace file is JSON Lines, one conversation per line:
+
+    {"conversation": "availability", "user_name": "Asha", "turns": [
+        {"user": "Do you have a cottage from 12/12/2026 to 14/12/2026?",
+         "rounds": [[{"name": "check_availability", "args": {"check_in": "12/12/2026", ...}}]],
+         "reply": "Yes, a Luxury Cottage is free ..."}
+    ]}
+
+"rounds" lists the tool calls the model makes before replying, one inner
+list per model response. Traces can be written by hand or exported from
+the messages and tool_calls tables of a real deployment.
+"""
+
+import json
+import argparse
+from typing import Dict, Any, Iterator, List, Tuple
+
+DEFAULT_TRACES = "benchmarks/traces/sample_conversations.jsonl"
+
+
+def load_traces(path: str = DEFAULT_TRACES) -> List[Dict[str, Any]]:
+    """Read a JSON Lines trace file"""
+    traces = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                traces.append(json.loads(line))
+    return traces
+
+
+def iter_turns(traces: List[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Yield (conversation, turn) pairs"""
+    for conversation in traces:
+        for turn in conversation.get("turns", []):
+            yield conversation, turn
+
+
+def export_traces(db, limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Rebuild traces from stored conversations
+
+    Tool calls are assigned to the turn whose inbound message precedes them.
+    The stored calls don't say which model response issued them, so each
+    becomes its own round.
+
+    Args:
+        db: Database session
+        limit: Maximum number of conversations (most recent first)
+
+    Returns:
+        List of conversation traces
+    """
+    from database.models import Conversation, Message, ToolCall
+
+    traces = []
+    conversations = db.query(Conversation).order_by(Conversation.id.desc()).limit(limit).all()
+    for conversation in conversations:
+        messages = (
+            db.query(Message)
+            .filter(Message.conversation_id == conversation.id)
+            .order_by(Message.timestamp, Message.id)
+            .all()
+        )
+        tool_calls = (
+            db.query(ToolCall)
+            .filter(ToolCall.conversation_id == conversation.id)
+            .order_by(ToolCall.timestamp, ToolCall.id)
+            .all()
+        )
+
+        turns = []
+        for message in messages:
+            if message.direction == "inbound":
+                turns.append({"user": message.content, "rounds": [], "reply": "", "_at": message.timestamp})
+            elif turns and not turns[-1]["reply"]:
+                turns[-1]["reply"] = message.content
+
+        for call in tool_calls:
+            owner = None
+            for turn in turns:
+                if turn["_at"] and call.timestamp and turn["_at"] <= call.timestamp:
+                    owner = turn
+            if owner is not None:
+                owner["rounds"].append([{"name": call.tool_name, "args": call.input_data or {}}])
+
+        for turn in turns:
+            turn.pop("_at")
+
+        if turns:
+            traces.append({
+                "conversation": f"conversation-{conversation.id}",
+                "user_name": conversation.user_name or "",
+                "turns": turns,
+            })
+
+    return traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export conversation traces from the database")
+    parser.add_argument("output", help="Trace file to write (JSON Lines)")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    from database.models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        traces = export_traces(db, args.limit)
+    finally:
+        db.close()
+
+    with open(args.output, "w") as f:
+        for trace in traces:
+            f.write(json.dumps(trace, default=str) + "\n")
+    print(f"Wrote {len(traces)} conversations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Webhook ingestion load test
+
+Fires AiSensy (JSON) and Twilio (form) webhook bodies at POST /webhook of
+the real server, with QStash replaced by the local stand-in (which only
+acks, so nothing is processed downstream). Each step holds a fixed number
+of in-flight requests for a while and records:
+
+- requests per second the server sustained
+- ack latency distribution (p50/p95/p99/max)
+- server CPU time per request, read from /proc for the uvicorn process tree
+
+The capacity report picks the highest step whose p99 ack stays under the
+SLO with no errors, and divides by the worker count.
+
+Usage:
+    python -m benchmarks.webhook_load --concurrency 1,4,16,64 --duration 10 --workers 2
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.replay import REPO_ROOT, BOT_NUMBER, percentile, server_environment, wait_until_healthy
+from benchmarks.stubs import StubLatency, StubServer, create_stub_app
+from benchmarks.traces import DEFAULT_TRACES
+
+FORMATS = ("aisensy", "twilio")
+
+
+def aisensy_body(phone: str, text: str, message_id: str, user_name: str = "Load Test") -> Dict[str, Any]:
+    """WhatsApp Business API webhook as AiSensy sends it"""
+    return {
+        "topic": "message.sender.user",
+        "data": {
+            "message": {
+                "messageId": message_id,
+                "phone_number": phone,
+                "userName": user_name,
+                "type": "text",
+                "timestamp": int(time.time()),
+                "message_content": {"text": text},
+            }
+        },
+    }
+
+
+def twilio_body(phone: str, text: str, message_id: str, user_name: str = "Load Test") -> Dict[str, str]:
+    """Twilio WhatsApp webhook form fields"""
+    return {
+        "MessageSid": message_id,
+        "From": f"whatsapp:+{phone}",
+        "To": f"whatsapp:{BOT_NUMBER}",
+        "Body": text,
+        "NumMedia": "0",
+        "ProfileName": user_name,
+    }
+
+
+def build_request(fmt: str, sequence: int) -> Dict[str, Any]:
+    """httpx request kwargs for one webhook delivery in the given format"""
+    phone = f"91{7000000000 + sequence % 100000}"
+    text = f"Do you have a cottage free this weekend? ({sequence})"
+    message_id = f"SM{uuid.uuid4().hex}"
+    if fmt == "aisensy":
+        return {"json": aisensy_body(phone, text, message_id)}
+    return {"data": twilio_body(phone, text, message_id)}
+
+
+def _clock_ticks() -> int:
+    try:
+        return os.sysconf("SC_CLK_TCK")
+    except (AttributeError, ValueError, OSError):
+        return 100
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid and all of its descendants (uvicorn --workers forks children)"""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return [pid]
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process tree, or None without /proc"""
+    total_ticks = 0
+    found = False
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+        total_ticks += int(fields[11]) + int(fields[12])
+        found = True
+    return total_ticks / _clock_ticks() if found else None
+
+
+async def run_step(url: str, concurrency: int, duration: float, formats: Tuple[str, ...],
+                   server_pid: Optional[int] = None) -> Dict[str, Any]:
+    """Keep `concurrency` webhook requests in flight for `duration` seconds"""
+    latencies: List[float] = []
+    errors = 0
+    sequence = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            nonlocal errors, sequence
+            while time.perf_counter() < deadline:
+                sequence += 1
+                request = build_request(formats[sequence % len(formats)], sequence)
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f"{url}/webhook", **request)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        cpu_before = cpu_seconds(server_pid) if server_pid else None
+        own_cpu_before = time.process_time()
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        cpu_after = cpu_seconds(server_pid) if server_pid else None
+        own_cpu = time.process_time() - own_cpu_before
+
+    completed = len(latencies)
+    cpu_ms = None
+    if cpu_before is not None and cpu_after is not None and completed:
+        cpu_ms = round((cpu_after - cpu_before) / completed * 1000, 3)
+
+    return {
+        "concurrency": concurrency,
+        "requests": completed,
+        "errors": errors,
+        "rps": round(completed / elapsed, 1) if elapsed else 0.0,
+        "ack_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2) if latencies else 0.0,
+        },
+        "cpu_ms_per_request": cpu_ms,
+        # Near 100 means the generator (and QStash stand-in), not the server, is the limit
+        "generator_cpu_pct": round(own_cpu / elapsed * 100, 1) if elapsed else 0.0,
+    }
+
+
+def capacity_report(steps: List[Dict[str, Any]], workers: int, slo_ms: float) -> Dict[str, Any]:
+    """Highest step that met the SLO (p99 ack under slo_ms, no errors)"""
+    sustained = [step for step in steps if not step["errors"] and step["ack_ms"]["p99"] <= slo_ms]
+    best = max(sustained, key=lambda step: step["rps"]) if sustained else None
+    return {
+        "workers": workers,
+        "slo_p99_ms": slo_ms,
+        "max_sustained_rps": best["rps"] if best else 0.0,
+        "max_sustained_rps_per_worker": round(best["rps"] / workers, 1) if best else 0.0,
+        "at_concurrency": best["concurrency"] if best else None,
+        "cpu_ms_per_request": best["cpu_ms_per_request"] if best else None,
+        "steps": steps,
+    }
+
+
+async def run_load_test(args) -> Dict[str, Any]:
+    server_url = f"http://127.0.0.1:{args.port}"
+    latency = StubLatency(travel_studio=0, tools_api=0, messaging=0, queue=args.queue_latency_ms / 1000)
+    stubs = StubServer(create_stub_app(latency, deliver_published=False), port=args.stub_port)
+    await stubs.start()
+
+    workdir = tempfile.mkdtemp(prefix="webhook-load-")
+    env = server_environment(server_url, stubs.url, f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                             os.path.abspath(DEFAULT_TRACES), 0,
+                             journal_path=os.path.join(workdir, "webhook_journal.jsonl"))
+
+    formats = FORMATS if args.format == "mixed" else (args.format,)
+    steps = []
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app",
+             "--host", "127.0.0.1", "--port", str(args.port),
+             "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        await wait_until_healthy(server_url, process)
+        await run_step(server_url, max(args.workers, 1), args.warmup, formats)
+        for concurrency in args.concurrency:
+            steps.append(await run_step(server_url, concurrency, args.duration, formats, process.pid))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        await stubs.stop()
+
+    report = capacity_report(steps, args.workers, args.slo_ms)
+    report["format"] = args.format
+    report["published"] = stubs.app.state.stats["published"]
+    report["qstash_batches"] = stubs.app.state.stats["batches"]
+    report["server_log"] = log_path
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load test POST /webhook against a local QStash stand-in")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        type=lambda value: [int(v) for v in value.split(",") if v],
+                        help="Comma-separated in-flight request counts, one step each")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per step")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--format", choices=FORMATS + ("mixed",), default="mixed")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--stub-port", type=int, default=8090)
+    parser.add_argument("--queue-latency-ms", type=float, default=20, help="QStash publish latency")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="p99 ack latency target")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report here")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = asyncio.run(run_load_test(args))
+
+    print(json.dumps(report, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
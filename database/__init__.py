@@ -1,5 +1,5 @@
-from .models import Base, engine, get_db, init_db, SessionLocal
-from .models import Conversation, Message, ToolCall, AgentMemory
+from .models import Base, engine, get_db, init_db, SessionLocal, SCHEMA_VERSION, SchemaVersion
+from .models import Conversation, Message, ToolCall, AgentMemory, EmailOutbox, OwnerNotification, TokenUsage, InventoryHold, BookingJournalEntry
 
 __all__ = [
     'Base',
@@ -7,8 +7,15 @@ __all__ = [
     'get_db',
     'init_db',
     'SessionLocal',
+    'SCHEMA_VERSION',
+    'SchemaVersion',
     'Conversation',
     'Message',
     'ToolCall',
-    'AgentMemory'
+    'AgentMemory',
+    'EmailOutbox',
+    'OwnerNotification',
+    'TokenUsage',
+    'InventoryHold',
+    'BookingJournalEntry'
 ]
\ No newline at end of file
@@ -1,3 +1,3 @@
-from .system_prompts import SYSTEM_PROMPT, TOOL_DESCRIPTIONS, get_current_date_context
+from .system_prompts import SYSTEM_PROMPT, TOOL_DESCRIPTIONS, get_current_date_context, with_room_type_ids
 
-__all__ = ['SYSTEM_PROMPT', 'TOOL_DESCRIPTIONS', 'get_current_date_context']
\ No newline at end of file
+__all__ = ['SYSTEM_PROMPT', 'TOOL_DESCRIPTIONS', 'get_current_date_context', 'with_room_type_ids']
\ No newline at end of file
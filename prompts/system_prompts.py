@@ -238,6 +238,7 @@ RESPONSE GUIDELINES:
 2. Get guest count
 3. Get number of rooms: "How many rooms do you need for {num_guests} guests, sir/ma'am?"
 4. Recommend 1 room briefly (ALWAYS mention breakfast included)
+   - Flexible dates ("any weekend in December"): search the whole range once and offer the best 2-3 windows
 5. If first-time: Ask "May I have your name, sir/ma'am?"
 6. Confirm: "To confirm your booking, full advance payment is required"
 7. Book immediately with num_of_rooms + dates + guests (never ask for phone - use context)
@@ -252,6 +253,18 @@ Then: "I've noted the details; our team will reach out with a customized quote."
 **For questions outside knowledge base:**
 "That's a great question! Let me have our reservations team call you to discuss this in detail, sir/ma'am. When would be a good time?"
 
+**If a tool result has "backend_unavailable": true:**
+Don't retry it this turn. Say: "I'm checking this with our team right now, sir/ma'am - I'll confirm shortly."
+
+**If a tool result has "valid_room_type_ids":**
+The room type wasn't recognised. Call the tool again with the matching id from that list.
+
+**If a tool result has "rooms_held_by_other_guests": true:**
+Another guest is completing a booking for the last of those rooms. Offer another room type or dates.
+
+**If a tool result has "booking_pending": true:**
+Don't call create_booking_reservation again. Say: "Your booking request is in, sir/ma'am - I'll send the confirmation here in a few minutes."
+
 SECURITY RULES - STRICTLY ENFORCE:
 
 **User can ONLY access/modify their OWN bookings:**
@@ -414,6 +427,10 @@ Agent: For 4 guests, I'd recommend either taking 2 Deluxe Rooms or 2 Cottages fo
 Remember: You're a helpful, efficient, and warm assistant for Maldevta Farms. Always mention breakfast is included. Always inform about pool closure. Escalate all events/groups. Full payment required upfront. Short responses. Premium natural experience.
 """
 
+# Room type ids in the tool schemas until the room catalogue is loaded;
+# with_room_type_ids() swaps in the catalogue's own ids
+DEFAULT_ROOM_TYPE_IDS = ["DELUXE", "COTTAGE", "COTTAGE_BATHTUB"]
+
 TOOL_DESCRIPTIONS = {
     "check_availability": {
         "name": "check_availability",
@@ -440,7 +457,8 @@ TOOL_DESCRIPTIONS = {
                 },
                 "room_type_id": {
                     "type": "string",
-                    "description": "Optional room type filter (DLX, PRE, FAM)",
+                    "enum": DEFAULT_ROOM_TYPE_IDS,
+                    "description": "Optional room type filter",
                 },
                 "budget": {
                     "type": "integer",
@@ -450,6 +468,41 @@ TOOL_DESCRIPTIONS = {
             "required": ["check_in", "check_out", "num_of_adults", "num_of_rooms"],
         },
     },
+    "find_available_windows": {
+        "name": "find_available_windows",
+        "description": (
+            "Find the best available stay windows when the guest's dates are flexible "
+            "(e.g. 'any weekend in December', '3 nights sometime next month'). Searches the "
+            "whole date range at once and returns the cheapest windows with rates - use this "
+            "instead of calling check_availability for each possible date"
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "start_date": {
+                    "type": "string",
+                    "description": "Earliest check-in date in DD/MM/YYYY format",
+                },
+                "end_date": {
+                    "type": "string",
+                    "description": "Latest check-out date in DD/MM/YYYY format",
+                },
+                "nights": {"type": "integer", "description": "Length of stay in nights"},
+                "num_of_adults": {"type": "integer", "description": "Number of adults"},
+                "num_of_children": {"type": "integer", "description": "Number of children"},
+                "room_type_id": {
+                    "type": "string",
+                    "enum": DEFAULT_ROOM_TYPE_IDS,
+                    "description": "Optional room type filter",
+                },
+                "weekends_only": {
+                    "type": "boolean",
+                    "description": "Only Friday or Saturday check-ins (guest asked for a weekend)",
+                },
+            },
+            "required": ["start_date", "end_date", "nights", "num_of_adults"],
+        },
+    },
     "create_booking_reservation": {
         "name": "create_booking_reservation",
         "description": "Create a room booking reservation",
@@ -474,7 +527,11 @@ TOOL_DESCRIPTIONS = {
                     "description": "token=pay token (default), free=no payment (VIP only)",
                 },
                 "num_of_rooms": {"type": "integer"},
-                "room_type_ids": {"type": "array", "items": {"type": "string"}},
+                "room_type_ids": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": DEFAULT_ROOM_TYPE_IDS},
+                    "description": "Room type of the booking",
+                },
                 "extra_guest": {"type": "integer"},
                 "special_request": {"type": "string"},
             },
@@ -607,3 +664,19 @@ TOOL_DESCRIPTIONS = {
     },
 
 }
+
+
+def with_room_type_ids(room_type_ids) -> dict:
+    """TOOL_DESCRIPTIONS with the room type enums set to room_type_ids"""
+    import copy
+
+    descriptions = copy.deepcopy(TOOL_DESCRIPTIONS)
+    if not room_type_ids:
+        return descriptions
+    for tool in descriptions.values():
+        properties = tool["input_schema"].get("properties", {})
+        if "room_type_id" in properties:
+            properties["room_type_id"]["enum"] = list(room_type_ids)
+        if "room_type_ids" in properties:
+            properties["room_type_ids"]["items"]["enum"] = list(room_type_ids)
+    return descriptions
@@ -4,20 +4,35 @@ Updated to use AiSensy API instead of Twilio
 No timeout errors, optimized for Vercel deployment
 """
 
-from fastapi import FastAPI, Request, Depends, Form, HTTPException
-from fastapi.responses import Response, JSONResponse
+from fastapi import FastAPI, Request, Depends, Form, HTTPException, Query
+from fastapi.responses import Response, JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 import logging
 import os
-import httpx
+import asyncio
+import time
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 
-from database import init_db, get_db
+from database import init_db, get_db, SessionLocal
 from services import WhatsAppService
 from services import AgentService
 from services import get_travel_studio_service
+from services import get_email_outbox_service
+from services import get_owner_notification_service
+from services import get_usage_service
+from services import get_qstash_publisher, get_qstash_batcher, parse_webhook_payload
+from services import get_fallback_executor
+from services import get_inventory_mirror
+from services import get_booking_analytics
+from services import get_booking_journal
+from services.ingestion_service import decode_json, decode_form, encode_json
+from services.travel_studio_service import decode_cursor, project_fields
+from services.booking_journal import STATUS_CONFIRMED, guest_message
+from utils.email_templates import render_email
+from utils.tracing import get_tracer, SPAN_KIND_SERVER, SPAN_KIND_PRODUCER, SPAN_KIND_CONSUMER, SPAN_KIND_CLIENT
+from utils.metrics import HTTP_REQUEST_SECONDS, QUEUE_LAG_SECONDS, OUTBOUND_SEND_SECONDS, render_metrics
 
 # Load environment variables
 load_dotenv()
@@ -33,10 +48,43 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting WhatsApp Agent Server (AiSensy + QStash Mode)...")
-    init_db()
-    logger.info("Database initialized")
+    if init_db():
+        logger.info("Database schema created/updated")
+    else:
+        logger.info("Database schema up to date")
+
+    # Background sender for queued notification emails
+    outbox_worker_enabled = os.getenv("EMAIL_OUTBOX_WORKER_ENABLED", "true").lower() == "true"
+    if outbox_worker_enabled:
+        await get_email_outbox_service().start()
+        await get_owner_notification_service().start()
+
+    # Inline processing + on-disk journal for messages QStash didn't take
+    await get_fallback_executor().start(
+        process_inline,
+        publish=publish_journaled if get_qstash_publisher().configured else None,
+        notify_busy=send_busy_reply,
+    )
+
+    # Local room inventory, loaded and synced in the background
+    await get_inventory_mirror().start()
+
+    # Settles bookings whose creation timed out, then tells guest and owner
+    booking_journal = get_booking_journal()
+    booking_journal.on_resolved = notify_booking_resolved
+    await booking_journal.start()
+
     yield
     logger.info("Shutting down...")
+    await get_booking_journal().stop()
+    await get_inventory_mirror().stop()
+    if outbox_worker_enabled:
+        await get_owner_notification_service().stop()
+        await get_email_outbox_service().stop()
+    await get_fallback_executor().stop()
+    await get_qstash_batcher().close()
+    await get_qstash_publisher().close()
+    await asyncio.to_thread(get_tracer().shutdown)
 
 
 # Initialize FastAPI
@@ -51,6 +99,36 @@ app = FastAPI(
 QSTASH_URL = os.getenv("QSTASH_URL", "https://qstash.upstash.io")
 QSTASH_TOKEN = os.getenv("QSTASH_TOKEN")
 BASE_URL = os.getenv("BASE_URL", "https://whatsapp.gydexp.in")
+WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
+QSTASH_BATCH_ENABLED = os.getenv("QSTASH_BATCH_ENABLED", "true").lower() == "true"
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Open a server span per request, continuing an incoming traceparent header,
+    and record the response time (webhook ack latency is route="/webhook")
+    """
+    tracer = get_tracer()
+    started = time.perf_counter()
+    with tracer.start_span(
+        f"{request.method} {request.url.path}",
+        {"http.method": request.method, "http.route": request.url.path},
+        parent=tracer.extract(dict(request.headers)),
+        kind=SPAN_KIND_SERVER,
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+
+    # Label by route template so ids in paths don't create new series
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    return response
 
 
 @app.get("/")
@@ -78,9 +156,50 @@ async def health_check():
         "aisensy_configured": aisensy_configured,
         "qstash_configured": qstash_configured,
         "base_url": BASE_URL,
+        # Endpoints whose circuit is not closed are failing fast
+        "travel_studio_circuits": get_travel_studio_service().circuit_states(),
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def queue_to_qstash(payload: dict) -> bool:
+    """
+    Publish a message for /process-async
+
+    Args:
+        payload: Message payload (with trace context)
+
+    Returns:
+        bool: True once QStash accepted it
+    """
+    process_url = f"{BASE_URL}/process-async"
+    forward = {"traceparent": payload["traceparent"]} if "traceparent" in payload else None
+
+    with get_tracer().start_span("qstash.publish", kind=SPAN_KIND_PRODUCER) as span:
+        if QSTASH_BATCH_ENABLED:
+            # Grouped with other webhooks arriving in the same few ms
+            message_id = await get_qstash_batcher().submit(process_url, payload, forward)
+            span.set_attribute("qstash.batched", True)
+            logger.info(f"✅ Queued to QStash: {message_id}")
+            return True
+
+        qstash_response = await get_qstash_publisher().publish(process_url, payload, forward)
+        span.set_attribute("http.status_code", qstash_response.status_code)
+
+    if qstash_response.status_code in [200, 201, 202]:
+        message_id = decode_json(qstash_response.content).get("messageId", "unknown")
+        logger.info(f"✅ Queued to QStash: {message_id}")
+        return True
+
+    logger.error(f"❌ QStash error: {qstash_response.status_code}")
+    return False
+
+
 @app.post("/webhook")
 async def whatsapp_webhook(request: Request):
     """
@@ -94,25 +213,23 @@ async def whatsapp_webhook(request: Request):
     NO TIMEOUT ERRORS! ✅
     """
     try:
-        # Try to parse as JSON first (WhatsApp Business API / AiSensy)
+        # Parse straight from the body bytes; no per-request service objects
         content_type = request.headers.get("content-type", "")
+        body = await request.body()
 
         if "application/json" in content_type:
-            # WhatsApp Business API format
-            json_data = await request.json()
-            logger.info(f"Received JSON webhook: {json_data}")
-
-            whatsapp_service = WhatsAppService()
-            parsed = whatsapp_service.parse_incoming_message(json_data)
-
+            # WhatsApp Business API format (AiSensy)
+            data = decode_json(body)
+        elif "multipart/form-data" in content_type:
+            data = dict(await request.form())
         else:
             # Twilio form data format (fallback)
-            form_data = await request.form()
-            form_dict = dict(form_data)
-            logger.info(f"Received form webhook: {form_dict}")
+            data = decode_form(body)
 
-            whatsapp_service = WhatsAppService()
-            parsed = whatsapp_service.parse_incoming_message(form_dict)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Received webhook: {data}")
+
+        parsed = parse_webhook_payload(data, to_number=WHATSAPP_PHONE_NUMBER_ID)
 
         phone_number = parsed["from_number"]
         user_message = parsed["body"]
@@ -124,52 +241,31 @@ async def whatsapp_webhook(request: Request):
             return JSONResponse(content={"status": "success"}, status_code=200)
 
         logger.info(f"📱 Message from {phone_number}: {user_message[:50]}...")
-        logger.info(f"👤 User: {user_name}")
 
-        # Send typing indicator immediately (non-blocking)
-        # try:
-        #     whatsapp_service.send_typing_indicator(phone_number, message_sid)
-        # except:
-        #     pass  # Don't fail if typing indicator fails
+        # Carry the trace context through the queue so /process-async
+        # continues this trace (payload field + forwarded header)
+        payload = get_tracer().inject({
+            "phone": phone_number,
+            "message": user_message,
+            "message_sid": message_sid,
+            "user_name": user_name,
+            "queued_at": time.time(),
+        })
 
         # Queue to QStash for async processing
-        if QSTASH_TOKEN:
-            logger.info(f"📤 Queueing to QStash for background processing")
-
-            process_url = f"{BASE_URL}/process-async"
-
+        queued = False
+        if get_qstash_publisher().configured:
             try:
-                async with httpx.AsyncClient(timeout=5.0) as client:
-                    # QStash publishes to destination URL
-                    qstash_response = await client.post(
-                        f"{QSTASH_URL}/v2/publish/{process_url}",
-                        headers={
-                            "Authorization": f"Bearer {QSTASH_TOKEN}",
-                            "Content-Type": "application/json",
-                        },
-                        json={
-                            "phone": phone_number,
-                            "message": user_message,
-                            "message_sid": message_sid,
-                            "user_name": user_name,
-                        },
-                    )
-
-                    if qstash_response.status_code in [200, 201, 202]:
-                        qstash_data = qstash_response.json()
-                        message_id = qstash_data.get("messageId", "unknown")
-                        logger.info(
-                            f"✅ Message queued successfully! QStash MessageID: {message_id}"
-                        )
-                    else:
-                        logger.error(f"❌ QStash error: {qstash_response.status_code}")
-
+                queued = await queue_to_qstash(payload)
             except Exception as e:
                 logger.error(f"Failed to queue to QStash: {str(e)}")
-                # Continue anyway - webhook still succeeds
         else:
-            logger.warning("⚠️  QStash not configured, processing inline (may timeout)")
-            # Process inline if QStash not available (not recommended for production)
+            logger.warning("⚠️  QStash not configured, processing inline")
+
+        if not queued:
+            # Bounded inline processing; spills to the journal when saturated
+            outcome = await get_fallback_executor().submit(payload)
+            logger.warning(f"Message from {phone_number} handled by fallback: {outcome}")
 
         # Return success immediately
         return JSONResponse(content={"status": "success"}, status_code=200)
@@ -210,57 +306,74 @@ async def webhook_verification(request: Request):
         raise HTTPException(status_code=403, detail="Verification failed")
 
 
-@app.post("/process-async")
-async def process_async(request: Request, db: Session = Depends(get_db)):
+async def process_queued_message(db: Session, data: dict, parent=None) -> bool:
     """
-    ASYNC processing endpoint - called by QStash
-    Can take 5-60 seconds, NO timeout!
+    Run the agent on a queued message and send the reply
 
-    This endpoint is called by QStash after /webhook queues the message
+    Args:
+        db: Database session
+        data: Queued payload (phone, message, message_sid, user_name, queued_at)
+        parent: Trace context to continue
+
+    Returns:
+        bool: True if the reply was sent
     """
     agent_service = None
-    phone_number = None
-
-    try:
-        logger.info("🔄 /process-async called by QStash")
-
-        # Get data from QStash
-        data = await request.json()
+    phone_number = data.get("phone")
+    user_message = data.get("message")
+    message_sid = data.get("message_sid")
+    user_name = data.get("user_name")
 
-        phone_number = data.get("phone")
-        user_message = data.get("message")
-        message_sid = data.get("message_sid")
-        user_name = data.get("user_name")
+    logger.info(f"📱 Processing message from {phone_number}")
+    logger.info(f"💬 Message: {user_message[:100]}...")
 
-        logger.info(f"📱 Processing message from {phone_number}")
-        logger.info(f"💬 Message: {user_message[:100]}...")
-
-        # Initialize services
-        agent_service = AgentService(db)
-        whatsapp_service = WhatsAppService()
+    try:
+        tracer = get_tracer()
+        with tracer.start_span(
+            "queue.process_message",
+            {"messaging.system": "qstash", "message.sid": message_sid or ""},
+            parent=parent,
+            kind=SPAN_KIND_CONSUMER,
+        ) as span:
+            if data.get("queued_at"):
+                queue_lag = max(time.time() - float(data["queued_at"]), 0.0)
+                QUEUE_LAG_SECONDS.observe(queue_lag)
+                span.set_attribute("queue.delay_ms", round(queue_lag * 1000, 1))
+
+            # Initialize services
+            agent_service = AgentService(db)
+            whatsapp_service = WhatsAppService()
 
-        logger.info(f"🤖 Calling AI agent...")
+            logger.info(f"🤖 Calling AI agent...")
 
-        # Process with AI (can take 5-30 seconds)
-        response_text = await agent_service.process_message(
-            phone_number=phone_number,
-            user_message=user_message,
-            message_sid=message_sid,
-            user_name=user_name,
-        )
+            # Process with AI (can take 5-30 seconds)
+            response_text = await agent_service.process_message(
+                phone_number=phone_number,
+                user_message=user_message,
+                message_sid=message_sid,
+                user_name=user_name,
+            )
 
-        logger.info(f"✅ AI response generated: {response_text[:100]}...")
-        logger.info(f"📤 Sending to WhatsApp via AiSensy...")
+            logger.info(f"✅ AI response generated: {response_text[:100]}...")
+            logger.info(f"📤 Sending to WhatsApp via AiSensy...")
 
-        # Send response via AiSensy WhatsApp API
-        success = whatsapp_service.send_message_using_Twilio(phone_number, response_text)
+            # Send response via AiSensy WhatsApp API
+            with tracer.start_span("whatsapp.send", kind=SPAN_KIND_CLIENT) as send_span:
+                send_started = time.perf_counter()
+                success = whatsapp_service.send_message_using_Twilio(phone_number, response_text)
+                OUTBOUND_SEND_SECONDS.observe(
+                    time.perf_counter() - send_started,
+                    provider="twilio",
+                    outcome="ok" if success else "error",
+                )
+                send_span.set_attribute("whatsapp.sent", bool(success))
 
         if success:
             logger.info(f"✅ Message sent successfully to {phone_number}")
         else:
             logger.error(f"❌ Failed to send message to {phone_number}")
 
-        return {"status": "success", "phone": phone_number, "sent": success}
+        return success
 
     except Exception as e:
         logger.error(f"❌ Error in async processing: {str(e)}", exc_info=True)
@@ -281,10 +394,7 @@ async def process_async(request: Request, db: Session = Depends(get_db)):
         except Exception as msg_error:
             logger.error(f"Failed to send error message to user: {msg_error}")
 
-        # Return error to QStash (will retry if configured)
-        return JSONResponse(
-            status_code=500, content={"status": "error", "message": str(e)}
-        )
+        raise
 
     finally:
         # Always cleanup agent service resources
@@ -295,6 +405,79 @@ async def process_async(request: Request, db: Session = Depends(get_db)):
                 logger.error(f"Error closing agent service: {close_error}")
 
 
+async def process_inline(data: dict) -> bool:
+    """Fallback executor entry point: process_queued_message with its own session"""
+    db = SessionLocal()
+    try:
+        return await process_queued_message(db, data, parent=get_tracer().extract(data))
+    finally:
+        db.close()
+
+
+def send_busy_reply(phone_number: str, message: str):
+    """Tell the guest we'll get back to them (fallback pool saturated)"""
+    WhatsAppService().send_message_using_Twilio(phone_number, message)
+
+
+def notify_booking_resolved(entry: dict):
+    """Booking journal: a pending booking was confirmed or failed"""
+    WhatsAppService().send_message_using_Twilio(entry["guest_phone"], guest_message(entry))
+
+    confirmed = entry["status"] == STATUS_CONFIRMED
+    email = render_email(
+        "booking_resolved",
+        outcome_text="Confirmed" if confirmed else "Failed",
+        outcome_details=(
+            "Travel Studio has the booking; nothing to do."
+            if confirmed else
+            "Travel Studio never created the booking. The guest was asked to reply so the agent can book again."
+        ),
+        guest_phone=entry["guest_phone"],
+        room_category=entry["room_category"],
+        check_in=entry["check_in"],
+        check_out=entry["check_out"],
+        booking_id=entry.get("booking_id"),
+        attempts=entry["attempts"],
+        idempotency_key=entry["idempotency_key"],
+    )
+    get_owner_notification_service().notify(
+        "booking", os.getenv("OWNER_EMAIL"), email["subject"], email["html"], email["text"]
+    )
+
+
+async def publish_journaled(data: dict) -> bool:
+    """Fallback journal replay: queue the message to QStash again"""
+    return await queue_to_qstash(data)
+
+
+@app.post("/process-async")
+async def process_async(request: Request, db: Session = Depends(get_db)):
+    """
+    ASYNC processing endpoint - called by QStash
+    Can take 5-60 seconds, NO timeout!
+
+    This endpoint is called by QStash after /webhook queues the message
+    """
+    try:
+        logger.info("🔄 /process-async called by QStash")
+
+        # Get data from QStash
+        data = await request.json()
+
+        # Continue the trace started in /webhook (the request span already
+        # does when QStash forwarded the traceparent header)
+        parent = None if "traceparent" in request.headers else get_tracer().extract(data)
+        success = await process_queued_message(db, data, parent)
+
+        return {"status": "success", "phone": data.get("phone"), "sent": success}
+
+    except Exception as e:
+        # Return error to QStash (will retry if configured)
+        return JSONResponse(
+            status_code=500, content={"status": "error", "message": str(e)}
+        )
+
+
 @app.post("/send-message")
 async def send_message(
     to_number: str = Form(...), message: str = Form(...), db: Session = Depends(get_db)
@@ -355,22 +538,72 @@ async def config_status():
 async def get_travel_studio_bookings(
     status: Optional[str] = None,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    phone: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$")
 ):
-    """Get bookings from Travel Studio API"""
+    """
+    Get bookings from Travel Studio API
+
+    Without limit or cursor every booking is returned. With them, one page
+    of at most `limit` bookings and a next_cursor for the following page.
+    format=ndjson streams the bookings as one JSON object per line,
+    fetching backend pages as the client reads. fields keeps only the
+    listed fields (comma-separated, dotted for nested: "id,status,Guest.phone").
+    """
     try:
         travel_studio = get_travel_studio_service()
-        bookings = travel_studio.get_bookings(status=status, start_date=start_date, end_date=end_date)
+        filters = {"status": status, "start_date": start_date, "end_date": end_date, "phone": phone}
+        selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if output_format == "ndjson":
+            return StreamingResponse(
+                _ndjson_bookings(travel_studio, selected, cursor=cursor, **filters),
+                media_type="application/x-ndjson",
+            )
+
+        if limit or cursor:
+            page = await asyncio.to_thread(travel_studio.list_bookings, cursor=cursor, limit=limit or 50, **filters)
+            if page is None:
+                return {"status": "error", "message": "Failed to fetch bookings"}
+            bookings = page["items"]
+            if selected:
+                bookings = [project_fields(booking, selected) for booking in bookings]
+            return {"status": "success", "bookings": bookings, "count": len(bookings), "next_cursor": page["next_cursor"]}
+
+        bookings = await asyncio.to_thread(travel_studio.get_bookings, **filters)
         
         if bookings is not None:
+            if selected:
+                bookings = [project_fields(booking, selected) for booking in bookings]
             return {"status": "success", "bookings": bookings, "count": len(bookings)}
         else:
             return {"status": "error", "message": "Failed to fetch bookings"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching bookings: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _ndjson_bookings(travel_studio, selected, **filters):
+    """NDJSON lines of bookings; run by Starlette in a worker thread"""
+    try:
+        for booking in travel_studio.iter_bookings(**filters):
+            yield encode_json(project_fields(booking, selected) if selected else booking) + b"\n"
+    except RuntimeError as e:
+        logger.error(f"Bookings export stopped: {str(e)}")
+        yield encode_json({"error": str(e)}) + b"\n"
+
+
 @app.get("/travel-studio/bookings/{booking_id}")
 async def get_travel_studio_booking(booking_id: str):
     """Get a specific booking from Travel Studio API"""
@@ -447,6 +680,66 @@ async def get_room_types():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/travel-studio/inventory/consistency")
+async def check_inventory_consistency(
+    check_in_date: Optional[str] = None,
+    check_out_date: Optional[str] = None,
+    room_type: Optional[str] = None
+):
+    """Compare the local inventory mirror with Travel Studio availability"""
+    try:
+        mirror = get_inventory_mirror()
+        ranges = [(check_in_date, check_out_date)] if check_in_date and check_out_date else None
+        categories = [room_type] if room_type else None
+        report = await asyncio.to_thread(mirror.check_consistency, ranges, categories)
+        return {"status": "success", "ready": mirror.ready, **report}
+    except Exception as e:
+        logger.error(f"Error checking inventory consistency: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/travel-studio/analytics")
+async def get_booking_analytics_report(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    refresh: bool = False
+):
+    """Occupancy, ADR, RevPAR, lead time and channel mix computed from the booking list"""
+    try:
+        report = await asyncio.to_thread(get_booking_analytics().report, start_date, end_date, refresh)
+        if report is None:
+            return {"status": "error", "message": "Failed to compute analytics"}
+        summary = {key: value for key, value in report.items() if key != "by_night"}
+        return {"status": "success", "analytics": summary}
+    except Exception as e:
+        logger.error(f"Error computing analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/travel-studio/analytics/occupancy")
+async def get_occupancy_by_night(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    refresh: bool = False
+):
+    """Rooms sold and occupancy per night and category"""
+    try:
+        report = await asyncio.to_thread(get_booking_analytics().report, start_date, end_date, refresh)
+        if report is None:
+            return {"status": "error", "message": "Failed to compute occupancy"}
+        return {
+            "status": "success",
+            "start_date": report["start_date"],
+            "end_date": report["end_date"],
+            "rooms": report["rooms"],
+            "occupancy": report["occupancy"],
+            "nights": report["by_night"],
+        }
+    except Exception as e:
+        logger.error(f"Error computing occupancy: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/travel-studio/profile")
 async def get_hotel_profile():
     """Get hotel profile from Travel Studio API"""
@@ -463,45 +756,68 @@ async def get_hotel_profile():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/travel-studio/catalogue/purge")
+async def purge_catalogue(name: Optional[str] = None):
+    """
+    Drop cached catalogue data (profile, rooms) so the next request refetches it
+
+    Use after changing rooms or the profile in Travel Studio directly.
+    Without a name every entry is purged. Other workers drop the entry on
+    their next lookup, once they see the rewritten snapshot; with
+    CATALOGUE_SNAPSHOT_PATH="" only the worker serving this request is
+    purged.
+    """
+    try:
+        travel_studio = get_travel_studio_service()
+        purged = await asyncio.to_thread(travel_studio.catalogue.purge, name)
+        return {"status": "success", "purged": purged}
+    except Exception as e:
+        logger.error(f"Error purging catalogue cache: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/travel-studio/booking-journal")
+async def get_unresolved_bookings(limit: int = 100):
+    """Journalled bookings still being sent or whose outcome is unknown"""
+    try:
+        entries = await asyncio.to_thread(get_booking_journal().unresolved, limit)
+        for entry in entries:
+            entry["sent_at"] = entry["sent_at"].isoformat() if entry["sent_at"] else None
+        return {"status": "success", "count": len(entries), "bookings": entries}
+    except Exception as e:
+        logger.error(f"Error reading booking journal: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # Email notification endpoint
 
 @app.post("/send_email")
 async def send_email_endpoint(request: Request):
     """
-    Send email notification
+    Queue email notification
     Used by AI agent for cancel/upgrade/update requests and event inquiries
+
+    The email is written to the outbox and sent by the background worker,
+    so this endpoint returns without waiting on SMTP. Requests with a
+    digested "category" (see OWNER_DIGEST_POLICY) wait for the next digest.
     """
     try:
-        from utils.helpers import send_email
-        
         data = await request.json()
         
-        to_email = data.get("to_email")
-        subject = data.get("subject")
-        body = data.get("body")
-        is_html = data.get("is_html", True)  # Default to HTML for formatted emails
-        
-        if not all([to_email, subject, body]):
+        if not all([data.get("to_email"), data.get("subject"), data.get("body")]):
             raise HTTPException(
                 status_code=400,
                 detail="Missing required fields: to_email, subject, body"
             )
         
-        logger.info(f"Sending email to {to_email}: {subject}")
+        logger.info(f"Queueing email to {data.get('to_email')}: {data.get('subject')}")
         
-        result = send_email(
-            to_email=to_email,
-            subject=subject,
-            body=body,
-            is_html=is_html
-        )
+        # Database writes, and possibly an early digest: off the event loop
+        result = await asyncio.to_thread(get_owner_notification_service().handle_send_email, data)
         
-        if result.get("success"):
-            logger.info(f"Email sent successfully to {to_email}")
-            return {"success": True, "message": result.get("message")}
-        else:
-            logger.error(f"Failed to send email: {result.get('error')}")
-            return {"success": False, "error": result.get("error")}
+        if not result.get("success"):
+            logger.error(f"Failed to queue email: {result.get('error')}")
+        return result
             
     except HTTPException:
         raise
@@ -510,6 +826,59 @@ async def send_email_endpoint(request: Request):
         return {"success": False, "error": str(e)}
 
 
+@app.post("/outbox/flush")
+async def flush_email_outbox():
+    """
+    Send due owner digests and drain one batch of queued emails
+    Lets a scheduler (e.g. a QStash schedule) drive the outbox on serverless
+    deployments where the background worker does not outlive the request
+    """
+    try:
+        digests = await asyncio.to_thread(get_owner_notification_service().flush_due)
+        outbox = get_email_outbox_service()
+        stats = await asyncio.to_thread(outbox.drain_once)
+        counts = await asyncio.to_thread(outbox.get_status_counts)
+        return {"status": "success", "digests": digests, "batch": stats, "outbox": counts}
+    except Exception as e:
+        logger.error(f"Error flushing email outbox: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Token usage endpoints
+
+@app.get("/usage/daily")
+async def get_daily_usage(days: int = 7):
+    """Gemini tokens and estimated cost per day"""
+    try:
+        usage = await asyncio.to_thread(get_usage_service().get_daily_usage, days)
+        return {"status": "success", "days": usage}
+    except Exception as e:
+        logger.error(f"Error fetching daily usage: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/usage/conversations/{phone_number}")
+async def get_conversation_usage(phone_number: str):
+    """Gemini tokens and estimated cost per turn of one conversation"""
+    try:
+        usage = await asyncio.to_thread(get_usage_service().get_conversation_usage, phone_number)
+        return {"status": "success", **usage}
+    except Exception as e:
+        logger.error(f"Error fetching conversation usage: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/usage/breakdown")
+async def get_usage_breakdown(days: int = 7, limit: int = 20):
+    """Prompt sections and tool results that cost the most"""
+    try:
+        breakdown = await asyncio.to_thread(get_usage_service().get_cost_breakdown, days, limit)
+        return {"status": "success", **breakdown}
+    except Exception as e:
+        logger.error(f"Error fetching usage breakdown: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # CORS middleware
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -2,5 +2,18 @@ from .whatsapp_service import WhatsAppService
 from .agent_service import AgentService
 from .tool_service import ToolService
 from .travel_studio_service import TravelStudioService, get_travel_studio_service
+from .email_outbox_service import EmailOutboxService, get_email_outbox_service
+from .owner_notification_service import OwnerNotificationService, get_owner_notification_service
+from .usage_service import UsageService, get_usage_service
+from .fallback_service import FallbackExecutor, get_fallback_executor
+from .availability_cache import AvailabilityCache, get_availability_cache
+from .catalogue_cache import CatalogueCache
+from .room_types import RoomTypeResolver, get_room_type_resolver
+from .hold_service import HoldService, get_hold_service
+from .booking_journal import BookingJournal, get_booking_journal
+from .prefetch_service import AvailabilityPrefetcher
+from .inventory_service import InventoryMirror, get_inventory_mirror
+from .analytics_service import BookingAnalytics, get_booking_analytics
+from .ingestion_service import QStashPublisher, QStashBatcher, get_qstash_publisher, get_qstash_batcher, parse_webhook_payload
 
-__all__ = ['WhatsAppService', 'AgentService', 'ToolService', 'TravelStudioService', 'get_travel_studio_service']
\ No newline at end of file
+__all__ = ['WhatsAppService', 'AgentService', 'ToolService', 'TravelStudioService', 'get_travel_studio_service', 'EmailOutboxService', 'get_email_outbox_service', 'OwnerNotificationService', 'get_owner_notification_service', 'UsageService', 'get_usage_service', 'QStashPublisher', 'QStashBatcher', 'get_qstash_publisher', 'get_qstash_batcher', 'parse_webhook_payload', 'FallbackExecutor', 'get_fallback_executor', 'AvailabilityCache', 'get_availability_cache', 'CatalogueCache', 'RoomTypeResolver', 'get_room_type_resolver', 'HoldService', 'get_hold_service', 'BookingJournal', 'get_booking_journal', 'AvailabilityPrefetcher', 'InventoryMirror', 'get_inventory_mirror', 'BookingAnalytics', 'get_booking_analytics']
\ No newline at end of file
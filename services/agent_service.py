@@ -1,27 +1,83 @@
-import google.generativeai as genai
 import os
 import json
+import time
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from database.models import Conversation, Message, ToolCall, AgentMemory
+from database.models import Conversation, Message, ToolCall, AgentMemory, TokenUsage
 from sqlalchemy.orm import Session
-from prompts import SYSTEM_PROMPT, TOOL_DESCRIPTIONS, get_current_date_context
+from prompts import SYSTEM_PROMPT, TOOL_DESCRIPTIONS, get_current_date_context, with_room_type_ids
 from services.tool_service import ToolService
+from services.travel_studio_service import get_travel_studio_service
+from services.room_types import get_room_type_resolver
+from services.prefetch_service import AvailabilityPrefetcher
+from services.loop_controller import (
+    TurnController,
+    STOP_COMPLETED,
+    STOP_DEADLINE,
+    STOP_ERROR,
+    STOP_MAX_ITERATIONS,
+    STOP_REPEATED_CALLS,
+)
+from services.usage_service import build_usage_entry, estimate_tokens, record_usage_metrics, TOOL_RESULT_PREFIX
 from utils.helpers import proto_to_dict, safe_json_serialize
+from utils.tracing import get_tracer, SPAN_KIND_CLIENT
+from utils.lazy_imports import lazy_import
+from utils.metrics import (
+    DB_COMMIT_SECONDS,
+    GEMINI_CALL_SECONDS,
+    GEMINI_ITERATIONS,
+    GEMINI_TOKENS_TOTAL,
+    GEMINI_TURN_STOPS_TOTAL,
+    TOOL_CALL_SECONDS,
+    TOOL_CALLS_TOTAL,
+)
 
 logger = logging.getLogger(__name__)
 
+# Imported on first use; the webhook path never needs the Gemini SDK
+genai = lazy_import("google.generativeai")
+
+# Final call of a turn: the model must answer in text, no more tool calls
+TEXT_ONLY_TOOL_CONFIG = {"function_calling_config": {"mode": "NONE"}}
+
+# Prompt sizes that don't change between turns
+SYSTEM_PROMPT_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+TOOL_DECLARATIONS_TOKENS = estimate_tokens(json.dumps(TOOL_DESCRIPTIONS))
+
 class AgentService:
+    # Builds the Gemini model (genai.GenerativeModel when None); the
+    # benchmark harness swaps in a scripted model
+    model_factory = None
+    # Gemini tool declarations, converted once per set of room type ids
+    _gemini_tools: Optional[List] = None
+    _gemini_tools_room_types: Optional[tuple] = None
+    
     def __init__(self, db: Session):
         self.db = db
         genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
         self.tool_service = ToolService()
+        self.prefetcher = AvailabilityPrefetcher(
+            self.tool_service.travel_studio, self.tool_service.availability_cache,
+            inventory=self.tool_service.inventory,
+        )
         self.model_name = "gemini-2.5-flash"
-        self.model = genai.GenerativeModel(
+        self.model = self._build_model(
             model_name=self.model_name,
             system_instruction=SYSTEM_PROMPT
         )
+        # Gemini usage of the current turn, one entry per call
+        self._turn_usage: List[Dict[str, Any]] = []
+    
+    def _build_model(self, **kwargs):
+        factory = self.model_factory or genai.GenerativeModel
+        return factory(**kwargs)
+    
+    def _commit(self):
+        """Commit the session inside a db.commit span"""
+        with get_tracer().start_span("db.commit"), DB_COMMIT_SECONDS.time():
+            self.db.commit()
     
     async def get_or_create_conversation(self, phone_number: str) -> Conversation:
         """Get existing conversation or create new one"""
@@ -33,7 +89,7 @@ class AgentService:
         if not conv:
             conv = Conversation(phone_number=phone_number)
             self.db.add(conv)
-            self.db.commit()
+            self._commit()
             self.db.refresh(conv)
         
         return conv
@@ -80,7 +136,7 @@ class AgentService:
                 )
                 self.db.add(memory)
             
-            self.db.commit()
+            self._commit()
             
         except Exception as e:
             logger.error(f"Error saving user memory: {str(e)}")
@@ -104,7 +160,7 @@ class AgentService:
                 content=content
             )
             self.db.add(msg)
-            self.db.commit()
+            self._commit()
             
         except Exception as e:
             logger.error(f"Error saving message: {str(e)}")
@@ -128,7 +184,7 @@ class AgentService:
                 error_message=output_data.get("error")
             )
             self.db.add(tool_call)
-            self.db.commit()
+            self._commit()
             
         except Exception as e:
             # If serialization still fails, rollback and save minimal version
@@ -146,16 +202,58 @@ class AgentService:
                     error_message=f"Serialization error: {str(e)}"
                 )
                 self.db.add(tool_call)
-                self.db.commit()
+                self._commit()
                 logger.info(f"Saved minimal tool call record for {tool_name}")
             except Exception as fallback_error:
                 # If even the fallback fails, just log and continue
                 logger.error(f"Could not save tool call at all: {fallback_error}")
                 self.db.rollback()
     
+    def _record_usage(self, response, iteration: int, sections: Dict[str, int], trigger_tools: List[str]):
+        """Keep the usage_metadata of one Gemini call for the current turn"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self._turn_usage.append(
+            build_usage_entry(self.model_name, iteration, usage, dict(sections), trigger_tools)
+        )
+    
+    def save_usage(self, conversation_id: int, phone_number: str, message_sid: str):
+        """Save the token usage of the current turn"""
+        entries, self._turn_usage = self._turn_usage, []
+        if not entries:
+            return
+        
+        record_usage_metrics(entries)
+        
+        try:
+            for entry in entries:
+                self.db.add(TokenUsage(
+                    conversation_id=conversation_id,
+                    phone_number=phone_number,
+                    message_sid=message_sid,
+                    **entry
+                ))
+            self._commit()
+            
+            total = sum(entry["total_tokens"] for entry in entries)
+            cost = sum(entry["cost_usd"] for entry in entries)
+            logger.info(f"Turn used {total} tokens over {len(entries)} Gemini calls (${cost:.5f})")
+        except Exception as e:
+            logger.error(f"Error saving token usage: {str(e)}")
+            self.db.rollback()
+    
     async def process_message(self, phone_number: str, user_message: str, 
                              message_sid: str, user_name: Optional[str] = None) -> str:
         """Process incoming message and generate response"""
+        with get_tracer().start_span("agent.process_message", {"message.sid": message_sid or ""}):
+            return await self._process_message(phone_number, user_message, message_sid, user_name)
+    
+    async def _process_message(self, phone_number: str, user_message: str, 
+                              message_sid: str, user_name: Optional[str] = None) -> str:
+        self._turn_usage = []
+        # Room holds placed by this turn's tool calls belong to this guest
+        self.tool_service.holder = phone_number
         
         # Get or create conversation
         conversation = await self.get_or_create_conversation(phone_number)
@@ -163,7 +261,7 @@ class AgentService:
         # Update user name if provided
         if user_name and not conversation.user_name:
             conversation.user_name = user_name
-            self.db.commit()
+            self._commit()
         
         # Save incoming message
         self.save_message(conversation.id, phone_number, message_sid, "inbound", user_message)
@@ -204,16 +302,27 @@ class AgentService:
         # Prepare tools for Gemini function calling
         tools = self._convert_tools_to_gemini_format()
         
-        # Call Gemini API with function calling
-        response_text = await self._call_gemini_with_tools(
-            history=history,
-            user_message=user_message,
-            tools=tools,
-            conversation_id=conversation.id,
-            phone_number=phone_number,
-            context_info=context_info
+        # Dates and guests known: fetch availability while Gemini thinks
+        speculation = self.prefetcher.speculate(
+            [part for item in history if item["role"] == "user" for part in item["parts"]],
+            owner=phone_number,
         )
         
+        # Call Gemini API with function calling
+        try:
+            response_text = await self._call_gemini_with_tools(
+                history=history,
+                user_message=user_message,
+                tools=tools,
+                conversation_id=conversation.id,
+                phone_number=phone_number,
+                context_info=context_info
+            )
+        finally:
+            # Settled even when the turn fails
+            self.prefetcher.settle(speculation)
+        self.save_usage(conversation.id, phone_number, message_sid)
+        
         # Extract and save user information from responses
         lower_msg = user_message.lower()
         
@@ -267,7 +376,7 @@ class AgentService:
         }
         return type_mapping.get(json_type.lower(), genai.protos.Type.STRING)
     
-    def _convert_property_to_gemini_schema(self, prop_schema: Dict) -> genai.protos.Schema:
+    def _convert_property_to_gemini_schema(self, prop_schema: Dict) -> "genai.protos.Schema":
         """Recursively convert a JSON Schema property to Gemini Schema"""
         prop_type = prop_schema.get("type", "string")
         gemini_type = self._convert_json_schema_type_to_gemini(prop_type)
@@ -308,10 +417,23 @@ class AgentService:
         return genai.protos.Schema(**schema_kwargs)
     
     def _convert_tools_to_gemini_format(self) -> List:
-        """Convert tool descriptions to Gemini function calling format"""
+        """Convert tool descriptions to Gemini function calling format
+        
+        Cached per process and rebuilt only when the room catalogue's
+        categories change, so the room type enums list valid ids
+        """
+        # Never waits on Travel Studio: a cold catalogue keeps the default ids
+        categories = get_travel_studio_service().get_room_types(wait=False)
+        room_type_ids = tuple(get_room_type_resolver().room_type_ids(categories))
+        if AgentService._gemini_tools is None or AgentService._gemini_tools_room_types != room_type_ids:
+            AgentService._gemini_tools = self._build_gemini_tools(with_room_type_ids(room_type_ids))
+            AgentService._gemini_tools_room_types = room_type_ids
+        return AgentService._gemini_tools
+    
+    def _build_gemini_tools(self, tool_descriptions: Dict[str, Dict]) -> List:
         function_declarations = []
         
-        for tool_data in TOOL_DESCRIPTIONS.values():
+        for tool_data in tool_descriptions.values():
             # Convert properties
             properties = {}
             for prop_name, prop_schema in tool_data["input_schema"].get("properties", {}).items():
@@ -338,6 +460,124 @@ class AgentService:
         
         return [genai.protos.Tool(function_declarations=function_declarations)]
     
+    def _send_to_gemini(self, chat, content, iteration: int, **kwargs):
+        """Send one request to Gemini inside a gemini.send_message span"""
+        with get_tracer().start_span(
+            "gemini.send_message",
+            {"gen_ai.system": "gemini", "gen_ai.request.model": self.model_name, "gemini.iteration": iteration},
+            kind=SPAN_KIND_CLIENT,
+        ) as span:
+            with GEMINI_CALL_SECONDS.time(model=self.model_name):
+                response = chat.send_message(content, **kwargs)
+            
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+                response_tokens = getattr(usage, "candidates_token_count", 0) or 0
+                GEMINI_TOKENS_TOTAL.inc(prompt_tokens, model=self.model_name, kind="prompt")
+                GEMINI_TOKENS_TOTAL.inc(response_tokens, model=self.model_name, kind="response")
+                GEMINI_TOKENS_TOTAL.inc(
+                    getattr(usage, "thoughts_token_count", 0) or 0, model=self.model_name, kind="thinking"
+                )
+                span.set_attribute("gen_ai.usage.input_tokens", prompt_tokens)
+                span.set_attribute("gen_ai.usage.output_tokens", response_tokens)
+            return response
+    
+    async def _send_within_budget(self, chat, content, iteration: int, controller: TurnController,
+                                  final: bool = False):
+        """
+        Send to Gemini off the event loop, bounded by the turn deadline
+        
+        Args:
+            chat: Gemini chat session
+            content: User message or function responses
+            iteration: Call number within the turn
+            controller: Budget of the current turn
+            final: Disable function calling so the model must answer in text
+        
+        Raises:
+            asyncio.TimeoutError: If the deadline passes first
+        """
+        remaining = controller.remaining()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        controller.calls += 1
+        kwargs = {"tool_config": TEXT_ONLY_TOOL_CONFIG} if final else {}
+        return await asyncio.wait_for(
+            asyncio.to_thread(self._send_to_gemini, chat, content, iteration, **kwargs),
+            timeout=remaining,
+        )
+    
+    async def _run_tool_within_budget(self, tool_name: str, tool_input: Dict, controller: TurnController) -> Dict:
+        """
+        Run a tool, bounded by the turn deadline
+
+        The tool itself is shielded: past the deadline it finishes in the
+        background, so a booking already on its way is still journalled.
+
+        Raises:
+            asyncio.TimeoutError: If the deadline passes first
+        """
+        remaining = controller.remaining()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        return await asyncio.wait_for(asyncio.shield(self._run_tool(tool_name, tool_input)), timeout=remaining)
+    
+    def _function_response(self, tool_name: str, tool_result: Any):
+        return genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(
+                name=tool_name,
+                response={"result": json.dumps(tool_result) if isinstance(tool_result, dict) else str(tool_result)}
+            )
+        )
+    
+    def _record_turn_stop(self, controller: TurnController):
+        """Iterations distribution and why the loop ended"""
+        GEMINI_ITERATIONS.observe(controller.calls)
+        GEMINI_TURN_STOPS_TOTAL.inc(reason=controller.stop_reason or STOP_COMPLETED)
+        if controller.stop_reason not in (None, STOP_COMPLETED):
+            logger.info(
+                f"Turn stopped early ({controller.stop_reason}) after {controller.calls} Gemini calls, "
+                f"{controller.memoized_calls} repeated tool calls answered from memo"
+            )
+    
+    async def _run_tool(self, tool_name: str, tool_input: Dict) -> Dict:
+        """Route a function call to the matching ToolService method"""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with get_tracer().start_span(f"tool.{tool_name}", {"tool.name": tool_name}) as span:
+                if tool_name == "request_update_or_cancel":
+                    tool_result = await self.tool_service.request_update_or_cancel(tool_input)
+                elif tool_name == "check_availability":
+                    tool_result = await self.tool_service.check_availability(tool_input)
+                elif tool_name == "find_available_windows":
+                    tool_result = await self.tool_service.find_available_windows(tool_input)
+                elif tool_name == "create_booking_reservation":
+                    tool_result = await self.tool_service.create_booking_reservation(tool_input)
+                elif tool_name == "get_all_room_reservations":
+                    tool_result = await self.tool_service.get_all_room_reservations(tool_input)
+                elif tool_name == "create_event_inquiry":
+                    tool_result = await self.tool_service.create_event_inquiry(tool_input)
+                elif tool_name == "lead_gen":
+                    tool_result = await self.tool_service.lead_gen(tool_input)
+                elif tool_name == "human_followup":
+                    tool_result = await self.tool_service.human_followup(tool_input)
+                elif tool_name == "general_info":
+                    tool_result = await self.tool_service.general_info(tool_input)
+                else:
+                    # For any other tools, try the old API (will likely fail)
+                    tool_result = await self.tool_service.call_tool(tool_name, tool_input)
+                
+                success = isinstance(tool_result, dict) and bool(tool_result.get("success", False))
+                span.set_attribute("tool.success", success)
+                if success:
+                    outcome = "ok"
+                return tool_result
+        finally:
+            TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=tool_name)
+            TOOL_CALLS_TOTAL.inc(tool=tool_name, outcome=outcome)
+    
     async def _call_gemini_with_tools(self, history: List[Dict], user_message: str,
                                      tools: List, conversation_id: int, 
                                      phone_number: str, context_info: str = "") -> str:
@@ -350,24 +590,37 @@ class AgentService:
             system_instruction += f"\n\nCONTEXT:{context_info}"
         
         # Create model with updated system instruction and tools
-        model = genai.GenerativeModel(
+        model = self._build_model(
             model_name=self.model_name,
             system_instruction=system_instruction,
             tools=tools
         )
         
+        # Estimated size of each prompt section, for cost attribution.
+        # The chat re-sends everything on every call, so tool results accumulate.
+        sections = {
+            "system_prompt": SYSTEM_PROMPT_TOKENS,
+            "date_context": estimate_tokens(date_context),
+            "user_context": estimate_tokens(context_info),
+            "tool_declarations": TOOL_DECLARATIONS_TOKENS,
+            "history": sum(estimate_tokens(str(part)) for item in history for part in item.get("parts", [])),
+            "user_message": estimate_tokens(user_message),
+        }
+        
+        controller = TurnController()
+        
         try:
             # Start chat with history
             chat = model.start_chat(history=history)
             
             # Send message
-            response = chat.send_message(user_message)
+            response = await self._send_within_budget(chat, user_message, 0, controller)
+            self._record_usage(response, 0, sections, [])
             
             # Handle function calls
-            max_iterations = 5
             iteration = 0
             
-            while iteration < max_iterations:
+            while iteration < controller.max_iterations:
                 # Check if response has the expected structure
                 if not response or not response.candidates:
                     logger.warning("Response has no candidates")
@@ -390,6 +643,7 @@ class AgentService:
                 
                 # Process each function call
                 function_responses = []
+                repeated = 0
                 
                 for function_call_part in function_calls:
                     function_call = function_call_part.function_call
@@ -399,42 +653,40 @@ class AgentService:
                     raw_args = dict(function_call.args) if function_call.args else {}
                     tool_input = proto_to_dict(raw_args)
                     
+                    sections["function_calls"] = sections.get("function_calls", 0) + estimate_tokens(
+                        tool_name + json.dumps(tool_input, default=str)
+                    )
+                    
+                    # Same tool with the same arguments earlier this turn: reuse the result
+                    call_key = controller.call_key(tool_name, tool_input)
+                    tool_result = controller.memoized(call_key)
+                    if tool_result is not None:
+                        repeated += 1
+                        logger.info(f"Repeated tool call {tool_name}, returning the earlier result")
+                        TOOL_CALLS_TOTAL.inc(tool=tool_name, outcome="memoized")
+                        function_responses.append(self._function_response(tool_name, tool_result))
+                        continue
+                    
                     logger.info(f"Calling tool: {tool_name} with input: {tool_input}")
                     
                     try:
                         # Call the tool - route to correct method
-                        if tool_name == "request_update_or_cancel":
-                            tool_result = await self.tool_service.request_update_or_cancel(tool_input)
-                        elif tool_name == "check_availability":
-                            tool_result = await self.tool_service.check_availability(tool_input)
-                        elif tool_name == "create_booking_reservation":
-                            tool_result = await self.tool_service.create_booking_reservation(tool_input)
-                        elif tool_name == "get_all_room_reservations":
-                            tool_result = await self.tool_service.get_all_room_reservations(tool_input)
-                        elif tool_name == "create_event_inquiry":
-                            tool_result = await self.tool_service.create_event_inquiry(tool_input)
-                        elif tool_name == "lead_gen":
-                            tool_result = await self.tool_service.lead_gen(tool_input)
-                        elif tool_name == "human_followup":
-                            tool_result = await self.tool_service.human_followup(tool_input)
-                        elif tool_name == "general_info":
-                            tool_result = await self.tool_service.general_info(tool_input)
-                        else:
-                            # For any other tools, try the old API (will likely fail)
-                            tool_result = await self.tool_service.call_tool(tool_name, tool_input)
+                        tool_result = await self._run_tool_within_budget(tool_name, tool_input, controller)
+                        controller.remember(call_key, tool_result)
+                        controller.record(tool_name, tool_result)
                         
                         # Save tool call
                         self.save_tool_call(conversation_id, tool_name, tool_input, tool_result)
                         
-                        # Add function response
-                        function_responses.append(
-                            genai.protos.Part(
-                                function_response=genai.protos.FunctionResponse(
-                                    name=tool_name,
-                                    response={"result": json.dumps(tool_result) if isinstance(tool_result, dict) else str(tool_result)}
-                                )
-                            )
+                        result_key = f"{TOOL_RESULT_PREFIX}{tool_name}"
+                        sections[result_key] = sections.get(result_key, 0) + estimate_tokens(
+                            json.dumps(tool_result, default=str) if isinstance(tool_result, dict) else str(tool_result)
                         )
+                        
+                        # Add function response
+                        function_responses.append(self._function_response(tool_name, tool_result))
+                    except asyncio.TimeoutError:
+                        raise
                     except Exception as tool_error:
                         logger.error(f"Error calling tool {tool_name}: {str(tool_error)}")
                         # Add error response
@@ -447,14 +699,39 @@ class AgentService:
                             )
                         )
                 
+                # A round of nothing but repeats means the model is looping;
+                # on the last allowed call there is no room for more tools.
+                # Either way, ask for the answer with tools disabled.
+                final = False
+                if repeated == len(function_calls):
+                    controller.stop(STOP_REPEATED_CALLS)
+                    final = True
+                elif controller.is_last_iteration(iteration):
+                    controller.stop(STOP_MAX_ITERATIONS)
+                    final = True
+                
                 # Send function responses back to model
                 try:
-                    response = chat.send_message(function_responses)
+                    response = await self._send_within_budget(
+                        chat, function_responses, iteration + 1, controller, final=final
+                    )
+                    self._record_usage(
+                        response, iteration + 1, sections,
+                        [part.function_call.name for part in function_calls],
+                    )
+                except asyncio.TimeoutError:
+                    raise
                 except Exception as send_error:
                     logger.error(f"Error sending function responses: {str(send_error)}")
+                    controller.stop(STOP_ERROR)
                     break
                 
                 iteration += 1
+                if final:
+                    break
+            
+            controller.stop(STOP_COMPLETED)
+            self._record_turn_stop(controller)
             
             # Extract final text response
             assistant_message = ""
@@ -473,8 +750,19 @@ class AgentService:
             
             return assistant_message
             
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Turn deadline of {controller.deadline_seconds}s reached after {controller.calls} "
+                f"Gemini calls, replying without the model"
+            )
+            controller.stop(STOP_DEADLINE)
+            self._record_turn_stop(controller)
+            return controller.deadline_reply()
+        
         except Exception as e:
             logger.error(f"Error calling Gemini API: {str(e)}", exc_info=True)
+            controller.stop(STOP_ERROR)
+            self._record_turn_stop(controller)
             return "I'm sorry, I'm experiencing technical difficulties. Please try again in a moment."
     
     async def close(self):
@@ -0,0 +1,384 @@
+"""
+Analytics Service
+Occupancy, rate and booking-mix analytics computed locally from Travel
+Studio bookings
+
+Bookings are loaded once into columns (check-in and check-out day
+ordinals, category and channel codes, creation day, revenue) and every
+metric is an array operation over those columns: rooms sold per night is a
+bincount of stay starts and ends followed by a cumulative sum, revenue in
+a date range is the per-night rate times the clipped overlap, and channel
+mix is a bincount of channel codes. NumPy is used when it is installed;
+otherwise the same report is computed with plain loops.
+
+The loaded columns and the computed reports are cached for
+ANALYTICS_CACHE_TTL_SECONDS, so dashboards polling several ranges cost one
+booking list pull per TTL.
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+import importlib.util
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.travel_studio_service import CANCELLED_STATUSES, day_ordinal, room_rate, get_travel_studio_service
+from utils.lazy_imports import lazy_import
+from utils.metrics import record_cache_lookup
+
+# Optional speedup, imported on the first report rather than at startup
+np = lazy_import("numpy") if importlib.util.find_spec("numpy") else None
+
+logger = logging.getLogger(__name__)
+
+# Lead time buckets: booked up to 7, 30, 90 days ahead, and beyond
+LEAD_TIME_EDGES = (7, 30, 90)
+LEAD_TIME_LABELS = ("0-7", "8-30", "31-90", "91+")
+
+
+def _amount(booking: Dict) -> Optional[float]:
+    for field in ("total_amount", "amount", "total_price"):
+        value = booking.get(field)
+        if value not in (None, ""):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of sorted values (NumPy's default)"""
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class BookingColumns:
+    """Bookings as parallel columns; cancelled and undated bookings are dropped"""
+
+    def __init__(self, bookings: List[Dict], rates: Optional[Dict[str, float]] = None, use_numpy: Optional[bool] = None):
+        """
+        Args:
+            bookings: Travel Studio booking dicts
+            rates: Nightly rate per category, for bookings without an amount
+            use_numpy: Force the NumPy (True) or plain Python (False) engine
+        """
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        rates = rates or {}
+        self.categories: List[str] = []
+        self.channels: List[str] = []
+        category_codes: Dict[str, int] = {}
+        channel_codes: Dict[str, int] = {}
+
+        # A booking list covers a few hundred distinct days; parse each once
+        ordinals: Dict[Any, Optional[int]] = {}
+
+        def ordinal(value: Any) -> Optional[int]:
+            day = str(value)[:10] if value else None
+            if day not in ordinals:
+                ordinals[day] = day_ordinal(day)
+            return ordinals[day]
+
+        check_in, check_out, category, channel, created, revenue = [], [], [], [], [], []
+        for booking in bookings:
+            if str(booking.get("status", "")).lower() in CANCELLED_STATUSES:
+                continue
+            start = ordinal(booking.get("check_in_date") or booking.get("check_in"))
+            end = ordinal(booking.get("check_out_date") or booking.get("check_out"))
+            if start is None or end is None or end <= start:
+                continue
+
+            name = str(booking.get("room_category") or booking.get("category") or "unknown")
+            if name not in category_codes:
+                category_codes[name] = len(self.categories)
+                self.categories.append(name)
+            source = str(booking.get("booking_channel") or "unknown").lower()
+            if source not in channel_codes:
+                channel_codes[source] = len(self.channels)
+                self.channels.append(source)
+
+            amount = _amount(booking)
+            if amount is None:
+                amount = rates.get(name.lower(), 0.0) * (end - start)
+            booked = ordinal(booking.get("created_at"))
+
+            check_in.append(start)
+            check_out.append(end)
+            category.append(category_codes[name])
+            channel.append(channel_codes[source])
+            created.append(booked if booked is not None else -1)
+            revenue.append(amount)
+
+        if self.use_numpy:
+            self.check_in = np.array(check_in, dtype=np.int64)
+            self.check_out = np.array(check_out, dtype=np.int64)
+            self.category = np.array(category, dtype=np.int64)
+            self.channel = np.array(channel, dtype=np.int64)
+            self.created = np.array(created, dtype=np.int64)
+            self.revenue = np.array(revenue, dtype=np.float64)
+        else:
+            self.check_in, self.check_out = check_in, check_out
+            self.category, self.channel = category, channel
+            self.created, self.revenue = created, revenue
+
+    def __len__(self) -> int:
+        return len(self.check_in)
+
+    def report(self, start_date: str, end_date: str, rooms_by_category: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """
+        Occupancy, ADR, RevPAR, lead time and channel mix for a date range
+
+        Args:
+            start_date: First night (YYYY-MM-DD)
+            end_date: Day after the last night (YYYY-MM-DD)
+            rooms_by_category: Sellable rooms per category (lowercase keys)
+
+        Returns:
+            dict: The report, or None for an empty or invalid range
+        """
+        first, last = day_ordinal(start_date), day_ordinal(end_date)
+        if first is None or last is None or last <= first:
+            return None
+        span = last - first
+        if self.use_numpy:
+            sold, nights_sold, revenue, in_range, lead_times = self._numpy_totals(first, last)
+        else:
+            sold, nights_sold, revenue, in_range, lead_times = self._python_totals(first, last)
+
+        # Categories with rooms but no bookings still count towards supply
+        capacity = [rooms_by_category.get(name.lower(), 0) for name in self.categories]
+        booked_names = {name.lower() for name in self.categories}
+        idle_rooms = sum(count for name, count in rooms_by_category.items() if name not in booked_names)
+        total_rooms = sum(capacity) + idle_rooms
+        available = total_rooms * span
+        total_sold = sum(nights_sold)
+        total_revenue = sum(revenue)
+
+        by_category = {}
+        for code, name in enumerate(self.categories):
+            category_available = capacity[code] * span
+            by_category[name] = {
+                "rooms": capacity[code],
+                "room_nights_sold": int(nights_sold[code]),
+                "occupancy": round(nights_sold[code] / category_available, 4) if category_available else None,
+                "revenue": round(revenue[code], 2),
+                "adr": round(revenue[code] / nights_sold[code], 2) if nights_sold[code] else None,
+            }
+
+        by_night = []
+        for offset in range(span):
+            night_sold = {name: int(sold[code][offset]) for code, name in enumerate(self.categories)}
+            total = sum(night_sold.values())
+            by_night.append({
+                "date": date.fromordinal(first + offset).isoformat(),
+                "rooms_sold": total,
+                "occupancy": round(total / total_rooms, 4) if total_rooms else None,
+                "by_category": night_sold,
+            })
+
+        bookings_in_range = sum(in_range[1])
+        channel_mix = {}
+        for code, name in enumerate(self.channels):
+            count = in_range[1][code]
+            if count:
+                channel_mix[name] = {
+                    "bookings": int(count),
+                    "share": round(count / bookings_in_range, 4),
+                    "revenue": round(in_range[0][code], 2),
+                }
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "nights": span,
+            "rooms": total_rooms,
+            "bookings": int(bookings_in_range),
+            "room_nights_sold": int(total_sold),
+            "room_nights_available": available,
+            "occupancy": round(total_sold / available, 4) if available else None,
+            "revenue": round(total_revenue, 2),
+            "adr": round(total_revenue / total_sold, 2) if total_sold else None,
+            "revpar": round(total_revenue / available, 2) if available else None,
+            "by_category": by_category,
+            "by_night": by_night,
+            "lead_time_days": lead_times,
+            "channel_mix": channel_mix,
+        }
+
+    def _numpy_totals(self, first: int, last: int):
+        span = last - first
+        lo = np.clip(self.check_in, first, last) - first
+        hi = np.clip(self.check_out, first, last) - first
+        overlap = hi - lo
+        hits = overlap > 0
+        n_categories = max(len(self.categories), 1)
+
+        # Rooms sold per (category, night): +1 at the first night, -1 after the last
+        width = span + 1
+        starts = np.bincount(self.category[hits] * width + lo[hits], minlength=n_categories * width)
+        ends = np.bincount(self.category[hits] * width + hi[hits], minlength=n_categories * width)
+        sold = np.cumsum((starts - ends).reshape(n_categories, width), axis=1)[:, :span]
+
+        nights = self.check_out - self.check_in
+        earned = self.revenue * overlap / nights
+        nights_sold = np.bincount(self.category, weights=overlap, minlength=n_categories)
+        revenue = np.bincount(self.category, weights=earned, minlength=n_categories)
+        channel_revenue = np.bincount(self.channel[hits], weights=earned[hits], minlength=len(self.channels))
+        channel_count = np.bincount(self.channel[hits], minlength=len(self.channels))
+
+        known = hits & (self.created >= 0)
+        lead = np.maximum(self.check_in[known] - self.created[known], 0)
+        lead_times = self._lead_time_summary(
+            len(lead),
+            lambda: float(lead.mean()),
+            lambda q: float(np.percentile(lead, q)),
+            np.bincount(np.searchsorted(LEAD_TIME_EDGES, lead, side="left"), minlength=len(LEAD_TIME_LABELS)),
+        )
+        return (sold.tolist(), nights_sold.tolist(), revenue.tolist(),
+                (channel_revenue.tolist(), channel_count.tolist()), lead_times)
+
+    def _python_totals(self, first: int, last: int):
+        span = last - first
+        sold = [[0] * span for _ in self.categories]
+        nights_sold = [0] * len(self.categories)
+        revenue = [0.0] * len(self.categories)
+        channel_revenue = [0.0] * len(self.channels)
+        channel_count = [0] * len(self.channels)
+        lead = []
+        for index in range(len(self.check_in)):
+            start, end = self.check_in[index], self.check_out[index]
+            lo, hi = max(start, first), min(end, last)
+            if lo >= hi:
+                continue
+            code = self.category[index]
+            row = sold[code]
+            for night in range(lo - first, hi - first):
+                row[night] += 1
+            earned = self.revenue[index] * (hi - lo) / (end - start)
+            nights_sold[code] += hi - lo
+            revenue[code] += earned
+            channel_revenue[self.channel[index]] += earned
+            channel_count[self.channel[index]] += 1
+            if self.created[index] >= 0:
+                lead.append(max(start - self.created[index], 0))
+
+        lead.sort()
+        buckets = [0] * len(LEAD_TIME_LABELS)
+        for days in lead:
+            buckets[bisect.bisect_left(LEAD_TIME_EDGES, days)] += 1
+        lead_times = self._lead_time_summary(
+            len(lead),
+            lambda: sum(lead) / len(lead),
+            lambda q: _percentile(lead, q),
+            buckets,
+        )
+        return sold, nights_sold, revenue, (channel_revenue, channel_count), lead_times
+
+    @staticmethod
+    def _lead_time_summary(count: int, mean, percentile, buckets) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"bookings": count}
+        if count:
+            summary.update({
+                "mean": round(mean(), 1),
+                "p50": round(percentile(50), 1),
+                "p90": round(percentile(90), 1),
+            })
+        summary["buckets"] = {label: int(buckets[index]) for index, label in enumerate(LEAD_TIME_LABELS)}
+        return summary
+
+
+class BookingAnalytics:
+    """Cached analytics over the Travel Studio booking list"""
+
+    def __init__(self, travel_studio, ttl_seconds: Optional[float] = None):
+        self.travel_studio = travel_studio
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+        self._lock = threading.Lock()
+        self._loaded: Optional[Tuple[float, BookingColumns, Dict[str, int]]] = None
+        self._reports: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def _columns(self) -> Optional[Tuple[BookingColumns, Dict[str, int]]]:
+        """Booking columns and room counts, reloaded once the TTL has passed"""
+        if self._loaded is not None and time.monotonic() - self._loaded[0] <= self.ttl:
+            return self._loaded[1], self._loaded[2]
+
+        bookings = self.travel_studio.get_bookings()
+        rooms = self.travel_studio.get_all_rooms()
+        if bookings is None or rooms is None:
+            return None
+
+        rooms_by_category: Dict[str, int] = {}
+        rates: Dict[str, float] = {}
+        for room in rooms:
+            if room.get("isOccupiable", True) is False:
+                continue
+            name = str(room.get("category", "")).lower()
+            rooms_by_category[name] = rooms_by_category.get(name, 0) + 1
+            rates.setdefault(name, room_rate(room))
+
+        started = time.perf_counter()
+        columns = BookingColumns(bookings, rates)
+        logger.info(
+            f"Loaded {len(columns)} bookings for analytics in {(time.perf_counter() - started) * 1000:.1f} ms "
+            f"({'numpy' if columns.use_numpy else 'python'})"
+        )
+        self._loaded = (time.monotonic(), columns, rooms_by_category)
+        self._reports = {}
+        return columns, rooms_by_category
+
+    def report(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+               refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Analytics report for a date range, cached until the bookings are reloaded
+
+        Args:
+            start_date: First night (YYYY-MM-DD), default today
+            end_date: Day after the last night (YYYY-MM-DD), default 30 days later
+            refresh: Reload the bookings first
+
+        Returns:
+            dict: See BookingColumns.report, or None if Travel Studio failed
+        """
+        start_date = start_date or date.today().isoformat()
+        end_date = end_date or (date.fromisoformat(start_date) + timedelta(days=30)).isoformat()
+        key = (start_date, end_date)
+
+        # Concurrent dashboard requests wait for one load instead of each pulling bookings
+        with self._lock:
+            if refresh:
+                self._loaded = None
+            loaded = self._columns()
+            if loaded is None:
+                return None
+            cached = self._reports.get(key)
+            record_cache_lookup("analytics", cached is not None)
+            if cached is None:
+                columns, rooms_by_category = loaded
+                cached = columns.report(start_date, end_date, rooms_by_category)
+                if cached is None:
+                    return None
+                cached["engine"] = "numpy" if columns.use_numpy else "python"
+                self._reports[key] = cached
+            return cached
+
+    def clear(self):
+        with self._lock:
+            self._loaded = None
+            self._reports = {}
+
+
+# Singleton instance
+_booking_analytics = None
+
+
+def get_booking_analytics() -> BookingAnalytics:
+    """Get singleton instance of BookingAnalytics"""
+    global _booking_analytics
+    if _booking_analytics is None:
+        _booking_analytics = BookingAnalytics(get_travel_studio_service())
+    return _booking_analytics
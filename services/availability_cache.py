@@ -0,0 +1,194 @@
+"""
+Availability Cache
+Short-lived cache of Travel Studio room availability, shared by the
+check_availability tool and the speculative prefetcher
+
+Entries are keyed by (check-in, check-out, category) in YYYY-MM-DD form. A
+lookup that arrives while the same query is still in flight waits for it
+instead of sending a second request, so a tool call that races the
+prefetch still costs one API call. A category query is also answered from
+an all-categories entry for the same dates by filtering on the room's
+category.
+
+Registered as a Travel Studio booking listener, the cache drops every
+entry whose dates overlap a booking created, changed or cancelled here
+(all of them when the change carries no dates), so a room that was just
+booked isn't offered for the rest of the TTL.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.travel_studio_service import get_travel_studio_service
+from utils.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+class _Entry:
+    def __init__(self, future: asyncio.Future, prefetched: bool, owner: Optional[str] = None):
+        self.future = future
+        self.loop = future.get_loop()
+        self.created = time.monotonic()
+        self.prefetched = prefetched
+        self.owner = owner  # guest whose turn speculated it
+        self.used = False  # served to the owner's tool call at least once
+
+
+class AvailabilityCache:
+    """TTL + LRU cache of get_available_rooms results"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: int = 256, travel_studio=None):
+        """
+        Initialize availability cache
+
+        Args:
+            ttl_seconds: Entry lifetime (default AVAILABILITY_CACHE_TTL_SECONDS)
+            max_entries: Least recently used entries beyond this are dropped
+            travel_studio: TravelStudioService whose booking changes
+                           invalidate entries (None: not watched)
+        """
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "60"))
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._tasks = set()
+        if travel_studio is not None:
+            travel_studio.add_booking_listener(self.on_booking_change)
+
+    @staticmethod
+    def key(check_in: str, check_out: str, category: Optional[str] = None) -> CacheKey:
+        return (check_in, check_out, (category or "").lower())
+
+    def _live(self, key: CacheKey) -> Optional[_Entry]:
+        """Entry usable on the running loop, dropping stale ones"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created > self.ttl:
+            self._entries.pop(key, None)
+            return None
+        if not entry.future.done() and entry.loop is not asyncio.get_running_loop():
+            # In flight on another event loop; it can't be awaited from here
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _start(self, key: CacheKey, travel_studio, category: Optional[str], prefetched: bool,
+               owner: Optional[str] = None) -> _Entry:
+        """Add an entry and fetch it in the background"""
+        entry = _Entry(asyncio.get_running_loop().create_future(), prefetched, owner)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        task = asyncio.create_task(self._fetch(key, entry, travel_studio, category))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return entry
+
+    async def _fetch(self, key: CacheKey, entry: _Entry, travel_studio, category: Optional[str]):
+        check_in, check_out, _ = key
+        try:
+            rooms = await asyncio.to_thread(
+                travel_studio.get_available_rooms,
+                check_in_date=check_in,
+                check_out_date=check_out,
+                category=category,
+            )
+        except Exception as e:
+            logger.error(f"Availability lookup failed: {e}")
+            rooms = None
+
+        if rooms is None and self._entries.get(key) is entry:
+            # Don't cache failures
+            self._entries.pop(key, None)
+        if not entry.future.done():
+            entry.future.set_result(rooms)
+
+    def prefetch(self, travel_studio, check_in: str, check_out: str,
+                 category: Optional[str] = None, owner: Optional[str] = None) -> Optional[_Entry]:
+        """
+        Start fetching availability ahead of a likely tool call
+
+        Args:
+            owner: Guest whose turn speculates; only their get_rooms marks
+                   the entry used
+
+        Returns:
+            The new entry, or None if these dates are already cached or in flight
+        """
+        key = self.key(check_in, check_out, category)
+        if self._live(key) is not None:
+            return None
+        return self._start(key, travel_studio, category, prefetched=True, owner=owner)
+
+    async def get_rooms(
+        self,
+        travel_studio,
+        check_in: str,
+        check_out: str,
+        category: Optional[str] = None,
+        consumer: Optional[str] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Available rooms for the dates, from the cache or Travel Studio
+
+        Args:
+            travel_studio: TravelStudioService used on a miss
+            check_in: Check-in date (YYYY-MM-DD)
+            check_out: Check-out date (YYYY-MM-DD)
+            category: Travel Studio room category, or None for all
+            consumer: Guest asking; marks their own speculation used
+
+        Returns:
+            list: Available rooms, or None if the API call failed
+        """
+        key = self.key(check_in, check_out, category)
+        entry = self._live(key)
+        narrow = False
+        if entry is None and category:
+            entry = self._live(self.key(check_in, check_out))
+            narrow = entry is not None
+
+        record_cache_lookup("availability", entry is not None)
+        if entry is None:
+            entry = self._start(key, travel_studio, category, prefetched=False)
+        if entry.owner is not None and entry.owner == consumer:
+            entry.used = True
+
+        rooms = await asyncio.shield(entry.future)
+        if rooms is None:
+            return None
+        if narrow:
+            return [room for room in rooms if str(room.get("category", "")).lower() == key[2]]
+        return list(rooms)
+
+    def on_booking_change(self, action: str, booking: Dict[str, Any], category: Optional[str] = None):
+        """Booking listener: drop the entries whose stay overlaps the booking's"""
+        check_in = str(booking.get("check_in_date") or booking.get("check_in") or "")[:10]
+        check_out = str(booking.get("check_out_date") or booking.get("check_out") or "")[:10]
+        # May run on a worker thread, so work on a copy of the keys
+        for key in list(self._entries):
+            if not check_in or not check_out or (key[0] < check_out and check_in < key[1]):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Singleton instance
+_availability_cache = None
+
+
+def get_availability_cache() -> AvailabilityCache:
+    """Get singleton instance of AvailabilityCache"""
+    global _availability_cache
+    if _availability_cache is None:
+        _availability_cache = AvailabilityCache(travel_studio=get_travel_studio_service())
+    return _availability_cache
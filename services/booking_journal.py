@@ -0,0 +1,484 @@
+"""
+Booking Journal
+Write-ahead record of the bookings the agent creates, so a Travel Studio
+timeout after the booking was committed neither loses it nor duplicates it
+
+Before the POST, the booking is written to the booking_journal table under
+an idempotency key derived from the guest, dates, room type and party
+size, and the key is sent as the POST's Idempotency-Key header. A retry
+of the same booking (the model calling the tool again, QStash
+redelivering the message) finds the entry: a confirmed booking that
+Travel Studio still has is answered from the journal without booking
+again, and one that is in flight or whose outcome is unknown is reported
+as pending instead of being sent again. A confirmed booking that has
+since been cancelled starts a new attempt, sent under a new key.
+
+A timeout or dropped connection leaves the outcome unknown. The
+reconciler looks the booking up in Travel Studio every
+BOOKING_RECONCILE_INTERVAL_SECONDS: once found it is confirmed; still
+missing BOOKING_RECONCILE_GIVE_UP_SECONDS after it was sent, it is marked
+failed and may be sent again. Either way on_resolved is called so the
+guest and the owner hear the same outcome.
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database.models import BookingJournalEntry, SessionLocal
+from services.travel_studio_service import (
+    CANCELLED_STATUSES,
+    ERROR_CONNECTION,
+    ERROR_TIMEOUT,
+    get_travel_studio_service,
+    normalize_phone,
+    phone_matches,
+)
+from utils.metrics import BOOKING_JOURNAL_TOTAL
+
+logger = logging.getLogger(__name__)
+
+STATUS_SENDING = "sending"      # POST in flight (until the lease runs out)
+STATUS_UNKNOWN = "unknown"      # POST timed out; the reconciler decides
+STATUS_CONFIRMED = "confirmed"
+STATUS_FAILED = "failed"        # Not created; the next attempt sends again
+STATUS_PENDING = "pending"      # What callers see for sending and unknown
+
+# Request failures after which Travel Studio may still have created the booking
+AMBIGUOUS_ERRORS = {ERROR_TIMEOUT, ERROR_CONNECTION}
+
+# Allowed difference between our clock and Travel Studio's
+CLOCK_SKEW = timedelta(seconds=60)
+
+
+def booking_key(guest_phone: str, check_in: str, check_out: str, room_category: str,
+                num_adults: Any = 1, num_children: Any = 0) -> str:
+    """Idempotency key: the same guest booking the same stay gets the same key"""
+    parts = [
+        normalize_phone(guest_phone)[-10:],
+        str(check_in)[:10],
+        str(check_out)[:10],
+        str(room_category or "").strip().lower(),
+        str(int(num_adults or 1)),
+        str(int(num_children or 0)),
+    ]
+    return "wa-" + hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def attempt_key(key: str, attempts: int) -> str:
+    """Key sent with one attempt, so a rebooked stay never matches the cancelled booking"""
+    return key if attempts <= 1 else f"{key}-{attempts}"
+
+
+def _created_at(booking: Dict) -> Optional[datetime]:
+    """When Travel Studio created a booking, as naive UTC"""
+    value = booking.get("created_at") or booking.get("createdAt")
+    if not value:
+        return None
+    try:
+        created = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if created.tzinfo is not None:
+        created = created.astimezone(timezone.utc).replace(tzinfo=None)
+    return created
+
+
+def find_booking(bookings: List[Dict], entry: Dict[str, Any]) -> Optional[Dict]:
+    """
+    The Travel Studio booking a journal entry created, if it is in the list
+
+    A booking echoing the idempotency key is ours. Otherwise guest, dates
+    and room type must match and the booking must have been created after
+    the entry and not cancelled, so neither a booking the guest made
+    through another channel nor one they cancelled is taken for this one.
+    """
+    sent_key = attempt_key(entry["idempotency_key"], entry.get("attempts") or 1)
+    for booking in bookings:
+        if booking.get("idempotency_key") == sent_key:
+            return booking
+    journalled_at = datetime.fromisoformat(entry["created_at"]) - CLOCK_SKEW
+    for booking in bookings:
+        category = booking.get("room_category")
+        created = _created_at(booking)
+        if (
+            created is not None and created >= journalled_at
+            and str(booking.get("status", "")).lower() not in CANCELLED_STATUSES
+            and phone_matches(booking, entry["guest_phone"])
+            and str(booking.get("check_in_date", ""))[:10] == entry["check_in"]
+            and str(booking.get("check_out_date", ""))[:10] == entry["check_out"]
+            and (not category or str(category).lower() == str(entry["room_category"]).lower())
+        ):
+            return booking
+    return None
+
+
+def guest_message(entry: Dict[str, Any]) -> str:
+    """WhatsApp message for the guest once a pending booking is resolved"""
+    stay = f"{entry['room_category']} booking for {entry['check_in']} to {entry['check_out']}"
+    if entry["status"] == STATUS_CONFIRMED:
+        booking_id = entry["booking_id"]
+        return (
+            f"Good news! Your {stay} is confirmed (booking ID: {booking_id}). "
+            f"Payment link: https://maldevtafarms.com/book?bookingId={booking_id}"
+        )
+    return (
+        f"Sorry, we couldn't complete your {stay}. "
+        f"Reply here and we'll try again right away."
+    )
+
+
+class BookingJournal:
+    def __init__(
+        self,
+        travel_studio=None,
+        session_factory: Optional[Callable] = None,
+        on_resolved: Optional[Callable[[Dict[str, Any]], None]] = None,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        """
+        Initialize booking journal
+
+        Args:
+            travel_studio: TravelStudioService (default: the shared one)
+            session_factory: Database sessions (default: SessionLocal)
+            on_resolved: Called with the entry when the reconciler confirms or
+                         fails a booking whose outcome was unknown
+            clock: UTC now (for tests)
+        """
+        self.travel_studio = travel_studio or get_travel_studio_service()
+        self.session_factory = session_factory or SessionLocal
+        self.on_resolved = on_resolved
+        # Longer than a POST can take, retries included
+        self.lease_seconds = float(os.getenv("BOOKING_JOURNAL_LEASE_SECONDS", "120"))
+        self.reconcile_interval = float(os.getenv("BOOKING_RECONCILE_INTERVAL_SECONDS", "30"))
+        self.give_up_seconds = float(os.getenv("BOOKING_RECONCILE_GIVE_UP_SECONDS", "600"))
+        self._clock = clock
+
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    # Booking side
+
+    def create_booking(self, booking: Dict[str, Any], travel_studio=None) -> Dict[str, Any]:
+        """
+        Create a booking at most once
+
+        Args:
+            booking: TravelStudioService.create_booking arguments
+            travel_studio: Service to book through (default: the journal's)
+
+        Returns:
+            dict: status (confirmed, pending or failed), booking (when
+            confirmed), idempotency_key, and replayed=True when answered
+            from the journal
+        """
+        travel_studio = travel_studio or self.travel_studio
+        key = booking_key(
+            booking.get("guest_phone", ""), booking.get("check_in_date", ""), booking.get("check_out_date", ""),
+            booking.get("room_category", ""), booking.get("num_adults"), booking.get("num_children"),
+        )
+
+        try:
+            entry, send = self._claim(key, booking)
+        except SQLAlchemyError as e:
+            # Booking without the journal beats not booking at all
+            logger.error(f"Booking journal unavailable, creating booking without it: {str(e)}")
+            created = travel_studio.create_booking(**booking, idempotency_key=key)
+            return {"status": STATUS_CONFIRMED if created else STATUS_FAILED, "booking": created, "idempotency_key": key}
+
+        if not send and entry["status"] == STATUS_CONFIRMED and not self._still_booked(entry, travel_studio):
+            logger.info(f"Booking {entry['booking_id']} for {key} is no longer live, booking the stay again")
+            try:
+                entry, send = self._reclaim(key, booking, STATUS_CONFIRMED, entry["attempts"])
+            except SQLAlchemyError as e:
+                logger.error(f"Booking journal unavailable, not rebooking {key}: {str(e)}")
+                return {"status": STATUS_FAILED, "idempotency_key": key, "error": "journal unavailable"}
+
+        if not send:
+            if entry["status"] == STATUS_CONFIRMED:
+                BOOKING_JOURNAL_TOTAL.inc(outcome="replayed")
+                logger.info(f"Booking {key} already confirmed as {entry['booking_id']}, not sending again")
+                return {"status": STATUS_CONFIRMED, "booking": entry["booking"], "idempotency_key": key,
+                        "replayed": True}
+            BOOKING_JOURNAL_TOTAL.inc(outcome="pending")
+            return {"status": STATUS_PENDING, "idempotency_key": key}
+
+        created = travel_studio.create_booking(**booking, idempotency_key=attempt_key(key, entry["attempts"]))
+        if created:
+            self._finish(key, entry["attempts"], STATUS_CONFIRMED, booking=created)
+            BOOKING_JOURNAL_TOTAL.inc(outcome="confirmed")
+            return {"status": STATUS_CONFIRMED, "booking": created, "idempotency_key": key}
+
+        error = travel_studio.last_error_kind()
+        if error in AMBIGUOUS_ERRORS:
+            logger.warning(f"Booking {key} outcome unknown ({error}), reconciling in the background")
+            self._finish(key, entry["attempts"], STATUS_UNKNOWN, error=error,
+                         next_check_at=self._clock() + timedelta(seconds=self.reconcile_interval))
+            BOOKING_JOURNAL_TOTAL.inc(outcome="unknown")
+            return {"status": STATUS_PENDING, "idempotency_key": key}
+
+        self._finish(key, entry["attempts"], STATUS_FAILED, error=error)
+        BOOKING_JOURNAL_TOTAL.inc(outcome="failed")
+        return {"status": STATUS_FAILED, "idempotency_key": key, "error": error}
+
+    def _claim(self, key: str, booking: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Record the intent, or find the earlier one
+
+        Returns:
+            (entry, send): send is True when this caller owns the POST
+        """
+        now = self._clock()
+        lease = now + timedelta(seconds=self.lease_seconds)
+        db = self.session_factory()
+        try:
+            entry = BookingJournalEntry(
+                idempotency_key=key,
+                guest_phone=booking.get("guest_phone", ""),
+                room_category=booking.get("room_category", ""),
+                check_in=str(booking.get("check_in_date", ""))[:10],
+                check_out=str(booking.get("check_out_date", ""))[:10],
+                request=booking,
+                status=STATUS_SENDING,
+                attempts=1,
+                created_at=now,
+                sent_at=now,
+                next_check_at=lease,
+            )
+            db.add(entry)
+            try:
+                db.commit()
+                return self._as_dict(entry), True
+            except IntegrityError:
+                db.rollback()
+
+            earlier = db.query(BookingJournalEntry).filter(BookingJournalEntry.idempotency_key == key).one()
+            earlier = self._as_dict(earlier)
+        finally:
+            db.close()
+
+        if earlier["status"] != STATUS_FAILED:
+            return earlier, False
+        # Failed before: send again
+        return self._reclaim(key, booking, STATUS_FAILED, earlier["attempts"])
+
+    def _reclaim(self, key: str, booking: Dict[str, Any], status: str, attempts: int) -> Tuple[Dict[str, Any], bool]:
+        """
+        Start a new attempt on an entry, unless another attempt claimed it first
+
+        Args:
+            key: Idempotency key
+            booking: Booking to send
+            status: Status the entry must still have (failed, or confirmed
+                    for a booking that was cancelled)
+            attempts: Attempt count the entry must still have
+
+        Returns:
+            (entry, send): send is True when this caller owns the POST
+        """
+        now = self._clock()
+        db = self.session_factory()
+        try:
+            claimed = db.query(BookingJournalEntry).filter(
+                BookingJournalEntry.idempotency_key == key,
+                BookingJournalEntry.status == status,
+                BookingJournalEntry.attempts == attempts,
+            ).update({
+                "status": STATUS_SENDING,
+                "attempts": attempts + 1,
+                "request": booking,
+                "booking": None,
+                "booking_id": None,
+                "last_error": None,
+                "sent_at": now,
+                "next_check_at": now + timedelta(seconds=self.lease_seconds),
+            }, synchronize_session=False)
+            db.commit()
+            entry = db.query(BookingJournalEntry).filter(BookingJournalEntry.idempotency_key == key).one()
+            return self._as_dict(entry), claimed == 1
+        finally:
+            db.close()
+
+    @staticmethod
+    def _still_booked(entry: Dict[str, Any], travel_studio) -> bool:
+        """
+        Whether a confirmed entry's booking is still live in Travel Studio
+
+        Only a booking Travel Studio reports as cancelled or missing (404)
+        counts as gone; when it can't be asked, the journal is trusted.
+        """
+        current = travel_studio.get_booking_by_id(entry["booking_id"])
+        if current is None:
+            return travel_studio.last_status_code() != 404
+        return str(current.get("status", "")).lower() not in CANCELLED_STATUSES
+
+    def _finish(self, key: str, attempts: int, status: str, booking: Optional[Dict] = None,
+                error: Optional[str] = None, next_check_at: Optional[datetime] = None) -> bool:
+        """Record an outcome, unless a later attempt has taken the entry over"""
+        values: Dict[str, Any] = {"status": status, "last_error": error, "next_check_at": next_check_at}
+        if booking is not None:
+            values["booking"] = booking
+            values["booking_id"] = str(booking.get("booking_id") or booking.get("id") or "")
+        db = self.session_factory()
+        try:
+            updated = db.query(BookingJournalEntry).filter(
+                BookingJournalEntry.idempotency_key == key,
+                BookingJournalEntry.attempts == attempts,
+                BookingJournalEntry.status.in_([STATUS_SENDING, STATUS_UNKNOWN]),
+            ).update(values, synchronize_session=False)
+            db.commit()
+            return updated == 1
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Could not record booking {key} as {status}: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+    @staticmethod
+    def _as_dict(entry: BookingJournalEntry) -> Dict[str, Any]:
+        return {
+            "idempotency_key": entry.idempotency_key,
+            "guest_phone": entry.guest_phone,
+            "room_category": entry.room_category,
+            "check_in": entry.check_in,
+            "check_out": entry.check_out,
+            "status": entry.status,
+            "booking_id": entry.booking_id,
+            "booking": entry.booking,
+            "attempts": entry.attempts,
+            "last_error": entry.last_error,
+            "created_at": entry.created_at.isoformat() if entry.created_at else None,
+            "sent_at": entry.sent_at,
+        }
+
+    # Reconciler
+
+    def unresolved(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Entries still sending or with an unknown outcome, oldest first"""
+        db = self.session_factory()
+        try:
+            entries = (
+                db.query(BookingJournalEntry)
+                .filter(BookingJournalEntry.status.in_([STATUS_SENDING, STATUS_UNKNOWN]))
+                .order_by(BookingJournalEntry.id)
+                .limit(limit)
+                .all()
+            )
+            return [self._as_dict(entry) for entry in entries]
+        finally:
+            db.close()
+
+    def reconcile_due(self, limit: int = 20) -> int:
+        """
+        Look up unknown outcomes (and sends whose lease ran out) in Travel Studio
+
+        Returns:
+            int: Entries confirmed or failed
+        """
+        now = self._clock()
+        db = self.session_factory()
+        try:
+            entries = (
+                db.query(BookingJournalEntry)
+                .filter(
+                    BookingJournalEntry.status.in_([STATUS_SENDING, STATUS_UNKNOWN]),
+                    BookingJournalEntry.next_check_at <= now,
+                )
+                .order_by(BookingJournalEntry.next_check_at)
+                .limit(limit)
+                .all()
+            )
+            due = [self._as_dict(entry) for entry in entries]
+        finally:
+            db.close()
+        return sum(1 for entry in due if self.reconcile(entry))
+
+    def reconcile(self, entry: Dict[str, Any]) -> bool:
+        """
+        Settle one entry from Travel Studio's bookings
+
+        Returns:
+            bool: True if it was confirmed or failed
+        """
+        now = self._clock()
+        key, attempts = entry["idempotency_key"], entry["attempts"]
+        # By guest only; find_booking matches the dates itself
+        bookings = self.travel_studio.get_bookings(phone=entry["guest_phone"])
+        if bookings is None:
+            # Travel Studio still unreachable: ask again later
+            self._finish(key, attempts, STATUS_UNKNOWN, error=entry["last_error"],
+                         next_check_at=now + timedelta(seconds=self.reconcile_interval))
+            return False
+
+        booking = find_booking(bookings, entry)
+        if booking is not None:
+            if not self._finish(key, attempts, STATUS_CONFIRMED, booking=booking):
+                return False
+            BOOKING_JOURNAL_TOTAL.inc(outcome="reconciled")
+            logger.info(f"Booking {key} found in Travel Studio after an unknown outcome")
+        elif entry["sent_at"] is not None and now - entry["sent_at"] >= timedelta(seconds=self.give_up_seconds):
+            if not self._finish(key, attempts, STATUS_FAILED, error="not found in Travel Studio"):
+                return False
+            BOOKING_JOURNAL_TOTAL.inc(outcome="abandoned")
+            logger.warning(f"Booking {key} never appeared in Travel Studio, marked failed")
+        else:
+            self._finish(key, attempts, STATUS_UNKNOWN, error=entry["last_error"],
+                         next_check_at=now + timedelta(seconds=self.reconcile_interval))
+            return False
+
+        if self.on_resolved is not None:
+            resolved = {**entry, "status": STATUS_CONFIRMED if booking is not None else STATUS_FAILED}
+            if booking is not None:
+                resolved["booking"] = booking
+                resolved["booking_id"] = str(booking.get("booking_id") or booking.get("id") or "")
+            try:
+                self.on_resolved(resolved)
+            except Exception as e:
+                logger.error(f"Booking resolution notification failed for {key}: {str(e)}")
+        return True
+
+    async def start(self):
+        """Start the reconciler on the running event loop"""
+        if self._task is not None:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Booking reconciler started (every {self.reconcile_interval:.0f}s)")
+
+    async def stop(self):
+        """Stop the reconciler"""
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while self._running:
+            try:
+                await asyncio.to_thread(self.reconcile_due)
+            except Exception as e:
+                logger.error(f"Booking reconciler error: {e}", exc_info=True)
+            await asyncio.sleep(self.reconcile_interval)
+
+
+# Singleton instance
+_booking_journal = None
+
+
+def get_booking_journal() -> BookingJournal:
+    """Get singleton instance of BookingJournal"""
+    global _booking_journal
+    if _booking_journal is None:
+        _booking_journal = BookingJournal()
+    return _booking_journal
@@ -0,0 +1,225 @@
+"""
+Catalogue Cache
+Stale-while-revalidate cache for Travel Studio data that rarely changes:
+the hotel profile, the room catalogue and the room types derived from it
+
+A value younger than CATALOGUE_TTL_SECONDS is served as is. An older one
+(up to CATALOGUE_MAX_STALE_SECONDS) is still served immediately while a
+background thread fetches a fresh copy; only a missing or expired value
+makes the caller wait for Travel Studio. If a fetch fails, the last known
+value keeps being served.
+
+Every successful fetch is written to a JSON snapshot on disk
+(CATALOGUE_SNAPSHOT_PATH), so a cold start answers from the snapshot and
+refreshes in the background instead of calling the API first. Workers
+sharing the snapshot reload it when it changes on disk, so a refresh or a
+purge in one worker reaches the others on their next lookup.
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from utils.metrics import CATALOGUE_REFRESHES_TOTAL, record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogueCache:
+    """Named values with stale-while-revalidate refresh and a disk snapshot"""
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        max_stale_seconds: Optional[float] = None,
+        snapshot_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("CATALOGUE_TTL_SECONDS", "3600"))
+        self.max_stale = (
+            max_stale_seconds if max_stale_seconds is not None
+            else float(os.getenv("CATALOGUE_MAX_STALE_SECONDS", "604800"))
+        )
+        # "" disables the snapshot; kept in the temp dir, which stays writable when deployed
+        self.snapshot_path = (
+            snapshot_path if snapshot_path is not None
+            else os.getenv("CATALOGUE_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "catalogue_snapshot.json"))
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._refreshing = set()
+        # (inode, mtime, size) of the snapshot as last read or written here
+        self._snapshot_version: Optional[Tuple[int, int, int]] = None
+        # name -> {"value": ..., "fetched_at": unix time}
+        self._entries: Dict[str, Dict[str, Any]] = self._read_snapshot()
+
+    def get(self, name: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """
+        Cached value, refreshed with loader() as needed
+
+        Args:
+            name: Cache key, e.g. "profile"
+            loader: Fetches the value; returns None on failure
+
+        Returns:
+            The value, or None if it was never fetched and loading failed
+        """
+        self._sync_snapshot()
+        entry = self._entries.get(name)
+        age = self._clock() - entry["fetched_at"] if entry else None
+        record_cache_lookup("catalogue", entry is not None and age <= self.max_stale)
+
+        if entry is not None and age <= self.ttl:
+            return entry["value"]
+        if entry is not None and age <= self.max_stale:
+            self._refresh_in_background(name, loader)
+            return entry["value"]
+
+        value = self._load(name, loader)
+        if value is None and entry is not None:
+            logger.warning(f"Serving expired catalogue entry {name}: refresh failed")
+            return entry["value"]
+        return value
+
+    def peek(self, name: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """
+        Like get(), but never waits: a missing or old entry is fetched in the
+        background and whatever is in memory (possibly None) is returned now
+        """
+        self._sync_snapshot()
+        entry = self._entries.get(name)
+        if entry is None or self._clock() - entry["fetched_at"] > self.ttl:
+            self._refresh_in_background(name, loader)
+        return entry["value"] if entry is not None else None
+
+    def put(self, name: str, value: Any):
+        with self._lock:
+            self._entries[name] = {"value": value, "fetched_at": self._clock()}
+            entries = dict(self._entries)
+        self._write_snapshot(entries)
+
+    def purge(self, name: Optional[str] = None) -> List[str]:
+        """
+        Drop one entry, or all of them, from memory and the snapshot
+
+        Other workers drop it on their next lookup, when they see the
+        rewritten snapshot; with the snapshot disabled only this process
+        is purged.
+
+        Returns:
+            list: Names that were dropped
+        """
+        with self._lock:
+            names = [name] if name else list(self._entries)
+            purged = [key for key in names if self._entries.pop(key, None) is not None]
+            entries = dict(self._entries)
+        self._write_snapshot(entries)
+        return purged
+
+    def age(self, name: str) -> Optional[float]:
+        """Seconds since the entry was fetched, or None if absent"""
+        entry = self._entries.get(name)
+        return self._clock() - entry["fetched_at"] if entry else None
+
+    def _load(self, name: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+        try:
+            value = loader()
+        except Exception as e:
+            logger.error(f"Catalogue refresh of {name} failed: {str(e)}")
+            value = None
+        CATALOGUE_REFRESHES_TOTAL.inc(name=name, outcome="ok" if value is not None else "error")
+        if value is not None:
+            self.put(name, value)
+        return value
+
+    def _refresh_in_background(self, name: str, loader: Callable[[], Optional[Any]]):
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def run():
+            try:
+                self._load(name, loader)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=run, name=f"catalogue-refresh-{name}", daemon=True).start()
+
+    def wait_for_refreshes(self, timeout: float = 5.0):
+        """Block until background refreshes finish (for tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _snapshot_stat(self) -> Optional[Tuple[int, int, int]]:
+        # Every rewrite is a new file, so the inode changes even when two
+        # writes land within the filesystem's mtime resolution
+        try:
+            stat = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _sync_snapshot(self):
+        """Reload the snapshot if another worker has rewritten it"""
+        if not self.snapshot_path:
+            return
+        version = self._snapshot_stat()
+        if version is None or version == self._snapshot_version:
+            return
+        entries = self._read_snapshot()
+        with self._lock:
+            self._entries = entries
+
+    def _read_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        if not self.snapshot_path:
+            return {}
+        self._snapshot_version = self._snapshot_stat()
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable catalogue snapshot {self.snapshot_path}: {str(e)}")
+            return {}
+        logger.info(f"Catalogue snapshot loaded: {', '.join(sorted(entries)) or 'empty'}")
+        return {
+            name: entry for name, entry in entries.items()
+            if isinstance(entry, dict) and "value" in entry and "fetched_at" in entry
+        }
+
+    def _write_snapshot(self, entries: Dict[str, Dict[str, Any]]):
+        """Atomic rewrite, so a crash never leaves a half-written snapshot"""
+        if not self.snapshot_path:
+            return
+        tmp_path = None
+        try:
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._write_lock:
+                # A temp file of our own: workers writing at once never share one
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", dir=directory or ".", prefix=".catalogue-", suffix=".tmp", delete=False
+                ) as f:
+                    tmp_path = f.name
+                    json.dump(entries, f, default=str)
+                os.replace(tmp_path, self.snapshot_path)
+                tmp_path = None
+                self._snapshot_version = self._snapshot_stat()
+        except OSError as e:
+            logger.error(f"Could not write catalogue snapshot: {str(e)}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
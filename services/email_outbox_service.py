@@ -0,0 +1,427 @@
+"""
+Email Outbox Service
+Durable outbox for notification emails with a pooled SMTP sender
+
+Tools write emails to the email_outbox table and return immediately.
+A background worker drains the table in batches over one reused,
+authenticated SMTP connection and retries failures with backoff.
+"""
+
+import os
+import asyncio
+import smtplib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable
+
+from database.models import EmailOutbox, SessionLocal
+from utils.helpers import get_smtp_config, build_email_message
+from utils.metrics import OUTBOUND_SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+# SMTP errors that will not succeed on retry
+PERMANENT_SMTP_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+)
+
+
+class PooledSMTPSender:
+    """Keeps one authenticated SMTP connection open across sends"""
+
+    def __init__(
+        self,
+        server: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: Optional[bool] = None,
+        from_email: Optional[str] = None,
+        max_idle_seconds: float = 60.0,
+        timeout: float = 30.0,
+    ):
+        config = get_smtp_config()
+        self.server = server or config["server"]
+        self.port = port or config["port"]
+        self.user = user if user is not None else config["user"]
+        self.password = password if password is not None else config["password"]
+        self.use_tls = config["use_tls"] if use_tls is None else use_tls
+        self.from_email = from_email or config["from_email"]
+        self.max_idle_seconds = max_idle_seconds
+        self.timeout = timeout
+
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connections_opened = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.server)
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open, secure and authenticate a new SMTP connection"""
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.user and self.password:
+            smtp.login(self.user, self.password)
+        self.connections_opened += 1
+        logger.info(f"Opened SMTP connection to {self.server}:{self.port}")
+        return smtp
+
+    def _get_connection(self) -> smtplib.SMTP:
+        """Return the open connection, reconnecting if it went idle or stale"""
+        if self._smtp is not None:
+            idle = time.monotonic() - self._last_used
+            if idle > self.max_idle_seconds:
+                # Servers drop idle sessions; probe before reusing
+                try:
+                    status, _ = self._smtp.noop()
+                    if status != 250:
+                        self.close()
+                except smtplib.SMTPException:
+                    self.close()
+                except OSError:
+                    self.close()
+
+        if self._smtp is None:
+            self._smtp = self._connect()
+
+        return self._smtp
+
+    def send(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        is_html: bool = True,
+        text_body: Optional[str] = None,
+    ):
+        """
+        Send one email over the pooled connection.
+        Reconnects once if the server dropped the session.
+
+        Raises:
+            smtplib.SMTPException or OSError on failure
+        """
+        msg = build_email_message(to_email, subject, body, is_html, self.from_email, text_body)
+
+        try:
+            self._get_connection().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            self.close()
+            self._get_connection().send_message(msg)
+
+        self._last_used = time.monotonic()
+
+    def close(self):
+        """Close the pooled connection"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+class EmailOutboxService:
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        sender: Optional[PooledSMTPSender] = None,
+    ):
+        """Initialize email outbox service"""
+        self.session_factory = session_factory or SessionLocal
+        self.sender = sender or PooledSMTPSender()
+        self.batch_size = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20"))
+        self.max_attempts = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+        self.retry_base_seconds = float(os.getenv("EMAIL_OUTBOX_RETRY_BASE_SECONDS", "30"))
+        self.poll_interval = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "10"))
+        self.lease_seconds = 300
+
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake_event: Optional[asyncio.Event] = None
+        self._running = False
+        self._warned_unconfigured = False
+
+    # Producer side
+
+    def enqueue(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        is_html: bool = True,
+        text_body: Optional[str] = None,
+        priority: int = 5,
+    ) -> Dict[str, Any]:
+        """
+        Write an email to the outbox.
+
+        Args:
+            to_email: Recipient email address
+            subject: Email subject
+            body: Email body (plain text or HTML)
+            is_html: Whether body is HTML (default: True)
+            text_body: Plain-text alternative for HTML emails
+            priority: Send order within a batch, lower first (default: 5)
+
+        Returns:
+            Dictionary with success status, message and outbox_id
+        """
+        if not to_email:
+            logger.error("Cannot queue email: no recipient")
+            return {"success": False, "error": "Email recipient not configured"}
+
+        db = self.session_factory()
+        try:
+            entry = EmailOutbox(
+                to_email=to_email,
+                subject=subject,
+                body=body,
+                text_body=text_body,
+                is_html=is_html,
+                priority=priority,
+                status="pending",
+                attempts=0,
+                next_attempt_at=datetime.utcnow(),
+            )
+            db.add(entry)
+            db.commit()
+            outbox_id = entry.id
+        except Exception as e:
+            logger.error(f"Error queueing email: {str(e)}")
+            db.rollback()
+            return {"success": False, "error": f"Failed to queue email: {str(e)}"}
+        finally:
+            db.close()
+
+        logger.info(f"Queued email {outbox_id} to {to_email}: {subject}")
+        self.wake()
+        return {
+            "success": True,
+            "message": f"Email queued for {to_email}",
+            "outbox_id": outbox_id,
+        }
+
+    def handle_send_email(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate a send_email tool request and queue it.
+        Shared by the /send_email endpoint and the local tool transport.
+
+        Args:
+            data: Request with to_email, subject, body and optional is_html/text_body/priority
+
+        Returns:
+            Dictionary with success status and message or error
+        """
+        to_email = data.get("to_email")
+        subject = data.get("subject")
+        body = data.get("body")
+        is_html = data.get("is_html", True)  # Default to HTML for formatted emails
+
+        if not all([to_email, subject, body]):
+            return {"success": False, "error": "Missing required fields: to_email, subject, body"}
+
+        try:
+            priority = int(data.get("priority", 5))
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid email priority: {data.get('priority')!r}")
+            priority = 5
+
+        result = self.enqueue(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            is_html=is_html,
+            text_body=data.get("text_body"),
+            priority=priority,
+        )
+
+        if result.get("success"):
+            return {"success": True, "message": result.get("message")}
+        return {"success": False, "error": result.get("error")}
+
+    # Consumer side
+
+    def _claim_batch(self, db, limit: int):
+        """Lease a batch of due emails so concurrent workers skip them"""
+        now = datetime.utcnow()
+        entries = (
+            db.query(EmailOutbox)
+            .filter(
+                EmailOutbox.status.in_(["pending", "sending"]),
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.priority, EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        for entry in entries:
+            entry.status = "sending"
+            entry.next_attempt_at = lease_until
+        db.commit()
+        return entries
+
+    def _retry_delay(self, attempts: int) -> timedelta:
+        """Exponential backoff capped at one hour"""
+        return timedelta(seconds=min(self.retry_base_seconds * (2 ** (attempts - 1)), 3600))
+
+    def drain_once(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Send one batch of due emails over the pooled connection.
+
+        Args:
+            limit: Maximum number of emails to send (default: batch size)
+
+        Returns:
+            Counts of sent, retried and failed emails
+        """
+        stats = {"claimed": 0, "sent": 0, "retried": 0, "failed": 0}
+
+        if not self.sender.configured:
+            if not self._warned_unconfigured:
+                logger.warning("SMTP_SERVER not set, email outbox not draining")
+                self._warned_unconfigured = True
+            return stats
+
+        db = self.session_factory()
+        try:
+            entries = self._claim_batch(db, limit or self.batch_size)
+            stats["claimed"] = len(entries)
+
+            for entry in entries:
+                entry.attempts = (entry.attempts or 0) + 1
+                started = time.perf_counter()
+                outcome = "error"
+                try:
+                    self.sender.send(
+                        entry.to_email, entry.subject, entry.body, entry.is_html, entry.text_body
+                    )
+                    outcome = "ok"
+                    entry.status = "sent"
+                    entry.sent_at = datetime.utcnow()
+                    entry.last_error = None
+                    stats["sent"] += 1
+                except PERMANENT_SMTP_ERRORS as e:
+                    logger.error(f"Outbox email {entry.id} rejected: {str(e)}")
+                    entry.status = "failed"
+                    entry.last_error = str(e)
+                    stats["failed"] += 1
+                except Exception as e:
+                    # Connection is unusable after most errors; reopen on next send
+                    self.sender.close()
+                    entry.last_error = str(e)
+                    if entry.attempts >= self.max_attempts:
+                        logger.error(f"Outbox email {entry.id} failed after {entry.attempts} attempts: {str(e)}")
+                        entry.status = "failed"
+                        stats["failed"] += 1
+                    else:
+                        logger.warning(f"Outbox email {entry.id} attempt {entry.attempts} failed: {str(e)}")
+                        entry.status = "pending"
+                        entry.next_attempt_at = datetime.utcnow() + self._retry_delay(entry.attempts)
+                        stats["retried"] += 1
+                finally:
+                    OUTBOUND_SEND_SECONDS.observe(time.perf_counter() - started, provider="smtp", outcome=outcome)
+
+                # Persist each outcome so a crash mid-batch cannot resend delivered mail
+                db.commit()
+
+        except Exception as e:
+            logger.error(f"Error draining email outbox: {str(e)}", exc_info=True)
+            db.rollback()
+        finally:
+            db.close()
+
+        if stats["claimed"]:
+            logger.info(f"Email outbox batch: {stats}")
+        return stats
+
+    def get_status_counts(self) -> Dict[str, int]:
+        """Count outbox entries by status"""
+        from sqlalchemy import func
+
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(EmailOutbox.status, func.count(EmailOutbox.id))
+                .group_by(EmailOutbox.status)
+                .all()
+            )
+            return {status: count for status, count in rows}
+        finally:
+            db.close()
+
+    # Background worker
+
+    def wake(self):
+        """Signal the background worker that new mail is waiting (thread-safe)"""
+        if self._loop is not None and self._wake_event is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake_event.set)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+    async def start(self):
+        """Start the background drain loop on the running event loop"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Email outbox worker started")
+
+    async def stop(self):
+        """Stop the background drain loop and close the SMTP connection"""
+        self._running = False
+        if self._task is not None:
+            self._wake_event.set()
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Error stopping email outbox worker: {e}")
+            self._task = None
+        await asyncio.to_thread(self.sender.close)
+        logger.info("Email outbox worker stopped")
+
+    async def _run(self):
+        while self._running:
+            try:
+                stats = await asyncio.to_thread(self.drain_once)
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}", exc_info=True)
+                stats = {"claimed": 0}
+
+            if not self._running:
+                break
+
+            # A full batch probably means more mail is waiting
+            if stats["claimed"] >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+
+# Singleton instance
+_email_outbox_service = None
+
+
+def get_email_outbox_service() -> EmailOutboxService:
+    """Get singleton instance of EmailOutboxService"""
+    global _email_outbox_service
+    if _email_outbox_service is None:
+        _email_outbox_service = EmailOutboxService()
+    return _email_outbox_service
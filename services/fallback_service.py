@@ -0,0 +1,329 @@
+"""
+Fallback Service
+Keeps guest messages when QStash is not configured or a publish fails
+
+Messages /webhook could not queue run inline on a bounded in-process pool.
+When the pool is saturated the guest gets a short "we're busy" reply and the
+message is appended to an on-disk journal. A background loop replays the
+journal to QStash once publishing works again, or to the pool as it frees
+up while the queue is still unavailable.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Callable, Awaitable
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one worker only
+    fcntl = None
+
+from utils.metrics import FALLBACK_MESSAGES_TOTAL, FALLBACK_JOURNAL_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BUSY_MESSAGE = (
+    "Thanks for your message! We're a little busy right now and will reply shortly."
+)
+
+
+class FallbackJournal:
+    """
+    Append-only JSON Lines file of messages waiting to be queued
+
+    Every uvicorn worker shares the file. Appends and rewrites hold an
+    exclusive flock on `<path>.lock`; a replay holds `<path>.replay.lock`
+    for its whole read/replay/remove cycle, so only one worker replays at a
+    time, and it removes the entries it replayed by id, never by position.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, suffix: str, blocking: bool = True):
+        """Exclusive cross-process lock on `<path><suffix>`; yields False if busy"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}{suffix}", "a") as lock_file:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def replay_lock(self):
+        """Held by the worker replaying the journal; yields False if another one is"""
+        return self._file_lock(".replay.lock", blocking=False)
+
+    def append(self, payload: Dict[str, Any]) -> str:
+        """
+        Write one entry and flush it to disk before returning
+
+        Returns:
+            str: The entry id
+        """
+        entry_id = uuid.uuid4().hex
+        line = json.dumps({"id": entry_id, "payload": payload}, default=str) + "\n"
+        with self._lock, self._file_lock(".lock"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        return entry_id
+
+    @staticmethod
+    def _parse(line: str) -> Tuple[str, Dict[str, Any]]:
+        """(id, payload) of a journal line; lines written before ids existed are keyed by their hash"""
+        data = json.loads(line)
+        if isinstance(data, dict) and "id" in data and "payload" in data:
+            return data["id"], data["payload"]
+        return hashlib.sha1(line.encode()).hexdigest(), data
+
+    def entries(self, limit: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Oldest (id, payload) pairs first"""
+        entries = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(self._parse(line))
+                    except json.JSONDecodeError:
+                        logger.error(f"Skipping corrupt fallback journal line: {line[:100]}")
+                        continue
+                    if limit is not None and len(entries) >= limit:
+                        break
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def read(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Oldest payloads first"""
+        return [payload for _, payload in self.entries(limit)]
+
+    def remove(self, entry_ids: Iterable[str]):
+        """Drop the given entries (atomic rewrite); anything appended meanwhile is kept"""
+        entry_ids = set(entry_ids)
+        if not entry_ids:
+            return
+        with self._lock, self._file_lock(".lock"):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    lines = [line.strip() for line in f if line.strip()]
+            except FileNotFoundError:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for line in lines:
+                    try:
+                        if self._parse(line)[0] in entry_ids:
+                            continue
+                    except json.JSONDecodeError:
+                        pass
+                    f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+
+class FallbackExecutor:
+    """Bounded inline processing with admission control and a disk spill"""
+
+    def __init__(
+        self,
+        journal_path: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        replay_interval: Optional[float] = None,
+        busy_message: Optional[str] = None,
+    ):
+        # /tmp by default: the deployment filesystem is read-only elsewhere
+        self.journal = FallbackJournal(
+            journal_path
+            or os.getenv("WEBHOOK_JOURNAL_PATH")
+            or os.path.join(tempfile.gettempdir(), "webhook_journal.jsonl")
+        )
+        self.max_concurrency = max_concurrency or int(os.getenv("FALLBACK_MAX_CONCURRENCY", "4"))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("FALLBACK_MAX_PENDING", "16"))
+        self.replay_interval = replay_interval or float(os.getenv("FALLBACK_REPLAY_INTERVAL_SECONDS", "10"))
+        self.busy_message = busy_message or os.getenv("FALLBACK_BUSY_MESSAGE", DEFAULT_BUSY_MESSAGE)
+
+        self._processor: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None
+        self._publish: Optional[Callable[[Dict[str, Any]], Awaitable[bool]]] = None
+        self._notify_busy: Optional[Callable[[str, str], Any]] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+        self._in_flight = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.max_concurrency + self.max_pending
+
+    async def start(
+        self,
+        processor: Callable[[Dict[str, Any]], Awaitable[Any]],
+        publish: Optional[Callable[[Dict[str, Any]], Awaitable[bool]]] = None,
+        notify_busy: Optional[Callable[[str, str], Any]] = None,
+    ):
+        """
+        Start the journal replay loop on the running event loop
+
+        Args:
+            processor: Runs the agent for a queued payload and sends the reply
+            publish: Queues a payload to QStash, returning True once accepted
+                (None when QStash isn't configured)
+            notify_busy: Sends a WhatsApp message (phone, text); blocking is fine
+        """
+        self._processor = processor
+        self._publish = publish
+        self._notify_busy = notify_busy
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        FALLBACK_JOURNAL_DEPTH.set(len(self.journal))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Fallback executor started (concurrency {self.max_concurrency}, pending {self.max_pending})"
+            )
+
+    async def stop(self):
+        """Stop replaying and wait for inline work already admitted"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, payload: Dict[str, Any]) -> str:
+        """
+        Take a message /webhook could not queue
+
+        Args:
+            payload: The payload that would have gone to /process-async
+
+        Returns:
+            str: "inline" if it will be processed here, "journaled" if it was
+                spilled to disk (the guest gets the busy reply)
+        """
+        if self._processor is not None and not self.saturated:
+            self._admit(payload)
+            FALLBACK_MESSAGES_TOTAL.inc(outcome="inline")
+            return "inline"
+
+        await asyncio.to_thread(self.journal.append, payload)
+        FALLBACK_MESSAGES_TOTAL.inc(outcome="journaled")
+        FALLBACK_JOURNAL_DEPTH.set(await asyncio.to_thread(len, self.journal))
+        logger.warning(f"Fallback pool saturated, journaled message from {payload.get('phone')}")
+
+        if self._notify_busy is not None and payload.get("phone"):
+            self._spawn(self._send_busy_reply(payload["phone"]))
+        return "journaled"
+
+    def _admit(self, payload: Dict[str, Any]):
+        self._in_flight += 1
+        self._spawn(self._process(payload))
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, payload: Dict[str, Any]):
+        try:
+            async with self._semaphore:
+                await self._processor(payload)
+        except Exception as e:
+            logger.error(f"Inline processing failed for {payload.get('phone')}: {e}", exc_info=True)
+        finally:
+            self._in_flight -= 1
+
+    async def _send_busy_reply(self, phone: str):
+        try:
+            await asyncio.to_thread(self._notify_busy, phone, self.busy_message)
+        except Exception as e:
+            logger.error(f"Failed to send busy reply to {phone}: {e}")
+
+    async def replay_once(self, limit: int = 100) -> int:
+        """
+        Move journaled messages back to QStash, or to the inline pool when
+        QStash still refuses them and the pool has room
+
+        Stops at the first message that can't be placed, so the journal
+        keeps its order. Skipped while another worker is replaying.
+
+        Returns:
+            int: Number of messages replayed
+        """
+        with self.journal.replay_lock() as acquired:
+            if not acquired:
+                return 0
+            entries = await asyncio.to_thread(self.journal.entries, limit)
+            replayed = []
+            for entry_id, payload in entries:
+                accepted = False
+                if self._publish is not None:
+                    try:
+                        accepted = await self._publish(payload)
+                    except Exception as e:
+                        logger.warning(f"Journal replay publish failed: {e}")
+                if not accepted:
+                    # Queue still down (or not configured): use free pool capacity
+                    if self._processor is None or self.saturated:
+                        break
+                    self._admit(payload)
+                replayed.append(entry_id)
+
+            if replayed:
+                await asyncio.to_thread(self.journal.remove, replayed)
+        if replayed:
+            FALLBACK_MESSAGES_TOTAL.inc(len(replayed), outcome="replayed")
+            FALLBACK_JOURNAL_DEPTH.set(await asyncio.to_thread(len, self.journal))
+            logger.info(f"Replayed {len(replayed)} journaled messages")
+        return len(replayed)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            try:
+                await self.replay_once()
+            except Exception as e:
+                logger.error(f"Fallback journal replay error: {e}", exc_info=True)
+
+
+# Singleton instance
+_fallback_executor = None
+
+
+def get_fallback_executor() -> FallbackExecutor:
+    """Get singleton instance of FallbackExecutor"""
+    global _fallback_executor
+    if _fallback_executor is None:
+        _fallback_executor = FallbackExecutor()
+    return _fallback_executor
@@ -0,0 +1,279 @@
+"""
+Hold Service
+Short-lived room holds so two guests chatting at the same time can't both
+book the last room of a category
+
+When check_availability is asked about one room type on behalf of a
+guest, the rooms they would need are held for INVENTORY_HOLD_TTL_SECONDS:
+one inventory_holds row per room and night. The table's unique
+(room_id, night) constraint decides races between workers and processes,
+so no explicit locking is needed. Other guests don't see held rooms, and
+a booking attempt for rooms someone else holds fails fast instead of
+reaching Travel Studio. Creating the booking consumes the hold, and an
+attempt that books nothing (failed, duplicate or still pending) releases
+it; expired holds are simply ignored and replaced.
+
+If the database can't be used the holds are skipped and availability
+behaves as before.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database.models import InventoryHold, SessionLocal
+from utils.metrics import INVENTORY_HOLDS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+def stay_nights(check_in: str, check_out: str) -> List[str]:
+    """Nights of a stay as YYYY-MM-DD (check-in up to the night before check-out)"""
+    start = datetime.strptime(check_in[:10], "%Y-%m-%d").date()
+    end = datetime.strptime(check_out[:10], "%Y-%m-%d").date()
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days)]
+
+
+class HoldService:
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        """Initialize hold service"""
+        self.session_factory = session_factory or SessionLocal
+        self.enabled = os.getenv("INVENTORY_HOLDS_ENABLED", "true").lower() == "true"
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("INVENTORY_HOLD_TTL_SECONDS", "600"))
+        self._clock = clock
+
+    def place(self, holder: str, room_ids: Iterable[str], check_in: str, check_out: str,
+              count: int = 1) -> Optional[List[str]]:
+        """
+        Hold `count` of the given rooms for every night of the stay
+
+        Rooms the holder already holds are kept (and extended) first; the
+        others are tried in order until enough are held.
+
+        Args:
+            holder: Guest phone number
+            room_ids: Candidate rooms, e.g. the available rooms of a category
+            check_in: YYYY-MM-DD
+            check_out: YYYY-MM-DD
+            count: Rooms wanted
+
+        Returns:
+            Held room ids (fewer than count if the rest are held by other
+            guests), or None if holds are disabled or the store failed
+        """
+        if not self.enabled or not holder:
+            return None
+        try:
+            nights = stay_nights(check_in, check_out)
+        except ValueError:
+            return None
+        candidates = list(dict.fromkeys(room_ids))
+        if not nights or not candidates or count <= 0:
+            return []
+
+        try:
+            own = self.held_by(holder, check_in, check_out)
+            candidates.sort(key=lambda room_id: room_id not in own)
+            held = []
+            for room_id in candidates:
+                if len(held) >= count:
+                    break
+                if self._hold_room(holder, room_id, nights):
+                    held.append(room_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Could not place inventory hold: {str(e)}")
+            INVENTORY_HOLDS_TOTAL.inc(outcome="error")
+            return None
+
+        INVENTORY_HOLDS_TOTAL.inc(outcome="placed" if len(held) == count else "contended")
+        if len(held) < count:
+            logger.info(f"Only {len(held)} of {count} rooms could be held for {holder} ({check_in} to {check_out})")
+        return held
+
+    def _hold_room(self, holder: str, room_id: str, nights: List[str]) -> bool:
+        """One transaction: all nights of the room for holder, or nothing"""
+        db = self.session_factory()
+        try:
+            now = self._clock()
+            # Writing first takes the write lock up front (SQLite) instead of
+            # upgrading a read lock, which can't wait for a busy database
+            db.query(InventoryHold).filter(
+                InventoryHold.room_id == room_id,
+                InventoryHold.night.in_(nights),
+                InventoryHold.expires_at <= now,
+            ).delete(synchronize_session=False)
+            existing = (
+                db.query(InventoryHold)
+                .filter(InventoryHold.room_id == room_id, InventoryHold.night.in_(nights))
+                .all()
+            )
+            if any(row.holder != holder for row in existing):
+                db.rollback()
+                return False
+
+            expires_at = now + timedelta(seconds=self.ttl)
+            held_nights = set()
+            for row in existing:
+                row.expires_at = expires_at
+                held_nights.add(row.night)
+            for night in nights:
+                if night not in held_nights:
+                    db.add(InventoryHold(room_id=room_id, night=night, holder=holder,
+                                         created_at=now, expires_at=expires_at))
+            db.commit()
+            return True
+        except IntegrityError:
+            # Another guest held one of the nights between our read and insert
+            db.rollback()
+            return False
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def held_by(self, holder: str, check_in: str, check_out: str) -> Set[str]:
+        """Rooms the holder holds for every night of the stay"""
+        nights = stay_nights(check_in, check_out)
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(InventoryHold.room_id, InventoryHold.night)
+                .filter(
+                    InventoryHold.holder == holder,
+                    InventoryHold.night.in_(nights),
+                    InventoryHold.expires_at > self._clock(),
+                )
+                .all()
+            )
+        finally:
+            db.close()
+        nights_by_room = {}
+        for room_id, night in rows:
+            nights_by_room.setdefault(room_id, set()).add(night)
+        return {room_id for room_id, held in nights_by_room.items() if len(held) == len(nights)}
+
+    def held_by_others(self, holder: Optional[str], check_in: str, check_out: str) -> Set[str]:
+        """
+        Rooms other guests hold on any night of the stay
+
+        Returns:
+            Room ids (empty if holds are disabled or the store failed)
+        """
+        if not self.enabled:
+            return set()
+        try:
+            nights = stay_nights(check_in, check_out)
+        except ValueError:
+            return set()
+        db = self.session_factory()
+        try:
+            query = db.query(InventoryHold.room_id).filter(
+                InventoryHold.night.in_(nights),
+                InventoryHold.expires_at > self._clock(),
+            )
+            if holder:
+                query = query.filter(InventoryHold.holder != holder)
+            return {room_id for (room_id,) in query.distinct().all()}
+        except SQLAlchemyError as e:
+            logger.error(f"Could not read inventory holds: {str(e)}")
+            return set()
+        finally:
+            db.close()
+
+    def held_nights_by_others(self, holder: Optional[str], start_date: str,
+                              end_date: str) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Nights other guests hold in a date span, for window searches
+
+        Returns:
+            Room id -> held [night, night + 1) day ordinals (empty if holds
+            are disabled or the store failed)
+        """
+        if not self.enabled:
+            return {}
+        db = self.session_factory()
+        try:
+            query = db.query(InventoryHold.room_id, InventoryHold.night).filter(
+                InventoryHold.night >= start_date[:10],
+                InventoryHold.night < end_date[:10],
+                InventoryHold.expires_at > self._clock(),
+            )
+            if holder:
+                query = query.filter(InventoryHold.holder != holder)
+            rows = query.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Could not read inventory holds: {str(e)}")
+            return {}
+        finally:
+            db.close()
+        held: Dict[str, List[Tuple[int, int]]] = {}
+        for room_id, night in rows:
+            day = datetime.strptime(night, "%Y-%m-%d").date().toordinal()
+            held.setdefault(room_id, []).append((day, day + 1))
+        return held
+
+    def consume(self, holder: str, check_in: str, check_out: str) -> int:
+        """
+        Drop the holder's holds for the stay once the booking exists, along
+        with any expired holds
+
+        Returns:
+            Number of room-nights released
+        """
+        return self._drop(holder, check_in, check_out, "consumed")
+
+    def release(self, holder: str, check_in: str, check_out: str) -> int:
+        """
+        Give the holder's rooms for the stay back when nothing was booked
+
+        Returns:
+            Number of room-nights released
+        """
+        return self._drop(holder, check_in, check_out, "released")
+
+    def _drop(self, holder: str, check_in: str, check_out: str, outcome: str) -> int:
+        if not self.enabled or not holder:
+            return 0
+        try:
+            nights = stay_nights(check_in, check_out)
+        except ValueError:
+            return 0
+        db = self.session_factory()
+        try:
+            released = db.query(InventoryHold).filter(
+                InventoryHold.holder == holder, InventoryHold.night.in_(nights)
+            ).delete(synchronize_session=False)
+            db.query(InventoryHold).filter(
+                InventoryHold.expires_at <= self._clock()
+            ).delete(synchronize_session=False)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Could not release inventory holds: {str(e)}")
+            return 0
+        finally:
+            db.close()
+        if released:
+            INVENTORY_HOLDS_TOTAL.inc(outcome=outcome)
+        return released
+
+
+# Singleton instance
+_hold_service = None
+
+
+def get_hold_service() -> HoldService:
+    """Get singleton instance of HoldService"""
+    global _hold_service
+    if _hold_service is None:
+        _hold_service = HoldService()
+    return _hold_service
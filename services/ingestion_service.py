@@ -0,0 +1,397 @@
+"""
+Ingestion Service
+Fast path for /webhook: parse the inbound payload and hand it to QStash
+
+Parsing is stateless (no WhatsAppService or Twilio client per request) and
+publishing goes through one long-lived pooled httpx client, so an ack costs
+a body read, a parse and a keep-alive POST. JSON is decoded straight from
+the request bytes with orjson when it is installed.
+
+Under bursts, QStashBatcher groups messages that arrive within a few
+milliseconds into one call to QStash's batch API. Each caller still waits
+until QStash has accepted its own message.
+
+Messages are published with the guest's phone as QStash flow-control key
+and a parallelism of 1, so QStash delivers one message per guest at a time
+and a guest's messages are processed in the order they were accepted.
+Different guests are still processed concurrently.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def decode_json(body: bytes) -> Any:
+    """Decode a JSON request body without copying it into a str first"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def encode_json(data: Any) -> bytes:
+    """Encode a payload to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def decode_form(body: bytes) -> Dict[str, str]:
+    """Decode an application/x-www-form-urlencoded body (Twilio webhooks)"""
+    return dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+
+
+def _empty_message(message_type: str) -> Dict[str, Any]:
+    return {
+        "message_sid": "",
+        "from_number": "",
+        "to_number": "",
+        "body": "",
+        "num_media": 0,
+        "profile_name": "",
+        "timestamp": "",
+        "message_type": message_type,
+    }
+
+
+def parse_webhook_payload(data: dict, to_number: str = "") -> Dict[str, Any]:
+    """
+    Parse an inbound WhatsApp webhook
+
+    Supports the WhatsApp Business API format (AiSensy) and the Twilio
+    format for compatibility.
+
+    Args:
+        data: Decoded webhook body
+        to_number: Receiving number reported for AiSensy messages
+
+    Returns:
+        dict: Parsed message data with standardized keys
+    """
+    try:
+        # WhatsApp Business API format (AiSensy webhook)
+        message_data = data.get("data")
+        if isinstance(message_data, dict) and "message" in message_data:
+            message_data = message_data["message"]
+
+            message_content = message_data.get("message_content", {})
+            body = ""
+            if isinstance(message_content, dict):
+                # Text message; media messages may carry a caption
+                if "text" in message_content:
+                    body = message_content["text"]
+                elif "caption" in message_content:
+                    body = message_content["caption"]
+
+            return {
+                "message_sid": message_data.get("messageId", ""),
+                "from_number": message_data.get("phone_number", ""),
+                "to_number": to_number,
+                "body": body,
+                "num_media": 0,
+                "profile_name": message_data.get("userName", ""),
+                "timestamp": message_data.get("timestamp", ""),
+                "message_type": message_data.get("type", "text"),
+            }
+
+        # Twilio format
+        if "MessageSid" in data or "From" in data:
+            return {
+                "message_sid": data.get("MessageSid", ""),
+                "from_number": data.get("From", "").replace("whatsapp:", ""),
+                "to_number": data.get("To", "").replace("whatsapp:", ""),
+                "body": data.get("Body", ""),
+                "num_media": int(data.get("NumMedia", 0)),
+                "profile_name": data.get("ProfileName", ""),
+                "timestamp": "",
+                "message_type": "text",
+            }
+
+        logger.error("Unknown webhook format")
+        return _empty_message("unknown")
+
+    except Exception as e:
+        logger.error(f"Error parsing incoming message: {str(e)}")
+        return _empty_message("error")
+
+
+class QStashPublisher:
+    """Publishes messages to QStash over one pooled keep-alive client"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        token: Optional[str] = None,
+        timeout: float = 5.0,
+        max_connections: int = 100,
+    ):
+        self.base_url = (base_url or os.getenv("QSTASH_URL", "https://qstash.upstash.io")).rstrip("/")
+        self.token = token if token is not None else os.getenv("QSTASH_TOKEN")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        # One delivery at a time per phone, so a guest's messages stay in order
+        self.flow_control = os.getenv("QSTASH_FLOW_CONTROL_ENABLED", "true").lower() == "true"
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token)
+
+    def _headers(self, forward_headers: Optional[Dict[str, str]], payload: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        for name, value in (forward_headers or {}).items():
+            headers[f"Upstash-Forward-{name}"] = value
+        phone = (payload or {}).get("phone")
+        if self.flow_control and phone:
+            headers["Upstash-Flow-Control-Key"] = f"phone-{''.join(ch for ch in str(phone) if ch.isalnum())}"
+            headers["Upstash-Flow-Control-Value"] = "parallelism=1"
+        return headers
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Create the client on first use (it binds to the running loop)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def publish(
+        self, destination: str, payload: Dict[str, Any], forward_headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """
+        Publish a JSON payload for QStash to deliver to destination
+
+        Args:
+            destination: URL QStash should POST the payload to
+            payload: Message body
+            forward_headers: Headers QStash should pass on to the destination
+
+        Returns:
+            httpx.Response: QStash's answer
+        """
+        headers = self._headers(forward_headers, payload)
+        headers["Authorization"] = f"Bearer {self.token}"
+
+        return await self._get_client().post(
+            f"{self.base_url}/v2/publish/{destination}",
+            headers=headers,
+            content=encode_json(payload),
+        )
+
+    async def publish_batch(
+        self, messages: List[Tuple[str, Dict[str, Any], Optional[Dict[str, str]]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Publish several messages in one request (QStash batch API)
+
+        Args:
+            messages: (destination, payload, forward_headers) tuples
+
+        Returns:
+            list: One result per message, in order ({"messageId": ...} or {"error": ...})
+        """
+        batch = [
+            {
+                "destination": destination,
+                "headers": self._headers(forward_headers, payload),
+                "body": encode_json(payload).decode("utf-8"),
+            }
+            for destination, payload, forward_headers in messages
+        ]
+        response = await self._get_client().post(
+            f"{self.base_url}/v2/batch",
+            headers={"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"},
+            content=encode_json(batch),
+        )
+        response.raise_for_status()
+
+        results = decode_json(response.content)
+        if not isinstance(results, list) or len(results) != len(messages):
+            raise ValueError(f"QStash batch returned {len(results) if isinstance(results, list) else 'no'} "
+                             f"results for {len(messages)} messages")
+        return results
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class QStashBatcher:
+    """
+    Micro-batches publishes into QStash batch calls
+
+    Messages submitted while a batch is being collected or sent go into the
+    next one; a lone message waits at most max_delay_ms. One batch is in
+    flight at a time and messages keep their submission order, so QStash
+    accepts two messages from the same phone in the order the webhooks
+    arrived; the per-phone flow-control key (see QStashPublisher) keeps
+    their delivery in that order.
+    """
+
+    def __init__(
+        self,
+        publisher: Optional[QStashPublisher] = None,
+        max_batch_size: Optional[int] = None,
+        max_delay_ms: Optional[float] = None,
+    ):
+        self.publisher = publisher or get_qstash_publisher()
+        self.max_batch_size = max_batch_size or int(os.getenv("QSTASH_BATCH_MAX_SIZE", "100"))
+        self.max_delay = (
+            max_delay_ms if max_delay_ms is not None else float(os.getenv("QSTASH_BATCH_MAX_DELAY_MS", "5"))
+        ) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches_sent = 0
+
+    def _ensure_started(self):
+        """
+        Start the flush loop on the running event loop
+
+        A loop that died is restarted on the same queue, so messages
+        already waiting still go out. Only a queue left behind by another
+        event loop is replaced, and its waiters are failed rather than
+        left hanging.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        if self._task is not None and not self._task.cancelled() and self._task.exception() is not None:
+            logger.error(f"QStash batcher stopped unexpectedly, restarting: {self._task.exception()}")
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._fail_queued(RuntimeError("QStash batcher restarted on another event loop"))
+            self._queue = asyncio.Queue()
+            self._loop = loop
+        self._task = asyncio.create_task(self._run())
+
+    def _fail_queued(self, error: Exception):
+        """Fail every message still waiting in the queue"""
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                try:
+                    future.set_exception(error)
+                except RuntimeError:
+                    pass  # its event loop is closed; nobody is waiting any more
+
+    async def submit(
+        self, destination: str, payload: Dict[str, Any], forward_headers: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Queue a message for the next batch and wait until QStash accepts it
+
+        Args:
+            destination: URL QStash should POST the payload to
+            payload: Message body
+            forward_headers: Headers QStash should pass on to the destination
+
+        Returns:
+            str: QStash message id
+
+        Raises:
+            Exception: If QStash rejected the message or the batch failed
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((destination, payload, forward_headers), future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Tuple[str, Dict[str, Any], Optional[Dict[str, str]]], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            messages = [message for message, _ in batch]
+            failure: Exception = RuntimeError("QStash batch did not complete")
+            try:
+                if len(messages) == 1:
+                    response = await self.publisher.publish(*messages[0])
+                    response.raise_for_status()
+                    results = [decode_json(response.content)]
+                else:
+                    results = await self.publisher.publish_batch(messages)
+                self.batches_sent += 1
+
+                for (_, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, dict) and result.get("messageId"):
+                        future.set_result(result["messageId"])
+                    else:
+                        error = result.get("error") if isinstance(result, dict) else result
+                        future.set_exception(RuntimeError(f"QStash rejected message: {error}"))
+            except Exception as e:
+                logger.error(f"QStash batch of {len(batch)} failed: {e}")
+                failure = e
+            finally:
+                # Never leave a caller waiting, even if this loop is cancelled
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(failure)
+
+    async def close(self):
+        """Stop the flush loop, failing anything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._fail_queued(RuntimeError("QStash batcher closed"))
+
+
+# Singleton instance
+_qstash_publisher = None
+
+
+def get_qstash_publisher() -> QStashPublisher:
+    """Get singleton instance of QStashPublisher"""
+    global _qstash_publisher
+    if _qstash_publisher is None:
+        _qstash_publisher = QStashPublisher()
+    return _qstash_publisher
+
+
+# Singleton instance
+_qstash_batcher = None
+
+
+def get_qstash_batcher() -> QStashBatcher:
+    """Get singleton instance of QStashBatcher"""
+    global _qstash_batcher
+    if _qstash_batcher is None:
+        _qstash_batcher = QStashBatcher()
+    return _qstash_batcher
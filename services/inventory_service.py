@@ -0,0 +1,481 @@
+"""
+Inventory Service
+In-process mirror of Travel Studio rooms and their booked nights
+
+A full load reads every room (get_all_rooms) and each room's bookings
+(get_room_bookings). Per room, the booked stays are kept as a sorted array
+of [first night, checkout) day ordinals with a running maximum of the end
+days, so "is this room free for these nights" is one bisect and
+availability for any date range and category is computed locally in
+microseconds.
+
+Freshness:
+- A background loop runs a delta sync every INVENTORY_SYNC_INTERVAL_SECONDS:
+  one get_all_rooms call, whose rooms carry their booking_list, and only the
+  rooms whose bookings changed are re-indexed.
+- Bookings made, updated or cancelled through TravelStudioService are
+  written through immediately. When the booked room isn't known yet, the
+  category isn't served from the mirror until the next sync. Write-throughs
+  that land while a sync is fetching are applied again on top of what it
+  installs, and only categories dirtied before the fetch are cleared.
+- The mirror stops answering (callers fall back to the remote endpoint) if
+  it was never loaded, is older than INVENTORY_MAX_STALENESS_SECONDS (one
+  sync interval plus a minute by default), or the last consistency check
+  against /rooms/available found a mismatch.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.travel_studio_service import (
+    CANCELLED_STATUSES,
+    booking_nights,
+    day_ordinal,
+    get_travel_studio_service,
+)
+from utils.metrics import (
+    INVENTORY_MIRROR_MISMATCHES_TOTAL,
+    INVENTORY_MIRROR_SYNCS_TOTAL,
+    record_cache_lookup,
+)
+
+logger = logging.getLogger(__name__)
+
+def _booking_id(booking: Dict[str, Any]) -> str:
+    return str(booking.get("booking_id") or booking.get("id") or "")
+
+
+def _booking_room_id(booking: Dict[str, Any]) -> Optional[str]:
+    room = booking.get("Room") or booking.get("room")
+    if isinstance(room, dict) and room.get("id"):
+        return str(room["id"])
+    room_id = booking.get("room_id") or booking.get("roomId")
+    return str(room_id) if room_id else None
+
+
+def _stays(room_id: str, bookings: List[Dict[str, Any]]) -> Dict[str, Tuple[int, int]]:
+    """Booking id -> nights for the bookings that hold the room"""
+    stays = {}
+    for booking in bookings:
+        nights = booking_nights(booking)
+        if nights is not None:
+            stays[_booking_id(booking) or f"{room_id}:{nights[0]}"] = nights
+    return stays
+
+
+class RoomCalendar:
+    """Booked stays of one room, sorted by check-in"""
+
+    def __init__(self, stays: Optional[Dict[str, Tuple[int, int]]] = None):
+        self._stays: Dict[str, Tuple[int, int]] = dict(stays or {})
+        self._rebuild()
+
+    def _rebuild(self):
+        ordered = sorted(self._stays.values())
+        self._starts = [start for start, _ in ordered]
+        # _max_end[i]: latest checkout among the first i + 1 stays
+        self._max_end = []
+        latest = 0
+        for _, end in ordered:
+            latest = max(latest, end)
+            self._max_end.append(latest)
+
+    @property
+    def stays(self) -> Dict[str, Tuple[int, int]]:
+        return dict(self._stays)
+
+    def holds(self, stays: Dict[str, Tuple[int, int]]) -> bool:
+        """True if the calendar has exactly these stays"""
+        return self._stays == stays
+
+    def is_free(self, start: int, end: int) -> bool:
+        """True if no stay overlaps the nights [start, end)"""
+        index = bisect_left(self._starts, end)
+        return index == 0 or self._max_end[index - 1] <= start
+
+    def add(self, booking_id: str, nights: Tuple[int, int]):
+        self._stays[booking_id] = nights
+        self._rebuild()
+
+    def remove(self, booking_id: str) -> bool:
+        if self._stays.pop(booking_id, None) is None:
+            return False
+        self._rebuild()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._stays)
+
+
+class InventoryMirror:
+    """Local copy of rooms and booked nights, kept fresh by sync and write-through"""
+
+    def __init__(
+        self,
+        travel_studio=None,
+        sync_interval: Optional[float] = None,
+        max_staleness: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.travel_studio = travel_studio or get_travel_studio_service()
+        self.sync_interval = sync_interval or float(os.getenv("INVENTORY_SYNC_INTERVAL_SECONDS", "300"))
+        self.max_staleness = max_staleness or float(
+            os.getenv("INVENTORY_MAX_STALENESS_SECONDS", str(self.sync_interval + 60))
+        )
+        if enabled is None:
+            enabled = os.getenv("INVENTORY_MIRROR_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._rooms: Dict[str, Dict[str, Any]] = {}
+        self._calendars: Dict[str, RoomCalendar] = {}
+        self._booking_rooms: Dict[str, str] = {}  # booking id -> room id
+        self._dirty_categories = set()
+        self._fetches = 0  # syncs fetching from Travel Studio right now
+        self._writes_during_fetch: List[Tuple[str, Dict[str, Any], Optional[str]]] = []
+        self.synced_at: Optional[float] = None
+        self.trusted = True  # False after a failed consistency check
+        self._task: Optional[asyncio.Task] = None
+        self.travel_studio.add_booking_listener(self.on_booking_change)
+
+    @property
+    def ready(self) -> bool:
+        return (
+            self.enabled
+            and self.trusted
+            and self.synced_at is not None
+            and time.monotonic() - self.synced_at <= self.max_staleness
+        )
+
+    # Loading and syncing
+
+    def _begin_fetch(self) -> set:
+        """
+        Note that a sync is fetching; caller holds the lock
+
+        Returns:
+            The categories dirty now, which the fetched data will settle
+        """
+        self._fetches += 1
+        return set(self._dirty_categories)
+
+    def _end_fetch(self):
+        """Caller holds the lock"""
+        self._fetches -= 1
+        if not self._fetches:
+            self._writes_during_fetch.clear()
+
+    def _install(self, rooms: List[Dict[str, Any]], bookings_by_room: Dict[str, List[Dict[str, Any]]],
+                 settled: set, only: Optional[List[str]] = None):
+        """
+        Replace the calendars of `only` (all rooms when None); caller holds the lock
+
+        Args:
+            settled: Dirty categories from before the fetch, now cleared
+        """
+        self._rooms = {str(room["id"]): room for room in rooms if room.get("id")}
+        for room_id in (only if only is not None else list(self._rooms)):
+            self._calendars[room_id] = RoomCalendar(_stays(room_id, bookings_by_room.get(room_id, [])))
+
+        # Drop rooms that disappeared, then re-derive booking -> room
+        for room_id in list(self._calendars):
+            if room_id not in self._rooms:
+                del self._calendars[room_id]
+        self._booking_rooms = {
+            booking_id: room_id
+            for room_id, calendar in self._calendars.items()
+            for booking_id in calendar.stays
+        }
+        self._dirty_categories.difference_update(settled)
+        # The fetched data may predate these; apply them again
+        for action, booking, category in self._writes_during_fetch:
+            self._apply(action, booking, category)
+        self.synced_at = time.monotonic()
+
+    def load(self) -> bool:
+        """
+        Full load: all rooms, then each room's bookings (fetched concurrently)
+
+        Returns:
+            bool: True if the mirror was (re)built
+        """
+        with self._lock:
+            settled = self._begin_fetch()
+        try:
+            rooms = self.travel_studio.get_all_rooms()
+            if rooms is None:
+                INVENTORY_MIRROR_SYNCS_TOTAL.inc(kind="full", outcome="error")
+                logger.warning("Inventory mirror load failed: could not list rooms")
+                return False
+
+            room_ids = [str(room.get("id", "")) for room in rooms if room.get("id")]
+            fetched = self.travel_studio.get_room_bookings_batch(room_ids)["results"]
+            bookings_by_room = {}
+            for room in rooms:
+                room_id = str(room.get("id", ""))
+                if not room_id:
+                    continue
+                # Fall back to the bookings embedded in the room list
+                bookings_by_room[room_id] = fetched.get(room_id, room.get("booking_list") or [])
+
+            with self._lock:
+                self._install(rooms, bookings_by_room, settled)
+        finally:
+            with self._lock:
+                self._end_fetch()
+        INVENTORY_MIRROR_SYNCS_TOTAL.inc(kind="full", outcome="ok")
+        logger.info(f"Inventory mirror loaded {len(rooms)} rooms, {len(self._booking_rooms)} bookings")
+        return True
+
+    def sync(self) -> int:
+        """
+        Delta sync from one get_all_rooms call
+
+        Rooms whose booking_list differs from the mirror are re-indexed;
+        the rest are left alone. Falls back to a full load when the mirror
+        is empty.
+
+        Returns:
+            int: Number of rooms whose calendar changed (-1 on error)
+        """
+        if self.synced_at is None:
+            return len(self._rooms) if self.load() else -1
+
+        with self._lock:
+            settled = self._begin_fetch()
+        try:
+            rooms = self.travel_studio.get_all_rooms()
+            if rooms is None:
+                INVENTORY_MIRROR_SYNCS_TOTAL.inc(kind="delta", outcome="error")
+                return -1
+
+            bookings_by_room = {str(room.get("id", "")): room.get("booking_list") or [] for room in rooms}
+            with self._lock:
+                changed = []
+                for room_id, bookings in bookings_by_room.items():
+                    if not room_id:
+                        continue
+                    current = self._calendars.get(room_id)
+                    if current is None or not current.holds(_stays(room_id, bookings)):
+                        changed.append(room_id)
+                self._install(rooms, bookings_by_room, settled, only=changed)
+        finally:
+            with self._lock:
+                self._end_fetch()
+
+        INVENTORY_MIRROR_SYNCS_TOTAL.inc(kind="delta", outcome="ok")
+        if changed:
+            logger.info(f"Inventory mirror delta sync updated {len(changed)} rooms")
+        return len(changed)
+
+    # Write-through
+
+    def on_booking_change(self, action: str, booking: Dict[str, Any], category: Optional[str] = None):
+        """
+        Apply a booking written through TravelStudioService
+
+        Args:
+            action: "create", "update" or "cancel"
+            booking: Booking as returned by the API (or {"booking_id": ...})
+            category: Room category the booking was made for, if known
+        """
+        with self._lock:
+            if self._fetches:
+                self._writes_during_fetch.append((action, booking, category))
+            self._apply(action, booking, category)
+
+    def _apply(self, action: str, booking: Dict[str, Any], category: Optional[str]):
+        """Write a booking change into the calendars; caller holds the lock"""
+        booking_id = _booking_id(booking)
+        old_room = self._booking_rooms.get(booking_id)
+        if action == "cancel":
+            if old_room and old_room in self._calendars:
+                self._calendars[old_room].remove(booking_id)
+                del self._booking_rooms[booking_id]
+            return
+
+        room_id = _booking_room_id(booking) or old_room
+        nights = booking_nights(booking)
+        if room_id and room_id in self._calendars:
+            if old_room and old_room != room_id and old_room in self._calendars:
+                self._calendars[old_room].remove(booking_id)
+                del self._booking_rooms[booking_id]
+            if nights is not None:
+                self._calendars[room_id].add(booking_id, nights)
+                self._booking_rooms[booking_id] = room_id
+                return
+            if str(booking.get("status", "")).lower() in CANCELLED_STATUSES:
+                self._calendars[room_id].remove(booking_id)
+                self._booking_rooms.pop(booking_id, None)
+                return
+            # Partial update (e.g. one date): re-read the room on the next sync
+            category = category or self._rooms[room_id].get("category")
+
+        # Room not assigned, unknown or partially updated: don't answer
+        # for the category until the next sync
+        category = category or booking.get("room_category")
+        self._dirty_categories.add(str(category).lower() if category else "*")
+
+    # Queries
+
+    def available_rooms(
+        self, check_in: str, check_out: str, category: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Rooms free for every night from check_in to check_out
+
+        Args:
+            check_in: Check-in date (YYYY-MM-DD)
+            check_out: Check-out date (YYYY-MM-DD)
+            category: Room category filter (case-insensitive), or None for all
+
+        Returns:
+            list: Room dicts in the /rooms/available shape, or None when the
+                mirror can't answer and the remote endpoint should be asked
+        """
+        start, end = day_ordinal(check_in), day_ordinal(check_out)
+        wanted = category.lower() if category else None
+        dirty = self._dirty_categories
+        served = (
+            self.ready and start is not None and end is not None and end > start
+            and not (dirty and (wanted is None or wanted in dirty or "*" in dirty))
+        )
+        record_cache_lookup("inventory_mirror", served)
+        if not served:
+            return None
+        return self._free_rooms(start, end, wanted)
+
+    def occupancy(self, category: Optional[str] = None) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, List[Tuple[int, int]]]]]:
+        """
+        Snapshot of rooms and their booked nights, for searches over a date span
+
+        Returns:
+            tuple: (rooms, room id -> booked [start, end) day ordinals), or
+                None when the mirror can't answer for the category
+        """
+        wanted = category.lower() if category else None
+        dirty = self._dirty_categories
+        served = self.ready and not (dirty and (wanted is None or wanted in dirty or "*" in dirty))
+        record_cache_lookup("inventory_mirror", served)
+        if not served:
+            return None
+        with self._lock:
+            rooms = list(self._rooms.values())
+            stays = {room_id: list(calendar.stays.values()) for room_id, calendar in self._calendars.items()}
+        return rooms, stays
+
+    def _free_rooms(self, start: int, end: int, wanted: Optional[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                room for room_id, room in self._rooms.items()
+                if room.get("isOccupiable", True) is not False
+                and (wanted is None or str(room.get("category", "")).lower() == wanted)
+                and self._calendars[room_id].is_free(start, end)
+            ]
+
+    # Consistency
+
+    def check_consistency(self, ranges: Optional[List[Tuple[str, str]]] = None,
+                          categories: Optional[List[Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        Compare the mirror with the remote /rooms/available endpoint
+
+        A mismatch marks the mirror untrusted until a check passes again.
+
+        Args:
+            ranges: (check_in, check_out) pairs; defaults to 2-night stays
+                starting today, in a week and in a month
+            categories: Categories to check (None means all rooms)
+
+        Returns:
+            dict: checked, mismatches (with the room ids only one side reported) and trusted
+        """
+        if ranges is None:
+            today = date.today()
+            ranges = [
+                ((today + timedelta(days=offset)).isoformat(), (today + timedelta(days=offset + 2)).isoformat())
+                for offset in (0, 7, 30)
+            ]
+        categories = categories or [None]
+
+        mismatches = []
+        checked = 0
+        for check_in, check_out in ranges:
+            for category in categories:
+                remote = self.travel_studio.get_available_rooms(check_in, check_out, category=category)
+                if remote is None:
+                    continue
+                local = {
+                    str(room.get("id"))
+                    for room in self._free_rooms(day_ordinal(check_in), day_ordinal(check_out), category.lower() if category else None)
+                }
+                remote_ids = {str(room.get("id")) for room in remote}
+                checked += 1
+                if local != remote_ids:
+                    mismatches.append({
+                        "check_in": check_in,
+                        "check_out": check_out,
+                        "category": category,
+                        "only_mirror": sorted(local - remote_ids),
+                        "only_remote": sorted(remote_ids - local),
+                    })
+
+        if mismatches:
+            INVENTORY_MIRROR_MISMATCHES_TOTAL.inc(len(mismatches))
+            logger.warning(f"Inventory mirror disagrees with Travel Studio on {len(mismatches)} of {checked} queries")
+        if checked:
+            self.trusted = not mismatches
+        return {"checked": checked, "mismatches": mismatches, "trusted": self.trusted}
+
+    # Background loop
+
+    async def start(self):
+        """Load in the background and keep syncing"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        first = True
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+                if first and self.synced_at is not None:
+                    await asyncio.to_thread(self.check_consistency)
+                    first = False
+            except Exception as e:
+                logger.error(f"Inventory mirror sync error: {e}", exc_info=True)
+            await self._wait_for_next_sync()
+
+    async def _wait_for_next_sync(self):
+        """Sleep until the next sync is due, or about a second after a write-through dirtied a category"""
+        deadline = time.monotonic() + self.sync_interval
+        await asyncio.sleep(min(1.0, self.sync_interval))
+        while time.monotonic() < deadline and not self._dirty_categories:
+            await asyncio.sleep(min(1.0, deadline - time.monotonic()))
+
+
+# Singleton instance
+_inventory_mirror = None
+
+
+def get_inventory_mirror() -> InventoryMirror:
+    """Get singleton instance of InventoryMirror"""
+    global _inventory_mirror
+    if _inventory_mirror is None:
+        _inventory_mirror = InventoryMirror()
+    return _inventory_mirror
@@ -0,0 +1,109 @@
+"""
+Loop Controller
+Budget for one user turn of the Gemini function-calling loop
+
+Tracks the iteration count and a wall-clock deadline, and memoizes tool
+results by (tool name, arguments) so a model that repeats an identical
+call within the turn gets the earlier result instead of another API hit.
+A round made only of repeats means the model is looping; the agent then
+asks for a final text answer with tools disabled instead of spending the
+remaining iterations. Tool calls count against the deadline too, and a
+booking confirmed before the deadline is still reported to the guest.
+"""
+
+import os
+import json
+import time
+from typing import Dict, Any, Optional, Callable
+
+# Stop reasons, also the label values of gemini_turn_stops_total
+STOP_COMPLETED = "completed"
+STOP_MAX_ITERATIONS = "max_iterations"
+STOP_REPEATED_CALLS = "repeated_calls"
+STOP_DEADLINE = "deadline"
+STOP_ERROR = "error"
+
+DEADLINE_REPLY = (
+    "I'm sorry, this is taking longer than expected. "
+    "Our team will get back to you shortly, or feel free to ask me again."
+)
+
+# The deadline passed after the booking went through
+BOOKING_DEADLINE_REPLY = (
+    "Your booking is confirmed (booking ID: {booking_id}). "
+    "Payment link: https://maldevtafarms.com/book?bookingId={booking_id}\n"
+    "Sorry for the wait; feel free to ask me anything else."
+)
+
+BOOKING_TOOL = "create_booking_reservation"
+
+
+class TurnController:
+    """Iteration budget, deadline and tool-call memo for one turn"""
+
+    def __init__(
+        self,
+        max_iterations: Optional[int] = None,
+        deadline_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_iterations is None:
+            max_iterations = int(os.getenv("GEMINI_MAX_ITERATIONS", "5"))
+        if deadline_seconds is None:
+            deadline_seconds = float(os.getenv("GEMINI_TURN_DEADLINE_SECONDS", "45"))
+        self.max_iterations = max_iterations
+        self.deadline_seconds = deadline_seconds
+        self._clock = clock
+        self.started = clock()
+        self._results: Dict[str, Any] = {}
+        self.memoized_calls = 0
+        self.calls = 0  # Gemini calls made this turn
+        self.stop_reason: Optional[str] = None
+        self.booking: Optional[Dict[str, Any]] = None  # confirmed by a tool call this turn
+
+    @staticmethod
+    def call_key(tool_name: str, tool_input: Dict[str, Any]) -> str:
+        """Identity of a tool call: name plus canonical JSON of the arguments"""
+        return f"{tool_name}:{json.dumps(tool_input, sort_keys=True, default=str)}"
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(self.deadline_seconds - (self._clock() - self.started), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def memoized(self, key: str) -> Optional[Any]:
+        """Result of an identical earlier call this turn, if any"""
+        if key in self._results:
+            self.memoized_calls += 1
+            return self._results[key]
+        return None
+
+    def remember(self, key: str, result: Any):
+        self._results[key] = result
+
+    def record(self, tool_name: str, result: Any):
+        """Keep a booking the tool call confirmed, for the deadline reply"""
+        if (
+            tool_name == BOOKING_TOOL and isinstance(result, dict)
+            and result.get("success") and not result.get("booking_pending")
+        ):
+            self.booking = result.get("data") or {}
+
+    def deadline_reply(self) -> str:
+        """Reply once the deadline passes: the booking confirmation if there is one"""
+        if self.booking is None:
+            return DEADLINE_REPLY
+        booking_id = self.booking.get("booking_id") or self.booking.get("id")
+        if not booking_id:
+            return "Your booking is confirmed. Sorry for the wait; feel free to ask me anything else."
+        return BOOKING_DEADLINE_REPLY.format(booking_id=booking_id)
+
+    def is_last_iteration(self, iteration: int) -> bool:
+        """True when the follow-up call for this iteration is the last one allowed"""
+        return iteration + 1 >= self.max_iterations
+
+    def stop(self, reason: str):
+        if self.stop_reason is None:
+            self.stop_reason = reason
@@ -0,0 +1,417 @@
+"""
+Owner Notification Service
+Routes owner notification emails either straight to the outbox or into
+periodic digests, depending on their category
+
+Policy comes from OWNER_DIGEST_POLICY, a comma-separated list of
+category=seconds pairs (e.g. "lead=3600,followup=1800"). Listed categories
+are batched into one digest email per interval; everything else is sent
+immediately. Urgent categories (cancellations) are never digested.
+A digest also goes out early once OWNER_DIGEST_MAX_ITEMS are waiting.
+
+The schedule lives in the owner_notifications table, not in the process:
+every worker's scheduler looks for groups whose oldest notification is
+past its interval, and claims the rows before queueing the digest, so
+notifications left behind by a recycled instance still go out and no
+digest is sent twice. A digest that fails to go out is retried with
+exponential backoff (from DIGEST_RETRY_SECONDS up to
+DIGEST_MAX_RETRY_SECONDS) instead of on every pass.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+from sqlalchemy import func
+
+from database.models import OwnerNotification, SessionLocal
+from services.email_outbox_service import EmailOutboxService, get_email_outbox_service
+from utils.email_templates import render_email
+
+logger = logging.getLogger(__name__)
+
+
+# Outbox priority per category (lower is sent first)
+CATEGORY_PRIORITY = {
+    "cancel": 0,
+    "update": 1,
+    "booking": 1,
+    "event_inquiry": 2,
+    "followup": 2,
+    "lead": 4,
+}
+DEFAULT_PRIORITY = 5
+
+# Categories that always go out immediately
+URGENT_CATEGORIES = {"cancel"}
+
+CATEGORY_TITLES = {
+    "cancel": "Cancellation Requests",
+    "update": "Update Requests",
+    "booking": "Pending Booking Outcomes",
+    "event_inquiry": "Event Inquiries",
+    "followup": "Follow-up Requests",
+    "lead": "New Leads",
+}
+
+# Backoff of a digest that failed to queue, and the scheduler's shortest sleep
+DIGEST_RETRY_SECONDS = 5.0
+DIGEST_MAX_RETRY_SECONDS = 300.0
+
+_BODY = re.compile(r"<body[^>]*>(.*)</body>", re.IGNORECASE | re.DOTALL)
+
+
+def html_fragment(html: str) -> str:
+    """Contents of an HTML email's <body>, for embedding in a digest"""
+    match = _BODY.search(html or "")
+    return (match.group(1) if match else html or "").strip()
+
+
+def parse_digest_policy(policy: str) -> Dict[str, int]:
+    """
+    Parse OWNER_DIGEST_POLICY into {category: interval_seconds}
+
+    Entries with an interval of 0, "immediate" or an urgent category are skipped.
+    """
+    intervals = {}
+    for entry in (policy or "").split(","):
+        if "=" not in entry:
+            continue
+        category, _, value = entry.partition("=")
+        category = category.strip()
+        value = value.strip().lower()
+
+        if not category or value in ("", "0", "immediate"):
+            continue
+        if category in URGENT_CATEGORIES:
+            logger.warning(f"Ignoring digest policy for urgent category '{category}'")
+            continue
+
+        try:
+            intervals[category] = int(value)
+        except ValueError:
+            logger.warning(f"Invalid digest interval for '{category}': {value}")
+
+    return intervals
+
+
+class OwnerNotificationService:
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        outbox: Optional[EmailOutboxService] = None,
+        policy: Optional[Dict[str, int]] = None,
+        max_items: Optional[int] = None,
+    ):
+        """Initialize owner notification service"""
+        self.session_factory = session_factory or SessionLocal
+        self.outbox = outbox or get_email_outbox_service()
+        self.policy = policy if policy is not None else parse_digest_policy(
+            os.getenv("OWNER_DIGEST_POLICY", "lead=3600")
+        )
+        self.max_items = max_items or int(os.getenv("OWNER_DIGEST_MAX_ITEMS", "25"))
+
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        # (category, to_email) -> (consecutive failures, retry at) of digests that failed here
+        self._failures: Dict[Tuple[str, str], Tuple[int, datetime]] = {}
+
+    def is_digested(self, category: Optional[str]) -> bool:
+        return bool(category) and category in self.policy
+
+    # Producer side
+
+    def notify(
+        self,
+        category: Optional[str],
+        to_email: str,
+        subject: str,
+        body: str,
+        text_body: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send an owner notification now or hold it for the category digest
+
+        Args:
+            category: Notification category (lead, followup, event_inquiry, update, cancel)
+            to_email: Recipient email address
+            subject: Email subject
+            body: HTML body
+            text_body: Plain-text alternative
+
+        Returns:
+            Dictionary with success status and message or error
+        """
+        if not self.is_digested(category):
+            return self.outbox.enqueue(
+                to_email=to_email,
+                subject=subject,
+                body=body,
+                is_html=True,
+                text_body=text_body,
+                priority=CATEGORY_PRIORITY.get(category, DEFAULT_PRIORITY),
+            )
+
+        if not to_email:
+            logger.error("Cannot queue notification: no recipient")
+            return {"success": False, "error": "Email recipient not configured"}
+
+        db = self.session_factory()
+        try:
+            notification = OwnerNotification(
+                category=category,
+                to_email=to_email,
+                subject=subject,
+                body=body,
+                text_body=text_body,
+                created_at=datetime.utcnow(),
+            )
+            db.add(notification)
+            db.commit()
+
+            waiting = (
+                db.query(OwnerNotification)
+                .filter(
+                    OwnerNotification.category == category,
+                    OwnerNotification.to_email == to_email,
+                    OwnerNotification.digested_at.is_(None),
+                )
+                .count()
+            )
+        except Exception as e:
+            logger.error(f"Error queueing owner notification: {str(e)}")
+            db.rollback()
+            return {"success": False, "error": f"Failed to queue notification: {str(e)}"}
+        finally:
+            db.close()
+
+        if waiting >= self.max_items:
+            logger.info(f"{waiting} {category} notifications waiting, sending digest early")
+            self.flush_category(category, to_email)
+
+        return {"success": True, "message": f"Notification queued for the next {category} digest"}
+
+    def handle_send_email(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        send_email tool entry point
+        Requests with a digested "category" are held for the digest,
+        everything else goes straight to the outbox
+        """
+        category = data.get("category")
+        if not self.is_digested(category):
+            if category and "priority" not in data:
+                data = {**data, "priority": CATEGORY_PRIORITY.get(category, DEFAULT_PRIORITY)}
+            return self.outbox.handle_send_email(data)
+
+        if not all([data.get("to_email"), data.get("subject"), data.get("body")]):
+            return {"success": False, "error": "Missing required fields: to_email, subject, body"}
+
+        return self.notify(
+            category=category,
+            to_email=data["to_email"],
+            subject=data["subject"],
+            body=data["body"],
+            text_body=data.get("text_body"),
+        )
+
+    # Scheduling
+
+    def _waiting_groups(self) -> List[Tuple[str, str, datetime]]:
+        """(category, to_email, due_at) of every digest waiting in the table"""
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(
+                    OwnerNotification.category,
+                    OwnerNotification.to_email,
+                    func.min(OwnerNotification.created_at),
+                )
+                .filter(OwnerNotification.digested_at.is_(None))
+                .group_by(OwnerNotification.category, OwnerNotification.to_email)
+                .all()
+            )
+        finally:
+            db.close()
+        groups = []
+        for category, to_email, oldest in rows:
+            # Categories switched to immediate are due right away
+            due_at = oldest + timedelta(seconds=self.policy.get(category, 0))
+            failure = self._failures.get((category, to_email))
+            if failure is not None:
+                due_at = max(due_at, failure[1])
+            groups.append((category, to_email, due_at))
+        return groups
+
+    def next_due(self) -> Optional[datetime]:
+        """When the next digest is due (or retried after a failure), if any"""
+        due = [due_at for _, _, due_at in self._waiting_groups()]
+        return min(due) if due else None
+
+    # Consumer side
+
+    def flush_due(self, now: Optional[datetime] = None) -> int:
+        """
+        Send every digest whose interval has elapsed, whichever process
+        queued its notifications
+
+        Returns:
+            Number of digest emails queued
+        """
+        now = now or datetime.utcnow()
+        groups = self._waiting_groups()
+        # Forget failures of digests that have gone out since (here or elsewhere)
+        waiting = {(category, to_email) for category, to_email, _ in groups}
+        self._failures = {group: failure for group, failure in self._failures.items() if group in waiting}
+
+        sent = 0
+        for category, to_email, due_at in groups:
+            if due_at > now:
+                continue
+            if self.flush_category(category, to_email):
+                self._failures.pop((category, to_email), None)
+                sent += 1
+                continue
+            failures = self._failures.get((category, to_email), (0, now))[0] + 1
+            backoff = min(DIGEST_RETRY_SECONDS * 2 ** (failures - 1), DIGEST_MAX_RETRY_SECONDS)
+            self._failures[(category, to_email)] = (failures, now + timedelta(seconds=backoff))
+            logger.warning(f"{category} digest to {to_email} not sent, retrying in {backoff:.0f}s")
+        return sent
+
+    def flush_category(self, category: str, to_email: str) -> bool:
+        """
+        Combine all waiting notifications of a category into one digest email
+
+        The rows are claimed (digested_at set) before the digest is queued,
+        so two workers flushing at once never send the same notification
+        twice; if queueing fails the claim is released again.
+
+        Returns:
+            True if a digest was queued
+        """
+        db = self.session_factory()
+        try:
+            items = (
+                db.query(OwnerNotification)
+                .filter(
+                    OwnerNotification.category == category,
+                    OwnerNotification.to_email == to_email,
+                    OwnerNotification.digested_at.is_(None),
+                )
+                .order_by(OwnerNotification.id)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not items:
+                return False
+
+            ids = [item.id for item in items]
+            claimed_at = datetime.utcnow()
+            claimed = (
+                db.query(OwnerNotification)
+                .filter(OwnerNotification.id.in_(ids), OwnerNotification.digested_at.is_(None))
+                .update({"digested_at": claimed_at}, synchronize_session=False)
+            )
+            if claimed != len(ids):
+                # Another worker is sending some of them; it will pick up the rest
+                db.rollback()
+                return False
+            db.commit()
+
+            email = render_email(
+                "owner_digest",
+                category=category,
+                title=CATEGORY_TITLES.get(category, category.replace("_", " ").title()),
+                items=[
+                    {
+                        "subject": item.subject,
+                        "text": item.text_body or "",
+                        "html": html_fragment(item.body),
+                        "created_at": item.created_at.strftime("%d/%m/%Y %H:%M UTC"),
+                    }
+                    for item in items
+                ],
+            )
+
+            result = self.outbox.enqueue(
+                to_email=to_email,
+                subject=email["subject"],
+                body=email["html"],
+                is_html=True,
+                text_body=email["text"],
+                priority=CATEGORY_PRIORITY.get(category, DEFAULT_PRIORITY),
+            )
+            if not result.get("success"):
+                logger.error(f"Failed to queue {category} digest: {result.get('error')}")
+                # Unclaim: the next pass tries again
+                db.query(OwnerNotification).filter(
+                    OwnerNotification.id.in_(ids), OwnerNotification.digested_at == claimed_at
+                ).update({"digested_at": None}, synchronize_session=False)
+                db.commit()
+                return False
+
+            db.query(OwnerNotification).filter(OwnerNotification.id.in_(ids)).update(
+                {"outbox_id": result.get("outbox_id")}, synchronize_session=False
+            )
+            db.commit()
+
+            logger.info(f"Queued {category} digest with {len(items)} notifications to {to_email}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error sending {category} digest: {str(e)}", exc_info=True)
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    # Background worker
+
+    async def start(self):
+        """Start the digest scheduler on the running event loop"""
+        if self._task is not None:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Owner digest scheduler started with policy {self.policy}")
+
+    async def stop(self):
+        """Stop the digest scheduler"""
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while self._running:
+            try:
+                await asyncio.to_thread(self.flush_due)
+                next_due = await asyncio.to_thread(self.next_due)
+            except Exception as e:
+                logger.error(f"Owner digest scheduler error: {e}", exc_info=True)
+                next_due = None
+
+            # Sleep until the next digest, re-checking at least once a minute;
+            # never spin on a digest that is due but keeps failing
+            delay = 60.0
+            if next_due is not None:
+                delay = min(delay, max((next_due - datetime.utcnow()).total_seconds(), DIGEST_RETRY_SECONDS))
+            await asyncio.sleep(delay)
+
+
+# Singleton instance
+_owner_notification_service = None
+
+
+def get_owner_notification_service() -> OwnerNotificationService:
+    """Get singleton instance of OwnerNotificationService"""
+    global _owner_notification_service
+    if _owner_notification_service is None:
+        _owner_notification_service = OwnerNotificationService()
+    return _owner_notification_service
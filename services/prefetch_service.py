@@ -0,0 +1,154 @@
+"""
+Prefetch Service
+Speculative availability lookup started alongside the Gemini call
+
+Once a guest has given stay dates and a head count, the next model call
+almost always asks for check_availability. The prefetcher runs the cheap
+regex extractors over the guest's recent messages and, when dates and
+guests are known, starts the Travel Studio query for all room categories
+in the background. The tool call that follows is then answered from the
+availability cache (or joins the query still in flight).
+
+Each speculation is settled at the end of the turn as a hit (a tool call
+of the same guest used it) or a miss; availability_prefetch_total carries the hit rate.
+"""
+
+import os
+import re
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from services.availability_cache import AvailabilityCache, get_availability_cache
+from utils.helpers import parse_date_from_text, extract_number_from_text, to_api_date
+from utils.metrics import AVAILABILITY_PREFETCH_TOTAL
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_DATE_PATTERN = re.compile(r"\b(\d{1,2})[/-](\d{1,2})[/-](\d{4}|\d{2})\b")
+NIGHTS_PATTERN = re.compile(r"\b(\d{1,2})\s*nights?\b")
+GUEST_KEYWORDS = ("adult", "guest", "people", "person", "pax")
+
+
+def extract_stay(text: str) -> Dict[str, Any]:
+    """
+    Stay details mentioned in one message
+
+    Args:
+        text: Guest message
+
+    Returns:
+        dict: Any of check_in, check_out (DD/MM/YYYY), nights and guests
+    """
+    stay: Dict[str, Any] = {}
+    dates = []
+    for day, month, year in NUMERIC_DATE_PATTERN.findall(text):
+        if len(year) == 2:
+            year = f"20{year}"
+        dates.append(f"{int(day):02d}/{int(month):02d}/{year}")
+
+    if not dates:
+        # "12th December", "tomorrow", ...
+        parsed = parse_date_from_text(text)
+        if parsed:
+            dates.append(parsed)
+
+    if dates:
+        stay["check_in"] = dates[0]
+    if len(dates) > 1:
+        stay["check_out"] = dates[1]
+
+    nights = NIGHTS_PATTERN.search(text.lower())
+    if nights:
+        stay["nights"] = int(nights.group(1))
+
+    for keyword in GUEST_KEYWORDS:
+        guests = extract_number_from_text(text, keyword)
+        if guests:
+            stay["guests"] = guests
+            break
+    return stay
+
+
+def stay_from_conversation(messages: List[str]) -> Dict[str, Any]:
+    """
+    Combine the stay details of a guest's messages, newest mention winning
+
+    A new check-in without a check-out drops the earlier check-out, so a
+    guest who moves their dates isn't matched against the old stay.
+
+    Args:
+        messages: Guest messages, oldest first
+
+    Returns:
+        dict: check_in and check_out (YYYY-MM-DD) and guests, when known
+    """
+    state: Dict[str, Any] = {}
+    for text in messages:
+        found = extract_stay(text)
+        if "check_in" in found and "check_out" not in found:
+            state.pop("check_out", None)
+        if "check_in" in found:
+            state.pop("nights", None)
+        state.update(found)
+
+    check_in = to_api_date(state.get("check_in"))
+    check_out = to_api_date(state.get("check_out"))
+    if check_in and not check_out and state.get("nights"):
+        check_out = (datetime.strptime(check_in, "%Y-%m-%d") + timedelta(days=state["nights"])).strftime("%Y-%m-%d")
+
+    stay: Dict[str, Any] = {}
+    if check_in and check_out and check_out > check_in:
+        stay["check_in"] = check_in
+        stay["check_out"] = check_out
+    if state.get("guests"):
+        stay["guests"] = state["guests"]
+    return stay
+
+
+class AvailabilityPrefetcher:
+    """Starts the availability query a turn is likely to need"""
+
+    def __init__(self, travel_studio, cache: Optional[AvailabilityCache] = None, enabled: Optional[bool] = None,
+                 inventory=None):
+        self.travel_studio = travel_studio
+        self.cache = cache or get_availability_cache()
+        # Nothing to prefetch while the local inventory mirror answers
+        self.inventory = inventory
+        if enabled is None:
+            enabled = os.getenv("AVAILABILITY_PREFETCH_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+
+    def speculate(self, messages: List[str], owner: Optional[str] = None):
+        """
+        Prefetch availability if the conversation has dates and guests
+
+        Must be called on the event loop that will run the tool call.
+
+        Args:
+            messages: Guest messages of the conversation, oldest first
+            owner: Guest of the turn; only their tool calls count as a hit
+
+        Returns:
+            The cache entry being fetched, or None if nothing was started
+        """
+        if not self.enabled or (self.inventory is not None and self.inventory.ready):
+            return None
+        stay = stay_from_conversation(messages)
+        if "check_in" not in stay or "guests" not in stay:
+            return None
+        if stay["check_in"] < datetime.now().strftime("%Y-%m-%d"):
+            return None
+
+        entry = self.cache.prefetch(self.travel_studio, stay["check_in"], stay["check_out"], owner=owner)
+        if entry is not None:
+            logger.info(
+                f"Prefetching availability {stay['check_in']} to {stay['check_out']} for {stay['guests']} guests"
+            )
+        return entry
+
+    def settle(self, entry):
+        """Count whether a tool call used the speculative result this turn"""
+        if entry is None:
+            return
+        AVAILABILITY_PREFETCH_TOTAL.inc(outcome="hit" if entry.used else "miss")
@@ -0,0 +1,148 @@
+"""
+Room Types
+Resolves whatever the model sends as a room type ("DELUXE", "cottage",
+"Luxury Pinewood Cottage", "delux") to a Travel Studio room category
+
+The alias index is built from the categories in the room catalogue
+(TravelStudioService.get_room_types), so it follows the rooms actually
+configured in Travel Studio and is rebuilt when they change. Every
+category gets an id (upper-case, underscores: "LUXURY_COTTAGE") that the
+tool schemas list as the allowed values; ids from older prompts keep
+working through LEGACY_ROOM_TYPES.
+
+Matching is case- and punctuation-insensitive, ignores the word "room",
+then falls back to word overlap ("Luxury Pinewood Cottage with Bathtub")
+and to close spellings ("delux").
+"""
+
+import re
+import difflib
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.metrics import ROOM_TYPE_LOOKUPS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Ids used by earlier prompts and saved conversations -> category
+LEGACY_ROOM_TYPES = {
+    "DELUXE": "Deluxe",
+    "DLX": "Deluxe",
+    "COTTAGE": "Luxury Cottage",
+    "COTTAGE_BATHTUB": "Luxury Cottage",
+    "BASIC": "basic",
+}
+
+# Spelling similarity (0-1) a fuzzy match needs
+FUZZY_CUTOFF = 0.8
+
+_FILLER_WORDS = {"room", "rooms", "with", "the", "a"}
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in re.findall(r"[a-z0-9]+", str(text).casefold()) if word not in _FILLER_WORDS]
+
+
+def _normalize(text: str) -> str:
+    return "".join(_words(text))
+
+
+def room_type_id(category: str) -> str:
+    """Schema id of a category: "Luxury Cottage" -> "LUXURY_COTTAGE" """
+    return "_".join(re.findall(r"[A-Za-z0-9]+", category)).upper()
+
+
+class _Index:
+    def __init__(self, categories: Sequence[str]):
+        self.categories = sorted(set(categories))
+        by_name = {category.casefold(): category for category in self.categories}
+        self.aliases: Dict[str, str] = {}
+        for alias, category in LEGACY_ROOM_TYPES.items():
+            if category.casefold() in by_name:
+                self.aliases[_normalize(alias)] = by_name[category.casefold()]
+        for category in self.categories:
+            self.aliases[_normalize(category)] = category
+        self.words = {category: set(_words(category)) for category in self.categories}
+
+    def match(self, requested: str) -> Tuple[Optional[str], str]:
+        key = _normalize(requested)
+        if key in self.aliases:
+            return self.aliases[key], "exact"
+
+        # Word overlap: the request names a category plus extra words
+        # ("Luxury Pinewood Cottage"), or part of one ("cottage")
+        words = set(_words(requested))
+        overlapping = [
+            category for category, category_words in self.words.items()
+            if category_words and words and (category_words <= words or words <= category_words)
+        ]
+        if overlapping:
+            # The most specific category wins ("Luxury Cottage" over "Cottage")
+            overlapping.sort(key=lambda category: len(self.words[category]), reverse=True)
+            if len(overlapping) == 1 or len(self.words[overlapping[0]]) > len(self.words[overlapping[1]]):
+                return overlapping[0], "fuzzy"
+
+        close = difflib.get_close_matches(key, list(self.aliases), n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            return self.aliases[close[0]], "fuzzy"
+        return None, "unknown"
+
+
+class RoomTypeResolver:
+    """Alias index over the catalogue's room categories, rebuilt when they change"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index: Optional[_Index] = None
+
+    def _index_for(self, categories: Sequence[str]) -> _Index:
+        with self._lock:
+            if self._index is None or self._index.categories != sorted(set(categories)):
+                self._index = _Index(categories)
+            return self._index
+
+    def resolve(self, requested: Optional[str], categories: Optional[Sequence[str]]) -> Optional[str]:
+        """
+        Travel Studio category for a requested room type
+
+        Args:
+            requested: Room type from the tool call (id, name or alias)
+            categories: Categories from the room catalogue, or None if it
+                couldn't be fetched
+
+        Returns:
+            The category, or None if it matches none of them. Without a
+            catalogue the legacy ids are mapped and anything else is passed
+            through unchanged, as before.
+        """
+        if not requested:
+            return None
+        if not categories:
+            return LEGACY_ROOM_TYPES.get(str(requested).upper(), requested)
+
+        category, match = self._index_for(categories).match(str(requested))
+        ROOM_TYPE_LOOKUPS_TOTAL.inc(match=match)
+        if match == "fuzzy":
+            logger.info(f"Room type '{requested}' matched to '{category}'")
+        elif match == "unknown":
+            logger.warning(f"Unknown room type '{requested}' (categories: {', '.join(categories)})")
+        return category
+
+    def room_type_ids(self, categories: Optional[Sequence[str]]) -> List[str]:
+        """Ids for the tool schema enum, one per category ([] without a catalogue)"""
+        if not categories:
+            return []
+        return [room_type_id(category) for category in self._index_for(categories).categories]
+
+
+# Singleton instance
+_room_type_resolver = None
+
+
+def get_room_type_resolver() -> RoomTypeResolver:
+    """Get singleton instance of RoomTypeResolver"""
+    global _room_type_resolver
+    if _room_type_resolver is None:
+        _room_type_resolver = RoomTypeResolver()
+    return _room_type_resolver
@@ -1,13 +1,32 @@
 import httpx
 import os
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, Optional, Tuple
 import logging
 from datetime import datetime
 from utils.helpers import sanitize_tool_params
-from services.travel_studio_service import get_travel_studio_service
+from utils.email_templates import render_email
+from services.travel_studio_service import (
+    CANCELLED_STATUSES,
+    get_travel_studio_service,
+    normalize_phone,
+    phone_matches,
+    rooms_needed,
+)
+from services.availability_cache import get_availability_cache
+from services.inventory_service import get_inventory_mirror
+from services.room_types import get_room_type_resolver
+from services.hold_service import get_hold_service
+from services.booking_journal import STATUS_CONFIRMED, STATUS_PENDING, get_booking_journal
+from services.tool_transport import create_tool_transport
 
 logger = logging.getLogger(__name__)
 
+BACKEND_UNAVAILABLE_MESSAGE = (
+    "The booking system is not responding right now. Tell the guest you're checking "
+    "with the team and will confirm shortly; don't call this tool again this turn."
+)
+
 
 class ToolService:
     def __init__(self):
@@ -17,6 +36,76 @@ class ToolService:
         self.api_token = os.getenv("TOOLS_API_TOKEN")
         self.client = httpx.AsyncClient(timeout=30.0)
         self.travel_studio = get_travel_studio_service()
+        self.availability_cache = get_availability_cache()
+        self.inventory = get_inventory_mirror()
+        self.room_types = get_room_type_resolver()
+        self.holds = get_hold_service()
+        self.bookings = get_booking_journal()
+        # Guest of the current conversation (set by AgentService each turn);
+        # rooms checked for one room type are held for them
+        self.holder: Optional[str] = None
+        self.transport = create_tool_transport(self.client, self.base_url, self.api_token)
+
+    def _travel_studio_failure(self, error: str) -> Dict[str, Any]:
+        """Failed Travel Studio call; during an outage the agent is told not to retry"""
+        result = {"success": False, "error": error}
+        if self.travel_studio.backend_degraded():
+            result["backend_unavailable"] = True
+            result["message"] = BACKEND_UNAVAILABLE_MESSAGE
+        return result
+
+    async def _room_category(self, requested: Optional[str]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Catalogue category for the room type the model sent
+
+        Returns:
+            (category, None), or (None, error result listing the valid ids)
+            when it matches no room in the catalogue
+        """
+        if not requested:
+            return None, None
+        categories = await asyncio.to_thread(self.travel_studio.get_room_types)
+        category = self.room_types.resolve(requested, categories)
+        if category is None:
+            return None, {
+                "success": False,
+                "error": f"Unknown room type '{requested}'",
+                "valid_room_type_ids": self.room_types.room_type_ids(categories),
+            }
+        return category, None
+
+    async def _hold_for_booking(self, holder: Optional[str], check_in: str, check_out: str,
+                                category: str) -> Optional[Dict[str, Any]]:
+        """
+        Hold a room of the category for the guest about to book it
+
+        Returns:
+            None to go ahead with the booking, or a failure result when every
+            free room of the category is held by other guests
+        """
+        if not self.holds.enabled or not holder:
+            return None
+        rooms = self.inventory.available_rooms(check_in, check_out, category)
+        if rooms is None:
+            rooms = await self.availability_cache.get_rooms(
+                self.travel_studio, check_in, check_out, category, consumer=holder
+            )
+        room_ids = [room.get("id") for room in rooms or [] if room.get("id")]
+        if not room_ids:
+            return None  # Availability unknown or already gone: Travel Studio decides
+        held = await asyncio.to_thread(self.holds.place, holder, room_ids, check_in, check_out, 1)
+        if held is None or held:
+            return None
+        logger.info(f"Booking for {holder} refused: every free {category} is held by another guest")
+        return {
+            "success": False,
+            "error": f"Every available {category} for these dates is being booked by another guest right now",
+            "rooms_held_by_other_guests": True,
+            "message": (
+                f"Offer another room type or dates; the room may free up within "
+                f"{int(self.holds.ttl // 60)} minutes if the other booking isn't completed."
+            ),
+        }
 
     def _sanitize_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -52,28 +141,33 @@ class ToolService:
             # Return params as-is if sanitization fails
             return params
 
+    async def _send_owner_email(self, category: str, email: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Queue a rendered notification email to the owner via the send_email tool.
+        The category decides whether it goes out now or in the next digest.
+        """
+        email_params = {
+            "to_email": os.getenv("OWNER_EMAIL"),
+            "subject": email["subject"],
+            "body": email["html"],
+            "text_body": email["text"],
+            "category": category,
+        }
+        return await self.call_tool("send_email", email_params)
+
     async def call_tool(
         self, tool_name: str, parameters: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Call external tool API with sanitized parameters"""
+        """Call a tool through the configured transport with sanitized parameters"""
         try:
             # CRITICAL: Sanitize parameters to prevent serialization errors
             safe_params = self._sanitize_params(parameters)
 
-            url = f"{self.base_url}/{tool_name}"
-            headers = {"Content-Type": "application/json"}
-
-            # Add token if provided
-            if self.api_token:
-                headers["Authorization"] = f"Bearer {self.api_token}"
-
             logger.info(
-                f"Calling tool: {tool_name} with sanitized params: {safe_params}"
+                f"Calling tool: {tool_name} ({self.transport.name}) with sanitized params: {safe_params}"
             )
 
-            response = await self.client.post(url, json=safe_params, headers=headers)
-            response.raise_for_status()
-            result = response.json()
+            result = await self.transport.call(tool_name, safe_params)
 
             logger.info(f"Tool {tool_name} response: {result}")
             return result
@@ -117,34 +211,30 @@ class ToolService:
         try:
             logger.info(f"Checking availability via Travel Studio API: {check_in} to {check_out}")
             
-            # Map room type IDs to actual Travel Studio categories
-            room_type_mapping = {
-                "DELUXE": "Deluxe",
-                "COTTAGE": "Luxury Cottage",
-                "COTTAGE_BATHTUB": "Luxury Cottage",
-                "BASIC": "basic",
-            }
-            
-            # Get and map the room type
-            requested_type = params.get("room_type_id")
-            mapped_category = room_type_mapping.get(requested_type, requested_type) if requested_type else None
-            
-            if requested_type and mapped_category:
-                logger.info(f"Mapped room type '{requested_type}' to '{mapped_category}'")
-            
-            available_rooms = self.travel_studio.get_available_rooms(
-                check_in_date=check_in,
-                check_out_date=check_out,
-                category=mapped_category,
-                num_adults=params.get("num_of_adults"),
-                num_children=params.get("num_of_children")
-            )
+            # Map the room type to a Travel Studio category
+            mapped_category, error = await self._room_category(params.get("room_type_id"))
+            if error:
+                return error
+            
+            # Computed from the local inventory mirror when it's in sync;
+            # otherwise from the availability cache, which the prefetcher
+            # (or an earlier call) may already have filled for these dates
+            available_rooms = self.inventory.available_rooms(check_in, check_out, mapped_category)
+            if available_rooms is None:
+                available_rooms = await self.availability_cache.get_rooms(
+                    self.travel_studio, check_in, check_out, mapped_category, consumer=self.holder
+                )
             
             if available_rooms is not None:
                 # Format response to match expected structure
                 num_rooms_requested = params.get("num_of_rooms", 1)
                 budget = params.get("budget")
                 
+                # Rooms other guests are holding aren't offered
+                held_elsewhere = await asyncio.to_thread(self.holds.held_by_others, self.holder, check_in, check_out)
+                if held_elsewhere:
+                    available_rooms = [room for room in available_rooms if room.get("id") not in held_elsewhere]
+                
                 # Filter by budget if specified
                 if budget:
                     available_rooms = [
@@ -152,6 +242,19 @@ class ToolService:
                         if room.get("base_rate", 0) <= budget
                     ]
                 
+                # Asking about one room type means the guest is about to book:
+                # hold the rooms they need while they decide
+                held = None
+                if self.holder and mapped_category and available_rooms:
+                    held = await asyncio.to_thread(
+                        self.holds.place, self.holder, [room.get("id") for room in available_rooms if room.get("id")],
+                        check_in, check_out, int(num_rooms_requested or 1),
+                    )
+                    if held is not None and len(held) < int(num_rooms_requested or 1):
+                        # Lost a race for some of them
+                        taken = await asyncio.to_thread(self.holds.held_by_others, self.holder, check_in, check_out)
+                        available_rooms = [room for room in available_rooms if room.get("id") not in taken]
+                
                 # Group by category and calculate availability
                 room_summary = {}
                 for room in available_rooms:
@@ -166,7 +269,7 @@ class ToolService:
                     room_summary[category]["available_count"] += 1
                     room_summary[category]["rooms"].append(room)
                 
-                return {
+                result = {
                     "success": True,
                     "data": {
                         "available_rooms": list(room_summary.values()),
@@ -178,11 +281,12 @@ class ToolService:
                         "num_of_rooms": num_rooms_requested
                     }
                 }
+                if held:
+                    result["data"]["rooms_held"] = len(held)
+                    result["data"]["hold_minutes"] = int(self.holds.ttl // 60)
+                return result
             else:
-                return {
-                    "success": False,
-                    "error": "Failed to fetch room availability from Travel Studio API"
-                }
+                return self._travel_studio_failure("Failed to fetch room availability from Travel Studio API")
                 
         except Exception as e:
             logger.error(f"Error checking availability: {str(e)}", exc_info=True)
@@ -191,6 +295,71 @@ class ToolService:
                 "error": f"Failed to check availability: {str(e)}"
             }
 
+    async def find_available_windows(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Find stay windows for flexible dates - converts DD/MM/YYYY to YYYY-MM-DD format"""
+        params = self._sanitize_params(params)
+
+        try:
+            start_date = datetime.strptime(str(params.get("start_date")), "%d/%m/%Y").strftime("%Y-%m-%d")
+            end_date = datetime.strptime(str(params.get("end_date")), "%d/%m/%Y").strftime("%Y-%m-%d")
+        except Exception as e:
+            logger.warning(f"Date conversion failed for window search: {params}, error: {e}")
+            return {"success": False, "error": "start_date and end_date must be in DD/MM/YYYY format"}
+
+        category, error = await self._room_category(params.get("room_type_id"))
+        if error:
+            return error
+
+        search = dict(
+            start_date=start_date,
+            end_date=end_date,
+            nights=int(params.get("nights") or 1),
+            num_adults=int(params.get("num_of_adults") or 1),
+            num_children=int(params.get("num_of_children") or 0),
+            category=category,
+            weekends_only=bool(params.get("weekends_only", False)),
+        )
+
+        try:
+            # Rooms other guests are booking count as taken
+            search["held_by_room"] = await asyncio.to_thread(
+                self.holds.held_nights_by_others, self.holder, start_date, end_date
+            )
+            # The inventory mirror has the occupancy in memory; otherwise one
+            # room list call to Travel Studio covers the whole range
+            occupancy = self.inventory.occupancy(category)
+            if occupancy is not None:
+                rooms, stays_by_room = occupancy
+                windows = self.travel_studio.find_available_windows(
+                    **search, rooms=rooms, stays_by_room=stays_by_room
+                )
+            else:
+                windows = await asyncio.to_thread(self.travel_studio.find_available_windows, **search)
+
+            if windows is None:
+                return self._travel_studio_failure("Failed to fetch room occupancy from Travel Studio API")
+
+            result = {
+                "success": True,
+                "data": {
+                    "windows": windows,
+                    "rooms_needed": rooms_needed(search["num_adults"], search["num_children"]),
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "nights": search["nights"],
+                }
+            }
+            if not windows:
+                result["message"] = "No open windows in this range"
+            return result
+
+        except Exception as e:
+            logger.error(f"Error finding available windows: {str(e)}", exc_info=True)
+            return {
+                "success": False,
+                "error": f"Failed to find available windows: {str(e)}"
+            }
+
     async def create_booking_reservation(
         self, params: Dict[str, Any]
     ) -> Dict[str, Any]:
@@ -221,44 +390,39 @@ class ToolService:
                 )
 
         # Use Travel Studio API to create booking
+        holder = None
+        confirmed = False
         try:
             logger.info(f"Creating booking via Travel Studio API: {params.get('name')}")
             
-            # Map room type IDs to actual Travel Studio categories
-            room_type_mapping = {
-                "DELUXE": "Deluxe",
-                "COTTAGE": "Luxury Cottage",
-                "COTTAGE_BATHTUB": "Luxury Cottage",
-                "BASIC": "basic",
-                "Deluxe": "Deluxe",  # Already correct
-                "Luxury Cottage": "Luxury Cottage",  # Already correct
-                "basic": "basic"  # Already correct
-            }
-            
             # Determine room category from room_type_ids array
             room_category = "Deluxe"  # Default
             if params.get("room_type_ids") and len(params["room_type_ids"]) > 0:
-                requested_type = params["room_type_ids"][0]
-                room_category = room_type_mapping.get(requested_type, requested_type)
-                logger.info(f"Mapped room type '{requested_type}' to '{room_category}'")
+                room_category, error = await self._room_category(params["room_type_ids"][0])
+                if error:
+                    return error
             
             # Ensure numeric fields are integers (AI often sends floats)
             num_adults = int(params.get("num_of_adults", 1))
             num_children = int(params.get("num_of_children", 0))
             
+            # Fail fast if other guests hold every free room of the category
+            holder = self.holder or normalize_phone(params.get("phone_number", ""))
+            contended = await self._hold_for_booking(holder, check_in, check_out, room_category)
+            if contended:
+                return contended
+            
             # Check if guest already has a booking for these dates
             phone_number = params.get("phone_number", "")
             if phone_number:
-                existing_bookings = self.travel_studio.get_bookings()
+                # All of this guest's bookings, off the event loop: a date filter
+                # could miss one starting before check-in, so overlap is checked here
+                existing_bookings = await asyncio.to_thread(self.travel_studio.get_bookings, phone=phone_number)
                 if existing_bookings:
-                    # Normalize phone for comparison
-                    phone_normalized = phone_number.replace("+", "").replace(" ", "").replace("-", "")
-                    
                     for existing in existing_bookings:
-                        guest = existing.get("Guest") or {}
-                        existing_phone = (guest.get("phone") or "").replace("+", "").replace(" ", "").replace("-", "")
-                        
-                        if existing_phone == phone_normalized:
+                        if str(existing.get("status", "")).lower() in CANCELLED_STATUSES:
+                            continue
+                        if phone_matches(existing, phone_number):
                             # Check date overlap
                             existing_checkin = existing.get("check_in_date", "")[:10]
                             existing_checkout = existing.get("check_out_date", "")[:10]
@@ -277,32 +441,46 @@ class ToolService:
                                     "message": f"You already have an existing booking (ID: {booking_id}) for these dates. Payment link: https://maldevtafarms.com/book?bookingId={booking_id}"
                                 }
             
-            booking = self.travel_studio.create_booking(
-                guest_name=params.get("name", ""),
-                guest_email=params.get("email", "guest@example.com"),
-                guest_phone=params.get("phone_number", ""),
-                check_in_date=check_in,
-                check_out_date=check_out,
-                room_category=room_category,
-                num_adults=num_adults,
-                num_children=num_children,
-                booking_channel="whatsapp",
-                payment_status="Unpaid",
-                special_requests=params.get("special_request", "")
-            )
-            
-            if booking:
+            # Journalled under an idempotency key, so a retry after a timeout
+            # never creates the booking twice
+            outcome = await asyncio.to_thread(self.bookings.create_booking, {
+                "guest_name": params.get("name", ""),
+                "guest_email": params.get("email", "guest@example.com"),
+                "guest_phone": params.get("phone_number", ""),
+                "check_in_date": check_in,
+                "check_out_date": check_out,
+                "room_category": room_category,
+                "num_adults": num_adults,
+                "num_children": num_children,
+                "booking_channel": "whatsapp",
+                "payment_status": "Unpaid",
+                "special_requests": params.get("special_request", ""),
+            }, self.travel_studio)
+            
+            if outcome["status"] == STATUS_CONFIRMED:
                 logger.info(f"Booking created successfully via Travel Studio")
+                confirmed = True
+                await asyncio.to_thread(self.holds.consume, holder, check_in, check_out)
                 return {
                     "success": True,
-                    "data": booking,
+                    "data": outcome["booking"],
                     "message": "Booking created successfully"
                 }
-            else:
+            elif outcome["status"] == STATUS_PENDING:
+                # Travel Studio may have created it; the reconciler finds out
+                # and messages the guest either way
+                logger.info(f"Booking {outcome['idempotency_key']} pending confirmation from Travel Studio")
                 return {
-                    "success": False,
-                    "error": "Failed to create booking via Travel Studio API"
+                    "success": True,
+                    "booking_pending": True,
+                    "data": {"status": STATUS_PENDING, "reference": outcome["idempotency_key"]},
+                    "message": (
+                        "The booking request was sent but Travel Studio hasn't confirmed it yet. "
+                        "The guest will get a WhatsApp message with the confirmation shortly; don't retry the booking."
+                    )
                 }
+            else:
+                return self._travel_studio_failure("Failed to create booking via Travel Studio API")
                 
         except Exception as e:
             logger.error(f"Error creating booking: {str(e)}", exc_info=True)
@@ -310,6 +488,10 @@ class ToolService:
                 "success": False,
                 "error": f"Failed to create booking: {str(e)}"
             }
+        finally:
+            if holder and not confirmed:
+                # Nothing booked (failed, duplicate or pending): other guests may have the rooms
+                await asyncio.to_thread(self.holds.release, holder, check_in, check_out)
 
     async def create_day_outing_reservation(
         self, params: Dict[str, Any]
@@ -341,7 +523,7 @@ class ToolService:
         return await self.call_tool("create_day_outing_reservation", params)
 
     async def create_event_inquiry(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Create event inquiry - sends email to owner"""
+        """Create event inquiry - queues email to owner"""
         params = self._sanitize_params(params)
         
         # Handle date fields
@@ -359,89 +541,22 @@ class ToolService:
         try:
             logger.info(f"Creating event inquiry for {params.get('name')}")
             
-            subject = f"Event Inquiry - {params.get('purpose', 'Event')} - {params.get('name')}"
-            
-            body = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-            </head>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background-color: #f8f9fa; border-left: 4px solid #007bff; padding: 20px; margin-bottom: 20px;">
-                    <h2 style="margin: 0 0 10px 0; color: #007bff;">New Event Inquiry</h2>
-                    <p style="margin: 0; color: #666;">WhatsApp Booking Agent</p>
-                </div>
-                
-                <div style="background-color: #ffffff; border: 1px solid #dee2e6; border-radius: 5px; padding: 20px; margin: 20px 0;">
-                    <h3 style="margin-top: 0; color: #007bff; border-bottom: 2px solid #007bff; padding-bottom: 10px;">Guest Details</h3>
-                    <table style="width: 100%; border-collapse: collapse;">
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold; width: 150px;">Name:</td>
-                            <td style="padding: 8px 0;">{params.get('name', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Phone:</td>
-                            <td style="padding: 8px 0;">{params.get('phone_number', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Age:</td>
-                            <td style="padding: 8px 0;">{params.get('age', 'N/A')}</td>
-                        </tr>
-                    </table>
-                </div>
-                
-                <div style="background-color: #ffffff; border: 1px solid #dee2e6; border-radius: 5px; padding: 20px; margin: 20px 0;">
-                    <h3 style="margin-top: 0; color: #007bff; border-bottom: 2px solid #007bff; padding-bottom: 10px;">Event Details</h3>
-                    <table style="width: 100%; border-collapse: collapse;">
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold; width: 150px;">Purpose:</td>
-                            <td style="padding: 8px 0;">{params.get('purpose', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Starting Date:</td>
-                            <td style="padding: 8px 0;">{params.get('starting_date', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">End Date:</td>
-                            <td style="padding: 8px 0;">{params.get('end_date', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Number of People:</td>
-                            <td style="padding: 8px 0;">{params.get('num_of_people', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Special Requests:</td>
-                            <td style="padding: 8px 0;">{params.get('special_request', 'None')}</td>
-                        </tr>
-                    </table>
-                </div>
-                
-                <div style="background-color: #d1ecf1; border-left: 4px solid #17a2b8; padding: 15px; margin: 20px 0;">
-                    <p style="margin: 0; color: #0c5460;">
-                        <strong>⚠️ Action Required:</strong> Please contact the customer at <strong>{params.get('phone_number', 'N/A')}</strong> to discuss event details and provide a quote.
-                    </p>
-                </div>
-                
-                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #dee2e6;">
-                    <p style="margin: 0; color: #999; font-size: 12px; font-style: italic;">
-                        This is an automated inquiry from the WhatsApp booking agent.
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            email_params = {
-                "to_email": os.getenv("OWNER_EMAIL"),
-                "subject": subject,
-                "body": body,
-            }
+            email = render_email(
+                "event_inquiry",
+                name=params.get("name"),
+                phone_number=params.get("phone_number"),
+                age=params.get("age"),
+                purpose=params.get("purpose"),
+                starting_date=params.get("starting_date"),
+                end_date=params.get("end_date"),
+                num_of_people=params.get("num_of_people"),
+                special_request=params.get("special_request"),
+            )
             
-            result = await self.call_tool("send_email", email_params)
+            result = await self._send_owner_email("event_inquiry", email)
             
             if result.get("success"):
-                logger.info(f"Event inquiry email sent successfully")
+                logger.info(f"Event inquiry email queued successfully")
                 return {
                     "success": True,
                     "message": "Event inquiry submitted successfully. Our team will contact you within 24 hours."
@@ -457,61 +572,23 @@ class ToolService:
             }
 
     async def lead_gen(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate lead - sends email to owner"""
+        """Generate lead - queues email to owner"""
         params = self._sanitize_params(params)
         
         try:
             logger.info(f"Generating lead for {params.get('name')}")
             
-            lead_type = params.get('type_of_lead', 'GENERAL')
-            subject = f"New Lead - {lead_type} - {params.get('name')}"
-            
-            body = f"""
-            <!DOCTYPE html>
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background-color: #f8f9fa; border-left: 4px solid #28a745; padding: 20px; margin-bottom: 20px;">
-                    <h2 style="margin: 0 0 10px 0; color: #28a745;">New Lead Generated</h2>
-                    <p style="margin: 0; color: #666;">WhatsApp Booking Agent</p>
-                </div>
-                
-                <div style="background-color: #ffffff; border: 1px solid #dee2e6; border-radius: 5px; padding: 20px;">
-                    <h3 style="margin-top: 0; color: #28a745;">Lead Details</h3>
-                    <table style="width: 100%; border-collapse: collapse;">
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold; width: 150px;">Name:</td>
-                            <td style="padding: 8px 0;">{params.get('name', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Phone:</td>
-                            <td style="padding: 8px 0;">{params.get('phone_number', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Type:</td>
-                            <td style="padding: 8px 0;">{lead_type}</td>
-                        </tr>
-                    </table>
-                </div>
-                
-                <div style="background-color: #d1ecf1; border-left: 4px solid #17a2b8; padding: 15px; margin: 20px 0;">
-                    <p style="margin: 0; color: #0c5460;">
-                        <strong>Follow up:</strong> Contact {params.get('name')} at {params.get('phone_number')} for {lead_type}.
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            email_params = {
-                "to_email": os.getenv("OWNER_EMAIL"),
-                "subject": subject,
-                "body": body,
-            }
+            email = render_email(
+                "lead",
+                name=params.get("name"),
+                phone_number=params.get("phone_number"),
+                lead_type=params.get("type_of_lead", "GENERAL"),
+            )
             
-            result = await self.call_tool("send_email", email_params)
+            result = await self._send_owner_email("lead", email)
             
             if result.get("success"):
-                logger.info(f"Lead generation email sent successfully")
+                logger.info(f"Lead generation email queued successfully")
                 return {
                     "success": True,
                     "message": "Lead captured successfully. Our team will follow up soon."
@@ -527,64 +604,24 @@ class ToolService:
             }
 
     async def human_followup(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Schedule human followup - sends email to owner"""
+        """Schedule human followup - queues email to owner"""
         params = self._sanitize_params(params)
         
         try:
             logger.info(f"Scheduling human followup for {params.get('name')}")
             
-            subject = f"Follow-up Request - {params.get('name')}"
-            
-            body = f"""
-            <!DOCTYPE html>
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 20px; margin-bottom: 20px;">
-                    <h2 style="margin: 0 0 10px 0; color: #856404;">Follow-up Request</h2>
-                    <p style="margin: 0; color: #666;">WhatsApp Booking Agent</p>
-                </div>
-                
-                <div style="background-color: #ffffff; border: 1px solid #dee2e6; border-radius: 5px; padding: 20px;">
-                    <h3 style="margin-top: 0; color: #856404;">Customer Details</h3>
-                    <table style="width: 100%; border-collapse: collapse;">
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold; width: 150px;">Name:</td>
-                            <td style="padding: 8px 0;">{params.get('name', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Phone:</td>
-                            <td style="padding: 8px 0;">{params.get('phone_number', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Purpose:</td>
-                            <td style="padding: 8px 0;">{params.get('purpose', 'N/A')}</td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 8px 0; font-weight: bold;">Requested Time:</td>
-                            <td style="padding: 8px 0;">{params.get('schedule_time', 'ASAP')}</td>
-                        </tr>
-                    </table>
-                </div>
-                
-                <div style="background-color: #f8d7da; border-left: 4px solid #dc3545; padding: 15px; margin: 20px 0;">
-                    <p style="margin: 0; color: #721c24;">
-                        <strong>⚠️ Action Required:</strong> Please call {params.get('name')} at {params.get('phone_number')} at the scheduled time.
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            email_params = {
-                "to_email": os.getenv("OWNER_EMAIL"),
-                "subject": subject,
-                "body": body,
-            }
+            email = render_email(
+                "followup",
+                name=params.get("name"),
+                phone_number=params.get("phone_number"),
+                purpose=params.get("purpose"),
+                schedule_time=params.get("schedule_time"),
+            )
             
-            result = await self.call_tool("send_email", email_params)
+            result = await self._send_owner_email("followup", email)
             
             if result.get("success"):
-                logger.info(f"Follow-up request email sent successfully")
+                logger.info(f"Follow-up request email queued successfully")
                 return {
                     "success": True,
                     "message": "Follow-up scheduled successfully. Our team will call you at the requested time."
@@ -646,7 +683,7 @@ class ToolService:
         try:
             logger.info("Fetching all room reservations via Travel Studio API")
             
-            bookings = self.travel_studio.get_bookings()
+            bookings = await asyncio.to_thread(self.travel_studio.get_bookings)
             
             if bookings is not None:
                 return {
@@ -658,10 +695,7 @@ class ToolService:
                     "message": f"Found {len(bookings)} bookings"
                 }
             else:
-                return {
-                    "success": False,
-                    "error": "Failed to fetch bookings from Travel Studio API"
-                }
+                return self._travel_studio_failure("Failed to fetch bookings from Travel Studio API")
                 
         except Exception as e:
             logger.error(f"Error fetching bookings: {str(e)}", exc_info=True)
@@ -708,7 +742,7 @@ class ToolService:
         return await self.call_tool("location_info", params)
 
     async def request_update_or_cancel(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle cancellation or update requests - sends email to owner via /send_email endpoint"""
+        """Handle cancellation or update requests - queues email to owner via the outbox"""
         params = self._sanitize_params(params)
         
         # Extract parameters
@@ -728,74 +762,18 @@ class ToolService:
         
         # Build email content
         action_text = "CANCEL" if request_type.lower() == "cancel" else "UPDATE"
-        subject = f"[{action_text}] {booking_type_friendly} Request - {customer_name}"
-        
-        body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="background-color: #f8f9fa; border-left: 4px solid #28a745; padding: 20px; margin-bottom: 20px;">
-                <h2 style="margin: 0 0 10px 0; color: #28a745;">Booking {action_text} Request</h2>
-                <p style="margin: 0; color: #666;">WhatsApp Booking Agent</p>
-            </div>
-            
-            <p>Dear Team,</p>
-            <p>A new booking {action_text.lower()} request has been received via WhatsApp:</p>
-            
-            <div style="background-color: #ffffff; border: 1px solid #dee2e6; border-radius: 5px; padding: 20px; margin: 20px 0;">
-                <h3 style="margin-top: 0; color: #28a745; border-bottom: 2px solid #28a745; padding-bottom: 10px;">Customer Details</h3>
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr>
-                        <td style="padding: 8px 0; font-weight: bold; width: 130px;">Name:</td>
-                        <td style="padding: 8px 0;">{customer_name}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; font-weight: bold;">Phone:</td>
-                        <td style="padding: 8px 0;">{customer_phone}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; font-weight: bold;">Booking Type:</td>
-                        <td style="padding: 8px 0;">{booking_type_friendly}</td>
-                    </tr>
-                </table>
-            </div>
-            
-            <div style="background-color: #fff3cd; border: 1px solid #ffc107; border-radius: 5px; padding: 15px; margin: 20px 0;">
-                <p style="margin: 0; font-weight: bold; color: #856404;">Request Type: {request_type.upper()}</p>
-            </div>
-            
-            <div style="background-color: #ffffff; border: 1px solid #dee2e6; border-radius: 5px; padding: 20px; margin: 20px 0;">
-                <h3 style="margin-top: 0; color: #28a745; border-bottom: 2px solid #28a745; padding-bottom: 10px;">Request Details</h3>
-                <p style="margin: 0; white-space: pre-wrap;">{request_details}</p>
-            </div>
-            
-            <div style="background-color: #d1ecf1; border-left: 4px solid #17a2b8; padding: 15px; margin: 20px 0;">
-                <p style="margin: 0; color: #0c5460;">
-                    <strong>⚠️ Action Required:</strong> Please contact the customer at <strong>{customer_phone}</strong> to process this request.
-                </p>
-            </div>
-            
-            <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #dee2e6;">
-                <p style="margin: 0; color: #999; font-size: 12px; font-style: italic;">
-                    This is an automated request from the WhatsApp booking agent.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-                # Call existing /send_email endpoint instead
-                
-        email_params = {
-            "to_email": os.getenv("OWNER_EMAIL"),
-            "subject": subject,
-            "body": body,
-        }
+        email = render_email(
+            "update_or_cancel",
+            action_text=action_text,
+            customer_name=customer_name,
+            customer_phone=customer_phone,
+            booking_type_friendly=booking_type_friendly,
+            request_type=request_type,
+            request_details=request_details,
+        )
         
-        return await self.call_tool("send_email", email_params)
+        category = "cancel" if action_text == "CANCEL" else "update"
+        return await self._send_owner_email(category, email)
 
     async def close(self):
         await self.client.aclose()
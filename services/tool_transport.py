@@ -0,0 +1,115 @@
+"""
+Tool Transports
+Decide how ToolService.call_tool reaches a tool implementation
+
+- local: internal tools (e.g. send_email) run in-process; anything not
+  registered locally still goes to the remote tools API
+- remote: every tool is POSTed to TOOLS_API_BASE_URL/<tool_name>
+  (for split deployments where tools run on another host)
+
+Both transports return the same result contract as the tools API:
+a dictionary with "success" plus "message"/"data" or "error".
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ToolHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class RemoteToolTransport:
+    """POSTs tool calls to the external tools API"""
+
+    name = "remote"
+
+    def __init__(self, client: httpx.AsyncClient, base_url: str, api_token: Optional[str] = None):
+        self.client = client
+        self.base_url = base_url
+        self.api_token = api_token
+
+    async def call(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Call a tool over HTTP
+
+        Raises:
+            httpx.HTTPError on transport or status errors
+        """
+        url = f"{self.base_url}/{tool_name}"
+        headers = {"Content-Type": "application/json"}
+
+        # Add token if provided
+        if self.api_token:
+            headers["Authorization"] = f"Bearer {self.api_token}"
+
+        response = await self.client.post(url, json=params, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+
+class LocalToolTransport:
+    """Dispatches internal tools to in-process handlers"""
+
+    name = "local"
+
+    def __init__(self, handlers: Dict[str, ToolHandler], fallback: Optional[RemoteToolTransport] = None):
+        self.handlers = handlers
+        self.fallback = fallback
+
+    def handles(self, tool_name: str) -> bool:
+        return tool_name in self.handlers
+
+    async def call(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        handler = self.handlers.get(tool_name)
+        if handler is not None:
+            return await handler(params)
+
+        if self.fallback is None:
+            return {"success": False, "error": f"Tool {tool_name} is not available"}
+
+        logger.info(f"Tool {tool_name} has no local handler, using remote tools API")
+        return await self.fallback.call(tool_name, params)
+
+
+async def _send_email_handler(params: Dict[str, Any]) -> Dict[str, Any]:
+    """In-process equivalent of POST /send_email (database writes run off the event loop)"""
+    from services.owner_notification_service import get_owner_notification_service
+
+    return await asyncio.to_thread(get_owner_notification_service().handle_send_email, params)
+
+
+# Internal tools served by this deployment
+LOCAL_TOOL_HANDLERS: Dict[str, ToolHandler] = {
+    "send_email": _send_email_handler,
+}
+
+
+def create_tool_transport(
+    client: httpx.AsyncClient, base_url: str, api_token: Optional[str] = None
+):
+    """
+    Build the transport selected by TOOLS_TRANSPORT ("local" or "remote")
+
+    Args:
+        client: Shared HTTP client for remote calls
+        base_url: Remote tools API base URL
+        api_token: Optional bearer token for the remote tools API
+
+    Returns:
+        LocalToolTransport or RemoteToolTransport
+    """
+    mode = os.getenv("TOOLS_TRANSPORT", "local").lower()
+    remote = RemoteToolTransport(client, base_url, api_token)
+
+    if mode == "remote":
+        return remote
+
+    if mode != "local":
+        logger.warning(f"Unknown TOOLS_TRANSPORT '{mode}', using local")
+
+    return LocalToolTransport(LOCAL_TOOL_HANDLERS, fallback=remote)
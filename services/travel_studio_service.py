@@ -4,16 +4,249 @@ Handles all interactions with the Travel Studio Backend API
 """
 
 import os
+import json
+import time
+import base64
 import logging
-import requests
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import math
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Dict, List, Optional, Any, Callable, Iterable, Iterator, Tuple
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 
+from utils.tracing import get_tracer, SPAN_KIND_CLIENT
+from utils.metrics import (
+    TRAVEL_STUDIO_REQUEST_SECONDS, TRAVEL_STUDIO_RATE_LIMITED_TOTAL, TRAVEL_STUDIO_CIRCUIT_STATE,
+    TRAVEL_STUDIO_FAST_FAILS_TOTAL, TRAVEL_STUDIO_HEDGES_TOTAL, normalize_path,
+)
+from utils.rate_limit import RateLimiter
+from services.catalogue_cache import CatalogueCache
+from utils.resilience import CircuitBreaker, LatencyWindow, STATE_CLOSED, STATE_OPEN, STATE_VALUES
+from utils.lazy_imports import lazy_import
+
+# Loaded on the first API call
+requests = lazy_import("requests")
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+CANCELLED_STATUSES = {"cancelled", "canceled", "rejected", "no_show", "no-show"}
+
+# Room occupancy: max 3 adults, or 2 adults + up to 2 children
+MAX_ADULTS_PER_ROOM = 3
+MAX_ADULTS_WITH_CHILDREN = 2
+MAX_CHILDREN_PER_ROOM = 2
+
+WEEKEND_CHECK_IN_DAYS = (4, 5)  # Friday, Saturday
+
+# Why a request returned None (TravelStudioService.last_error_kind)
+ERROR_NOT_CONFIGURED = "not_configured"
+ERROR_CIRCUIT_OPEN = "circuit_open"
+ERROR_TIMEOUT = "timeout"
+ERROR_CONNECTION = "connection"
+ERROR_RATE_LIMITED = "rate_limited"
+ERROR_HTTP = "http_error"
+
+# POSTs that only read, so a duplicate copy is harmless
+HEDGEABLE_REQUESTS = {("POST", "/api/hocc/rooms/available")}
+
+
+def day_ordinal(value: Any) -> Optional[int]:
+    """Day ordinal of a YYYY-MM-DD or ISO timestamp string"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def booking_nights(booking: Dict) -> Optional[Tuple[int, int]]:
+    """
+    Nights a booking holds, as [check-in day, check-out day) ordinals
+    
+    Returns:
+        tuple: (start, end), or None for cancelled or undated bookings
+    """
+    if str(booking.get("status", "")).lower() in CANCELLED_STATUSES:
+        return None
+    start = day_ordinal(booking.get("check_in_date") or booking.get("check_in"))
+    end = day_ordinal(booking.get("check_out_date") or booking.get("check_out"))
+    if start is None or end is None or end <= start:
+        return None
+    return start, end
+
+
+def normalize_phone(phone: Any) -> str:
+    """Digits of a phone number, without country code formatting"""
+    return "".join(ch for ch in str(phone or "") if ch.isdigit())
+
+
+def booking_phone(booking: Dict) -> str:
+    guest = booking.get("Guest") or {}
+    return normalize_phone(booking.get("guest_phone") or guest.get("phone"))
+
+
+def phone_matches(booking: Dict, phone: str) -> bool:
+    """Same number, with or without the country code"""
+    wanted, found = normalize_phone(phone), booking_phone(booking)
+    if not wanted or not found:
+        return False
+    return found[-10:] == wanted[-10:]
+
+
+def project_fields(booking: Dict, fields: Iterable[str]) -> Dict:
+    """
+    Copy of a booking with only the given fields
+    
+    Args:
+        booking: Booking dict
+        fields: Field names; dotted paths ("Guest.phone") select nested fields
+    
+    Returns:
+        dict: Selected fields, nested like the source; missing ones are left out
+    """
+    projected: Dict[str, Any] = {}
+    for path in fields:
+        source, target = booking, projected
+        parts = path.split(".")
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = source[parts[-1]]
+    return projected
+
+
+def encode_cursor(position: str, skip: int) -> str:
+    """Opaque cursor: a backend page position plus the items already read from it"""
+    return base64.urlsafe_b64encode(json.dumps([position, skip]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        position, skip = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(position), int(skip)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def rooms_needed(num_adults: int, num_children: int = 0) -> int:
+    """Fewest rooms that fit the party under the occupancy policy"""
+    num_adults, num_children = max(int(num_adults or 1), 1), max(int(num_children or 0), 0)
+    rooms = max(math.ceil(num_adults / MAX_ADULTS_PER_ROOM), math.ceil(num_children / MAX_CHILDREN_PER_ROOM))
+    while True:
+        # Rooms with children hold fewer adults
+        with_children = math.ceil(num_children / MAX_CHILDREN_PER_ROOM)
+        if with_children * MAX_ADULTS_WITH_CHILDREN + (rooms - with_children) * MAX_ADULTS_PER_ROOM >= num_adults:
+            return rooms
+        rooms += 1
+
+
+def room_rate(room: Dict) -> float:
+    """Nightly base rate of a room, 0 when missing"""
+    try:
+        return float(room.get("base_rate") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def find_windows(
+    rooms: List[Dict],
+    stays_by_room: Dict[str, Iterable[Tuple[int, int]]],
+    start_date: str,
+    end_date: str,
+    nights: int,
+    num_rooms: int = 1,
+    category: Optional[str] = None,
+    weekends_only: bool = False,
+    max_results: int = 5,
+) -> List[Dict]:
+    """
+    Stay windows inside a date span with enough free rooms, cheapest first
+    
+    One pass per room over its booked nights: a prefix sum of occupied
+    nights across the span gives, for every check-in day, whether the room
+    is free for the whole stay. Free rooms are tallied per check-in day and
+    category, keeping their rates.
+    
+    Args:
+        rooms: Room dicts (id, category, base_rate, isOccupiable)
+        stays_by_room: Room id -> booked [start, end) day ordinals
+        start_date: Earliest check-in (YYYY-MM-DD)
+        end_date: Latest check-out (YYYY-MM-DD)
+        nights: Stay length
+        num_rooms: Rooms the party needs
+        category: Only this room category (case-insensitive)
+        weekends_only: Only Friday or Saturday check-ins
+        max_results: Windows to return
+    
+    Returns:
+        list: Windows with check_in/check_out (DD/MM/YYYY), category,
+            rooms_available, rate_per_night and total for num_rooms rooms;
+            at most one (the cheapest) per check-in date
+    """
+    first, last = day_ordinal(start_date), day_ordinal(end_date)
+    if first is None or last is None or nights < 1 or last - first < nights:
+        return []
+    span = last - first
+    wanted = category.lower() if category else None
+    
+    # (check-in offset, category) -> rates of the rooms free for the stay
+    free: Dict[Tuple[int, str], List[float]] = {}
+    for room in rooms:
+        room_category = str(room.get("category", ""))
+        if room.get("isOccupiable", True) is False or (wanted and room_category.lower() != wanted):
+            continue
+        occupied = [0] * (span + 1)
+        for stay_start, stay_end in stays_by_room.get(str(room.get("id")), ()):
+            lo, hi = max(stay_start, first) - first, min(stay_end, last) - first
+            if lo < hi:
+                occupied[lo] += 1
+                occupied[hi] -= 1
+        # booked_before[i]: occupied nights among the first i nights of the span
+        booked_before, running, nights_taken = [0], 0, 0
+        for offset in range(span):
+            running += occupied[offset]
+            nights_taken += 1 if running > 0 else 0
+            booked_before.append(nights_taken)
+        rate = room_rate(room)
+        for offset in range(span - nights + 1):
+            if booked_before[offset + nights] == booked_before[offset]:
+                free.setdefault((offset, room_category), []).append(rate)
+    
+    best: Dict[int, Dict] = {}
+    for (offset, room_category), rates in free.items():
+        if len(rates) < num_rooms:
+            continue
+        check_in = date.fromordinal(first + offset)
+        if weekends_only and check_in.weekday() not in WEEKEND_CHECK_IN_DAYS:
+            continue
+        cheapest = sorted(rates)[:num_rooms]
+        window = {
+            "check_in": check_in.strftime("%d/%m/%Y"),
+            "check_out": (check_in + timedelta(days=nights)).strftime("%d/%m/%Y"),
+            "weekday": check_in.strftime("%A"),
+            "category": room_category,
+            "rooms_available": len(rates),
+            "rate_per_night": cheapest[0],
+            "total": round(sum(cheapest) * nights, 2),
+        }
+        if offset not in best or window["total"] < best[offset]["total"]:
+            best[offset] = window
+    
+    # Cheapest first, earlier dates breaking ties
+    ranked = sorted(best.items(), key=lambda item: (item[1]["total"], item[0]))
+    return [window for _, window in ranked[:max_results]]
+
 
 class TravelStudioService:
     def __init__(self):
@@ -23,6 +256,29 @@ class TravelStudioService:
             "https://travel-studio-backend-e2bkc2e0a8e4e3hy.centralindia-01.azurewebsites.net"
         )
         self.bearer_token = os.getenv("TRAVEL_STUDIO_BEARER_TOKEN")
+        # Bookings requested per backend page
+        self.page_size = int(os.getenv("TRAVEL_STUDIO_PAGE_SIZE", "100"))
+        # Batch lookups run this many requests at once; every request,
+        # batched or not, shares one rate limit
+        self.max_concurrency = int(os.getenv("TRAVEL_STUDIO_MAX_CONCURRENCY", "8"))
+        self.rate_limiter = RateLimiter(float(os.getenv("TRAVEL_STUDIO_RATE_LIMIT_PER_SECOND", "20")))
+        self.rate_limit_retries = int(os.getenv("TRAVEL_STUDIO_RATE_LIMIT_RETRIES", "2"))
+        # HTTP status and error kind of the last request made by the current thread
+        self._last_status = threading.local()
+        # Resilience: per-endpoint circuit breakers and hedging of slow reads
+        self.timeout = float(os.getenv("TRAVEL_STUDIO_TIMEOUT_SECONDS", "30"))
+        self.breaker_failures = int(os.getenv("TRAVEL_STUDIO_BREAKER_FAILURES", "5"))
+        self.breaker_reset_seconds = float(os.getenv("TRAVEL_STUDIO_BREAKER_RESET_SECONDS", "30"))
+        self.hedge_enabled = os.getenv("TRAVEL_STUDIO_HEDGE_ENABLED", "true").lower() == "true"
+        self.hedge_min_seconds = float(os.getenv("TRAVEL_STUDIO_HEDGE_MIN_SECONDS", "0.2"))
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self._latency: Dict[str, LatencyWindow] = {}
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        # Profile and room catalogue, served stale-while-revalidate
+        self.catalogue = CatalogueCache()
+        # Called as listener(action, booking, category) after a booking write
+        self._booking_listeners: List[Callable[..., Any]] = []
         
         if not self.bearer_token:
             logger.warning("TRAVEL_STUDIO_BEARER_TOKEN not set in environment")
@@ -39,42 +295,100 @@ class TravelStudioService:
             "Accept": "application/json"
         }
     
+    def add_booking_listener(self, listener: Callable[..., Any]):
+        """
+        Register a callback for bookings created, updated or cancelled here
+        
+        Args:
+            listener: Called with (action, booking, category); action is
+                "create", "update" or "cancel"
+        """
+        if listener not in self._booking_listeners:
+            self._booking_listeners.append(listener)
+    
+    def _notify_booking_change(self, action: str, booking: Dict, category: Optional[str] = None):
+        for listener in self._booking_listeners:
+            try:
+                listener(action, booking, category)
+            except Exception as e:
+                logger.error(f"Booking listener failed on {action}: {str(e)}")
+    
     def _make_request(
         self, 
         method: str, 
         endpoint: str, 
         data: Optional[Dict] = None,
-        params: Optional[Dict] = None
+        params: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None
     ) -> Optional[Dict]:
         """
         Make HTTP request to Travel Studio API
         
+        Fails fast (returns None without a request) while the endpoint's
+        circuit breaker is open. Idempotent requests slower than the
+        endpoint's recent p95 are hedged with a second copy.
+        
         Args:
             method: HTTP method (GET, POST, PUT, DELETE)
             endpoint: API endpoint path
             data: Request body data
             params: Query parameters
+            headers: Extra request headers (e.g. Idempotency-Key)
             
         Returns:
-            Response data as dictionary or None on error
+            Response data as dictionary or None on error (see last_error_kind)
         """
+        self._last_status.code = None
+        self._last_status.kind = None
         if not self.client_initialized:
             logger.error("Travel Studio API client not initialized")
+            self._last_status.kind = ERROR_NOT_CONFIGURED
             return None
         
         url = f"{self.base_url}{endpoint}"
+        route = normalize_path(endpoint)
+        breaker = self._breaker(route)
+        if not breaker.allow():
+            logger.warning(f"Travel Studio circuit open for {route}, failing fast")
+            self._last_status.kind = ERROR_CIRCUIT_OPEN
+            TRAVEL_STUDIO_FAST_FAILS_TOTAL.inc(endpoint=route)
+            return None
+        self.rate_limiter.acquire()
         
+        healthy = False
         try:
             logger.info(f"Making {method} request to {url}")
             
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self._get_headers(),
-                json=data,
-                params=params,
-                timeout=30
-            )
+            with get_tracer().start_span(
+                "travel_studio.request",
+                {"http.method": method, "http.route": endpoint},
+                kind=SPAN_KIND_CLIENT,
+            ) as span:
+                started = time.perf_counter()
+                status = "error"
+                try:
+                    response = self._send(method, url, route, data, params, headers)
+                    status = str(response.status_code)
+                finally:
+                    TRAVEL_STUDIO_REQUEST_SECONDS.observe(
+                        time.perf_counter() - started,
+                        method=method, endpoint=route, status=status,
+                    )
+                span.set_attribute("http.status_code", response.status_code)
+                if response.status_code >= 400:
+                    span.set_status("ERROR", f"HTTP {response.status_code}")
+            
+            # 4xx answers still mean the backend is up
+            healthy = response.status_code < 500
+            self._last_status.code = response.status_code
+            if response.status_code == 429:
+                # Hold every caller, not just this one, until the backend is ready again
+                retry_after = response.headers.get("Retry-After", "1")
+                self.rate_limiter.pause(float(retry_after) if retry_after.replace(".", "", 1).isdigit() else 1.0)
+                TRAVEL_STUDIO_RATE_LIMITED_TOTAL.inc()
+                self._last_status.kind = ERROR_RATE_LIMITED
+            elif response.status_code >= 400:
+                self._last_status.kind = ERROR_HTTP
             
             response.raise_for_status()
             result = response.json()
@@ -84,13 +398,120 @@ class TravelStudioService:
             
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed: {str(e)}")
+            if isinstance(e, requests.exceptions.Timeout):
+                self._last_status.kind = ERROR_TIMEOUT
+            elif isinstance(e, requests.exceptions.ConnectionError):
+                self._last_status.kind = ERROR_CONNECTION
             if hasattr(e, 'response') and e.response is not None:
                 logger.error(f"Response status: {e.response.status_code}")
                 logger.error(f"Response body: {e.response.text}")
             return None
         except Exception as e:
             logger.error(f"Unexpected error in API request: {str(e)}")
+            self._last_status.kind = self._last_status.kind or ERROR_HTTP
             return None
+        finally:
+            if healthy:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+    
+    def _send(self, method: str, url: str, route: str, data: Optional[Dict], params: Optional[Dict],
+              headers: Optional[Dict[str, str]] = None):
+        """One HTTP request, hedged when it is idempotent and running slow"""
+        send = functools.partial(
+            requests.request,
+            method=method,
+            url=url,
+            headers={**self._get_headers(), **(headers or {})},
+            json=data,
+            params=params,
+            timeout=self.timeout
+        )
+        latency = self._latency.setdefault(route, LatencyWindow())
+        hedge_after = None
+        if self.hedge_enabled and (method == "GET" or (method, route) in HEDGEABLE_REQUESTS):
+            p95 = latency.percentile(95)
+            if p95 is not None:
+                hedge_after = max(p95, self.hedge_min_seconds)
+        
+        started = time.perf_counter()
+        response = send() if hedge_after is None else self._hedged(send, hedge_after, route)
+        if response.status_code < 400:
+            latency.add(time.perf_counter() - started)
+        return response
+    
+    def _hedged(self, send: Callable[[], Any], hedge_after: float, route: str):
+        """Send, and if no answer within hedge_after, race a second copy"""
+        if self._hedge_pool is None:
+            with self._breakers_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency * 2 + 4, thread_name_prefix="travel-studio-hedge"
+                    )
+        primary = self._hedge_pool.submit(send)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        
+        self.rate_limiter.acquire()
+        hedge = self._hedge_pool.submit(send)
+        errors = []
+        for future in as_completed([primary, hedge]):
+            try:
+                response = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            # The loser keeps running in the pool; its response is dropped
+            TRAVEL_STUDIO_HEDGES_TOTAL.inc(endpoint=route, winner="hedge" if future is hedge else "primary")
+            return response
+        raise errors[0]
+    
+    def _breaker(self, route: str) -> CircuitBreaker:
+        breaker = self._breakers.get(route)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self._breakers.get(route)
+                if breaker is None:
+                    breaker = CircuitBreaker(
+                        route,
+                        failure_threshold=self.breaker_failures,
+                        reset_seconds=self.breaker_reset_seconds,
+                        on_change=self._on_breaker_change,
+                    )
+                    self._breakers[route] = breaker
+                    TRAVEL_STUDIO_CIRCUIT_STATE.set(STATE_VALUES[STATE_CLOSED], endpoint=route)
+        return breaker
+    
+    @staticmethod
+    def _on_breaker_change(route: str, state: str):
+        TRAVEL_STUDIO_CIRCUIT_STATE.set(STATE_VALUES[state], endpoint=route)
+        if state == STATE_OPEN:
+            logger.error(f"Travel Studio circuit opened for {route}")
+        else:
+            logger.info(f"Travel Studio circuit {state} for {route}")
+    
+    def last_error_kind(self) -> Optional[str]:
+        """
+        Why the current thread's last request failed
+        
+        Returns:
+            str: One of the ERROR_* kinds, or None if it succeeded
+        """
+        return getattr(self._last_status, "kind", None)
+    
+    def last_status_code(self) -> Optional[int]:
+        """HTTP status of the current thread's last request (None if unanswered)"""
+        return getattr(self._last_status, "code", None)
+    
+    def backend_degraded(self) -> bool:
+        """True while any endpoint's circuit is open or probing"""
+        return any(breaker.state != STATE_CLOSED for breaker in list(self._breakers.values()))
+    
+    def circuit_states(self) -> Dict[str, str]:
+        """Circuit breaker state per endpoint"""
+        return {route: breaker.state for route, breaker in sorted(self._breakers.items())}
     
     # Booking Management
     
@@ -98,20 +519,105 @@ class TravelStudioService:
         self, 
         status: Optional[str] = None,
         start_date: Optional[str] = None,
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        phone: Optional[str] = None
     ) -> Optional[List[Dict]]:
         """
-        Get all bookings for the hotel
+        Get all bookings for the hotel, following every page
         
         Args:
             status: Filter by booking status (pending, confirmed, cancelled, completed)
             start_date: Filter bookings from this date (YYYY-MM-DD)
             end_date: Filter bookings until this date (YYYY-MM-DD)
+            phone: Only bookings of this guest phone number
             
         Returns:
             List of booking objects or None on error
         """
-        params = {}
+        try:
+            return list(self.iter_bookings(status=status, start_date=start_date, end_date=end_date, phone=phone))
+        except RuntimeError as e:
+            logger.error(str(e))
+            return None
+    
+    def iter_bookings(
+        self,
+        status: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        phone: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        Bookings one at a time, fetching the next backend page only when needed
+        
+        Args:
+            status, start_date, end_date, phone: Filters, as in get_bookings
+            cursor: Resume from a next_cursor returned by list_bookings
+            
+        Yields:
+            Booking objects
+            
+        Raises:
+            RuntimeError: A page could not be fetched
+        """
+        for booking, _ in self._walk_bookings(status, start_date, end_date, phone, cursor):
+            yield booking
+    
+    def list_bookings(
+        self,
+        status: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        phone: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Optional[Dict]:
+        """
+        One page of bookings for a client, with a cursor to the next
+        
+        Args:
+            status, start_date, end_date, phone: Filters, as in get_bookings
+            cursor: next_cursor of the previous page, or None for the first
+            limit: Bookings per page
+            
+        Returns:
+            dict: {"items": [...], "next_cursor": str or None}, or None on error
+            
+        Raises:
+            ValueError: The cursor is malformed
+        """
+        items: List[Dict] = []
+        next_cursor = None
+        try:
+            for booking, after in self._walk_bookings(status, start_date, end_date, phone, cursor):
+                items.append(booking)
+                if len(items) >= limit:
+                    next_cursor = after
+                    break
+        except RuntimeError as e:
+            logger.error(str(e))
+            return None
+        return {"items": items, "next_cursor": next_cursor}
+    
+    def _walk_bookings(
+        self,
+        status: Optional[str],
+        start_date: Optional[str],
+        end_date: Optional[str],
+        phone: Optional[str],
+        cursor: Optional[str]
+    ) -> Iterator[Tuple[Dict, str]]:
+        """
+        Matching bookings, each with the cursor that resumes right after it
+        
+        The backend is asked for page/limit pages. A page carrying a
+        next_cursor (or pagination with a page count) says where to go next;
+        without either, a short or repeated page ends the walk.
+        """
+        position, skip = decode_cursor(cursor) if cursor else ("page:1", 0)
+        wanted_status = status.lower() if status else None
+        params: Dict[str, Any] = {"limit": self.page_size}
         if status:
             params['status'] = status
         if start_date:
@@ -119,11 +625,57 @@ class TravelStudioService:
         if end_date:
             params['end_date'] = end_date
         
-        result = self._make_request("GET", "/api/hocc/bookings", params=params)
-        
-        if result and result.get("success"):
-            return result.get("data", {}).get("items", [])
-        return None
+        previous_first = None
+        while position:
+            kind, _, value = position.partition(":")
+            page_params = dict(params)
+            if kind == "cursor":
+                page_params['cursor'] = value
+            else:
+                page_params['page'] = int(value)
+            
+            result = self._make_request("GET", "/api/hocc/bookings", params=page_params)
+            if not result or not result.get("success"):
+                raise RuntimeError(f"Failed to fetch bookings page {position}")
+            data = result.get("data") or {}
+            items = data.get("items", []) if isinstance(data, dict) else data
+            
+            # A backend that ignores paging returns the same page again
+            first = json.dumps(items[0], sort_keys=True, default=str) if items else None
+            if first is not None and first == previous_first:
+                return
+            previous_first = first
+            
+            next_position = self._next_page(kind, value, data, len(items))
+            for index in range(skip, len(items)):
+                booking = items[index]
+                if wanted_status and str(booking.get("status", "")).lower() != wanted_status:
+                    continue
+                if phone and not phone_matches(booking, phone):
+                    continue
+                after = encode_cursor(position, index + 1) if index + 1 < len(items) else (
+                    encode_cursor(next_position, 0) if next_position else None
+                )
+                yield booking, after
+            position, skip = next_position, 0
+    
+    def _next_page(self, kind: str, value: str, data: Any, count: int) -> Optional[str]:
+        if not isinstance(data, dict):
+            return None
+        next_cursor = data.get("next_cursor") or data.get("nextCursor")
+        if next_cursor:
+            return f"cursor:{next_cursor}"
+        if kind != "page":
+            return None
+        page = int(value)
+        pagination = data.get("pagination") or {}
+        total_pages = pagination.get("total_pages") or pagination.get("totalPages")
+        if total_pages is not None:
+            return f"page:{page + 1}" if page < int(total_pages) else None
+        has_next = pagination.get("has_next", pagination.get("hasNext"))
+        if has_next is not None:
+            return f"page:{page + 1}" if has_next else None
+        return f"page:{page + 1}" if count >= self.page_size else None
     
     def get_booking_by_id(self, booking_id: str) -> Optional[Dict]:
         """
@@ -155,6 +707,7 @@ class TravelStudioService:
         booking_channel: str = "direct",
         payment_status: str = "Unpaid",
         special_requests: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
         **kwargs
     ) -> Optional[Dict]:
         """
@@ -173,6 +726,8 @@ class TravelStudioService:
             booking_channel: Booking source (default: "whatsapp")
             payment_status: Payment status (default: "Unpaid")
             special_requests: Any special requests
+            idempotency_key: Sent as the Idempotency-Key header, so the
+                backend can recognise a retried booking
             **kwargs: Additional booking details
             
         Returns:
@@ -230,10 +785,12 @@ class TravelStudioService:
             # Log the exact data being sent for debugging
             logger.info(f"Booking data being sent: {data}")
             
-            result = self._make_request("POST", "/api/hocc/bookings", data=data)
+            headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+            result = self._make_request("POST", "/api/hocc/bookings", data=data, headers=headers)
             
             if result and result.get("success"):
                 logger.info(f"Booking created successfully: {result.get('data', {}).get('booking_id')}")
+                self._notify_booking_change("create", {**data, **(result.get("data") or {})}, room_category)
                 return result.get("data")
             return None
             
@@ -264,6 +821,7 @@ class TravelStudioService:
         
         if result and result.get("success"):
             logger.info(f"Booking {booking_id} updated successfully")
+            self._notify_booking_change("update", {"booking_id": booking_id, **update_fields, **(result.get("data") or {})})
             return result.get("data")
         return None
     
@@ -287,6 +845,7 @@ class TravelStudioService:
         
         if result and result.get("success"):
             logger.info(f"Booking {booking_id} cancelled successfully")
+            self._notify_booking_change("cancel", {"booking_id": booking_id})
             return True
         return False
     
@@ -393,14 +952,105 @@ class TravelStudioService:
             logger.error(f"Error checking room availability: {str(e)}", exc_info=True)
             return None
     
-    def get_room_types(self) -> Optional[List[str]]:
+    def find_available_windows(
+        self,
+        start_date: str,
+        end_date: str,
+        nights: int,
+        num_adults: int,
+        num_children: int = 0,
+        category: Optional[str] = None,
+        weekends_only: bool = False,
+        max_results: int = 5,
+        rooms: Optional[List[Dict]] = None,
+        stays_by_room: Optional[Dict[str, Iterable[Tuple[int, int]]]] = None,
+        held_by_room: Optional[Dict[str, Iterable[Tuple[int, int]]]] = None,
+    ) -> Optional[List[Dict]]:
         """
-        Get all room types/categories from available rooms
+        Best stay windows for a flexible-date guest
+        
+        Occupancy comes from one get_all_rooms call (each room carries its
+        booking_list) unless rooms and stays_by_room are passed in, e.g. from
+        the local inventory mirror.
         
+        Args:
+            start_date: Earliest check-in (YYYY-MM-DD)
+            end_date: Latest check-out (YYYY-MM-DD)
+            nights: Stay length in nights
+            num_adults: Number of adults
+            num_children: Number of children
+            category: Room category filter (optional)
+            weekends_only: Only Friday/Saturday check-ins
+            max_results: Number of windows to return
+            rooms: Room list to use instead of calling the API
+            stays_by_room: Booked nights per room id, with rooms
+            held_by_room: Nights other guests hold, treated as booked
+            
         Returns:
-            List of unique room categories or None on error
+            List of windows (see find_windows) or None on error
+        """
+        if rooms is None:
+            rooms = self.get_all_rooms()
+            if rooms is None:
+                return None
+            stays_by_room = {
+                str(room.get("id")): [
+                    nights_held for booking in room.get("booking_list") or []
+                    for nights_held in [booking_nights(booking)] if nights_held is not None
+                ]
+                for room in rooms
+            }
+        
+        if held_by_room:
+            stays_by_room = {
+                room_id: list((stays_by_room or {}).get(room_id, [])) + list(held_by_room.get(room_id, []))
+                for room_id in set(stays_by_room or {}) | set(held_by_room)
+            }
+        
+        num_rooms = rooms_needed(num_adults, num_children)
+        windows = find_windows(
+            rooms, stays_by_room or {}, start_date, end_date, nights,
+            num_rooms=num_rooms, category=category,
+            weekends_only=weekends_only, max_results=max_results,
+        )
+        logger.info(
+            f"Found {len(windows)} windows of {nights} nights between {start_date} and {end_date} "
+            f"for {num_rooms} room(s)"
+        )
+        return windows
+    
+    def get_room_catalogue(self, wait: bool = True) -> Optional[List[Dict]]:
+        """
+        Rooms without their booking lists, from the catalogue cache
+        
+        Args:
+            wait: False never calls Travel Studio inline (safe on the event
+                loop); a missing catalogue is then fetched in the background
+        
+        Returns:
+            List of rooms (id, category, rates, ...) or None on error
         """
+        if not wait:
+            return self.catalogue.peek("rooms", self._fetch_room_catalogue)
+        return self.catalogue.get("rooms", self._fetch_room_catalogue)
+    
+    def _fetch_room_catalogue(self) -> Optional[List[Dict]]:
         rooms = self.get_all_rooms()
+        if rooms is None:
+            return None
+        return [{key: value for key, value in room.items() if key != "booking_list"} for room in rooms]
+    
+    def get_room_types(self, wait: bool = True) -> Optional[List[str]]:
+        """
+        Get all room types/categories from the room catalogue
+        
+        Args:
+            wait: See get_room_catalogue
+        
+        Returns:
+            List of unique room categories or None on error
+        """
+        rooms = self.get_room_catalogue(wait)
         if not rooms:
             return None
         
@@ -461,6 +1111,102 @@ class TravelStudioService:
             return result.get("data", {}).get("items", [])
         return None
     
+    # Batch lookups
+    
+    def _fan_out(
+        self,
+        fetch: Callable[[str], Optional[Any]],
+        keys: Iterable[Any],
+        concurrency: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Call fetch(key) for every key, at most `concurrency` at a time
+        
+        Requests still go through the shared rate limiter; a key that was
+        rate limited (429) is retried after the backend's Retry-After.
+        
+        Args:
+            fetch: Single-item lookup returning None on failure
+            keys: Items to look up (duplicates are fetched once)
+            concurrency: Parallel requests (default TRAVEL_STUDIO_MAX_CONCURRENCY)
+            
+        Returns:
+            dict: {"results": {key: value}, "errors": {key: reason}}; every
+                key appears in exactly one of them
+        """
+        keys = list(dict.fromkeys(str(key) for key in keys))
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        if not keys:
+            return {"results": results, "errors": errors}
+        
+        def run(key: str) -> Tuple[Optional[Any], Optional[int]]:
+            for _ in range(self.rate_limit_retries + 1):
+                value = fetch(key)
+                status = self.last_status_code()
+                if value is not None or status != 429:
+                    break
+            return value, status
+        
+        workers = max(1, min(concurrency or self.max_concurrency, len(keys)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="travel-studio") as pool:
+            # Each request's span stays under the caller's current span
+            futures = {pool.submit(contextvars.copy_context().run, run, key): key for key in keys}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    value, status = future.result()
+                except Exception as e:
+                    errors[key] = str(e)
+                    continue
+                if value is None:
+                    errors[key] = f"HTTP {status}" if status else "request failed"
+                else:
+                    results[key] = value
+        
+        if errors:
+            logger.warning(f"{len(errors)} of {len(keys)} Travel Studio lookups failed")
+        return {"results": results, "errors": errors}
+    
+    def get_room_bookings_batch(self, room_ids: Iterable[str], concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Bookings of many rooms, fetched concurrently
+        
+        Args:
+            room_ids: Room IDs
+            concurrency: Parallel requests (optional)
+            
+        Returns:
+            dict: {"results": {room_id: bookings}, "errors": {room_id: reason}}
+        """
+        return self._fan_out(self.get_room_bookings, room_ids, concurrency)
+    
+    def get_guest_bookings_batch(self, phones: Iterable[str], concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Bookings of many guests, fetched concurrently
+        
+        Args:
+            phones: Guest phone numbers
+            concurrency: Parallel requests (optional)
+            
+        Returns:
+            dict: {"results": {phone: bookings}, "errors": {phone: reason}}
+        """
+        return self._fan_out(self.get_guest_bookings, phones, concurrency)
+    
+    def get_bookings_by_ids(self, booking_ids: Iterable[str], concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Many bookings by ID, fetched concurrently
+        
+        Args:
+            booking_ids: Booking IDs
+            concurrency: Parallel requests (optional)
+            
+        Returns:
+            dict: {"results": {booking_id: booking}, "errors": {booking_id: reason}}
+        """
+        return self._fan_out(self.get_booking_by_id, booking_ids, concurrency)
+    
     # Analytics & Reports
     
     def get_occupancy_report(
@@ -543,11 +1289,14 @@ class TravelStudioService:
     
     def get_hotel_profile(self) -> Optional[Dict]:
         """
-        Get hotel profile information
+        Get hotel profile information, from the catalogue cache
         
         Returns:
             Hotel profile data or None on error
         """
+        return self.catalogue.get("profile", self._fetch_hotel_profile)
+    
+    def _fetch_hotel_profile(self) -> Optional[Dict]:
         result = self._make_request("GET", "/api/hocc/profile")
         
         if result and result.get("success"):
@@ -568,6 +1317,7 @@ class TravelStudioService:
         
         if result and result.get("success"):
             logger.info("Hotel profile updated successfully")
+            self.catalogue.purge("profile")
             return result.get("data")
         return None
 
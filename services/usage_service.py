@@ -0,0 +1,308 @@
+"""
+Usage Service
+Token and cost accounting for Gemini calls
+
+AgentService records one TokenUsage row per Gemini call from the response's
+usage_metadata. Gemini only reports a total prompt size, so the prompt tokens
+of each call are split across the prompt sections that were sent (system
+prompt, tool declarations, history, tool results, ...) in proportion to
+their estimated size. Summing those splits shows which sections and which
+tool results cost the most.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, List
+
+from sqlalchemy import func
+
+from database.models import TokenUsage, SessionLocal
+from utils.metrics import GEMINI_COST_USD_TOTAL, PROMPT_SECTION_TOKENS_TOTAL, TURN_TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+# USD per million tokens (gemini-2.5-flash list prices); override per deployment
+DEFAULT_INPUT_PRICE_PER_MTOK = 0.30
+DEFAULT_OUTPUT_PRICE_PER_MTOK = 2.50
+
+TOOL_RESULT_PREFIX = "tool_result:"
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count (about four characters per token)"""
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+
+def attribute_prompt_tokens(sections: Dict[str, int], prompt_tokens: int) -> Dict[str, int]:
+    """
+    Split a reported prompt token count across sections by estimated size
+
+    Args:
+        sections: Estimated tokens per section
+        prompt_tokens: Prompt tokens reported by Gemini
+
+    Returns:
+        Tokens per section, summing to prompt_tokens
+    """
+    estimated = sum(sections.values())
+    if not estimated or not prompt_tokens:
+        return {}
+
+    attributed = {}
+    assigned = 0
+    names = sorted(sections, key=lambda name: sections[name], reverse=True)
+    for name in names:
+        share = prompt_tokens * sections[name] // estimated
+        attributed[name] = share
+        assigned += share
+
+    # Rounding remainder goes to the largest section
+    attributed[names[0]] += prompt_tokens - assigned
+    return {name: tokens for name, tokens in attributed.items() if tokens}
+
+
+def get_token_prices() -> Dict[str, float]:
+    """Input/output USD prices per million tokens"""
+    return {
+        "input": float(os.getenv("GEMINI_INPUT_USD_PER_MTOK", DEFAULT_INPUT_PRICE_PER_MTOK)),
+        "output": float(os.getenv("GEMINI_OUTPUT_USD_PER_MTOK", DEFAULT_OUTPUT_PRICE_PER_MTOK)),
+    }
+
+
+def compute_cost(prompt_tokens: int, output_tokens: int, prices: Optional[Dict[str, float]] = None) -> float:
+    """Estimated USD cost of one call (thinking tokens bill as output)"""
+    prices = prices or get_token_prices()
+    return (prompt_tokens * prices["input"] + output_tokens * prices["output"]) / 1_000_000
+
+
+def build_usage_entry(
+    model: str,
+    iteration: int,
+    usage_metadata: Any,
+    sections: Dict[str, int],
+    trigger_tools: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Turn a Gemini usage_metadata object into a TokenUsage row (as a dict)
+
+    Args:
+        model: Model name
+        iteration: 0 for the first call of a turn, then one per tool round
+        usage_metadata: response.usage_metadata
+        sections: Estimated tokens per prompt section sent in this call
+        trigger_tools: Tools whose results were sent in this call
+
+    Returns:
+        Dictionary of TokenUsage fields
+    """
+    prompt_tokens = getattr(usage_metadata, "prompt_token_count", 0) or 0
+    response_tokens = getattr(usage_metadata, "candidates_token_count", 0) or 0
+    thinking_tokens = getattr(usage_metadata, "thoughts_token_count", 0) or 0
+    cached_tokens = getattr(usage_metadata, "cached_content_token_count", 0) or 0
+    total_tokens = getattr(usage_metadata, "total_token_count", 0) or (
+        prompt_tokens + response_tokens + thinking_tokens
+    )
+
+    return {
+        "iteration": iteration,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "response_tokens": response_tokens,
+        "thinking_tokens": thinking_tokens,
+        "cached_tokens": cached_tokens,
+        "total_tokens": total_tokens,
+        "cost_usd": compute_cost(prompt_tokens, response_tokens + thinking_tokens),
+        "trigger_tools": list(trigger_tools or []),
+        "section_tokens": attribute_prompt_tokens(sections, prompt_tokens),
+    }
+
+
+def record_usage_metrics(entries: List[Dict[str, Any]]):
+    """Feed one turn's usage into /metrics"""
+    if not entries:
+        return
+    for entry in entries:
+        GEMINI_COST_USD_TOTAL.inc(entry["cost_usd"], model=entry["model"])
+        for section, tokens in entry["section_tokens"].items():
+            PROMPT_SECTION_TOKENS_TOTAL.inc(tokens, section=section)
+    TURN_TOKENS.observe(sum(entry["total_tokens"] for entry in entries))
+
+
+class UsageService:
+    def __init__(self, session_factory: Optional[Callable] = None):
+        """Initialize usage service"""
+        self.session_factory = session_factory or SessionLocal
+
+    def get_conversation_usage(self, phone_number: str) -> Dict[str, Any]:
+        """
+        Usage for one conversation, per turn
+
+        Args:
+            phone_number: User phone number
+
+        Returns:
+            Dictionary with totals and a list of turns (one per inbound message)
+        """
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(TokenUsage)
+                .filter(TokenUsage.phone_number == phone_number)
+                .order_by(TokenUsage.id)
+                .all()
+            )
+
+            turns: Dict[str, Dict[str, Any]] = {}
+            for row in rows:
+                turn = turns.setdefault(row.message_sid or f"turn-{row.id}", {
+                    "message_sid": row.message_sid,
+                    "started_at": row.created_at.isoformat() if row.created_at else None,
+                    "gemini_calls": 0,
+                    "prompt_tokens": 0,
+                    "response_tokens": 0,
+                    "total_tokens": 0,
+                    "cost_usd": 0.0,
+                    "tools": [],
+                })
+                turn["gemini_calls"] += 1
+                turn["prompt_tokens"] += row.prompt_tokens or 0
+                turn["response_tokens"] += (row.response_tokens or 0) + (row.thinking_tokens or 0)
+                turn["total_tokens"] += row.total_tokens or 0
+                turn["cost_usd"] += row.cost_usd or 0.0
+                turn["tools"].extend(row.trigger_tools or [])
+
+            return {
+                "phone_number": phone_number,
+                "turns": list(turns.values()),
+                "total_tokens": sum(turn["total_tokens"] for turn in turns.values()),
+                "cost_usd": round(sum(turn["cost_usd"] for turn in turns.values()), 6),
+            }
+        finally:
+            db.close()
+
+    def get_daily_usage(self, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        Usage per day
+
+        Args:
+            days: Number of days to include (default: 7)
+
+        Returns:
+            One dictionary per day, oldest first
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        day = func.date(TokenUsage.created_at)
+
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(
+                    day,
+                    func.count(TokenUsage.id),
+                    func.count(func.distinct(TokenUsage.message_sid)),
+                    func.coalesce(func.sum(TokenUsage.prompt_tokens), 0),
+                    func.coalesce(func.sum(TokenUsage.response_tokens), 0),
+                    func.coalesce(func.sum(TokenUsage.thinking_tokens), 0),
+                    func.coalesce(func.sum(TokenUsage.total_tokens), 0),
+                    func.coalesce(func.sum(TokenUsage.cost_usd), 0.0),
+                )
+                .filter(TokenUsage.created_at >= since)
+                .group_by(day)
+                .order_by(day)
+                .all()
+            )
+            return [
+                {
+                    "date": str(date),
+                    "gemini_calls": calls,
+                    "turns": turns,
+                    "prompt_tokens": int(prompt),
+                    "response_tokens": int(response),
+                    "thinking_tokens": int(thinking),
+                    "total_tokens": int(total),
+                    "cost_usd": round(float(cost), 6),
+                }
+                for date, calls, turns, prompt, response, thinking, total, cost in rows
+            ]
+        finally:
+            db.close()
+
+    def get_cost_breakdown(self, days: int = 7, limit: int = 20) -> Dict[str, Any]:
+        """
+        Which prompt sections and tool results cost the most
+
+        Args:
+            days: Number of days to include (default: 7)
+            limit: Maximum number of sections to return
+
+        Returns:
+            Dictionary with sections (by prompt tokens) and tools (by follow-up cost)
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        prices = get_token_prices()
+
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(TokenUsage.section_tokens, TokenUsage.trigger_tools, TokenUsage.cost_usd)
+                .filter(TokenUsage.created_at >= since)
+                .all()
+            )
+        finally:
+            db.close()
+
+        sections: Dict[str, int] = {}
+        tools: Dict[str, Dict[str, Any]] = {}
+        for section_tokens, trigger_tools, cost in rows:
+            for section, tokens in (section_tokens or {}).items():
+                sections[section] = sections.get(section, 0) + tokens
+                if section.startswith(TOOL_RESULT_PREFIX):
+                    tool = tools.setdefault(section[len(TOOL_RESULT_PREFIX):], {
+                        "result_tokens": 0, "followup_calls": 0, "followup_cost_usd": 0.0,
+                    })
+                    tool["result_tokens"] += tokens
+
+            # The whole follow-up call is charged to the tools that triggered it
+            for name in set(trigger_tools or []):
+                tool = tools.setdefault(name, {"result_tokens": 0, "followup_calls": 0, "followup_cost_usd": 0.0})
+                tool["followup_calls"] += 1
+                tool["followup_cost_usd"] += (cost or 0.0) / len(set(trigger_tools))
+
+        total = sum(sections.values()) or 1
+        ranked = sorted(sections.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return {
+            "days": days,
+            "sections": [
+                {
+                    "section": section,
+                    "prompt_tokens": tokens,
+                    "share": round(tokens / total, 4),
+                    "cost_usd": round(tokens * prices["input"] / 1_000_000, 6),
+                }
+                for section, tokens in ranked
+            ],
+            "tools": sorted(
+                (
+                    {"tool": name, **stats, "followup_cost_usd": round(stats["followup_cost_usd"], 6)}
+                    for name, stats in tools.items()
+                ),
+                key=lambda tool: tool["followup_cost_usd"],
+                reverse=True,
+            ),
+        }
+
+
+# Singleton instance
+_usage_service = None
+
+
+def get_usage_service() -> UsageService:
+    """Get singleton instance of UsageService"""
+    global _usage_service
+    if _usage_service is None:
+        _usage_service = UsageService()
+    return _usage_service
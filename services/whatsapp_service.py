@@ -5,9 +5,14 @@ Replaces Twilio with AiSensy for WhatsApp messaging
 
 import os
 import logging
-import requests
 from typing import Dict, Optional
-from twilio.rest import Client
+
+from services.ingestion_service import parse_webhook_payload
+from utils.lazy_imports import lazy_import
+
+# Loaded when a message is actually sent
+requests = lazy_import("requests")
+twilio_rest = lazy_import("twilio.rest")
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +34,11 @@ class WhatsAppService:
         self.aisensy_messages_url = f"{self.aisensy_base_url}/messages"
 
         # Twilio API endpoints
-        self.twilio_client = Client(self.twilio_account_sid,self.twilio_auth_token)
+        self.twilio_client = twilio_rest.Client(self.twilio_account_sid,self.twilio_auth_token)
+        twilio_api_base_url = os.getenv("TWILIO_API_BASE_URL")
+        if twilio_api_base_url:
+            # e.g. a local stand-in for load tests
+            self.twilio_client.api.base_url = twilio_api_base_url.rstrip("/")
         
         # WhatsApp Business API endpoints (for typing indicator)
         self.whatsapp_base_url = f"https://graph.facebook.com/{self.whatsapp_api_version}/{self.whatsapp_phone_number_id}"
@@ -324,72 +333,7 @@ class WhatsAppService:
         Returns:
             dict: Parsed message data with standardized keys
         """
-        try:
-            # Try WhatsApp Business API format first (AiSensy webhook)
-            if "data" in data and "message" in data.get("data", {}):
-                message_data = data["data"]["message"]
-                
-                # Extract message content
-                message_content = message_data.get("message_content", {})
-                body = ""
-                
-                if isinstance(message_content, dict):
-                    # Text message
-                    if "text" in message_content:
-                        body = message_content["text"]
-                    # Could also be image, audio, video, etc.
-                    elif "caption" in message_content:
-                        body = message_content["caption"]
-                
-                return {
-                    "message_sid": message_data.get("messageId", ""),
-                    "from_number": message_data.get("phone_number", ""),
-                    "to_number": self.whatsapp_phone_number_id or "",
-                    "body": body,
-                    "num_media": 0,  # Would need to check message_content type
-                    "profile_name": message_data.get("userName", ""),
-                    "timestamp": message_data.get("timestamp", ""),
-                    "message_type": message_data.get("type", "text")
-                }
-            
-            # Fallback to Twilio format for compatibility
-            elif "MessageSid" in data or "From" in data:
-                return {
-                    "message_sid": data.get("MessageSid", ""),
-                    "from_number": data.get("From", "").replace("whatsapp:", ""),
-                    "to_number": data.get("To", "").replace("whatsapp:", ""),
-                    "body": data.get("Body", ""),
-                    "num_media": int(data.get("NumMedia", 0)),
-                    "profile_name": data.get("ProfileName", ""),
-                    "timestamp": "",
-                    "message_type": "text"
-                }
-            
-            else:
-                logger.error("Unknown webhook format")
-                return {
-                    "message_sid": "",
-                    "from_number": "",
-                    "to_number": "",
-                    "body": "",
-                    "num_media": 0,
-                    "profile_name": "",
-                    "timestamp": "",
-                    "message_type": "unknown"
-                }
-                
-        except Exception as e:
-            logger.error(f"Error parsing incoming message: {str(e)}")
-            return {
-                "message_sid": "",
-                "from_number": "",
-                "to_number": "",
-                "body": "",
-                "num_media": 0,
-                "profile_name": "",
-                "timestamp": "",
-                "message_type": "error"
-            }
+        return parse_webhook_payload(data, to_number=self.whatsapp_phone_number_id or "")
     
     
     def create_response(self, message: str) -> str:
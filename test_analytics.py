@@ -0,0 +1,124 @@
+"""
+Test script for the booking analytics
+Checks occupancy by night, ADR, RevPAR, lead time and channel mix on a
+small booking list, that the NumPy and plain Python engines agree, and
+that reports are cached until the bookings are reloaded
+"""
+
+import logging
+
+from services import analytics_service
+from services.analytics_service import BookingAnalytics, BookingColumns
+from benchmarks.bench_analytics import synthetic_bookings, RATES
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+ROOMS = {"deluxe": 2, "luxury cottage": 1}
+BOOKINGS = [
+    # 2 nights inside the range, paid 10000
+    {"status": "confirmed", "room_category": "Deluxe", "booking_channel": "whatsapp",
+     "check_in_date": "2026-12-01T14:00:00.000Z", "check_out_date": "2026-12-03T10:00:00.000Z",
+     "created_at": "2026-11-21T09:00:00", "total_amount": "10000"},
+    # Starts before the range: only 1 of its 2 nights counts; no amount, priced at the rate
+    {"status": "confirmed", "room_category": "Deluxe", "booking_channel": "direct",
+     "check_in_date": "2026-11-30", "check_out_date": "2026-12-02", "created_at": "2026-11-29"},
+    {"status": "confirmed", "room_category": "Luxury Cottage", "booking_channel": "WhatsApp",
+     "check_in_date": "2026-12-02", "check_out_date": "2026-12-04", "total_amount": 18000},
+    {"status": "cancelled", "room_category": "Deluxe", "booking_channel": "direct",
+     "check_in_date": "2026-12-01", "check_out_date": "2026-12-04", "total_amount": 99999},
+    # Outside the range
+    {"status": "confirmed", "room_category": "Deluxe", "booking_channel": "direct",
+     "check_in_date": "2026-12-10", "check_out_date": "2026-12-12", "created_at": "2026-06-01"},
+]
+
+
+def _engines():
+    return [False, True] if analytics_service.np is not None else [False]
+
+
+def test_report():
+    """Metrics on a hand-checked booking list, with every engine"""
+    logger.info("\n=== Testing Analytics Report ===")
+    for use_numpy in _engines():
+        columns = BookingColumns(BOOKINGS, {"deluxe": 4000.0}, use_numpy=use_numpy)
+        report = columns.report("2026-12-01", "2026-12-04", ROOMS)
+
+        assert report["bookings"] == 3
+        assert report["room_nights_available"] == 9
+        assert report["room_nights_sold"] == 5          # 2 + 1 + 2
+        assert report["revenue"] == 10000 + 4000 + 18000
+        assert report["adr"] == 6400.0
+        assert report["revpar"] == round(32000 / 9, 2)
+        assert [night["rooms_sold"] for night in report["by_night"]] == [2, 2, 1]
+        assert report["by_night"][1]["by_category"] == {"Deluxe": 1, "Luxury Cottage": 1}
+        assert report["by_category"]["Deluxe"]["occupancy"] == round(3 / 6, 4)
+
+        mix = report["channel_mix"]
+        assert mix["whatsapp"]["bookings"] == 2 and mix["direct"]["bookings"] == 1
+        assert mix["whatsapp"]["revenue"] == 28000
+
+        lead = report["lead_time_days"]
+        assert lead["bookings"] == 2 and lead["mean"] == 5.5   # 10 and 1 days ahead
+        assert lead["buckets"] == {"0-7": 1, "8-30": 1, "31-90": 0, "91+": 0}
+
+    assert BookingColumns(BOOKINGS).report("2026-12-04", "2026-12-01", ROOMS) is None
+
+
+def test_engines_agree():
+    """NumPy and Python engines give the same report on a large booking list"""
+    logger.info("\n=== Testing Engine Agreement ===")
+    if analytics_service.np is None:
+        logger.info("NumPy not installed, skipping")
+        return
+    bookings = synthetic_bookings(5000)
+    rooms = {"deluxe": 100, "luxury cottage": 100, "basic": 100}
+    python = BookingColumns(bookings, RATES, use_numpy=False).report("2026-01-01", "2026-03-01", rooms)
+    vectorized = BookingColumns(bookings, RATES, use_numpy=True).report("2026-01-01", "2026-03-01", rooms)
+    assert python == vectorized
+
+
+class FakeTravelStudio:
+    def __init__(self):
+        self.calls = 0
+
+    def get_bookings(self):
+        self.calls += 1
+        return BOOKINGS
+
+    def get_all_rooms(self):
+        return [{"category": "Deluxe", "base_rate": "4000"}, {"category": "Deluxe", "base_rate": "4000"},
+                {"category": "Luxury Cottage", "base_rate": "9000"},
+                {"category": "basic", "isOccupiable": False}]
+
+
+def test_reports_are_cached():
+    """Several ranges share one booking load; refresh reloads"""
+    logger.info("\n=== Testing Analytics Cache ===")
+    remote = FakeTravelStudio()
+    analytics = BookingAnalytics(remote, ttl_seconds=60)
+
+    first = analytics.report("2026-12-01", "2026-12-04")
+    assert first["revenue"] == 32000 and first["rooms"] == 3
+    assert analytics.report("2026-12-01", "2026-12-04") is first
+    analytics.report("2026-12-01", "2026-12-31")
+    assert remote.calls == 1
+
+    assert analytics.report("2026-12-01", "2026-12-04", refresh=True) is not first
+    assert remote.calls == 2
+
+
+def main():
+    """Run all tests"""
+    test_report()
+    test_engines_agree()
+    test_reports_are_cached()
+    logger.info("\n✅ All analytics tests passed")
+
+
+if __name__ == "__main__":
+    main()
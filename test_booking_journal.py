@@ -0,0 +1,302 @@
+"""
+Test script for the booking journal
+Runs against a temporary SQLite database with a fake Travel Studio: a
+timed-out booking is reported as pending and never sent twice, the
+reconciler confirms it once Travel Studio has it (or fails it after the
+give-up window so it can be sent again, without adopting an older
+booking for the same stay), a confirmed booking is answered from the
+journal while Travel Studio still has it (and booked again under a new
+key once it is cancelled), and a backend that rejects unknown fields still
+books because the key is sent as a header
+"""
+
+import os
+import json
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, BookingJournalEntry
+from services.booking_journal import BookingJournal, booking_key, find_booking
+from services.travel_studio_service import ERROR_HTTP, ERROR_TIMEOUT, TravelStudioService
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BOOKING = {
+    "guest_name": "Asha",
+    "guest_email": "guest@example.com",
+    "guest_phone": "+91 98000 00001",
+    "check_in_date": "2031-12-12",
+    "check_out_date": "2031-12-14",
+    "room_category": "Luxury Cottage",
+    "num_adults": 2,
+    "num_children": 0,
+    "booking_channel": "whatsapp",
+    "payment_status": "Unpaid",
+}
+
+
+def _make_session_factory():
+    db_path = os.path.join(tempfile.mkdtemp(), "journal.db")
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class FakeTravelStudio:
+    """Stores bookings; `fail` makes the next POST fail with that error kind"""
+
+    def __init__(self, clock=datetime.utcnow):
+        self.posts = []
+        self.keys = []
+        self.bookings = []
+        self.fail = None
+        self.commit_on_timeout = True
+        self.lookups_work = True
+        self._status = None
+        self._clock = clock
+
+    def create_booking(self, idempotency_key=None, **booking):
+        self.posts.append(booking)
+        self.keys.append(idempotency_key)
+        stored = {"id": f"BK{len(self.posts)}", "status": "confirmed",
+                  "created_at": self._clock().isoformat() + "Z", **booking}
+        if self.fail is None:
+            self.bookings.append(stored)
+            return stored
+        if self.fail == ERROR_TIMEOUT and self.commit_on_timeout:
+            self.bookings.append(stored)  # created, but the response was lost
+        self._error = self.fail
+        return None
+
+    def last_error_kind(self):
+        return self._error
+
+    def last_status_code(self):
+        return self._status
+
+    def get_booking_by_id(self, booking_id):
+        self._status = 200 if self.lookups_work else None
+        if not self.lookups_work:
+            return None
+        for booking in self.bookings:
+            if booking["id"] == booking_id:
+                return booking
+        self._status = 404
+        return None
+
+    def get_bookings(self, status=None, start_date=None, end_date=None, phone=None):
+        return list(self.bookings)
+
+
+def test_timeout_is_pending_then_reconciled():
+    """A lost response is pending, retries don't POST, the reconciler confirms"""
+    logger.info("\n=== Testing Timeout Reconciliation ===")
+    now = [datetime(2031, 12, 1, 12, 0)]
+    travel_studio = FakeTravelStudio(clock=lambda: now[0])
+    resolved = []
+    journal = BookingJournal(travel_studio, _make_session_factory(), on_resolved=resolved.append,
+                             clock=lambda: now[0])
+
+    travel_studio.fail = ERROR_TIMEOUT
+    first = journal.create_booking(dict(BOOKING))
+    assert first["status"] == "pending"
+    assert first["idempotency_key"] == booking_key("+919800000001", "2031-12-12", "2031-12-14",
+                                                   "luxury cottage", 2, 0)
+    assert travel_studio.keys == [first["idempotency_key"]]
+    assert "idempotency_key" not in travel_studio.posts[0]
+
+    # The model (or a redelivery) tries again while the outcome is unknown
+    travel_studio.fail = None
+    assert journal.create_booking(dict(BOOKING))["status"] == "pending"
+    assert len(travel_studio.posts) == 1
+    assert [entry["status"] for entry in journal.unresolved()] == ["unknown"]
+
+    assert journal.reconcile_due() == 0  # not due yet
+    now[0] += timedelta(seconds=31)
+    assert journal.reconcile_due() == 1
+    assert journal.unresolved() == []
+    assert resolved[0]["status"] == "confirmed" and resolved[0]["booking_id"] == "BK1"
+
+    replay = journal.create_booking(dict(BOOKING))
+    assert replay["status"] == "confirmed" and replay["replayed"]
+    assert replay["booking"]["id"] == "BK1"
+    assert len(travel_studio.posts) == 1
+    assert len(travel_studio.bookings) == 1
+
+
+def test_give_up_then_resend():
+    """A booking Travel Studio never created fails after the window and is sent again"""
+    logger.info("\n=== Testing Give Up ===")
+    now = [datetime(2031, 12, 1, 12, 0)]
+    travel_studio = FakeTravelStudio(clock=lambda: now[0])
+    travel_studio.commit_on_timeout = False
+    # The same stay, booked by phone last week: not the booking that timed out
+    travel_studio.bookings.append({**BOOKING, "id": "PHONE1", "created_at": "2031-11-24T09:00:00Z"})
+    resolved = []
+    journal = BookingJournal(travel_studio, _make_session_factory(), on_resolved=resolved.append,
+                             clock=lambda: now[0])
+    journal.give_up_seconds = 120
+
+    travel_studio.fail = ERROR_TIMEOUT
+    assert journal.create_booking(dict(BOOKING))["status"] == "pending"
+    now[0] += timedelta(seconds=60)
+    assert journal.reconcile_due() == 0  # still looking
+    assert resolved == []
+    now[0] += timedelta(seconds=61)
+    assert journal.reconcile_due() == 1
+    assert resolved[0]["status"] == "failed"
+    assert find_booking(travel_studio.bookings, {**resolved[0], "created_at": "2031-11-20T00:00:00"})["id"] == "PHONE1"
+
+    travel_studio.fail = None
+    booked = journal.create_booking(dict(BOOKING))
+    assert booked["status"] == "confirmed" and not booked.get("replayed")
+    assert len(travel_studio.posts) == 2
+    db = journal.session_factory()
+    try:
+        entry = db.query(BookingJournalEntry).one()
+        assert entry.status == "confirmed" and entry.attempts == 2
+    finally:
+        db.close()
+
+    # A definite rejection fails at once, with no reconciliation
+    travel_studio.fail = ERROR_HTTP
+    rejected = journal.create_booking({**BOOKING, "check_out_date": "2031-12-15"})
+    assert rejected["status"] == "failed" and rejected["error"] == ERROR_HTTP
+    assert journal.unresolved() == []
+
+
+def test_cancelled_booking_is_booked_again():
+    """A cancelled (or deleted) booking isn't replayed; the stay is booked under a new key"""
+    logger.info("\n=== Testing Rebook After Cancellation ===")
+    travel_studio = FakeTravelStudio()
+    journal = BookingJournal(travel_studio, _make_session_factory())
+
+    first = journal.create_booking(dict(BOOKING))
+    assert first["booking"]["id"] == "BK1"
+    travel_studio.bookings[0]["status"] = "cancelled"
+
+    # Travel Studio unreachable: the journal is trusted
+    travel_studio.lookups_work = False
+    assert journal.create_booking(dict(BOOKING))["replayed"]
+    travel_studio.lookups_work = True
+
+    rebooked = journal.create_booking(dict(BOOKING))
+    assert rebooked["status"] == "confirmed" and not rebooked.get("replayed")
+    assert rebooked["booking"]["id"] == "BK2"
+    assert len(travel_studio.posts) == 2
+    assert travel_studio.keys[1] != travel_studio.keys[0]
+
+    replay = journal.create_booking(dict(BOOKING))
+    assert replay["replayed"] and replay["booking"]["id"] == "BK2"
+
+    # The reconciler never adopts the cancelled booking for a later attempt
+    entry = {"idempotency_key": first["idempotency_key"], "attempts": 3,
+             "guest_phone": BOOKING["guest_phone"], "check_in": "2031-12-12", "check_out": "2031-12-14",
+             "room_category": "Luxury Cottage", "created_at": "2031-01-01T00:00:00"}
+    assert find_booking(travel_studio.bookings[:1], entry) is None
+
+    # Deleted outright (404) counts as gone too
+    travel_studio.bookings.clear()
+    assert journal.create_booking(dict(BOOKING))["booking"]["id"] == "BK3"
+    assert len(travel_studio.posts) == 3
+
+
+def test_concurrent_retries_post_once():
+    """Ten simultaneous attempts at the same booking reach Travel Studio once"""
+    logger.info("\n=== Testing Concurrent Attempts ===")
+    travel_studio = FakeTravelStudio()
+    journal = BookingJournal(travel_studio, _make_session_factory())
+    results = []
+    start = threading.Barrier(10)
+
+    def attempt():
+        start.wait()
+        results.append(journal.create_booking(dict(BOOKING))["status"])
+
+    threads = [threading.Thread(target=attempt) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(travel_studio.posts) == 1
+    assert results.count("confirmed") >= 1
+    assert set(results) <= {"confirmed", "pending"}
+
+
+# Fields Travel Studio's booking schema accepts; anything else is a 400
+BOOKING_FIELDS = set(BOOKING) | {"num_nights", "special_requests"}
+
+
+class StrictBackend(BaseHTTPRequestHandler):
+    """POST /api/hocc/bookings that rejects unknown fields"""
+
+    received = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StrictBackend.received.append((self.headers.get("Idempotency-Key"), body))
+        unknown = set(body) - BOOKING_FIELDS
+        if unknown:
+            self._reply(400, {"success": False, "error": f"Unknown fields: {sorted(unknown)}"})
+        else:
+            self._reply(201, {"success": True, "data": {"booking_id": "BK1", **body}})
+
+    def _reply(self, status, data):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_strict_backend_accepts_the_key():
+    """The key travels as a header, so a schema rejecting unknown fields still books"""
+    logger.info("\n=== Testing Strict Backend ===")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StrictBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        travel_studio = TravelStudioService()
+        travel_studio.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        travel_studio.bearer_token = "test"
+        travel_studio.client_initialized = True
+        journal = BookingJournal(travel_studio, _make_session_factory())
+
+        booked = journal.create_booking(dict(BOOKING))
+    finally:
+        server.shutdown()
+
+    assert booked["status"] == "confirmed", booked
+    assert booked["booking"]["booking_id"] == "BK1"
+    key, body = StrictBackend.received[0]
+    assert key == booked["idempotency_key"]
+    assert "idempotency_key" not in body
+
+
+def main():
+    """Run all tests"""
+    test_timeout_is_pending_then_reconciled()
+    test_give_up_then_resend()
+    test_cancelled_booking_is_booked_again()
+    test_concurrent_retries_post_once()
+    test_strict_backend_accepts_the_key()
+    logger.info("\n✅ All booking journal tests passed")
+
+
+if __name__ == "__main__":
+    main()
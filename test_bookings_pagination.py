@@ -0,0 +1,144 @@
+"""
+Test script for booking pagination
+Checks that the Travel Studio client follows backend pages lazily, resumes
+from a cursor, filters by status and phone, projects fields, and that
+/travel-studio/bookings serves pages and NDJSON exports
+"""
+
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+import services.travel_studio_service as travel_studio_service
+from services.travel_studio_service import TravelStudioService, project_fields, phone_matches
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BOOKINGS = [
+    {"id": f"BK{number:02d}", "status": "cancelled" if number % 4 == 0 else "confirmed",
+     "guest_phone": "+919800000001" if number % 3 == 0 else "+919800000002",
+     "Guest": {"name": f"Guest {number}", "phone": "9800000009"}, "room_category": "Deluxe"}
+    for number in range(23)
+]
+
+
+def _service(style: str = "pages", page_size: int = 5):
+    """TravelStudioService whose backend is a paged list in memory"""
+    service = TravelStudioService()
+    service.page_size = page_size
+    service.requests = []
+
+    def make_request(method, endpoint, data=None, params=None):
+        service.requests.append(dict(params or {}))
+        limit = params["limit"]
+        if style == "cursor":
+            start = int(params.get("cursor", 0))
+            items = BOOKINGS[start:start + limit]
+            next_cursor = str(start + limit) if start + limit < len(BOOKINGS) else None
+            return {"success": True, "data": {"items": items, "next_cursor": next_cursor}}
+        if style == "unpaged":
+            return {"success": True, "data": {"items": BOOKINGS}}
+        page = params["page"]
+        items = BOOKINGS[(page - 1) * limit:page * limit]
+        if style == "bare":
+            return {"success": True, "data": {"items": items}}
+        total_pages = (len(BOOKINGS) + limit - 1) // limit
+        return {"success": True, "data": {"items": items, "pagination": {"page": page, "total_pages": total_pages}}}
+
+    service._make_request = make_request
+    return service
+
+
+def test_follows_all_pages():
+    """Every backend page is read, only as far as the caller iterates"""
+    logger.info("\n=== Testing Page Walk ===")
+    for style in ("pages", "cursor", "bare", "unpaged"):
+        service = _service(style)
+        assert [b["id"] for b in service.get_bookings()] == [b["id"] for b in BOOKINGS], style
+
+    service = _service()
+    bookings = service.iter_bookings()
+    next(bookings)
+    assert len(service.requests) == 1
+    assert service.requests[0] == {"limit": 5, "page": 1}
+
+    # A failed page ends get_bookings with None, not a partial list
+    service = _service()
+    service._make_request = lambda *args, **kwargs: None
+    assert service.get_bookings() is None
+
+
+def test_cursor_pages_with_filters():
+    """Pages from list_bookings cover each matching booking once"""
+    logger.info("\n=== Testing Cursor Pages ===")
+    for style in ("pages", "cursor"):
+        service = _service(style)
+        seen, cursor = [], None
+        while True:
+            page = service.list_bookings(status="confirmed", phone="919800000002", cursor=cursor, limit=4)
+            seen.extend(b["id"] for b in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        expected = [b["id"] for b in BOOKINGS if b["status"] == "confirmed" and b["guest_phone"].endswith("02")]
+        assert seen == expected, style
+
+
+def test_projection_and_phone():
+    """Dotted fields keep nesting; phone matches with or without country code"""
+    logger.info("\n=== Testing Projection ===")
+    booking = BOOKINGS[3]
+    assert project_fields(booking, ["id", "Guest.name", "missing", "Guest.missing"]) == {
+        "id": "BK03", "Guest": {"name": "Guest 3"},
+    }
+    assert phone_matches(booking, "9800000001")
+    assert phone_matches(booking, "+91 98000-00001")
+    assert not phone_matches(booking, "9800000002")
+    assert phone_matches({"Guest": {"phone": "+919800000009"}}, "9800000009")
+
+
+def test_bookings_endpoint():
+    """JSON pages with next_cursor and a streamed NDJSON export"""
+    logger.info("\n=== Testing Bookings Endpoint ===")
+    import server
+
+    previous = travel_studio_service._travel_studio_service
+    travel_studio_service._travel_studio_service = _service()
+    try:
+        client = TestClient(server.app)
+        first = client.get("/travel-studio/bookings", params={"limit": 10, "fields": "id,status"}).json()
+        assert first["count"] == 10 and first["next_cursor"]
+        assert first["bookings"][0] == {"id": "BK00", "status": "cancelled"}
+        second = client.get("/travel-studio/bookings", params={"limit": 10, "cursor": first["next_cursor"]}).json()
+        assert second["bookings"][0]["id"] == "BK10"
+
+        everything = client.get("/travel-studio/bookings").json()
+        assert everything["count"] == len(BOOKINGS) and "next_cursor" not in everything
+
+        export = client.get("/travel-studio/bookings", params={"format": "ndjson", "status": "cancelled", "fields": "id"})
+        assert export.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in export.text.splitlines()]
+        assert lines == [{"id": b["id"]} for b in BOOKINGS if b["status"] == "cancelled"]
+
+        assert client.get("/travel-studio/bookings", params={"cursor": "not-a-cursor"}).status_code == 400
+    finally:
+        travel_studio_service._travel_studio_service = previous
+
+
+def main():
+    """Run all tests"""
+    test_follows_all_pages()
+    test_cursor_pages_with_filters()
+    test_projection_and_phone()
+    test_bookings_endpoint()
+    logger.info("\n✅ All booking pagination tests passed")
+
+
+if __name__ == "__main__":
+    main()
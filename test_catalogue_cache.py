@@ -0,0 +1,155 @@
+"""
+Test script for the catalogue cache
+Checks that fresh entries never hit Travel Studio, stale ones are served
+at once while a background refresh runs, failed refreshes keep the last
+known value, and that the disk snapshot gives a warm cold start
+"""
+
+import os
+import logging
+import tempfile
+
+from fastapi.testclient import TestClient
+
+import server
+import services.travel_studio_service as travel_studio_service
+from services.catalogue_cache import CatalogueCache
+from services.travel_studio_service import TravelStudioService
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLoader:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        value = self.values[min(self.calls, len(self.values) - 1)]
+        self.calls += 1
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def test_stale_while_revalidate():
+    """Fresh: no fetch; stale: old value now, new one after the refresh"""
+    logger.info("\n=== Testing Stale-While-Revalidate ===")
+    clock = FakeClock()
+    cache = CatalogueCache(ttl_seconds=60, max_stale_seconds=600, snapshot_path="", clock=clock)
+    loader = CountingLoader({"name": "v1"}, {"name": "v2"}, RuntimeError("backend down"))
+
+    assert cache.get("profile", loader) == {"name": "v1"}
+    clock.now += 30
+    assert cache.get("profile", loader) == {"name": "v1"}
+    assert loader.calls == 1
+
+    clock.now += 60
+    assert cache.get("profile", loader) == {"name": "v1"}  # stale, served at once
+    cache.wait_for_refreshes()
+    assert loader.calls == 2
+    assert cache.get("profile", loader) == {"name": "v2"}
+    assert cache.age("profile") == 0
+
+    # Failed refreshes keep the last value, even past max_stale
+    clock.now += 120
+    assert cache.get("profile", loader) == {"name": "v2"}
+    cache.wait_for_refreshes()
+    clock.now += 1000
+    assert cache.get("profile", loader) == {"name": "v2"}
+    assert loader.calls == 4
+
+    assert cache.get("rooms", CountingLoader(None)) is None
+
+
+def test_snapshot_cold_start():
+    """A new cache answers from the snapshot; purge removes entries from it and other workers"""
+    logger.info("\n=== Testing Catalogue Snapshot ===")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalogue", "snapshot.json")
+        clock = FakeClock()
+        first = CatalogueCache(ttl_seconds=60, snapshot_path=path, clock=clock)
+        first.get("profile", CountingLoader({"name": "Maldevta"}))
+        first.get("rooms", CountingLoader([{"id": "r1", "category": "Deluxe"}]))
+
+        loader = CountingLoader({"name": "fresh"})
+        second = CatalogueCache(ttl_seconds=60, snapshot_path=path, clock=clock)
+        assert second.get("profile", loader) == {"name": "Maldevta"}
+        assert loader.calls == 0
+
+        assert second.purge("profile") == ["profile"]
+        assert second.purge("missing") == []
+        # The first worker sees the purge on its next lookup
+        refetch = CountingLoader({"name": "after purge"})
+        assert first.get("profile", refetch) == {"name": "after purge"}
+        assert refetch.calls == 1
+        assert second.get("profile", CountingLoader(None)) == {"name": "after purge"}
+        assert second.purge("profile") == ["profile"]
+        assert os.listdir(os.path.dirname(path)) == ["snapshot.json"]  # no temp files left
+        third = CatalogueCache(ttl_seconds=60, snapshot_path=path, clock=clock)
+        assert third.age("profile") is None and third.age("rooms") == 0
+        assert third.purge() == ["rooms"]
+        assert CatalogueCache(snapshot_path=path).age("rooms") is None
+
+
+def test_room_types_use_catalogue():
+    """Room types and the profile cost one API call each until purged"""
+    logger.info("\n=== Testing Travel Studio Catalogue ===")
+    service = TravelStudioService()
+    service.catalogue = CatalogueCache(snapshot_path="")
+    calls = []
+
+    def make_request(method, endpoint, data=None, params=None):
+        calls.append(endpoint)
+        if endpoint == "/api/hocc/profile":
+            return {"success": True, "data": {"name": "Maldevta Farms"}}
+        return {"success": True, "data": {"items": [
+            {"id": "r1", "category": "Deluxe", "booking_list": [{"id": "b1"}]},
+            {"id": "r2", "category": "Cottage", "booking_list": []},
+        ]}}
+
+    service._make_request = make_request
+    for _ in range(3):
+        assert sorted(service.get_room_types()) == ["Cottage", "Deluxe"]
+        assert service.get_hotel_profile() == {"name": "Maldevta Farms"}
+    assert calls == ["/api/hocc/rooms", "/api/hocc/profile"]
+    assert "booking_list" not in service.get_room_catalogue()[0]
+
+    previous = travel_studio_service._travel_studio_service
+    travel_studio_service._travel_studio_service = service
+    try:
+        client = TestClient(server.app)
+        response = client.post("/travel-studio/catalogue/purge", params={"name": "profile"})
+        assert response.status_code == 200
+        assert response.json()["purged"] == ["profile"]
+    finally:
+        travel_studio_service._travel_studio_service = previous
+
+    service.get_hotel_profile()
+    service.get_room_types()
+    assert calls.count("/api/hocc/profile") == 2 and calls.count("/api/hocc/rooms") == 1
+
+
+def main():
+    """Run all tests"""
+    test_stale_while_revalidate()
+    test_snapshot_cold_start()
+    test_room_types_use_catalogue()
+    logger.info("\n✅ All catalogue cache tests passed")
+
+
+if __name__ == "__main__":
+    main()
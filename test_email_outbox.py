@@ -0,0 +1,188 @@
+"""
+Test script for the email outbox
+Runs against a local aiosmtpd SMTP sink and a temporary SQLite database
+"""
+
+import os
+import socket
+import tempfile
+import logging
+from datetime import datetime
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, EmailOutbox
+from services.email_outbox_service import EmailOutboxService, PooledSMTPSender
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class SinkHandler:
+    """Collects delivered messages in memory"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+class CountingAuthenticator:
+    """Accepts one user and counts logins (one per SMTP connection)"""
+
+    def __init__(self):
+        self.logins = 0
+
+    def __call__(self, server, session, envelope, mechanism, auth_data):
+        self.logins += 1
+        ok = auth_data.login == b"agent" and auth_data.password == b"secret"
+        return AuthResult(success=ok)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _make_session_factory():
+    db_path = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _start_sink(port: int):
+    handler = SinkHandler()
+    authenticator = CountingAuthenticator()
+    controller = Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=port,
+        authenticator=authenticator,
+        auth_require_tls=False,
+    )
+    controller.start()
+    return controller, handler, authenticator
+
+
+def _make_service(session_factory, port: int) -> EmailOutboxService:
+    sender = PooledSMTPSender(
+        server="127.0.0.1",
+        port=port,
+        user="agent",
+        password="secret",
+        use_tls=False,
+        from_email="agent@maldevtafarms.com",
+    )
+    service = EmailOutboxService(session_factory=session_factory, sender=sender)
+    service.retry_base_seconds = 0
+    return service
+
+
+def test_batch_uses_one_connection():
+    """A batch of emails is delivered over a single authenticated connection"""
+    logger.info("\n=== Testing Outbox Batch Delivery ===")
+
+    port = _free_port()
+    controller, handler, authenticator = _start_sink(port)
+    try:
+        service = _make_service(_make_session_factory(), port)
+
+        for i in range(5):
+            result = service.enqueue("owner@example.com", f"Lead {i}", f"<p>Lead {i}</p>")
+            assert result["success"], result
+
+        stats = service.drain_once()
+        service.sender.close()
+
+        logger.info(f"Batch stats: {stats}, logins: {authenticator.logins}")
+        assert stats["sent"] == 5
+        assert len(handler.messages) == 5
+        assert authenticator.logins == 1
+        assert service.sender.connections_opened == 1
+        assert service.get_status_counts() == {"sent": 5}
+    finally:
+        controller.stop()
+
+
+def test_retry_after_smtp_outage():
+    """Emails stay in the outbox while SMTP is down and go out once it is back"""
+    logger.info("\n=== Testing Outbox Retry ===")
+
+    port = _free_port()
+    session_factory = _make_session_factory()
+    service = _make_service(session_factory, port)
+
+    service.enqueue("owner@example.com", "Cancel request", "<p>Cancel</p>")
+
+    # Nothing is listening yet
+    stats = service.drain_once()
+    logger.info(f"Outage stats: {stats}")
+    assert stats["retried"] == 1
+
+    db = session_factory()
+    entry = db.query(EmailOutbox).one()
+    assert entry.status == "pending"
+    assert entry.attempts == 1
+    assert entry.last_error
+    db.close()
+
+    controller, handler, _ = _start_sink(port)
+    try:
+        stats = service.drain_once()
+        service.sender.close()
+        logger.info(f"Recovery stats: {stats}")
+        assert stats["sent"] == 1
+        assert len(handler.messages) == 1
+    finally:
+        controller.stop()
+
+
+def test_gives_up_after_max_attempts():
+    """Emails are marked failed once the retry budget is spent"""
+    logger.info("\n=== Testing Outbox Max Attempts ===")
+
+    session_factory = _make_session_factory()
+    service = _make_service(session_factory, _free_port())
+    service.max_attempts = 2
+
+    service.enqueue("owner@example.com", "Follow-up", "<p>Call back</p>")
+    service.drain_once()
+    stats = service.drain_once()
+
+    assert stats["failed"] == 1
+    assert service.get_status_counts() == {"failed": 1}
+
+
+def test_enqueue_requires_recipient():
+    """Queueing without OWNER_EMAIL reports an error instead of writing a row"""
+    service = _make_service(_make_session_factory(), _free_port())
+    result = service.enqueue(None, "Subject", "Body")
+    assert result["success"] is False
+
+
+def main():
+    """Run all tests"""
+    logger.info("Starting email outbox tests...")
+    start = datetime.now()
+
+    test_batch_uses_one_connection()
+    test_retry_after_smtp_outage()
+    test_gives_up_after_max_attempts()
+    test_enqueue_requires_recipient()
+
+    logger.info(f"\n✅ All email outbox tests passed in {(datetime.now() - start).total_seconds():.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Test script for email templates
+Checks rendering, autoescaping, the plain-text alternative and reloads
+"""
+
+import os
+import shutil
+import asyncio
+import tempfile
+import logging
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import services.email_outbox_service as email_outbox_module
+import services.owner_notification_service as owner_notification_module
+from database.models import Base, EmailOutbox
+from services.email_outbox_service import EmailOutboxService
+from services.owner_notification_service import OwnerNotificationService
+from services.tool_service import ToolService
+from utils.email_templates import EmailTemplates, DEFAULT_TEMPLATE_DIR
+from utils.helpers import build_email_message
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def test_all_templates_render():
+    """Every notification email has a subject, HTML and text part"""
+    logger.info("\n=== Testing Template Set ===")
+
+    templates = EmailTemplates()
+    names = templates.names()
+    logger.info(f"Templates: {names}")
+    assert names == ["booking_resolved", "event_inquiry", "followup", "lead", "owner_digest", "update_or_cancel"]
+
+    email = templates.render("lead", name="Asha", phone_number="+919999999999", lead_type="ROOM_BOOKING")
+    assert email["subject"] == "New Lead - ROOM_BOOKING - Asha"
+    assert "Contact Asha at +919999999999 for ROOM_BOOKING." in email["html"]
+    assert "Contact Asha at +919999999999 for ROOM_BOOKING." in email["text"]
+
+
+def test_guest_fields_are_escaped():
+    """Guest-provided values cannot inject markup into the HTML part"""
+    logger.info("\n=== Testing Autoescape ===")
+
+    email = EmailTemplates().render(
+        "update_or_cancel",
+        action_text="CANCEL",
+        customer_name="<script>alert(1)</script>",
+        customer_phone="+919999999999",
+        booking_type_friendly="Room-Booking",
+        request_type="cancel",
+        request_details="Dates <b>15-17</b> & refund",
+    )
+
+    assert "<script>" not in email["html"]
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in email["html"]
+    assert "Dates &lt;b&gt;15-17&lt;/b&gt; &amp; refund" in email["html"]
+    # Plain text keeps the raw value
+    assert "Dates <b>15-17</b> & refund" in email["text"]
+
+
+def test_subject_is_single_line():
+    """Line breaks in guest names cannot add email headers"""
+    email = EmailTemplates().render("followup", name="Ravi\nBcc: x@example.com", phone_number="1", purpose="", schedule_time="")
+    assert "\n" not in email["subject"]
+    assert email["subject"] == "Follow-up Request - Ravi Bcc: x@example.com"
+
+
+def test_missing_fields_use_defaults():
+    email = EmailTemplates().render(
+        "event_inquiry",
+        name="Asha", phone_number=None, age=None, purpose=None,
+        starting_date=None, end_date=None, num_of_people=None, special_request=None,
+    )
+    assert email["subject"] == "Event Inquiry - Event - Asha"
+    assert "N/A" in email["html"]
+
+
+def test_message_has_text_alternative():
+    """HTML emails carry a text/plain part ahead of the HTML part"""
+    email = EmailTemplates().render("lead", name="Asha", phone_number="1", lead_type="EVENT")
+    msg = build_email_message("owner@example.com", email["subject"], email["html"], True, "a@b.c", email["text"])
+    content_types = [part.get_content_type() for part in msg.get_payload()]
+    assert content_types == ["text/plain", "text/html"]
+
+
+def test_auto_reload_picks_up_edits():
+    """Ops can edit a template on disk without a deploy"""
+    logger.info("\n=== Testing Template Reload ===")
+
+    template_dir = tempfile.mkdtemp()
+    for filename in os.listdir(DEFAULT_TEMPLATE_DIR):
+        shutil.copy(os.path.join(DEFAULT_TEMPLATE_DIR, filename), template_dir)
+
+    templates = EmailTemplates(template_dir=template_dir, auto_reload=True)
+    assert templates.render("lead", name="A", phone_number="1", lead_type="X")["subject"] == "New Lead - X - A"
+
+    path = os.path.join(template_dir, "lead.subject")
+    with open(path, "w") as f:
+        f.write("Lead for {{ name }}\n")
+    # Make sure the mtime moves even on coarse filesystems
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+
+    assert templates.render("lead", name="A", phone_number="1", lead_type="X")["subject"] == "Lead for A"
+
+
+def test_lead_gen_queues_html_and_text():
+    """lead_gen stores both bodies in the outbox"""
+    db_path = os.path.join(tempfile.mkdtemp(), "templates.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    outbox = EmailOutboxService(session_factory=session_factory)
+    email_outbox_module._email_outbox_service = outbox
+    owner_notification_module._owner_notification_service = OwnerNotificationService(
+        session_factory=session_factory, outbox=outbox, policy={}
+    )
+
+    os.environ["OWNER_EMAIL"] = "owner@example.com"
+    os.environ["TOOLS_TRANSPORT"] = "local"
+
+    async def run():
+        tool_service = ToolService()
+        try:
+            return await tool_service.lead_gen({"name": "Asha", "phone_number": "+919999999999", "type_of_lead": "DINING"})
+        finally:
+            await tool_service.close()
+
+    result = asyncio.run(run())
+    assert result["success"] is True
+
+    db = session_factory()
+    entry = db.query(EmailOutbox).one()
+    assert entry.subject == "New Lead - DINING - Asha"
+    assert "<html>" in entry.body
+    assert entry.text_body.startswith("NEW LEAD GENERATED")
+    db.close()
+
+
+def main():
+    """Run all tests"""
+    test_all_templates_render()
+    test_guest_fields_are_escaped()
+    test_subject_is_single_line()
+    test_missing_fields_use_defaults()
+    test_message_has_text_alternative()
+    test_auto_reload_picks_up_edits()
+    test_lead_gen_queues_html_and_text()
+    logger.info("\n✅ All email template tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Test script for the fallback executor
+Checks admission control (inline vs journaled + busy reply), journal replay
+to QStash and to the inline pool, and that /webhook hands messages QStash
+rejected to the fallback instead of dropping them
+"""
+
+import os
+import asyncio
+import tempfile
+import logging
+
+import httpx
+from fastapi.testclient import TestClient
+
+import services.fallback_service as fallback_service
+import services.ingestion_service as ingestion_service
+from services.fallback_service import FallbackExecutor, FallbackJournal
+from services.ingestion_service import QStashPublisher
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _journal_path() -> str:
+    return os.path.join(tempfile.mkdtemp(), "journal.jsonl")
+
+
+def test_admission_control_and_replay():
+    """Beyond concurrency + pending the message is journaled and the guest told; replay drains it"""
+    logger.info("\n=== Testing Fallback Admission ===")
+    processed, busy = [], []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def processor(payload):
+            await release.wait()
+            processed.append(payload["seq"])
+
+        executor = FallbackExecutor(_journal_path(), max_concurrency=1, max_pending=1, replay_interval=3600)
+        await executor.start(processor, notify_busy=lambda phone, text: busy.append((phone, text)))
+
+        outcomes = [await executor.submit({"phone": "+91700000000", "seq": seq}) for seq in range(4)]
+        await asyncio.sleep(0.05)
+        assert len(executor.journal) == 2
+
+        release.set()
+        await asyncio.sleep(0.05)
+        replayed = await executor.replay_once()
+        await executor.stop()
+        return outcomes, replayed, len(executor.journal)
+
+    outcomes, replayed, remaining = asyncio.run(run())
+    assert outcomes == ["inline", "inline", "journaled", "journaled"]
+    assert [phone for phone, _ in busy] == ["+91700000000", "+91700000000"]
+    assert busy[0][1] == fallback_service.DEFAULT_BUSY_MESSAGE
+    assert replayed == 2 and remaining == 0
+    assert sorted(processed) == [0, 1, 2, 3]
+
+
+def test_replay_prefers_queue_and_keeps_order():
+    """Journaled messages go back to QStash in order once it accepts them"""
+    logger.info("\n=== Testing Journal Replay ===")
+    journal_path = _journal_path()
+    journal = FallbackJournal(journal_path)
+    for seq in range(5):
+        journal.append({"phone": "+91700000001", "seq": seq})
+
+    published = []
+    queue_up = {"value": False}
+
+    async def publish(payload):
+        if not queue_up["value"]:
+            return False
+        published.append(payload["seq"])
+        return True
+
+    async def run():
+        # No pool capacity for replays, so the journal waits for the queue
+        executor = FallbackExecutor(journal_path, max_concurrency=1, max_pending=0, replay_interval=3600)
+        await executor.start(None, publish=publish)
+        first = await executor.replay_once()
+        queue_up["value"] = True
+        second = await executor.replay_once()
+        await executor.stop()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == 0
+    assert second == 5
+    assert published == [0, 1, 2, 3, 4]
+    assert FallbackJournal(journal_path).read() == []
+
+
+def test_workers_share_the_journal():
+    """A second worker doesn't replay what the first is replaying; appends during a replay survive"""
+    logger.info("\n=== Testing Shared Journal ===")
+    journal_path = _journal_path()
+    FallbackJournal(journal_path).append({"phone": "+91700000002", "seq": 0})
+    published = []
+
+    async def run():
+        first = FallbackExecutor(journal_path, max_concurrency=1, max_pending=0, replay_interval=3600)
+        second = FallbackExecutor(journal_path, max_concurrency=1, max_pending=0, replay_interval=3600)
+
+        async def publish(payload):
+            published.append(payload["seq"])
+            if payload["seq"] == 0:
+                # Another worker spills a message and tries to replay meanwhile
+                second.journal.append({"phone": "+91700000002", "seq": 1})
+                assert await second.replay_once() == 0
+            return True
+
+        await first.start(None, publish=publish)
+        await second.start(None, publish=publish)
+        replayed = await first.replay_once()
+        await first.stop()
+        await second.stop()
+        return replayed
+
+    assert asyncio.run(run()) == 1
+    assert published == [0]
+    assert FallbackJournal(journal_path).read() == [{"phone": "+91700000002", "seq": 1}]
+
+
+def test_webhook_falls_back_when_qstash_rejects():
+    """A rejected publish no longer drops the guest's message"""
+    logger.info("\n=== Testing Webhook Fallback ===")
+    import server
+
+    handled = []
+
+    class RecordingExecutor:
+        async def submit(self, payload):
+            handled.append(payload)
+            return "inline"
+
+    publisher = QStashPublisher(base_url="http://qstash.test", token="test")
+    publisher._client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(503, json={"error": "unavailable"})
+    ))
+    previous = (ingestion_service._qstash_publisher, fallback_service._fallback_executor, server.QSTASH_BATCH_ENABLED)
+    ingestion_service._qstash_publisher = publisher
+    fallback_service._fallback_executor = RecordingExecutor()
+    server.QSTASH_BATCH_ENABLED = False
+    try:
+        client = TestClient(server.app)
+        response = client.post("/webhook", data={
+            "MessageSid": "SM1", "From": "whatsapp:+917000000003", "Body": "Room for two?",
+        })
+    finally:
+        ingestion_service._qstash_publisher, fallback_service._fallback_executor, server.QSTASH_BATCH_ENABLED = previous
+
+    assert response.json() == {"status": "success"}
+    assert [(p["phone"], p["message"]) for p in handled] == [("+917000000003", "Room for two?")]
+    assert handled[0]["queued_at"]
+
+
+def main():
+    """Run all tests"""
+    test_admission_control_and_replay()
+    test_replay_prefers_queue_and_keeps_order()
+    test_workers_share_the_journal()
+    test_webhook_falls_back_when_qstash_rejects()
+    logger.info("\n✅ All fallback tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Test script for concurrent Travel Studio lookups
+Checks the shared rate limiter, that batch lookups stay within their
+concurrency bound, return partial results with per-item errors, retry
+rate-limited items, and take about RTT x N / concurrency
+"""
+
+import time
+import logging
+import threading
+
+from services.travel_studio_service import TravelStudioService
+from utils.rate_limit import RateLimiter
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(round(seconds, 3))
+        self.now += seconds
+
+
+def test_rate_limiter():
+    """Bursts up to the bucket size, then one token per 1/rate seconds"""
+    logger.info("\n=== Testing Rate Limiter ===")
+    clock = FakeClock()
+    limiter = RateLimiter(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+    assert [limiter.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert round(limiter.acquire(), 3) == 0.1
+    clock.now += 1.0
+    assert limiter.acquire() == 0.0
+
+    limiter.pause(2.0)
+    assert round(limiter.acquire(), 3) == 2.0
+
+    unlimited = RateLimiter(rate=0, clock=clock, sleep=clock.sleep)
+    assert all(unlimited.acquire() == 0.0 for _ in range(100))
+
+
+def _service(rtt: float = 0.05, failing=(), throttled=()):
+    """TravelStudioService whose backend answers after `rtt` seconds"""
+    service = TravelStudioService()
+    service.rate_limiter = RateLimiter(rate=0)
+    service.in_flight = service.peak = 0
+    service.calls = {}
+    lock = threading.Lock()
+
+    def make_request(method, endpoint, data=None, params=None):
+        key = endpoint.split("/")[4]
+        with lock:
+            service.in_flight += 1
+            service.peak = max(service.peak, service.in_flight)
+            service.calls[key] = service.calls.get(key, 0) + 1
+            attempt = service.calls[key]
+        time.sleep(rtt)
+        with lock:
+            service.in_flight -= 1
+        if key in throttled and attempt == 1:
+            service._last_status.code = 429
+            return None
+        if key in failing:
+            service._last_status.code = 500
+            return None
+        service._last_status.code = 200
+        return {"success": True, "data": [{"booking_id": f"{key}-1"}]}
+
+    service._make_request = make_request
+    return service
+
+
+def test_batch_partial_results():
+    """Failures are reported per item; rate-limited items are retried"""
+    logger.info("\n=== Testing Batch Partial Results ===")
+    service = _service(rtt=0.01, failing={"r3"}, throttled={"r5"})
+    batch = service.get_room_bookings_batch(["r1", "r2", "r3", "r4", "r5", "r1"], concurrency=3)
+
+    assert sorted(batch["results"]) == ["r1", "r2", "r4", "r5"]
+    assert batch["errors"] == {"r3": "HTTP 500"}
+    assert batch["results"]["r5"] == [{"booking_id": "r5-1"}]
+    assert service.calls["r5"] == 2 and service.calls["r1"] == 1
+    assert service.get_room_bookings_batch([]) == {"results": {}, "errors": {}}
+
+
+def test_batch_wall_time():
+    """Wall time is about RTT x N / concurrency, never above the bound"""
+    logger.info("\n=== Testing Batch Wall Time ===")
+    service = _service(rtt=0.05)
+    rooms = [f"r{index}" for index in range(20)]
+
+    started = time.perf_counter()
+    batch = service.get_room_bookings_batch(rooms, concurrency=5)
+    elapsed = time.perf_counter() - started
+
+    assert len(batch["results"]) == 20
+    assert service.peak == 5
+    assert elapsed < 0.05 * 20 / 2, f"batch took {elapsed:.2f}s"  # sequential would be 1.0s
+
+
+def main():
+    """Run all tests"""
+    test_rate_limiter()
+    test_batch_partial_results()
+    test_batch_wall_time()
+    logger.info("\n✅ All fan-out tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Test script for inventory holds
+Runs against a temporary SQLite database: holds cover every night of a
+stay, expire, and are consumed by the booking; many guests racing for the
+same rooms never end up holding the same room-night; a guest who lost
+the last room is refused without a call to Travel Studio; a booking
+that fails gives the held room back; and a guest's earlier booking that
+overlaps the stay is found even when it starts before check-in
+"""
+
+import os
+import asyncio
+import logging
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, InventoryHold
+from services.availability_cache import AvailabilityCache
+from services.booking_journal import BookingJournal
+from services.hold_service import HoldService, stay_nights
+from services.room_types import RoomTypeResolver
+from services.tool_service import ToolService
+from services.travel_studio_service import TravelStudioService, day_ordinal
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _make_session_factory():
+    db_path = os.path.join(tempfile.mkdtemp(), "holds.db")
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_place_and_consume():
+    """All nights or nothing; expired holds are replaced; booking consumes"""
+    logger.info("\n=== Testing Hold Lifecycle ===")
+    now = [datetime(2026, 12, 1, 12, 0)]
+    holds = HoldService(_make_session_factory(), ttl_seconds=600, clock=lambda: now[0])
+    assert stay_nights("2026-12-12", "2026-12-14") == ["2026-12-12", "2026-12-13"]
+
+    assert holds.place("asha", ["c1", "c2"], "2026-12-12", "2026-12-14") == ["c1"]
+    assert holds.place("asha", ["c2", "c1"], "2026-12-12", "2026-12-14") == ["c1"]  # keeps its own room
+    # Overlapping the second night is enough to lose c1
+    assert holds.place("ravi", ["c1", "c2"], "2026-12-13", "2026-12-15") == ["c2"]
+    assert holds.place("meera", ["c1"], "2026-12-12", "2026-12-13") == []
+    assert holds.held_by_others("meera", "2026-12-12", "2026-12-14") == {"c1", "c2"}
+    assert holds.held_by_others("asha", "2026-12-12", "2026-12-13") == set()
+
+    now[0] += timedelta(minutes=11)
+    assert holds.held_by_others("meera", "2026-12-12", "2026-12-14") == set()
+    assert holds.place("meera", ["c1"], "2026-12-12", "2026-12-13") == ["c1"]
+
+    assert holds.consume("meera", "2026-12-12", "2026-12-13") == 1
+    db = holds.session_factory()
+    try:
+        assert db.query(InventoryHold).count() == 0  # expired rows are cleared too
+    finally:
+        db.close()
+    assert holds.place("asha", ["c1"], "bad", "2026-12-14") is None
+
+
+def test_concurrent_holds_never_overlap():
+    """50 guests race for 3 rooms: exactly 3 win, one room-night each"""
+    logger.info("\n=== Testing Concurrent Holds ===")
+    holds = HoldService(_make_session_factory(), ttl_seconds=600)
+    rooms = ["c1", "c2", "c3"]
+    results = {}
+    start = threading.Barrier(50)
+
+    def guest(index):
+        start.wait()
+        # Every guest tries the rooms in a different order
+        order = rooms[index % 3:] + rooms[:index % 3]
+        results[index] = holds.place(f"guest-{index}", order, "2026-12-12", "2026-12-15")
+
+    threads = [threading.Thread(target=guest, args=(index,)) for index in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = {index: held for index, held in results.items() if held}
+    assert all(held is not None for held in results.values())
+    assert len(winners) == 3
+    assert sorted(room for held in winners.values() for room in held) == rooms
+
+    db = holds.session_factory()
+    try:
+        rows = db.query(InventoryHold.room_id, InventoryHold.night, InventoryHold.holder).all()
+    finally:
+        db.close()
+    assert len(rows) == 9
+    assert max(Counter((room_id, night) for room_id, night, _ in rows).values()) == 1
+    assert all(len({holder for room_id, _, holder in rows if room_id == room}) == 1 for room in rooms)
+
+
+class FakeTravelStudio:
+    """One Luxury Cottage left; counts booking calls"""
+
+    def __init__(self):
+        self.created = []
+        self.fail = None
+        self.bookings = []
+
+    def get_room_types(self, wait=True):
+        return ["Deluxe", "Luxury Cottage"]
+
+    def get_available_rooms(self, check_in_date, check_out_date, category=None, **kwargs):
+        rooms = [{"id": "c4", "category": "Luxury Cottage", "base_rate": 7350}]
+        return [room for room in rooms if not category or room["category"] == category]
+
+    def get_bookings(self, start_date=None, end_date=None, **kwargs):
+        # Like a backend filtering on check-in date
+        return [booking for booking in self.bookings
+                if (not start_date or booking["check_in_date"] >= start_date)
+                and (not end_date or booking["check_in_date"] <= end_date)]
+
+    def create_booking(self, **booking):
+        if self.fail:
+            return None
+        self.created.append(booking["guest_phone"])
+        return {"booking_id": f"b{len(self.created)}"}
+
+    def last_error_kind(self):
+        return self.fail
+
+    def backend_degraded(self):
+        return False
+
+
+def test_last_room_goes_to_one_guest():
+    """The second guest doesn't see the held cottage and can't book it"""
+    logger.info("\n=== Testing Last Room Race ===")
+    holds = HoldService(_make_session_factory(), ttl_seconds=600)
+    travel_studio = FakeTravelStudio()
+    cache = AvailabilityCache(ttl_seconds=60)
+    bookings = BookingJournal(travel_studio, holds.session_factory)
+
+    async def run():
+        services = []
+        for holder in ("+919800000001", "+919800000002"):
+            tools = ToolService()
+            tools.travel_studio = travel_studio
+            tools.availability_cache = cache
+            tools.room_types = RoomTypeResolver()
+            tools.holds = holds
+            tools.bookings = bookings
+            tools.holder = holder
+            services.append(tools)
+        first, second = services
+        stay = {"check_in": "12/12/2031", "check_out": "14/12/2031", "num_of_adults": 2, "num_of_rooms": 1}
+        try:
+            seen = await asyncio.gather(
+                first.check_availability({**stay, "room_type_id": "LUXURY_COTTAGE"}),
+                second.check_availability({**stay, "room_type_id": "LUXURY_COTTAGE"}),
+            )
+            # The guest who lost tries to book while the other one still holds it
+            winner, loser = (first, second) if seen[0]["data"]["total_available"] else (second, first)
+            booking = {**stay, "name": "Guest", "age": 30, "room_type_ids": ["LUXURY_COTTAGE"]}
+            refused = await loser.create_booking_reservation({**booking, "phone_number": loser.holder})
+            booked = await winner.create_booking_reservation({**booking, "phone_number": winner.holder})
+            return seen, refused, booked
+        finally:
+            for tools in services:
+                await tools.close()
+
+    seen, refused, booked = asyncio.run(run())
+    assert sorted(result["data"]["total_available"] for result in seen) == [0, 1]
+    assert max(result["data"].get("rooms_held", 0) for result in seen) == 1
+
+    assert not refused["success"] and refused["rooms_held_by_other_guests"]
+    assert booked["success"]
+    assert len(travel_studio.created) == 1  # the refused guest never reached Travel Studio
+    assert holds.held_by_others(None, "2031-12-12", "2031-12-14") == set()  # consumed
+
+
+def test_failed_booking_releases_hold():
+    """A booking Travel Studio rejects doesn't keep the room from other guests"""
+    logger.info("\n=== Testing Release On Failure ===")
+    holds = HoldService(_make_session_factory(), ttl_seconds=600)
+    travel_studio = FakeTravelStudio()
+    travel_studio.fail = "http_error"
+
+    async def run():
+        tools = ToolService()
+        tools.travel_studio = travel_studio
+        tools.availability_cache = AvailabilityCache(ttl_seconds=60)
+        tools.room_types = RoomTypeResolver()
+        tools.holds = holds
+        tools.bookings = BookingJournal(travel_studio, holds.session_factory)
+        tools.holder = "+919800000001"
+        try:
+            return await tools.create_booking_reservation({
+                "check_in": "12/12/2031", "check_out": "14/12/2031", "num_of_adults": 2,
+                "name": "Guest", "phone_number": tools.holder, "room_type_ids": ["LUXURY_COTTAGE"],
+            })
+        finally:
+            await tools.close()
+
+    result = asyncio.run(run())
+    assert not result["success"]
+    assert holds.held_by_others(None, "2031-12-12", "2031-12-14") == set()
+
+
+def test_duplicate_found_when_it_starts_earlier():
+    """An existing stay from the night before still counts as the guest's booking"""
+    logger.info("\n=== Testing Overlapping Duplicate ===")
+    holds = HoldService(_make_session_factory(), ttl_seconds=600)
+    travel_studio = FakeTravelStudio()
+    travel_studio.bookings = [
+        {"booking_id": "old", "status": "cancelled", "guest_phone": "+919800000001",
+         "check_in_date": "2031-12-12", "check_out_date": "2031-12-14"},
+        {"booking_id": "b0", "status": "confirmed", "guest_phone": "+919800000001",
+         "check_in_date": "2031-12-11", "check_out_date": "2031-12-13"},
+    ]
+
+    async def run():
+        tools = ToolService()
+        tools.travel_studio = travel_studio
+        tools.availability_cache = AvailabilityCache(ttl_seconds=60)
+        tools.room_types = RoomTypeResolver()
+        tools.holds = holds
+        tools.bookings = BookingJournal(travel_studio, holds.session_factory)
+        tools.holder = "+919800000001"
+        try:
+            return await tools.create_booking_reservation({
+                "check_in": "12/12/2031", "check_out": "14/12/2031", "num_of_adults": 2,
+                "name": "Guest", "phone_number": tools.holder, "room_type_ids": ["LUXURY_COTTAGE"],
+            })
+        finally:
+            await tools.close()
+
+    result = asyncio.run(run())
+    assert result["success"] and result["data"]["booking_id"] == "b0"
+    assert travel_studio.created == []
+
+
+def test_windows_skip_held_rooms():
+    """Flexible-date windows don't offer a room another guest is holding"""
+    logger.info("\n=== Testing Windows With Holds ===")
+    holds = HoldService(_make_session_factory(), ttl_seconds=600)
+    assert holds.place("+919800000001", ["c4"], "2031-12-12", "2031-12-14") == ["c4"]
+    assert holds.held_nights_by_others("+919800000002", "2031-12-10", "2031-12-20") == {
+        "c4": [(day_ordinal("2031-12-12"), day_ordinal("2031-12-13")),
+               (day_ordinal("2031-12-13"), day_ordinal("2031-12-14"))],
+    }
+
+    travel_studio = TravelStudioService()
+    travel_studio.get_all_rooms = lambda: [
+        {"id": "c4", "category": "Luxury Cottage", "base_rate": 7350, "booking_list": []}
+    ]
+    travel_studio.get_room_types = lambda wait=True: ["Luxury Cottage"]
+
+    async def search(holder):
+        tools = ToolService()
+        tools.travel_studio = travel_studio
+        tools.room_types = RoomTypeResolver()
+        tools.holds = holds
+        tools.holder = holder
+        try:
+            return await tools.find_available_windows({
+                "start_date": "10/12/2031", "end_date": "16/12/2031", "nights": 2,
+                "num_of_adults": 2, "room_type_id": "LUXURY_COTTAGE",
+            })
+        finally:
+            await tools.close()
+
+    other = asyncio.run(search("+919800000002"))
+    own = asyncio.run(search("+919800000001"))
+    check_ins = lambda result: {window["check_in"] for window in result["data"]["windows"]}
+    # Any stay touching the 12th or 13th needs the held cottage
+    assert check_ins(other) == {"10/12/2031", "14/12/2031"}
+    assert "12/12/2031" in check_ins(own)
+
+
+def main():
+    """Run all tests"""
+    test_place_and_consume()
+    test_concurrent_holds_never_overlap()
+    test_last_room_goes_to_one_guest()
+    test_failed_booking_releases_hold()
+    test_duplicate_found_when_it_starts_earlier()
+    test_windows_skip_held_rooms()
+    logger.info("\n✅ All inventory hold tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Test script for the webhook ingestion fast path
+Checks the stateless parser and body decoders, and that /webhook publishes
+both payload formats through the one pooled QStash client
+"""
+
+import json
+import asyncio
+import logging
+from urllib.parse import urlencode
+
+import httpx
+from fastapi.testclient import TestClient
+
+import services.ingestion_service as ingestion_service
+from services.ingestion_service import QStashBatcher, QStashPublisher, decode_form, decode_json, encode_json, parse_webhook_payload
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+AISENSY_BODY = {
+    "topic": "message.sender.user",
+    "data": {"message": {
+        "messageId": "wamid.1", "phone_number": "917000000001", "userName": "Asha",
+        "type": "text", "message_content": {"text": "Is the cottage free?"},
+    }},
+}
+
+TWILIO_FORM = {
+    "MessageSid": "SM1", "From": "whatsapp:+917000000002", "To": "whatsapp:+10000000000",
+    "Body": "Hello & welcome", "NumMedia": "0", "ProfileName": "Ravi",
+}
+
+
+def test_parser_and_decoders():
+    """Both payload shapes parse from raw bytes; unknown shapes come back empty"""
+    logger.info("\n=== Testing Ingestion Parser ===")
+    aisensy = parse_webhook_payload(decode_json(json.dumps(AISENSY_BODY).encode()), to_number="PNID")
+    assert aisensy["from_number"] == "917000000001"
+    assert aisensy["body"] == "Is the cottage free?"
+    assert aisensy["profile_name"] == "Asha"
+    assert aisensy["to_number"] == "PNID"
+
+    twilio = parse_webhook_payload(decode_form(urlencode(TWILIO_FORM).encode()))
+    assert twilio["from_number"] == "+917000000002"
+    assert twilio["body"] == "Hello & welcome"
+    assert twilio["message_sid"] == "SM1"
+
+    assert parse_webhook_payload({"unexpected": True})["message_type"] == "unknown"
+    assert json.loads(encode_json({"a": "é"})) == {"a": "é"}
+
+
+def test_webhook_publishes_through_pooled_client():
+    """JSON and form webhooks reach QStash over the same client"""
+    logger.info("\n=== Testing Webhook Fast Path ===")
+    import server
+
+    published = []
+
+    def qstash(request: httpx.Request):
+        published.append((str(request.url), json.loads(request.content)))
+        assert request.headers["Upstash-Flow-Control-Key"].startswith("phone-")
+        return httpx.Response(201, json={"messageId": f"msg_{len(published)}"})
+
+    publisher = QStashPublisher(base_url="http://qstash.test", token="test")
+    publisher._client = httpx.AsyncClient(transport=httpx.MockTransport(qstash))
+    client_before = publisher._client
+    previous = ingestion_service._qstash_publisher
+    ingestion_service._qstash_publisher = publisher
+    try:
+        client = TestClient(server.app)
+        assert client.post("/webhook", json=AISENSY_BODY).json() == {"status": "success"}
+        assert client.post("/webhook", data=TWILIO_FORM).json() == {"status": "success"}
+    finally:
+        ingestion_service._qstash_publisher = previous
+
+    assert publisher._client is client_before
+    assert [payload["phone"] for _, payload in published] == ["917000000001", "+917000000002"]
+    assert published[0][0] == f"http://qstash.test/v2/publish/{server.BASE_URL}/process-async"
+    assert published[1][1]["message"] == "Hello & welcome"
+
+
+def test_batcher_groups_bursts_in_order():
+    """A burst becomes a few batch calls; order is kept and errors stay per message"""
+    logger.info("\n=== Testing QStash Batcher ===")
+    requests = []
+
+    def qstash(request: httpx.Request):
+        if request.url.path == "/v2/batch":
+            messages = json.loads(request.content)
+            requests.append([json.loads(message["body"]) for message in messages])
+            for message in messages:
+                # Serialized per guest by QStash
+                phone = json.loads(message["body"])["phone"]
+                assert message["headers"]["Upstash-Flow-Control-Key"] == f"phone-{phone}"
+                assert message["headers"]["Upstash-Flow-Control-Value"] == "parallelism=1"
+            return httpx.Response(200, json=[
+                {"error": "invalid destination"} if json.loads(message["body"])["seq"] == 7
+                else {"messageId": f"msg_{json.loads(message['body'])['seq']}"}
+                for message in messages
+            ])
+        payload = json.loads(request.content)
+        requests.append([payload])
+        return httpx.Response(201, json={"messageId": f"msg_{payload['seq']}"})
+
+    async def run():
+        publisher = QStashPublisher(base_url="http://qstash.test", token="test")
+        publisher._client = httpx.AsyncClient(transport=httpx.MockTransport(qstash))
+        batcher = QStashBatcher(publisher, max_batch_size=8, max_delay_ms=5)
+
+        async def submit(seq):
+            # Stagger arrivals a little, like webhooks in a burst
+            await asyncio.sleep(seq * 0.0005)
+            return await batcher.submit("http://app/process-async",
+                                        {"phone": f"9170000000{seq % 3}", "seq": seq})
+
+        results = await asyncio.gather(*(submit(seq) for seq in range(20)), return_exceptions=True)
+        await batcher.close()
+        await publisher.close()
+        return results
+
+    results = asyncio.run(run())
+
+    assert isinstance(results[7], RuntimeError)
+    assert [result for i, result in enumerate(results) if i != 7] == [f"msg_{i}" for i in range(20) if i != 7]
+    assert len(requests) < 20
+    assert max(len(batch) for batch in requests) <= 8
+    sent_order = [payload["seq"] for batch in requests for payload in batch]
+    assert sent_order == list(range(20))
+
+
+class _LoopCrash(BaseException):
+    """Something the flush loop doesn't survive"""
+
+
+def test_batcher_restarts_on_the_same_queue():
+    """Messages waiting when the flush loop dies are sent once it restarts"""
+    logger.info("\n=== Testing Batcher Restart ===")
+
+    async def run():
+        publisher = QStashPublisher(base_url="http://qstash.test", token="test")
+        publisher._client = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(201, json={"messageId": f"msg_{json.loads(request.content)['seq']}"})
+        ))
+        batcher = QStashBatcher(publisher, max_batch_size=1, max_delay_ms=1)
+        publish = publisher.publish
+        crashed = asyncio.Event()
+
+        async def crash_once(destination, payload, forward_headers=None):
+            if payload["seq"] == 0:
+                await asyncio.sleep(0.01)  # seq 1 queues up meanwhile
+                crashed.set()
+                raise _LoopCrash()
+            return await publish(destination, payload, forward_headers)
+
+        publisher.publish = crash_once
+        first = asyncio.ensure_future(batcher.submit("http://app/process-async", {"phone": "1", "seq": 0}))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(batcher.submit("http://app/process-async", {"phone": "1", "seq": 1}))
+        await crashed.wait()
+        await asyncio.sleep(0)
+        assert batcher._task.done()
+
+        later = await asyncio.wait_for(batcher.submit("http://app/process-async", {"phone": "1", "seq": 2}), 2)
+        results = [await asyncio.gather(first, return_exceptions=True), await asyncio.wait_for(waiting, 2), later]
+        await batcher.close()
+        await publisher.close()
+        return results
+
+    (crashed_result,), waited, later = asyncio.run(run())
+    assert isinstance(crashed_result, RuntimeError)  # failed, not left hanging
+    assert (waited, later) == ("msg_1", "msg_2")
+
+
+def main():
+    """Run all tests"""
+    test_parser_and_decoders()
+    test_webhook_publishes_through_pooled_client()
+    test_batcher_groups_bursts_in_order()
+    test_batcher_restarts_on_the_same_queue()
+    logger.info("\n✅ All ingestion tests passed")
+
+
+if __name__ == "__main__":
+    main()
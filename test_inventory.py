@@ -0,0 +1,191 @@
+"""
+Test script for the local inventory mirror
+Checks the per-room calendar, availability computed from the mirror,
+booking write-through (including one landing while a sync is fetching),
+delta sync and the consistency check against the remote availability
+endpoint
+"""
+
+import logging
+
+from services.inventory_service import InventoryMirror, RoomCalendar, booking_nights
+from services.travel_studio_service import TravelStudioService
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _booking(booking_id, check_in, check_out, status="confirmed"):
+    return {"booking_id": booking_id, "status": status,
+            "check_in_date": f"{check_in}T14:00:00.000Z", "check_out_date": f"{check_out}T10:00:00.000Z"}
+
+
+class FakeTravelStudio:
+    """Rooms with embedded booking lists; availability computed the slow way"""
+
+    def __init__(self):
+        self.rooms = [
+            {"id": "d1", "category": "Deluxe", "booking_list": [_booking("B1", "2026-12-10", "2026-12-12")]},
+            {"id": "d2", "category": "Deluxe", "booking_list": []},
+            {"id": "c1", "category": "Luxury Cottage", "booking_list": [_booking("B2", "2026-12-11", "2026-12-15")]},
+        ]
+        self.listeners = []
+        self.room_booking_calls = 0
+        self.during_fetch = None  # called while get_all_rooms is "in flight"
+
+    def add_booking_listener(self, listener):
+        self.listeners.append(listener)
+
+    def get_all_rooms(self):
+        rooms = [dict(room, booking_list=list(room["booking_list"])) for room in self.rooms]
+        if self.during_fetch is not None:
+            self.during_fetch()
+        return rooms
+
+    def get_room_bookings(self, room_id):
+        self.room_booking_calls += 1
+        return next(list(room["booking_list"]) for room in self.rooms if room["id"] == room_id)
+
+    def get_room_bookings_batch(self, room_ids):
+        return {"results": {room_id: self.get_room_bookings(room_id) for room_id in room_ids}, "errors": {}}
+
+    def get_available_rooms(self, check_in_date, check_out_date, category=None):
+        free = []
+        for room in self.rooms:
+            if category and room["category"] != category:
+                continue
+            if all(b["check_out_date"][:10] <= check_in_date or b["check_in_date"][:10] >= check_out_date
+                   for b in room["booking_list"] if b["status"] != "cancelled"):
+                free.append(room)
+        return free
+
+
+def _ids(rooms):
+    return sorted(room["id"] for room in rooms)
+
+
+def test_room_calendar():
+    """Back-to-back stays don't collide; any shared night does"""
+    logger.info("\n=== Testing Room Calendar ===")
+    calendar = RoomCalendar({"A": (10, 12), "B": (20, 25)})
+    assert calendar.is_free(12, 20)       # checkout day 12 and check-in day 20 are free
+    assert calendar.is_free(0, 10)
+    assert not calendar.is_free(11, 13)
+    assert not calendar.is_free(5, 30)    # spans a whole stay
+    assert not calendar.is_free(24, 26)
+    calendar.remove("B")
+    assert calendar.is_free(24, 26)
+    assert booking_nights(_booking("X", "2026-12-10", "2026-12-12", status="cancelled")) is None
+
+
+def test_availability_write_through_and_delta_sync():
+    """Queries are answered locally and follow bookings and syncs"""
+    logger.info("\n=== Testing Mirror Availability ===")
+    remote = FakeTravelStudio()
+    mirror = InventoryMirror(remote, sync_interval=60, enabled=True)
+    assert mirror.available_rooms("2026-12-10", "2026-12-12") is None  # not loaded yet
+
+    assert mirror.load()
+    assert remote.room_booking_calls == 3
+    assert _ids(mirror.available_rooms("2026-12-10", "2026-12-12")) == ["d2"]
+    assert _ids(mirror.available_rooms("2026-12-12", "2026-12-14", "deluxe")) == ["d1", "d2"]
+    assert _ids(mirror.available_rooms("2026-12-15", "2026-12-16", "Luxury Cottage")) == ["c1"]
+
+    # Write-through with the assigned room, then cancellation
+    remote.listeners[0]("create", dict(_booking("B3", "2026-12-12", "2026-12-14"), room_id="d2"), "Deluxe")
+    assert _ids(mirror.available_rooms("2026-12-12", "2026-12-14", "Deluxe")) == ["d1"]
+    remote.listeners[0]("cancel", {"booking_id": "B3"})
+    assert _ids(mirror.available_rooms("2026-12-12", "2026-12-14", "Deluxe")) == ["d1", "d2"]
+
+    # Room not known yet: the category falls back to the remote until the next sync
+    remote.listeners[0]("create", _booking("B4", "2026-12-20", "2026-12-22"), "Deluxe")
+    assert mirror.available_rooms("2026-12-20", "2026-12-22", "Deluxe") is None
+    assert mirror.available_rooms("2026-12-20", "2026-12-22", "Luxury Cottage") is not None
+
+    remote.rooms[1]["booking_list"].append(_booking("B4", "2026-12-20", "2026-12-22"))
+    assert mirror.sync() == 1
+    assert remote.room_booking_calls == 3  # delta sync used the room list only
+    assert _ids(mirror.available_rooms("2026-12-20", "2026-12-22", "Deluxe")) == ["d1"]
+
+
+def test_write_through_during_sync_survives():
+    """A booking written while a sync is fetching isn't wiped by the older data"""
+    logger.info("\n=== Testing Write-Through During Sync ===")
+    remote = FakeTravelStudio()
+    mirror = InventoryMirror(remote, sync_interval=60, enabled=True)
+    assert mirror.load()
+    assert mirror.max_staleness == 120
+
+    def bookings_land():
+        remote.listeners[0]("create", dict(_booking("B5", "2026-12-12", "2026-12-14"), room_id="d2"), "Deluxe")
+        remote.listeners[0]("create", _booking("B6", "2026-12-20", "2026-12-22"), "Luxury Cottage")
+
+    remote.during_fetch = bookings_land
+    mirror.sync()
+    remote.during_fetch = None
+    assert _ids(mirror.available_rooms("2026-12-12", "2026-12-14", "Deluxe")) == ["d1"]
+    assert mirror.available_rooms("2026-12-20", "2026-12-22", "Luxury Cottage") is None  # still dirty
+
+    remote.rooms[1]["booking_list"].append(_booking("B5", "2026-12-12", "2026-12-14"))
+    mirror.sync()
+    assert _ids(mirror.available_rooms("2026-12-12", "2026-12-14", "Deluxe")) == ["d1"]
+    assert mirror.available_rooms("2026-12-20", "2026-12-22", "Luxury Cottage") is not None
+
+
+def test_consistency_check():
+    """A disagreement with the remote endpoint stops the mirror from answering"""
+    logger.info("\n=== Testing Consistency Check ===")
+    remote = FakeTravelStudio()
+    mirror = InventoryMirror(remote, sync_interval=60, enabled=True)
+    mirror.load()
+    ranges = [("2026-12-10", "2026-12-12"), ("2026-12-13", "2026-12-16")]
+
+    report = mirror.check_consistency(ranges, [None, "Deluxe"])
+    assert report["checked"] == 4 and report["mismatches"] == [] and mirror.ready
+
+    # A booking made elsewhere that the mirror hasn't seen
+    remote.rooms[1]["booking_list"].append(_booking("B9", "2026-12-09", "2026-12-11"))
+    report = mirror.check_consistency(ranges, [None])
+    assert report["mismatches"][0]["only_mirror"] == ["d2"]
+    assert not mirror.ready
+    assert mirror.available_rooms("2026-12-13", "2026-12-14") is None
+
+    mirror.sync()
+    assert mirror.check_consistency(ranges, [None])["trusted"]
+    assert mirror.ready
+
+
+def test_travel_studio_notifies_listeners():
+    """Bookings created through TravelStudioService reach the listeners"""
+    logger.info("\n=== Testing Booking Listener ===")
+    service = TravelStudioService()
+    service._make_request = lambda *args, **kwargs: {"success": True, "data": {"booking_id": "B7", "room_id": "d1"}}
+    events = []
+    service.add_booking_listener(lambda action, booking, category: events.append((action, booking, category)))
+
+    service.create_booking("Asha", "asha@example.com", "+919800000000", "2026-12-01", "2026-12-03", "Deluxe", 2)
+    service.cancel_booking("B7")
+
+    assert [event[0] for event in events] == ["create", "cancel"]
+    created = events[0][1]
+    assert created["booking_id"] == "B7" and created["room_id"] == "d1"
+    assert booking_nights(created) is not None
+    assert events[0][2] == "Deluxe"
+
+
+def main():
+    """Run all tests"""
+    test_room_calendar()
+    test_availability_write_through_and_delta_sync()
+    test_write_through_during_sync_survives()
+    test_consistency_check()
+    test_travel_studio_notifies_listeners()
+    logger.info("\n✅ All inventory tests passed")
+
+
+if __name__ == "__main__":
+    main()
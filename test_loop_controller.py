@@ -0,0 +1,192 @@
+"""
+Test script for the Gemini loop controller
+Checks that a model repeating the same tool call is answered from the memo
+and cut short, that the last allowed call is forced to text, and that a
+slow turn (or slow tool) stops at the deadline with a graceful reply that
+still confirms a booking made before it, and that explicit limits (even 0)
+win over the environment
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import logging
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base
+from services.loop_controller import DEADLINE_REPLY, TurnController
+from utils.metrics import GEMINI_TURN_STOPS_TOTAL
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _response(text="", call=None):
+    function_call = SimpleNamespace(name=call[0], args=call[1]) if call else None
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(
+        parts=[SimpleNamespace(text=text, function_call=function_call)]
+    ))])
+
+
+def _run_turn(send, tool_calls, timings=None, tool_delay=0.0, tool_result=None):
+    """Run one turn with a fake Gemini send and a counting tool"""
+    from services.agent_service import AgentService
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loop.db')}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    agent = AgentService(db)
+    timings = timings if timings is not None else []
+
+    async def fake_tool(tool_name, tool_input):
+        tool_calls.append((tool_name, tool_input))
+        await asyncio.sleep(tool_delay)
+        return tool_result or {"success": True, "data": {"rooms": ["Deluxe"]}}
+
+    agent._send_to_gemini = send
+    agent._run_tool = fake_tool
+
+    async def run():
+        started = time.monotonic()
+        reply = await agent.process_message("+917000000009", "Is anything free on 1 Dec?", "SM9")
+        timings.append(time.monotonic() - started)
+        await agent.close()
+        return reply
+
+    try:
+        return asyncio.run(run())
+    finally:
+        db.close()
+
+
+def test_repeated_calls_are_memoized_and_cut_short():
+    """Identical repeats cost no tool call and end the loop with a text-only call"""
+    logger.info("\n=== Testing Repeated Tool Calls ===")
+    sends, tool_calls = [], []
+
+    def send(chat, content, iteration, **kwargs):
+        sends.append(kwargs)
+        if kwargs.get("tool_config"):
+            return _response("Deluxe is free on 1 Dec.")
+        return _response(call=("check_availability", {"check_in": "01/12/2026"}))
+
+    before = GEMINI_TURN_STOPS_TOTAL.get(reason="repeated_calls")
+    reply = _run_turn(send, tool_calls)
+
+    assert reply == "Deluxe is free on 1 Dec."
+    assert len(tool_calls) == 1
+    assert len(sends) == 3
+    assert sends[-1]["tool_config"]["function_calling_config"]["mode"] == "NONE"
+    assert GEMINI_TURN_STOPS_TOTAL.get(reason="repeated_calls") == before + 1
+
+
+def test_last_iteration_is_text_only():
+    """A model that keeps calling new tools gets a forced answer, not an apology"""
+    logger.info("\n=== Testing Iteration Budget ===")
+    sends, tool_calls = [], []
+
+    def send(chat, content, iteration, **kwargs):
+        sends.append(kwargs)
+        if kwargs.get("tool_config"):
+            return _response("Here is what I found.")
+        return _response(call=("check_availability", {"check_in": f"0{iteration + 1}/12/2026"}))
+
+    reply = _run_turn(send, tool_calls)
+
+    assert reply == "Here is what I found."
+    assert len(sends) == TurnController().max_iterations + 1
+    assert len(tool_calls) == TurnController().max_iterations
+
+
+def test_deadline_stops_slow_turn():
+    """The turn gives up at the deadline instead of waiting on the model"""
+    logger.info("\n=== Testing Turn Deadline ===")
+    os.environ["GEMINI_TURN_DEADLINE_SECONDS"] = "0.3"
+    try:
+        def send(chat, content, iteration, **kwargs):
+            time.sleep(1.0)
+            return _response("too late")
+
+        # The abandoned model call keeps its worker thread; only the reply time counts
+        timings = []
+        reply = _run_turn(send, [], timings)
+    finally:
+        del os.environ["GEMINI_TURN_DEADLINE_SECONDS"]
+
+    assert reply == DEADLINE_REPLY
+    assert timings[0] < 0.9
+
+
+def test_deadline_bounds_tool_calls():
+    """A slow tool doesn't hold the reply past the deadline"""
+    logger.info("\n=== Testing Tool Deadline ===")
+    os.environ["GEMINI_TURN_DEADLINE_SECONDS"] = "0.3"
+    try:
+        def send(chat, content, iteration, **kwargs):
+            return _response(call=("check_availability", {"check_in": "01/12/2026"}))
+
+        timings = []
+        reply = _run_turn(send, [], timings, tool_delay=1.0)
+    finally:
+        del os.environ["GEMINI_TURN_DEADLINE_SECONDS"]
+
+    assert reply == DEADLINE_REPLY
+    assert timings[0] < 0.9
+
+
+def test_deadline_after_booking_confirms_it():
+    """A booking made before the deadline is confirmed to the guest, not apologised for"""
+    logger.info("\n=== Testing Deadline After Booking ===")
+    os.environ["GEMINI_TURN_DEADLINE_SECONDS"] = "0.3"
+    try:
+        def send(chat, content, iteration, **kwargs):
+            if iteration == 0:
+                return _response(call=("create_booking_reservation", {"check_in": "01/12/2026"}))
+            time.sleep(1.0)
+            return _response("too late")
+
+        booked = {"success": True, "data": {"booking_id": "BK7"}, "message": "Booking created successfully"}
+        reply = _run_turn(send, [], tool_result=booked)
+    finally:
+        del os.environ["GEMINI_TURN_DEADLINE_SECONDS"]
+
+    assert reply != DEADLINE_REPLY
+    assert "BK7" in reply and "confirmed" in reply
+
+
+def test_explicit_limits_override_environment():
+    """An explicit 0 is a limit, not a request for the default"""
+    logger.info("\n=== Testing Explicit Limits ===")
+    os.environ["GEMINI_MAX_ITERATIONS"] = "7"
+    try:
+        assert TurnController().max_iterations == 7
+        controller = TurnController(max_iterations=0, deadline_seconds=0)
+    finally:
+        del os.environ["GEMINI_MAX_ITERATIONS"]
+
+    assert controller.max_iterations == 0
+    assert controller.deadline_seconds == 0
+    assert controller.is_last_iteration(0)
+
+
+def main():
+    """Run all tests"""
+    test_repeated_calls_are_memoized_and_cut_short()
+    test_last_iteration_is_text_only()
+    test_deadline_stops_slow_turn()
+    test_deadline_bounds_tool_calls()
+    test_deadline_after_booking_confirms_it()
+    test_explicit_limits_override_environment()
+    logger.info("\n✅ All loop controller tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Test script for the /metrics endpoint
+Checks metric math, the Prometheus text format, thread-safe recording
+and that the hot paths feed the shared registry
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from utils.metrics import MetricsRegistry, normalize_path, TOOL_CALLS_TOTAL, TOOL_CALL_SECONDS
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Buckets are cumulative and end with +Inf, _sum and _count"""
+    logger.info("\n=== Testing Histogram Format ===")
+    registry = MetricsRegistry()
+    histogram = registry.histogram("tool_seconds", "Tool latency", ("tool",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, tool="lead_gen")
+    histogram.observe(0.5, tool="lead_gen")
+    histogram.observe(5.0, tool="lead_gen")
+
+    text = registry.render()
+    logger.info(text)
+    assert "# TYPE tool_seconds histogram" in text
+    assert 'tool_seconds_bucket{tool="lead_gen",le="0.1"} 1' in text
+    assert 'tool_seconds_bucket{tool="lead_gen",le="1"} 2' in text
+    assert 'tool_seconds_bucket{tool="lead_gen",le="+Inf"} 3' in text
+    assert 'tool_seconds_sum{tool="lead_gen"} 5.55' in text
+    assert 'tool_seconds_count{tool="lead_gen"} 3' in text
+
+
+def test_counter_and_gauge():
+    """Counters add up per label set, gauges keep the last value"""
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", ("outcome",))
+    gauge = registry.gauge("pending", "Pending emails")
+
+    counter.inc(outcome="ok")
+    counter.inc(2, outcome="ok")
+    counter.inc(outcome="error")
+    gauge.set(4)
+    gauge.set(7)
+
+    assert counter.get(outcome="ok") == 3
+    assert counter.get(outcome="error") == 1
+    text = registry.render()
+    assert 'calls_total{outcome="ok"} 3' in text
+    assert "pending 7" in text
+
+    try:
+        registry.counter("calls_total", "duplicate")
+        assert False, "duplicate metric names must be rejected"
+    except ValueError:
+        pass
+
+
+def test_recording_from_many_threads_loses_nothing():
+    """Per-thread shards merge to exact totals"""
+    logger.info("\n=== Testing Concurrent Recording ===")
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "Events")
+    histogram = registry.histogram("latency_seconds", "Latency")
+
+    def work():
+        for _ in range(5000):
+            counter.inc()
+            histogram.observe(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.get() == 40000
+    assert histogram.count() == 40000
+
+
+def test_exited_threads_leave_no_shards():
+    """Pool threads come and go; their shards fold into one total"""
+    logger.info("\n=== Testing Shard Reclaim ===")
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "Events")
+    histogram = registry.histogram("latency_seconds", "Latency")
+
+    def work():
+        counter.inc()
+        histogram.observe(0.01)
+
+    for _ in range(50):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for _ in range(16):
+                pool.submit(work)
+        counter.get()  # a scrape
+
+    assert counter.get() == 800
+    assert histogram.count() == 800
+    assert len(counter._shards) <= 8
+    assert len(histogram._shards) <= 8
+
+
+def test_normalize_path():
+    """Ids in Travel Studio paths collapse to one label value"""
+    assert normalize_path("/api/hocc/bookings/BK1234") == "/api/hocc/bookings/{id}"
+    assert normalize_path("/api/hocc/rooms/available") == "/api/hocc/rooms/available"
+    assert normalize_path("/api/hocc/bookings?status=confirmed") == "/api/hocc/bookings"
+
+
+def test_metrics_endpoint_reports_requests_and_tools():
+    """Requests and agent tool calls show up on /metrics"""
+    logger.info("\n=== Testing /metrics Endpoint ===")
+    from server import app
+    from services.agent_service import AgentService
+
+    async def run_tool():
+        # Tool routing never touches the session
+        agent = AgentService(db=None)
+        result = await agent._run_tool("no_such_tool", {})
+        await agent.close()
+        return result
+
+    before = TOOL_CALLS_TOTAL.get(tool="no_such_tool", outcome="error")
+    asyncio.run(run_tool())
+    assert TOOL_CALLS_TOTAL.get(tool="no_such_tool", outcome="error") == before + 1
+    assert TOOL_CALL_SECONDS.count(tool="no_such_tool") >= 1
+
+    client = TestClient(app)
+    assert client.get("/health").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in text
+    assert 'tool_calls_total{tool="no_such_tool",outcome="error"}' in text
+    for name in ("queue_lag_seconds", "gemini_call_duration_seconds", "gemini_tokens_total",
+                 "travel_studio_request_duration_seconds", "outbound_send_duration_seconds",
+                 "db_commit_duration_seconds", "cache_requests_total"):
+        assert f"# TYPE {name}" in text
+
+
+def main():
+    """Run all tests"""
+    test_histogram_renders_cumulative_buckets()
+    test_counter_and_gauge()
+    test_recording_from_many_threads_loses_nothing()
+    test_exited_threads_leave_no_shards()
+    test_normalize_path()
+    test_metrics_endpoint_reports_requests_and_tools()
+    logger.info("\n✅ All metrics tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Test script for owner notification digests
+Checks that leads are batched, urgent requests skip the digest, the
+outbox sends urgent mail first, and a digest that fails backs off
+"""
+
+import os
+import tempfile
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, EmailOutbox, OwnerNotification
+from services.email_outbox_service import EmailOutboxService
+from services.owner_notification_service import (
+    OwnerNotificationService,
+    parse_digest_policy,
+)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+OWNER = "owner@example.com"
+
+
+def _make_services(policy, max_items=25):
+    db_path = os.path.join(tempfile.mkdtemp(), "digest.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    outbox = EmailOutboxService(session_factory=session_factory)
+    notifications = OwnerNotificationService(
+        session_factory=session_factory, outbox=outbox, policy=policy, max_items=max_items
+    )
+    return session_factory, outbox, notifications
+
+
+def _lead(notifications, i):
+    return notifications.handle_send_email({
+        "to_email": OWNER,
+        "subject": f"New Lead - ROOM_BOOKING - Guest {i}",
+        "body": f"<p>Guest {i}</p>",
+        "text_body": f"Contact Guest {i}",
+        "category": "lead",
+    })
+
+
+def test_parse_policy():
+    policy = parse_digest_policy("lead=3600, followup=900,update=immediate,cancel=60,bad=x")
+    assert policy == {"lead": 3600, "followup": 900}
+
+
+def test_leads_are_batched_into_one_digest():
+    """Many leads become one email once the interval passes"""
+    logger.info("\n=== Testing Lead Digest ===")
+
+    session_factory, outbox, notifications = _make_services({"lead": 3600})
+
+    for i in range(10):
+        result = _lead(notifications, i)
+        assert result["success"], result
+
+    # Nothing is in the outbox until the digest is due
+    assert outbox.get_status_counts() == {}
+    assert notifications.flush_due() == 0
+
+    due = notifications.next_due()
+    assert due is not None
+    assert notifications.flush_due(now=due + timedelta(seconds=1)) == 1
+
+    db = session_factory()
+    digest = db.query(EmailOutbox).one()
+    logger.info(f"Digest subject: {digest.subject}")
+    assert digest.subject == "New Leads Digest - 10 new"
+    assert "Contact Guest 9" in digest.text_body
+    assert "<p>Guest 9</p>" in digest.body  # each item's HTML, not just its text
+    assert db.query(OwnerNotification).filter(OwnerNotification.digested_at.is_(None)).count() == 0
+    db.close()
+
+
+def test_digest_flushes_early_when_full():
+    session_factory, outbox, notifications = _make_services({"lead": 3600}, max_items=3)
+    for i in range(3):
+        _lead(notifications, i)
+    assert outbox.get_status_counts() == {"pending": 1}
+
+
+def test_cancellations_skip_the_digest():
+    """Urgent notifications go to the outbox immediately, ahead of others"""
+    logger.info("\n=== Testing Urgent Notifications ===")
+
+    session_factory, outbox, notifications = _make_services(parse_digest_policy("lead=3600,cancel=3600"))
+
+    notifications.handle_send_email({
+        "to_email": OWNER, "subject": "Event", "body": "<p>Event</p>", "category": "event_inquiry",
+    })
+    notifications.handle_send_email({
+        "to_email": OWNER, "subject": "[CANCEL] Room", "body": "<p>Cancel</p>", "category": "cancel",
+    })
+    _lead(notifications, 1)
+
+    db = session_factory()
+    queued = db.query(EmailOutbox).order_by(EmailOutbox.priority, EmailOutbox.id).all()
+    assert [entry.subject for entry in queued] == ["[CANCEL] Room", "Event"]
+    db.close()
+
+
+def test_schedule_survives_restart():
+    """A fresh process picks up digests that were waiting in the table"""
+    session_factory, outbox, notifications = _make_services({"lead": 60})
+    _lead(notifications, 1)
+
+    restarted = OwnerNotificationService(session_factory=session_factory, outbox=outbox, policy={"lead": 60})
+    assert restarted.flush_due(now=datetime.utcnow() + timedelta(minutes=2)) == 1
+    assert outbox.get_status_counts() == {"pending": 1}
+
+
+def test_workers_share_the_schedule():
+    """Notifications queued by one worker are flushed by another, exactly once"""
+    session_factory, outbox, notifications = _make_services({"lead": 60})
+    other = OwnerNotificationService(session_factory=session_factory, outbox=outbox, policy={"lead": 60})
+    assert other.next_due() is None  # loaded before anything was queued
+    _lead(notifications, 1)
+    _lead(notifications, 2)
+
+    later = datetime.utcnow() + timedelta(minutes=2)
+    assert other.next_due() is not None
+    assert other.flush_due(now=later) == 1
+    assert notifications.flush_due(now=later) == 0
+    assert outbox.get_status_counts() == {"pending": 1}
+
+
+def test_failing_digest_backs_off():
+    """A digest that can't be queued is retried later, not on every pass"""
+    session_factory, outbox, notifications = _make_services({"lead": 60})
+    _lead(notifications, 1)
+    attempts = []
+    enqueue = outbox.enqueue
+    outbox.enqueue = lambda **email: attempts.append(email) or {"success": False, "error": "database is locked"}
+
+    now = datetime.utcnow() + timedelta(minutes=2)
+    assert notifications.flush_due(now=now) == 0
+    assert notifications.flush_due(now=now) == 0
+    assert len(attempts) == 1
+    assert notifications.next_due() == now + timedelta(seconds=5)
+
+    assert notifications.flush_due(now=now + timedelta(seconds=5)) == 0
+    assert len(attempts) == 2
+    assert notifications.next_due() == now + timedelta(seconds=15)  # doubled
+
+    outbox.enqueue = enqueue
+    assert notifications.flush_due(now=now + timedelta(seconds=15)) == 1
+    assert outbox.get_status_counts() == {"pending": 1}
+
+
+def test_invalid_priority_uses_default():
+    session_factory, outbox, notifications = _make_services({})
+    result = notifications.handle_send_email({
+        "to_email": OWNER, "subject": "Event", "body": "<p>Event</p>", "priority": "high",
+    })
+    assert result["success"], result
+    db = session_factory()
+    assert db.query(EmailOutbox).one().priority == 5
+    db.close()
+
+
+def main():
+    """Run all tests"""
+    test_parse_policy()
+    test_leads_are_batched_into_one_digest()
+    test_digest_flushes_early_when_full()
+    test_cancellations_skip_the_digest()
+    test_schedule_survives_restart()
+    test_workers_share_the_schedule()
+    test_failing_digest_backs_off()
+    test_invalid_priority_uses_default()
+    logger.info("\n✅ All owner digest tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Test script for the availability prefetcher
+Checks the stay extraction over a conversation, that a speculative fetch
+started before the tool call is reused by check_availability (one Travel
+Studio request), that hits and misses are counted (another guest reading
+the entry is no hit), and that a booking drops the overlapping entries
+"""
+
+import time
+import asyncio
+import logging
+
+from services.availability_cache import AvailabilityCache
+from services.prefetch_service import AvailabilityPrefetcher, stay_from_conversation
+from services.tool_service import ToolService
+from utils.metrics import AVAILABILITY_PREFETCH_TOTAL, CACHE_REQUESTS_TOTAL
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+GUEST = "+919800000001"
+
+ROOMS = [
+    {"id": "r1", "roomNumber": "101", "category": "Deluxe", "base_rate": 4500},
+    {"id": "r2", "roomNumber": "201", "category": "Luxury Cottage", "base_rate": 7000},
+]
+
+
+class FakeTravelStudio:
+    """Counts availability requests and answers after a delay"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.requests = []
+        self.listeners = []
+
+    def add_booking_listener(self, listener):
+        self.listeners.append(listener)
+
+    def book(self, booking):
+        for listener in self.listeners:
+            listener("create", booking, None)
+
+    def cancel(self, booking_id):
+        for listener in self.listeners:
+            listener("cancel", {"booking_id": booking_id}, None)
+
+    def get_available_rooms(self, check_in_date, check_out_date, category=None, **kwargs):
+        self.requests.append((check_in_date, check_out_date, category))
+        time.sleep(self.delay)
+        return [room for room in ROOMS if not category or room["category"] == category]
+
+    def get_room_types(self, wait=True):
+        return sorted({room["category"] for room in ROOMS})
+
+
+def test_stay_from_conversation():
+    """Dates and guests are combined across messages, newest mention winning"""
+    logger.info("\n=== Testing Stay Extraction ===")
+    assert stay_from_conversation(["Hi there"]) == {}
+
+    stay = stay_from_conversation(["Is a cottage free 12/12/2026 to 14/12/2026?", "We are 2 adults"])
+    assert stay == {"check_in": "2026-12-12", "check_out": "2026-12-14", "guests": 2}
+
+    # New dates replace the old stay; "N nights" gives the check-out
+    stay = stay_from_conversation(["12/12/2026 to 14/12/2026 for 2 adults", "Actually 20/12/2026 for 3 nights"])
+    assert stay == {"check_in": "2026-12-20", "check_out": "2026-12-23", "guests": 2}
+
+
+def test_prefetch_is_used_by_tool_call():
+    """The tool call joins the speculative query instead of sending its own"""
+    logger.info("\n=== Testing Prefetch Hit ===")
+    travel_studio = FakeTravelStudio()
+    cache = AvailabilityCache(ttl_seconds=60)
+    prefetcher = AvailabilityPrefetcher(travel_studio, cache, enabled=True)
+    hits_before = AVAILABILITY_PREFETCH_TOTAL.get(outcome="hit")
+    cache_hits_before = CACHE_REQUESTS_TOTAL.get(cache="availability", result="hit")
+
+    async def turn():
+        tools = ToolService()
+        tools.travel_studio = travel_studio
+        tools.availability_cache = cache
+        tools.holder = GUEST
+        try:
+            entry = prefetcher.speculate(["Do you have rooms 12/12/2026 to 14/12/2026 for 2 adults?"], owner=GUEST)
+            assert entry is not None
+            await asyncio.sleep(0.05)  # the model is thinking
+            result = await tools.check_availability({
+                "check_in": "12/12/2026", "check_out": "14/12/2026",
+                "num_of_adults": 2, "room_type_id": "DELUXE",
+            })
+            prefetcher.settle(entry)
+            return result
+        finally:
+            await tools.close()
+
+    result = asyncio.run(turn())
+
+    assert result["success"]
+    assert [room["category"] for room in result["data"]["available_rooms"]] == ["Deluxe"]
+    assert travel_studio.requests == [("2026-12-12", "2026-12-14", None)]
+    assert AVAILABILITY_PREFETCH_TOTAL.get(outcome="hit") == hits_before + 1
+    assert CACHE_REQUESTS_TOTAL.get(cache="availability", result="hit") == cache_hits_before + 1
+
+
+def test_unused_prefetch_is_a_miss():
+    """A speculation no tool call asked for is counted as a miss, and dates
+    already cached are not fetched again"""
+    logger.info("\n=== Testing Prefetch Miss ===")
+    travel_studio = FakeTravelStudio(delay=0.01)
+    prefetcher = AvailabilityPrefetcher(travel_studio, AvailabilityCache(ttl_seconds=60), enabled=True)
+    misses_before = AVAILABILITY_PREFETCH_TOTAL.get(outcome="miss")
+
+    async def turn():
+        entry = prefetcher.speculate(["Any rooms 05/01/2027 to 07/01/2027 for 4 people?"], owner=GUEST)
+        # Another guest's turn asking for the same dates doesn't make it a hit
+        assert await prefetcher.cache.get_rooms(travel_studio, "2027-01-05", "2027-01-07",
+                                                consumer="+919800000002") is not None
+        prefetcher.settle(entry)
+        return prefetcher.speculate(["Any rooms 05/01/2027 to 07/01/2027 for 4 people?"])
+
+    assert asyncio.run(turn()) is None
+    assert len(travel_studio.requests) == 1
+    assert AVAILABILITY_PREFETCH_TOTAL.get(outcome="miss") == misses_before + 1
+
+
+def test_booking_drops_overlapping_entries():
+    """A booking made through Travel Studio invalidates the dates it overlaps"""
+    logger.info("\n=== Testing Booking Invalidation ===")
+    travel_studio = FakeTravelStudio(delay=0.01)
+    cache = AvailabilityCache(ttl_seconds=60, travel_studio=travel_studio)
+
+    async def lookups():
+        for check_in, check_out in (("2026-12-12", "2026-12-14"), ("2026-12-20", "2026-12-22")):
+            await cache.get_rooms(travel_studio, check_in, check_out)
+
+    asyncio.run(lookups())
+    travel_studio.book({"check_in_date": "2026-12-13", "check_out_date": "2026-12-15"})
+    asyncio.run(lookups())
+    assert [request[0] for request in travel_studio.requests] == ["2026-12-12", "2026-12-20", "2026-12-12"]
+
+    # A cancellation carries no dates: everything goes
+    travel_studio.cancel("BK1")
+    asyncio.run(lookups())
+    assert len(travel_studio.requests) == 5
+
+
+def main():
+    """Run all tests"""
+    test_stay_from_conversation()
+    test_prefetch_is_used_by_tool_call()
+    test_unused_prefetch_is_a_miss()
+    test_booking_drops_overlapping_entries()
+    logger.info("\n✅ All prefetch tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Test script for Travel Studio resilience
+Checks circuit breaker transitions and half-open probing, that an open
+circuit fails fast with a reason the agent can act on, and that slow
+idempotent requests are hedged once they exceed the endpoint's p95
+"""
+
+import time
+import logging
+import threading
+from types import SimpleNamespace
+
+import requests
+
+import services.travel_studio_service as travel_studio_service
+from services.travel_studio_service import TravelStudioService, ERROR_CIRCUIT_OPEN, ERROR_TIMEOUT
+from services.catalogue_cache import CatalogueCache
+from services.tool_service import ToolService
+from utils.metrics import TRAVEL_STUDIO_CIRCUIT_STATE, TRAVEL_STUDIO_FAST_FAILS_TOTAL, TRAVEL_STUDIO_HEDGES_TOTAL
+from utils.rate_limit import RateLimiter
+from utils.resilience import CircuitBreaker, STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = ""
+        self._data = data if data is not None else {"success": True, "data": []}
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+def _service(backend):
+    """Configured TravelStudioService whose HTTP calls go to backend(**kwargs)"""
+    service = TravelStudioService()
+    service.client_initialized = True
+    service.bearer_token = "test"
+    service.rate_limiter = RateLimiter(rate=0)
+    service.breaker_failures = 3
+    service.breaker_reset_seconds = 60
+    service.catalogue = CatalogueCache(snapshot_path="")
+    fake_requests = SimpleNamespace(request=backend, exceptions=requests.exceptions)
+    return service, fake_requests
+
+
+def test_circuit_breaker_states():
+    """Opens after consecutive failures, probes once when half-open"""
+    logger.info("\n=== Testing Circuit Breaker ===")
+    now = [0.0]
+    changes = []
+    breaker = CircuitBreaker("rooms", failure_threshold=2, reset_seconds=10, clock=lambda: now[0],
+                             on_change=lambda name, state: changes.append(state))
+    breaker.record_failure()
+    breaker.record_success()      # a success resets the count
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN and not breaker.allow()
+    assert breaker.retry_after() == 10
+
+    now[0] = 10.0
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow()        # the probe
+    assert not breaker.allow()    # only one at a time
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED and breaker.allow()
+    assert changes == [STATE_OPEN, STATE_HALF_OPEN, STATE_OPEN, STATE_HALF_OPEN, STATE_CLOSED]
+
+
+def test_open_circuit_fails_fast():
+    """A timing-out endpoint stops being called; the agent gets a usable reason"""
+    logger.info("\n=== Testing Fast Fail ===")
+    calls = []
+
+    def backend(**kwargs):
+        calls.append(kwargs["url"])
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    service, fake_requests = _service(backend)
+    previous = travel_studio_service.requests
+    travel_studio_service.requests = fake_requests
+    try:
+        for _ in range(3):
+            assert service.get_all_rooms() is None
+            assert service.last_error_kind() == ERROR_TIMEOUT
+        fast_fails = TRAVEL_STUDIO_FAST_FAILS_TOTAL.get(endpoint="/api/hocc/rooms")
+
+        started = time.perf_counter()
+        assert service.get_all_rooms() is None
+        assert time.perf_counter() - started < 0.05
+        assert service.last_error_kind() == ERROR_CIRCUIT_OPEN
+        assert len(calls) == 3
+        assert TRAVEL_STUDIO_FAST_FAILS_TOTAL.get(endpoint="/api/hocc/rooms") == fast_fails + 1
+        assert TRAVEL_STUDIO_CIRCUIT_STATE.get(endpoint="/api/hocc/rooms") == 2
+        assert service.circuit_states() == {"/api/hocc/rooms": STATE_OPEN}
+
+        # Other endpoints keep their own breaker
+        travel_studio_service.requests = SimpleNamespace(request=lambda **kwargs: FakeResponse(),
+                                                         exceptions=requests.exceptions)
+        assert service.get_hotel_profile() == []
+        assert service.circuit_states()["/api/hocc/profile"] == STATE_CLOSED
+
+        tools = ToolService()
+        tools.travel_studio = service
+        failure = tools._travel_studio_failure("Failed to fetch room availability from Travel Studio API")
+        assert failure["backend_unavailable"] and "checking" in failure["message"]
+    finally:
+        travel_studio_service.requests = previous
+
+
+def test_slow_reads_are_hedged():
+    """Past the endpoint's p95 a second copy is sent and the first answer wins"""
+    logger.info("\n=== Testing Hedged Requests ===")
+    slow_first = threading.Event()
+    lock = threading.Lock()
+    sent = []
+
+    def backend(**kwargs):
+        with lock:
+            sent.append(kwargs["method"])
+            number = len(sent)
+        if slow_first.is_set() and number == 21:
+            time.sleep(1.0)  # the stuck primary
+        else:
+            time.sleep(0.01)
+        return FakeResponse(data={"success": True, "data": {"items": [{"id": number}]}})
+
+    service, fake_requests = _service(backend)
+    service.hedge_min_seconds = 0.05
+    previous = travel_studio_service.requests
+    travel_studio_service.requests = fake_requests
+    try:
+        for _ in range(20):   # build up the latency window
+            service.get_all_rooms()
+        hedged = TRAVEL_STUDIO_HEDGES_TOTAL.get(endpoint="/api/hocc/rooms", winner="hedge")
+
+        slow_first.set()
+        started = time.perf_counter()
+        rooms = service.get_all_rooms()
+        elapsed = time.perf_counter() - started
+
+        assert rooms == [{"id": 22}]
+        assert elapsed < 0.5, f"hedged request took {elapsed:.2f}s"
+        assert TRAVEL_STUDIO_HEDGES_TOTAL.get(endpoint="/api/hocc/rooms", winner="hedge") == hedged + 1
+
+        # Writes are never duplicated
+        service._latency["/api/hocc/bookings"] = service._latency["/api/hocc/rooms"]
+        before = len(sent)
+        service._make_request("POST", "/api/hocc/bookings", data={})
+        assert len(sent) == before + 1
+    finally:
+        travel_studio_service.requests = previous
+
+
+def main():
+    """Run all tests"""
+    test_circuit_breaker_states()
+    test_open_circuit_fails_fast()
+    test_slow_reads_are_hedged()
+    logger.info("\n✅ All resilience tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Test script for room type resolution
+Checks that ids, names, legacy aliases and near-misses map to the
+catalogue's categories, that unknown room types come back with the valid
+ids instead of an empty availability call, and that the tool schema enums
+follow the catalogue
+"""
+
+import asyncio
+import logging
+
+from prompts import TOOL_DESCRIPTIONS, with_room_type_ids
+from services.room_types import RoomTypeResolver, room_type_id
+from services.tool_service import ToolService
+from utils.metrics import ROOM_TYPE_LOOKUPS_TOTAL
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["Deluxe", "Luxury Cottage"]
+
+
+def test_resolve_aliases():
+    """Case, punctuation, extra words and typos all find the category"""
+    logger.info("\n=== Testing Room Type Resolution ===")
+    resolver = RoomTypeResolver()
+    expected = {
+        "DELUXE": "Deluxe",
+        "deluxe room": "Deluxe",
+        "DLX": "Deluxe",
+        "delux": "Deluxe",
+        "LUXURY_COTTAGE": "Luxury Cottage",
+        "luxury-cottage": "Luxury Cottage",
+        "COTTAGE": "Luxury Cottage",
+        "COTTAGE_BATHTUB": "Luxury Cottage",
+        "Luxury Pinewood Cottage with Bathtub": "Luxury Cottage",
+        "cottage": "Luxury Cottage",
+    }
+    for requested, category in expected.items():
+        assert resolver.resolve(requested, CATEGORIES) == category, requested
+
+    unknown = ROOM_TYPE_LOOKUPS_TOTAL.get(match="unknown")
+    assert resolver.resolve("Presidential Suite", CATEGORIES) is None
+    assert resolver.resolve("BASIC", CATEGORIES) is None  # not in this catalogue
+    assert ROOM_TYPE_LOOKUPS_TOTAL.get(match="unknown") == unknown + 2
+
+    # Without a catalogue: legacy ids map, anything else passes through
+    assert resolver.resolve("COTTAGE", None) == "Luxury Cottage"
+    assert resolver.resolve("Garden Villa", None) == "Garden Villa"
+    assert resolver.resolve(None, CATEGORIES) is None
+
+    assert room_type_id("Luxury Cottage") == "LUXURY_COTTAGE"
+    assert resolver.room_type_ids(CATEGORIES + ["Deluxe"]) == ["DELUXE", "LUXURY_COTTAGE"]
+    assert resolver.room_type_ids(None) == []
+
+
+def test_schema_enums():
+    """Every room type property lists the catalogue's ids"""
+    logger.info("\n=== Testing Tool Schema Enums ===")
+    descriptions = with_room_type_ids(["DELUXE", "LUXURY_COTTAGE"])
+    properties = {name: tool["input_schema"]["properties"] for name, tool in descriptions.items()}
+    assert properties["check_availability"]["room_type_id"]["enum"] == ["DELUXE", "LUXURY_COTTAGE"]
+    assert properties["find_available_windows"]["room_type_id"]["enum"] == ["DELUXE", "LUXURY_COTTAGE"]
+    assert properties["create_booking_reservation"]["room_type_ids"]["items"]["enum"] == ["DELUXE", "LUXURY_COTTAGE"]
+
+    # The shared defaults are left alone
+    default = TOOL_DESCRIPTIONS["check_availability"]["input_schema"]["properties"]["room_type_id"]["enum"]
+    assert "LUXURY_COTTAGE" not in default
+    assert with_room_type_ids([]) == TOOL_DESCRIPTIONS
+
+
+class FakeTravelStudio:
+    def __init__(self):
+        self.availability_calls = []
+
+    def get_room_types(self, wait=True):
+        return list(CATEGORIES)
+
+    def get_available_rooms(self, check_in_date, check_out_date, category=None, **kwargs):
+        self.availability_calls.append(category)
+        return [{"id": "r1", "category": category or "Deluxe", "base_rate": 4725}]
+
+
+def test_tool_unknown_room_type():
+    """An unknown room type is answered with the valid ids, without a backend call"""
+    logger.info("\n=== Testing Unknown Room Type In Tools ===")
+
+    async def run():
+        tools = ToolService()
+        tools.travel_studio = FakeTravelStudio()
+        tools.room_types = RoomTypeResolver()
+        tools.availability_cache.clear()
+        try:
+            params = {"check_in": "12/12/2031", "check_out": "14/12/2031", "num_of_adults": 2}
+            unknown = await tools.check_availability({**params, "room_type_id": "PRE"})
+            found = await tools.check_availability({**params, "room_type_id": "luxury pinewood cottage"})
+            booking = await tools.create_booking_reservation({
+                **params, "name": "Asha", "age": 30, "phone_number": "+919800000000", "room_type_ids": ["FAM"],
+            })
+            return tools.travel_studio.availability_calls, unknown, found, booking
+        finally:
+            await tools.close()
+
+    calls, unknown, found, booking = asyncio.run(run())
+    assert not unknown["success"] and unknown["valid_room_type_ids"] == ["DELUXE", "LUXURY_COTTAGE"]
+    assert found["success"] and found["data"]["available_rooms"][0]["category"] == "Luxury Cottage"
+    assert calls == ["Luxury Cottage"]
+    assert not booking["success"] and "FAM" in booking["error"]
+
+
+def main():
+    """Run all tests"""
+    test_resolve_aliases()
+    test_schema_enums()
+    test_tool_unknown_room_type()
+    logger.info("\n✅ All room type tests passed")
+
+
+if __name__ == "__main__":
+    main()
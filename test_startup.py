@@ -0,0 +1,80 @@
+"""
+Test script for cold start behaviour
+Checks that importing the server leaves the heavy SDKs unloaded, that
+init_db() skips create_all once the schema version is recorded, and that
+Gemini tool declarations are built once per process
+"""
+
+import os
+import sys
+import tempfile
+import subprocess
+import logging
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+import database.models as models
+from benchmarks.bench_startup import LAZY_MODULES
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def test_import_server_keeps_sdks_lazy():
+    """google.generativeai, twilio.rest and requests load on first use only"""
+    logger.info("\n=== Testing Lazy SDK Imports ===")
+    script = (
+        "import sys, server\n"
+        f"print('loaded:' + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert "loaded:\n" in result.stdout
+
+
+def test_init_db_checks_schema_version():
+    """create_all runs on a new database and after a version bump, not otherwise"""
+    logger.info("\n=== Testing Schema Version Check ===")
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'schema.db')}")
+    previous = (models.engine, models.SessionLocal, models.SCHEMA_VERSION)
+    models.engine = engine
+    models.SessionLocal = sessionmaker(bind=engine)
+    try:
+        assert models.init_db() is True
+        assert "conversations" in inspect(engine).get_table_names()
+        assert models.init_db() is False
+
+        models.SCHEMA_VERSION = previous[2] + 1
+        assert models.init_db() is True
+        assert models.init_db() is False
+    finally:
+        models.engine, models.SessionLocal, models.SCHEMA_VERSION = previous
+
+
+def test_tool_declarations_built_once():
+    """The Gemini tool schema conversion is cached for the process"""
+    from services.agent_service import AgentService
+
+    agent = AgentService.__new__(AgentService)
+    first = agent._convert_tools_to_gemini_format()
+    assert agent._convert_tools_to_gemini_format() is first
+    assert len(first[0].function_declarations) > 0
+
+
+def main():
+    """Run all tests"""
+    test_import_server_keeps_sdks_lazy()
+    test_init_db_checks_schema_version()
+    test_tool_declarations_built_once()
+    logger.info("\n✅ All startup tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Test script for token and cost accounting
+Drives one agent turn with a scripted Gemini (one tool round) and checks
+the stored usage rows, the per-conversation/per-day aggregates, the cost
+breakdown and the /metrics counters
+"""
+
+import os
+import asyncio
+import tempfile
+import logging
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, TokenUsage
+from services.usage_service import UsageService, attribute_prompt_tokens, compute_cost
+from utils.metrics import GEMINI_COST_USD_TOTAL, PROMPT_SECTION_TOKENS_TOTAL
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _response(parts, prompt_tokens, response_tokens, thinking_tokens=0):
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=response_tokens,
+            thoughts_token_count=thinking_tokens,
+            cached_content_token_count=0,
+            total_token_count=prompt_tokens + response_tokens + thinking_tokens,
+        ),
+    )
+
+
+def test_attribution_sums_to_reported_tokens():
+    """Section shares always add up to what Gemini billed"""
+    sections = {"system_prompt": 3000, "history": 500, "tool_result:check_availability": 1200}
+    attributed = attribute_prompt_tokens(sections, 5003)
+    assert sum(attributed.values()) == 5003
+    assert attributed["system_prompt"] > attributed["tool_result:check_availability"] > attributed["history"]
+    assert attribute_prompt_tokens({}, 100) == {}
+    assert abs(compute_cost(1_000_000, 1_000_000, {"input": 0.3, "output": 2.5}) - 2.8) < 1e-9
+
+
+def test_turn_usage_is_recorded_and_aggregated():
+    """A turn with one tool round stores two calls and feeds the aggregates"""
+    logger.info("\n=== Testing Turn Usage ===")
+    from services.agent_service import AgentService
+
+    db_path = os.path.join(tempfile.mkdtemp(), "usage.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+
+    agent = AgentService(db)
+
+    scripted = [
+        _response(
+            [SimpleNamespace(
+                text="",
+                function_call=SimpleNamespace(name="check_availability", args={"check_in_date": "2026-12-01"}),
+            )],
+            prompt_tokens=4000, response_tokens=20, thinking_tokens=100,
+        ),
+        _response([SimpleNamespace(text="Deluxe Room is available.", function_call=None)],
+                  prompt_tokens=4600, response_tokens=40),
+    ]
+
+    def fake_send(chat, content, iteration):
+        return scripted[iteration]
+
+    async def fake_tool(tool_name, tool_input):
+        return {"success": True, "data": {"available_rooms": ["Deluxe Room"] * 50}}
+
+    agent._send_to_gemini = fake_send
+    agent._run_tool = fake_tool
+
+    cost_before = GEMINI_COST_USD_TOTAL.get(model=agent.model_name)
+    tool_tokens_before = PROMPT_SECTION_TOKENS_TOTAL.get(section="tool_result:check_availability")
+
+    async def run():
+        reply = await agent.process_message("+911234567890", "Is a room free on 1 Dec?", "SM123")
+        await agent.close()
+        return reply
+
+    try:
+        reply = asyncio.run(run())
+    finally:
+        db.close()
+    assert reply == "Deluxe Room is available."
+
+    check = session_factory()
+    rows = check.query(TokenUsage).order_by(TokenUsage.iteration).all()
+    check.close()
+
+    assert [row.iteration for row in rows] == [0, 1]
+    assert all(row.message_sid == "SM123" for row in rows)
+    assert rows[0].trigger_tools == []
+    assert rows[1].trigger_tools == ["check_availability"]
+    assert rows[0].thinking_tokens == 100
+    assert sum(rows[1].section_tokens.values()) == 4600
+    assert "tool_result:check_availability" in rows[1].section_tokens
+    assert "tool_result:check_availability" not in rows[0].section_tokens
+
+    usage = UsageService(session_factory=session_factory)
+
+    conversation = usage.get_conversation_usage("+911234567890")
+    logger.info(f"Conversation usage: {conversation}")
+    assert len(conversation["turns"]) == 1
+    assert conversation["turns"][0]["gemini_calls"] == 2
+    assert conversation["total_tokens"] == 4120 + 4640
+
+    daily = usage.get_daily_usage(days=1)
+    assert len(daily) == 1 and daily[0]["turns"] == 1 and daily[0]["total_tokens"] == 8760
+
+    breakdown = usage.get_cost_breakdown(days=1)
+    logger.info(f"Breakdown: {breakdown}")
+    assert breakdown["sections"][0]["section"] == "system_prompt"
+    assert breakdown["tools"][0]["tool"] == "check_availability"
+    assert breakdown["tools"][0]["followup_calls"] == 1
+    assert breakdown["tools"][0]["result_tokens"] > 0
+
+    assert GEMINI_COST_USD_TOTAL.get(model=agent.model_name) > cost_before
+    assert PROMPT_SECTION_TOKENS_TOTAL.get(section="tool_result:check_availability") > tool_tokens_before
+
+
+def main():
+    """Run all tests"""
+    test_attribution_sums_to_reported_tokens()
+    test_turn_usage_is_recorded_and_aggregated()
+    logger.info("\n✅ All token usage tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Test script for tool transports
+Checks that local mode serves send_email in-process and remote mode
+still POSTs to the tools API with the same result contract
+"""
+
+import os
+import asyncio
+import tempfile
+import logging
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import services.email_outbox_service as email_outbox_module
+import services.owner_notification_service as owner_notification_module
+from database.models import Base
+from services.email_outbox_service import EmailOutboxService
+from services.owner_notification_service import OwnerNotificationService
+from services.tool_transport import (
+    LOCAL_TOOL_HANDLERS,
+    LocalToolTransport,
+    RemoteToolTransport,
+    create_tool_transport,
+)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _use_sqlite_outbox() -> EmailOutboxService:
+    db_path = os.path.join(tempfile.mkdtemp(), "transport.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    service = EmailOutboxService(session_factory=session_factory)
+    email_outbox_module._email_outbox_service = service
+    owner_notification_module._owner_notification_service = OwnerNotificationService(
+        session_factory=session_factory, outbox=service, policy={}
+    )
+    return service
+
+
+def test_local_send_email_skips_http():
+    """send_email is queued in-process without touching the tools API"""
+    logger.info("\n=== Testing Local Transport ===")
+
+    outbox = _use_sqlite_outbox()
+
+    def refuse(request):
+        raise AssertionError(f"Unexpected HTTP call to {request.url}")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(refuse)) as client:
+            os.environ["TOOLS_TRANSPORT"] = "local"
+            transport = create_tool_transport(client, "https://tools.example.com")
+            assert isinstance(transport, LocalToolTransport)
+            return await transport.call(
+                "send_email",
+                {"to_email": "owner@example.com", "subject": "Lead", "body": "<p>Lead</p>"},
+            )
+
+    result = asyncio.run(run())
+    logger.info(f"Local result: {result}")
+    assert result == {"success": True, "message": "Email queued for owner@example.com"}
+    assert outbox.get_status_counts() == {"pending": 1}
+
+    missing = asyncio.run(LocalToolTransport(LOCAL_TOOL_HANDLERS).call("send_email", {}))
+    assert missing["success"] is False
+
+
+def test_local_falls_back_to_remote_for_unknown_tools():
+    """Tools without a local handler still reach the tools API"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"success": True, "data": []})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            os.environ["TOOLS_TRANSPORT"] = "local"
+            transport = create_tool_transport(client, "https://tools.example.com")
+            return await transport.call("get_all_event_inquiries", {})
+
+    result = asyncio.run(run())
+    assert result["success"] is True
+    assert calls == ["/get_all_event_inquiries"]
+
+
+def test_remote_mode_posts_send_email():
+    """Remote mode keeps the HTTP path for split deployments"""
+    logger.info("\n=== Testing Remote Transport ===")
+    seen = {}
+
+    def handler(request):
+        seen["url"] = str(request.url)
+        seen["auth"] = request.headers.get("Authorization")
+        return httpx.Response(200, json={"success": True, "message": "Email queued for owner@example.com"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            os.environ["TOOLS_TRANSPORT"] = "remote"
+            transport = create_tool_transport(client, "https://tools.example.com", "token123")
+            assert isinstance(transport, RemoteToolTransport)
+            return await transport.call("send_email", {"to_email": "owner@example.com"})
+
+    result = asyncio.run(run())
+    os.environ["TOOLS_TRANSPORT"] = "local"
+
+    assert result["success"] is True
+    assert seen["url"] == "https://tools.example.com/send_email"
+    assert seen["auth"] == "Bearer token123"
+
+
+def main():
+    """Run all tests"""
+    test_local_send_email_skips_http()
+    test_local_falls_back_to_remote_for_unknown_tools()
+    test_remote_mode_posts_send_email()
+    logger.info("\n✅ All tool transport tests passed")
+
+
+if __name__ == "__main__":
+    main()
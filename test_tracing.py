@@ -0,0 +1,168 @@
+"""
+Test script for request tracing
+Checks span nesting, trace propagation through the queue payload,
+error recording, OTLP export shape and the spans around agent work
+"""
+
+import os
+import asyncio
+import tempfile
+import logging
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base
+from utils.tracing import (
+    InMemorySpanExporter,
+    SpanContext,
+    Tracer,
+    SPAN_KIND_SERVER,
+    set_tracer,
+)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _use_memory_tracer() -> InMemorySpanExporter:
+    exporter = InMemorySpanExporter()
+    set_tracer(Tracer(exporter))
+    return exporter
+
+
+def test_spans_nest_and_share_trace():
+    """Child spans inherit the trace id and point at their parent"""
+    logger.info("\n=== Testing Span Nesting ===")
+    exporter = _use_memory_tracer()
+    tracer = Tracer(exporter)
+
+    with tracer.start_span("outer") as outer:
+        with tracer.start_span("inner", {"step": 1}) as inner:
+            assert tracer.current_span() is inner
+        assert tracer.current_span() is outer
+    assert tracer.current_span() is None
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert spans["inner"].trace_id == spans["outer"].trace_id
+    assert spans["inner"].parent_span_id == spans["outer"].span_id
+    assert spans["outer"].parent_span_id is None
+    assert spans["inner"].duration_ms >= 0
+
+
+def test_trace_survives_queue_payload():
+    """inject() on the webhook side and extract() on the worker side join one trace"""
+    logger.info("\n=== Testing Queue Propagation ===")
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter)
+
+    with tracer.start_span("POST /webhook", kind=SPAN_KIND_SERVER) as webhook_span:
+        payload = tracer.inject({"phone": "+911234567890", "message": "hi"})
+
+    assert payload["traceparent"] == webhook_span.context.to_traceparent()
+
+    # Worker runs in another request with no current span
+    with tracer.start_span("queue.process_message", parent=tracer.extract(payload)) as worker_span:
+        with tracer.start_span("gemini.send_message"):
+            pass
+
+    assert worker_span.trace_id == webhook_span.trace_id
+    assert worker_span.parent_span_id == webhook_span.span_id
+
+    assert tracer.extract({}) is None
+    assert SpanContext.from_traceparent("garbage") is None
+    assert SpanContext.from_traceparent("00-" + "0" * 32 + "-" + "1" * 16 + "-01") is None
+
+
+def test_errors_are_recorded_and_exported_as_otlp():
+    """Exceptions mark the span as failed and still export it"""
+    logger.info("\n=== Testing Error Spans ===")
+    exporter = InMemorySpanExporter()
+    tracer = Tracer(exporter)
+
+    try:
+        with tracer.start_span("tool.check_availability", {"tool.name": "check_availability"}):
+            raise ValueError("Travel Studio down")
+    except ValueError:
+        pass
+
+    span = exporter.get_finished_spans()[0]
+    assert span.status == "ERROR"
+    assert span.events[0]["attributes"]["exception.type"] == "ValueError"
+
+    otlp = span.to_otlp()
+    assert len(otlp["traceId"]) == 32 and len(otlp["spanId"]) == 16
+    assert otlp["status"] == {"code": 2, "message": "Travel Studio down"}
+    assert {"key": "tool.name", "value": {"stringValue": "check_availability"}} in otlp["attributes"]
+    assert int(otlp["endTimeUnixNano"]) >= int(otlp["startTimeUnixNano"])
+
+
+def test_request_span_continues_incoming_traceparent():
+    """The HTTP middleware joins the caller's trace"""
+    logger.info("\n=== Testing Request Middleware ===")
+    exporter = _use_memory_tracer()
+
+    from server import app
+
+    parent = SpanContext("ab" * 16, "cd" * 8)
+    client = TestClient(app)
+    response = client.get("/health", headers={"traceparent": parent.to_traceparent()})
+    assert response.status_code == 200
+
+    server_span = [s for s in exporter.get_finished_spans() if s.name == "GET /health"][0]
+    assert server_span.trace_id == parent.trace_id
+    assert server_span.parent_span_id == parent.span_id
+    assert server_span.attributes["http.status_code"] == 200
+
+
+def test_agent_commits_and_tools_are_traced():
+    """DB commits and tool calls inside a turn become child spans"""
+    logger.info("\n=== Testing Agent Spans ===")
+    exporter = _use_memory_tracer()
+
+    from services.agent_service import AgentService
+    from utils.tracing import get_tracer
+
+    db_path = os.path.join(tempfile.mkdtemp(), "tracing.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    agent = AgentService(db)
+
+    async def run():
+        with get_tracer().start_span("agent.process_message"):
+            await agent.get_or_create_conversation("+911234567890")
+            result = await agent._run_tool("unknown_tool", {})
+        await agent.close()
+        return result
+
+    try:
+        asyncio.run(run())
+    finally:
+        db.close()
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    root = spans["agent.process_message"]
+    assert spans["db.commit"].parent_span_id == root.span_id
+    assert spans["tool.unknown_tool"].parent_span_id == root.span_id
+    assert spans["tool.unknown_tool"].attributes["tool.success"] is False
+
+
+def main():
+    """Run all tests"""
+    test_spans_nest_and_share_trace()
+    test_trace_survives_queue_payload()
+    test_errors_are_recorded_and_exported_as_otlp()
+    test_request_span_continues_incoming_traceparent()
+    test_agent_commits_and_tools_are_traced()
+    logger.info("\n✅ All tracing tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Test script for the webhook load generator
+Checks that both generated webhook formats parse like real deliveries, the
+/proc CPU accounting, and how the capacity report picks the sustained step
+"""
+
+import os
+import logging
+
+from benchmarks.webhook_load import build_request, capacity_report, cpu_seconds
+from services.ingestion_service import parse_webhook_payload
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def test_generated_bodies_parse():
+    """AiSensy JSON and Twilio form bodies both yield a phone and message"""
+    logger.info("\n=== Testing Generated Webhook Bodies ===")
+    aisensy = parse_webhook_payload(build_request("aisensy", 7)["json"])
+    twilio = parse_webhook_payload(build_request("twilio", 7)["data"])
+
+    for parsed in (aisensy, twilio):
+        assert parsed["from_number"].lstrip("+") == "917000000007"
+        assert "(7)" in parsed["body"]
+        assert parsed["message_sid"].startswith("SM")
+
+
+def test_cpu_seconds_reads_proc():
+    """CPU time of this process is available and grows with work"""
+    if not os.path.exists("/proc/self/stat"):
+        logger.info("No /proc here, skipping")
+        return
+    before = cpu_seconds(os.getpid())
+    total = 0
+    deadline = before + 0.05
+    while cpu_seconds(os.getpid()) < deadline:
+        total += sum(range(10000))
+    assert cpu_seconds(os.getpid()) >= before + 0.05
+
+
+def test_capacity_report_picks_highest_step_within_slo():
+    """Steps over the SLO or with errors don't count as sustained"""
+    def step(concurrency, rps, p99, errors=0):
+        return {"concurrency": concurrency, "rps": rps, "errors": errors,
+                "ack_ms": {"p99": p99}, "cpu_ms_per_request": 1.5}
+
+    report = capacity_report([step(1, 50, 30), step(8, 300, 400), step(32, 320, 1500),
+                              step(64, 400, 600, errors=3)], workers=2, slo_ms=1000)
+    assert report["max_sustained_rps"] == 300
+    assert report["max_sustained_rps_per_worker"] == 150
+    assert report["at_concurrency"] == 8
+
+    assert capacity_report([step(1, 10, 5000)], workers=1, slo_ms=1000)["max_sustained_rps"] == 0.0
+
+
+def main():
+    """Run all tests"""
+    test_generated_bodies_parse()
+    test_cpu_seconds_reads_proc()
+    test_capacity_report_picks_highest_step_within_slo()
+    logger.info("\n✅ All webhook load tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Test script for the flexible-date window search
+Checks the occupancy policy, the single-pass window search over a date
+span and the find_available_windows tool
+"""
+
+import asyncio
+import logging
+
+from services.tool_service import ToolService
+from services.travel_studio_service import day_ordinal, find_windows, rooms_needed
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+ROOMS = [
+    {"id": "d1", "category": "Deluxe", "base_rate": 6000},
+    {"id": "d2", "category": "Deluxe", "base_rate": 5000},
+    {"id": "c1", "category": "Luxury Cottage", "base_rate": 9000},
+    {"id": "x1", "category": "Deluxe", "base_rate": 1000, "isOccupiable": False},
+]
+
+
+def _stays():
+    # d2 is booked 04-06 Dec, c1 the whole first week
+    return {
+        "d2": [(day_ordinal("2026-12-04"), day_ordinal("2026-12-06"))],
+        "c1": [(day_ordinal("2026-12-01"), day_ordinal("2026-12-08"))],
+    }
+
+
+def test_rooms_needed():
+    """Parties are split by the per-room adult and child limits"""
+    logger.info("\n=== Testing Rooms Needed ===")
+    assert rooms_needed(2) == 1
+    assert rooms_needed(3) == 1
+    assert rooms_needed(4) == 2
+    assert rooms_needed(2, 2) == 1
+    assert rooms_needed(3, 1) == 2
+    assert rooms_needed(2, 3) == 2
+    assert rooms_needed(0) == 1
+
+
+def test_find_windows():
+    """Booked nights are skipped, one window per date, cheapest first"""
+    logger.info("\n=== Testing Window Search ===")
+    windows = find_windows(ROOMS, _stays(), "2026-12-01", "2026-12-08", nights=2, max_results=10)
+    assert [w["check_in"] for w in windows] == [
+        "01/12/2026", "02/12/2026", "06/12/2026",               # d2 at 5000
+        "03/12/2026", "04/12/2026", "05/12/2026",               # only d1 at 6000
+    ]
+    assert len({w["check_in"] for w in windows}) == len(windows)
+    assert all(w["rate_per_night"] != 1000 for w in windows)  # unoccupiable room never offered
+    assert all(w["category"] == "Deluxe" for w in windows)  # c1 is booked all week
+
+    # Two rooms: only dates where both Deluxe rooms are free
+    pair = find_windows(ROOMS, _stays(), "2026-12-01", "2026-12-08", nights=2, num_rooms=2, category="deluxe")
+    assert {w["check_in"] for w in pair} == {"01/12/2026", "02/12/2026", "06/12/2026"}
+    assert all(w["total"] == 22000 for w in pair)
+
+    weekends = find_windows(ROOMS, _stays(), "2026-12-01", "2026-12-31", nights=2, weekends_only=True, max_results=10)
+    assert weekends and all(w["weekday"] in ("Friday", "Saturday") for w in weekends)
+    assert find_windows(ROOMS, _stays(), "2026-12-01", "2026-12-02", nights=2) == []
+
+
+class FakeTravelStudio:
+    def __init__(self):
+        self.calls = 0
+
+    def find_available_windows(self, **search):
+        self.calls += 1
+        return find_windows(ROOMS, _stays(), search["start_date"], search["end_date"], search["nights"],
+                            num_rooms=rooms_needed(search["num_adults"], search["num_children"]),
+                            category=search["category"], weekends_only=search["weekends_only"])
+
+    def get_room_types(self, wait=True):
+        return sorted({room["category"] for room in ROOMS})
+
+
+def test_find_available_windows_tool():
+    """The tool converts dates, maps room types and reports the room count"""
+    logger.info("\n=== Testing find_available_windows Tool ===")
+    tools = ToolService()
+    tools.travel_studio = FakeTravelStudio()
+
+    result = asyncio.run(tools.find_available_windows({
+        "start_date": "01/12/2026", "end_date": "08/12/2026", "nights": 2,
+        "num_of_adults": 4, "room_type_id": "DELUXE",
+    }))
+    assert result["success"]
+    assert result["data"]["rooms_needed"] == 2
+    assert result["data"]["windows"] and all(w["category"] == "Deluxe" for w in result["data"]["windows"])
+    assert tools.travel_studio.calls == 1
+
+    bad = asyncio.run(tools.find_available_windows({"start_date": "2026-12-01", "end_date": "08/12/2026", "nights": 2}))
+    assert not bad["success"]
+
+
+def main():
+    """Run all tests"""
+    test_rooms_needed()
+    test_find_windows()
+    test_find_available_windows_tool()
+    logger.info("\n✅ All window search tests passed")
+
+
+if __name__ == "__main__":
+    main()
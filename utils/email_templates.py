@@ -0,0 +1,108 @@
+"""
+Email Templates
+Loads and precompiles notification email templates once
+
+Each email is three files in EMAIL_TEMPLATES_DIR (default: templates/email):
+- <name>.subject  subject line (plain text, collapsed to one line)
+- <name>.html     HTML body (fields are autoescaped)
+- <name>.txt      plain-text alternative
+"""
+
+import os
+import re
+import logging
+from typing import Dict, Any, Optional
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "email"
+)
+
+TEMPLATE_PARTS = ("subject", "html", "txt")
+
+
+class EmailTemplates:
+    def __init__(self, template_dir: Optional[str] = None, auto_reload: Optional[bool] = None):
+        """
+        Initialize the template set
+
+        Args:
+            template_dir: Directory holding the templates (default: EMAIL_TEMPLATES_DIR env var)
+            auto_reload: Re-read templates whose files changed on disk
+                         (default: EMAIL_TEMPLATES_AUTO_RELOAD env var, off)
+        """
+        self.template_dir = template_dir or os.getenv("EMAIL_TEMPLATES_DIR", DEFAULT_TEMPLATE_DIR)
+        if auto_reload is None:
+            auto_reload = os.getenv("EMAIL_TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+        self.auto_reload = auto_reload
+
+        self.env = Environment(
+            loader=FileSystemLoader(self.template_dir),
+            autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+            undefined=StrictUndefined,
+            auto_reload=auto_reload,
+            keep_trailing_newline=False,
+        )
+
+        # Compile every template up front so rendering never touches the disk
+        self._compiled = {}
+        for filename in self.env.list_templates():
+            name, _, part = filename.rpartition(".")
+            if part in TEMPLATE_PARTS:
+                self._compiled[filename] = self.env.get_template(filename)
+
+        logger.info(f"Loaded {len(self._compiled)} email templates from {self.template_dir}")
+
+    def _get(self, filename: str):
+        if self.auto_reload:
+            # Jinja re-checks the file mtime and recompiles only when it changed
+            return self.env.get_template(filename)
+        template = self._compiled.get(filename)
+        if template is None:
+            raise KeyError(f"Email template not found: {filename}")
+        return template
+
+    def names(self):
+        """List available email names"""
+        return sorted({filename.rpartition(".")[0] for filename in self._compiled})
+
+    def render(self, template_name: str, /, **context: Any) -> Dict[str, str]:
+        """
+        Render an email
+
+        Args:
+            template_name: Template name (e.g. "lead")
+            **context: Template fields
+
+        Returns:
+            Dictionary with subject, html and text
+        """
+        subject = self._get(f"{template_name}.subject").render(**context)
+        # Header values must be a single line
+        subject = re.sub(r"\s+", " ", subject).strip()
+
+        return {
+            "subject": subject,
+            "html": self._get(f"{template_name}.html").render(**context),
+            "text": self._get(f"{template_name}.txt").render(**context),
+        }
+
+
+# Singleton instance
+_email_templates = None
+
+
+def get_email_templates() -> EmailTemplates:
+    """Get singleton instance of EmailTemplates"""
+    global _email_templates
+    if _email_templates is None:
+        _email_templates = EmailTemplates()
+    return _email_templates
+
+
+def render_email(template_name: str, /, **context: Any) -> Dict[str, str]:
+    """Render an email with the shared template set"""
+    return get_email_templates().render(template_name, **context)
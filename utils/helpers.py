@@ -112,6 +112,14 @@ def parse_date_from_text(text: str, use_current_year: bool = True) -> Optional[s
     return None
 
 
+def to_api_date(value: Any) -> Optional[str]:
+    """Convert a DD/MM/YYYY date to the YYYY-MM-DD form APIs expect (None if it doesn't parse)"""
+    try:
+        return datetime.strptime(str(value), "%d/%m/%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
 def extract_number_from_text(text: str, keyword: str) -> Optional[int]:
     """Extract number associated with a keyword"""
     text_lower = text.lower()
@@ -390,59 +398,106 @@ def sanitize_tool_params(params: Dict[str, Any]) -> Dict[str, Any]:
     return sanitized
 
 
+def get_smtp_config() -> Dict[str, Any]:
+    """
+    Read SMTP settings from the environment.
+
+    Returns:
+        Dictionary with server, port, user, password, from_email and use_tls
+    """
+    return {
+        "server": os.getenv("SMTP_SERVER"),
+        "port": int(os.getenv("SMTP_PORT", "587")),
+        "user": os.getenv("SMTP_USER"),
+        "password": os.getenv("SMTP_PASSWORD"),
+        "from_email": os.getenv("SMTP_FROM_EMAIL", "noreply@singhanahaveli.com"),
+        "use_tls": os.getenv("SMTP_USE_TLS", "true").lower() == "true",
+    }
+
+
+def build_email_message(
+    to_email: str,
+    subject: str,
+    body: str,
+    is_html: bool = False,
+    from_email: Optional[str] = None,
+    text_body: Optional[str] = None,
+) -> MIMEMultipart:
+    """
+    Build a MIME email message.
+
+    Args:
+        to_email: Recipient email address
+        subject: Email subject
+        body: Email body (can be plain text or HTML)
+        is_html: Whether body is HTML (default: False)
+        from_email: Sender email (uses SMTP_FROM_EMAIL env var if not provided)
+        text_body: Plain-text alternative for HTML emails
+
+    Returns:
+        MIMEMultipart message ready to send
+    """
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = from_email or get_smtp_config()["from_email"]
+    msg["To"] = to_email
+
+    # Attach body - clients show the last part they support, so plain goes first
+    if is_html:
+        if text_body:
+            msg.attach(MIMEText(text_body, "plain"))
+        msg.attach(MIMEText(body, "html"))
+    else:
+        msg.attach(MIMEText(body, "plain"))
+
+    return msg
+
+
 def send_email(
     to_email: str,
     subject: str,
     body: str,
     is_html: bool = False,
     from_email: Optional[str] = None,
+    text_body: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Send email via SMTP.
 
+    Opens a fresh SMTP connection per call. Notification emails should go
+    through the outbox (services.email_outbox_service) instead, which reuses
+    one authenticated connection for a whole batch.
+
     Args:
         to_email: Recipient email address
         subject: Email subject
         body: Email body (can be plain text or HTML)
         is_html: Whether body is HTML (default: False)
         from_email: Sender email (uses SMTP_FROM_EMAIL env var if not provided)
+        text_body: Plain-text alternative for HTML emails
 
     Returns:
         Dictionary with success status and message
     """
     try:
         # Get email configuration from environment
-        smtp_server = os.getenv("SMTP_SERVER")
-        smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        smtp_user = os.getenv("SMTP_USER")
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        from_email = from_email or os.getenv(
-            "SMTP_FROM_EMAIL", "noreply@singhanahaveli.com"
-        )
+        config = get_smtp_config()
 
         # Validate configuration
-        if not all([smtp_server, smtp_user, smtp_password]):
+        if not all([config["server"], config["user"], config["password"]]):
             logger.error(
                 "Email configuration incomplete: SMTP_SERVER, SMTP_USER, or SMTP_PASSWORD not set"
             )
             return {"success": False, "error": "Email service not configured"}
 
         # Create email message
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = from_email
-        msg["To"] = to_email
-
-        # Attach body
-        if is_html:
-            msg.attach(MIMEText(body, "html"))
-        else:
-            msg.attach(MIMEText(body, "plain"))
+        msg = build_email_message(to_email, subject, body, is_html, from_email, text_body)
 
         # Send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
+        with smtplib.SMTP(config["server"], config["port"]) as server:
+            if config["use_tls"]:
+                server.starttls()
+            server.login(config["user"], config["password"])
             server.send_message(msg)
 
         logger.info(f"Email sent successfully to {to_email}")
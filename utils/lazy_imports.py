@@ -0,0 +1,48 @@
+"""
+Lazy imports
+Defer heavy SDK imports to the code paths that use them
+
+    genai = lazy_import("google.generativeai")   # nothing imported yet
+    genai.configure(api_key=...)                 # imported here, once
+
+A cold start that only acks a webhook never pays for the Gemini, Twilio or
+requests import graphs. Access from several threads at once is safe: the
+import system serialises the first import.
+"""
+
+import importlib
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """Stands in for a module until its first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Module proxy that imports `name` on first use
+
+    Args:
+        name: Dotted module name
+
+    Returns:
+        LazyModule: Proxy forwarding attribute access to the module
+    """
+    return LazyModule(name)
@@ -0,0 +1,413 @@
+"""
+Metrics
+Counters, gauges and histograms rendered in the Prometheus text format
+
+Recording is lock-free: every thread writes to its own shard (a plain dict
+it alone mutates), and shards are only merged when /metrics is scraped.
+The event loop thread therefore never waits on a lock, and worker threads
+(asyncio.to_thread, the outbox sender) never contend with it. The shard
+of a thread that has exited is folded into a shared total, so short-lived
+pool threads don't pile up shards.
+"""
+
+import re
+import time
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond DB commits to slow Gemini turns
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Shards:
+    """
+    One private dict per thread, merged on read
+
+    Args:
+        fold: fold(total, shard) returns a new dict with the shard added to
+              total, without modifying either
+    """
+
+    def __init__(self, fold: Callable[[dict, dict], dict]):
+        self._local = threading.local()
+        self._fold = fold
+        self._all: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}  # Shards of exited threads; replaced, never mutated
+        self._lock = threading.Lock()
+
+    def mine(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            # Only taken once per thread, never on the recording path afterwards
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._reclaim()
+                self._all.append((threading.current_thread(), shard))
+            return shard
+
+    def _reclaim(self):
+        """Fold the shards of exited threads into the retired total; caller holds the lock"""
+        live = []
+        for thread, shard in self._all:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # The thread is gone, so nothing writes to its shard any more
+                self._retired = self._fold(self._retired, shard)
+        self._all = live
+
+    def all(self) -> List[dict]:
+        with self._lock:
+            self._reclaim()
+            return [self._retired] + [shard for _, shard in self._all]
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple([labels.get(name, "") for name in self.labelnames])
+
+    def _label_str(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Sample lines of every label set"""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._shards = _Shards(self._fold)
+
+    @staticmethod
+    def _fold(total: dict, shard: dict) -> dict:
+        merged = dict(total)
+        for key, value in list(shard.items()):
+            merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        shard = self._shards.mine()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in self._shards.all():
+            for key, value in list(shard.items()):
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def get(self, **labels: str) -> float:
+        return self.values().get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._label_str(key)} {_format(value)}"
+            for key, value in sorted(self.values().items())
+        ]
+
+
+class Gauge(_Metric):
+    """Last-written value per label set (a single assignment, atomic under the GIL)"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._label_str(key)} {_format(value)}"
+            for key, value in sorted(list(self._values.items()))
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards(self._fold)
+
+    @staticmethod
+    def _fold(total: dict, shard: dict) -> dict:
+        merged = dict(total)
+        for key, (counts, running_sum) in list(shard.items()):
+            if key in merged:
+                base_counts, base_sum = merged[key]
+                merged[key] = [[a + b for a, b in zip(base_counts, counts)], base_sum + running_sum]
+            else:
+                merged[key] = [list(counts), running_sum]
+        return merged
+
+    def observe(self, value: float, **labels: str):
+        shard = self._shards.mine()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # [per-bucket counts (last one is +Inf), sum]
+            state = [[0] * (len(self.buckets) + 1), 0.0]
+            shard[key] = state
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        """Merged (per-bucket counts, sum) for every label set"""
+        merged: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        for shard in self._shards.all():
+            for key, (counts, total) in list(shard.items()):
+                if key not in merged:
+                    merged[key] = ([0] * len(counts), 0.0)
+                bucket_counts, running_sum = merged[key]
+                for index, count in enumerate(list(counts)):
+                    bucket_counts[index] += count
+                merged[key] = (bucket_counts, running_sum + total)
+        return merged
+
+    def count(self, **labels: str) -> int:
+        state = self.snapshot().get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._label_str(key, ('le', _format(bound)))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{self._label_str(key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._label_str(key)} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value != value or value in (float("inf"), float("-inf")):
+        return {"inf": "+Inf", "-inf": "-Inf"}.get(str(value), "NaN")
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+_ID_SEGMENT = re.compile(r"/(?=[^/]*\d)[^/]+")
+
+
+def normalize_path(path: str) -> str:
+    """Collapse id-like path segments so label values stay low-cardinality"""
+    return _ID_SEGMENT.sub("/{id}", path.split("?", 1)[0])
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP (webhook ack latency is route="/webhook")
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to respond to an HTTP request", ("method", "route", "status")
+)
+
+# Queue
+QUEUE_LAG_SECONDS = REGISTRY.histogram(
+    "queue_lag_seconds", "Time from /webhook queueing a message to /process-async receiving it"
+)
+
+# Fallback when the queue is unavailable
+FALLBACK_MESSAGES_TOTAL = REGISTRY.counter(
+    "fallback_messages_total",
+    "Webhook messages not queued to QStash, by outcome (inline, journaled, replayed)", ("outcome",),
+)
+FALLBACK_JOURNAL_DEPTH = REGISTRY.gauge(
+    "fallback_journal_depth", "Messages waiting in the on-disk fallback journal"
+)
+
+# Gemini
+GEMINI_CALL_SECONDS = REGISTRY.histogram(
+    "gemini_call_duration_seconds", "Duration of one Gemini send_message call", ("model",)
+)
+GEMINI_ITERATIONS = REGISTRY.histogram(
+    "gemini_iterations_per_turn", "Gemini calls needed to answer one user message",
+    buckets=(1, 2, 3, 4, 5, 6),
+)
+GEMINI_TURN_STOPS_TOTAL = REGISTRY.counter(
+    "gemini_turn_stops_total",
+    "Why the function-calling loop ended (completed, max_iterations, repeated_calls, deadline, error)",
+    ("reason",),
+)
+GEMINI_TOKENS_TOTAL = REGISTRY.counter(
+    "gemini_tokens_total", "Tokens reported by Gemini usage metadata", ("model", "kind")
+)
+GEMINI_COST_USD_TOTAL = REGISTRY.counter(
+    "gemini_cost_usd_total", "Estimated Gemini spend in USD", ("model",)
+)
+PROMPT_SECTION_TOKENS_TOTAL = REGISTRY.counter(
+    "gemini_prompt_section_tokens_total", "Prompt tokens attributed to each prompt section", ("section",)
+)
+TURN_TOKENS = REGISTRY.histogram(
+    "gemini_tokens_per_turn", "Prompt plus response tokens used to answer one user message",
+    buckets=(1000, 2500, 5000, 10000, 20000, 40000, 80000, 160000),
+)
+
+# Tools
+TOOL_CALL_SECONDS = REGISTRY.histogram(
+    "tool_call_duration_seconds", "Duration of one agent tool call", ("tool",)
+)
+TOOL_CALLS_TOTAL = REGISTRY.counter(
+    "tool_calls_total", "Agent tool calls by outcome (ok or error)", ("tool", "outcome")
+)
+
+# Travel Studio
+TRAVEL_STUDIO_REQUEST_SECONDS = REGISTRY.histogram(
+    "travel_studio_request_duration_seconds", "Duration of Travel Studio API requests",
+    ("method", "endpoint", "status"),
+)
+TRAVEL_STUDIO_RATE_LIMITED_TOTAL = REGISTRY.counter(
+    "travel_studio_rate_limited_total", "Travel Studio responses with HTTP 429 (all callers then wait for Retry-After)"
+)
+TRAVEL_STUDIO_CIRCUIT_STATE = REGISTRY.gauge(
+    "travel_studio_circuit_state", "Circuit breaker state per endpoint (0 closed, 1 half-open, 2 open)", ("endpoint",)
+)
+TRAVEL_STUDIO_FAST_FAILS_TOTAL = REGISTRY.counter(
+    "travel_studio_fast_fails_total", "Requests refused without a call because the endpoint's circuit was open",
+    ("endpoint",),
+)
+TRAVEL_STUDIO_HEDGES_TOTAL = REGISTRY.counter(
+    "travel_studio_hedges_total", "Slow requests duplicated after the endpoint's p95, by which copy answered first",
+    ("endpoint", "winner"),
+)
+AVAILABILITY_PREFETCH_TOTAL = REGISTRY.counter(
+    "availability_prefetch_total",
+    "Speculative availability lookups by outcome (hit: used by a tool call that turn, miss: unused)",
+    ("outcome",),
+)
+
+# Catalogue cache (hotel profile, room catalogue)
+CATALOGUE_REFRESHES_TOTAL = REGISTRY.counter(
+    "catalogue_refreshes_total", "Catalogue fetches from Travel Studio by entry and outcome", ("name", "outcome")
+)
+ROOM_TYPE_LOOKUPS_TOTAL = REGISTRY.counter(
+    "room_type_lookups_total", "Room types from tool calls resolved to a category, by match (exact, fuzzy, unknown)",
+    ("match",),
+)
+
+# Inventory holds
+INVENTORY_HOLDS_TOTAL = REGISTRY.counter(
+    "inventory_holds_total", "Room hold attempts by outcome (placed, contended, consumed, released, error)", ("outcome",)
+)
+
+# Booking journal
+BOOKING_JOURNAL_TOTAL = REGISTRY.counter(
+    "booking_journal_total",
+    "Booking attempts by outcome (confirmed, replayed, pending, unknown, failed, reconciled, abandoned)",
+    ("outcome",),
+)
+
+# Local inventory mirror
+INVENTORY_MIRROR_SYNCS_TOTAL = REGISTRY.counter(
+    "inventory_mirror_syncs_total", "Inventory mirror loads and delta syncs by outcome", ("kind", "outcome")
+)
+INVENTORY_MIRROR_MISMATCHES_TOTAL = REGISTRY.counter(
+    "inventory_mirror_mismatches_total", "Availability queries where the mirror disagreed with Travel Studio"
+)
+
+# Outbound messages
+OUTBOUND_SEND_SECONDS = REGISTRY.histogram(
+    "outbound_send_duration_seconds", "Duration of outbound WhatsApp and email sends",
+    ("provider", "outcome"),
+)
+
+# Database
+DB_COMMIT_SECONDS = REGISTRY.histogram(
+    "db_commit_duration_seconds", "Duration of agent session commits"
+)
+
+# Caches (hit ratio = hit / (hit + miss))
+CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by result (hit or miss)", ("cache", "result")
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS_TOTAL.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def render_metrics() -> str:
+    """Render the shared registry"""
+    return REGISTRY.render()
@@ -0,0 +1,62 @@
+"""
+Rate limiting
+Token bucket shared by every thread that calls a rate-limited backend
+
+    limiter = RateLimiter(rate=20)      # 20 requests/second, bursts of 20
+    limiter.acquire()                   # blocks until a token is free
+    limiter.pause(retry_after)          # backend said 429: everyone waits
+
+Each caller reserves its token under the lock and sleeps outside it, so
+waiting threads queue up in order without holding the lock.
+"""
+
+import time
+import threading
+from typing import Callable, Optional
+
+
+class RateLimiter:
+    """Token bucket; a rate of 0 disables limiting"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def acquire(self) -> float:
+        """
+        Take one token, waiting for it if needed
+
+        Returns:
+            float: Seconds waited
+        """
+        if self.rate <= 0 and self._paused_until <= self._clock():
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            wait = max(self._paused_until - now, 0.0)
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds`, e.g. after a 429 with Retry-After"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
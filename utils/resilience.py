@@ -0,0 +1,131 @@
+"""
+Resilience
+Circuit breaker and latency window for calls to a flaky backend
+
+    breaker = CircuitBreaker("/api/hocc/rooms", failure_threshold=5, reset_seconds=30)
+    if not breaker.allow():
+        ...                              # fail fast, don't wait on a dead backend
+    try:
+        call()
+        breaker.record_success()
+    except TimeoutError:
+        breaker.record_failure()
+
+After failure_threshold consecutive failures the breaker opens and every
+call fails fast. Once reset_seconds have passed it lets a single probe
+through (half-open): a success closes it, a failure opens it again.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+
+# Gauge values for each state
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with half-open probing"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        on_change: Optional[Callable[[str, str], None]] = None,
+    ):
+        """
+        Args:
+            name: What the breaker guards, passed to on_change
+            failure_threshold: Consecutive failures that open the breaker
+            reset_seconds: Time open before a probe is let through
+            clock: Monotonic clock (for tests)
+            on_change: Called with (name, new_state) on every transition
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._on_change = on_change
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == STATE_OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                return STATE_HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until a probe will be allowed (0 when not open)"""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(self.reset_seconds - (self._clock() - self._opened_at), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; a True in half-open is the probe"""
+        with self._lock:
+            now = self._clock()
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_OPEN:
+                if now - self._opened_at < self.reset_seconds:
+                    return False
+                self._transition(STATE_HALF_OPEN)
+            # Half-open: one probe at a time; a probe that never reported back
+            # is replaced after another reset period
+            if self._probe_started is not None and now - self._probe_started < self.reset_seconds:
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+            if self._state != STATE_CLOSED:
+                self._transition(STATE_CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self._state == STATE_HALF_OPEN or (
+                self._state == STATE_CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = self._clock()
+                self._transition(STATE_OPEN)
+
+    def _transition(self, state: str):
+        self._state = state
+        if self._on_change is not None:
+            self._on_change(self.name, state)
+
+
+class LatencyWindow:
+    """Recent latencies of one operation, for percentile-based hedging"""
+
+    def __init__(self, size: int = 100, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile, or None until min_samples were seen"""
+        samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(len(samples) * q / 100), len(samples) - 1)]
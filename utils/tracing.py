@@ -0,0 +1,375 @@
+"""
+Lightweight tracing
+Spans with W3C trace context propagation and OpenTelemetry-compatible export
+
+A trace starts at /webhook, travels through the QStash payload as a
+"traceparent" field and continues in /process-async, so one trace id covers
+the webhook, queue delivery, agent turn, Gemini calls, tool calls, Travel
+Studio requests, DB commits and the outbound send.
+
+Exporters (OTEL_TRACES_EXPORTER):
+- none:    spans are dropped (default)
+- logging: one log line per finished span with its duration
+- otlp:    OTLP/JSON batches POSTed to OTEL_EXPORTER_OTLP_ENDPOINT/v1/traces
+- memory:  kept in an InMemorySpanExporter (tests)
+"""
+
+import os
+import re
+import time
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+SPAN_KIND_PRODUCER = 4
+SPAN_KIND_CONSUMER = 5
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """Identifies a span, possibly from another process"""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        if not value:
+            return None
+        match = TRACEPARENT_RE.match(value.strip().lower())
+        if not match:
+            return None
+        trace_id, span_id, flags = match.groups()
+        if trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, sampled=bool(int(flags, 16) & 1))
+
+
+class Span:
+    __slots__ = (
+        "name", "context", "parent_span_id", "kind", "attributes",
+        "start_ns", "end_ns", "status", "status_message", "events", "_tracer",
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext,
+                 parent_span_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "UNSET"
+        self.status_message = ""
+        self.events: List[Dict[str, Any]] = []
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.trace_id
+
+    @property
+    def span_id(self) -> str:
+        return self.context.span_id
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_status(self, status: str, message: str = ""):
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, error: BaseException):
+        self.events.append({
+            "name": "exception",
+            "time_ns": time.time_ns(),
+            "attributes": {
+                "exception.type": type(error).__name__,
+                "exception.message": str(error),
+            },
+        })
+        self.set_status("ERROR", str(error))
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self._tracer._on_end(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Span in OTLP/JSON form"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "events": [
+                {
+                    "name": event["name"],
+                    "timeUnixNano": str(event["time_ns"]),
+                    "attributes": [_otlp_attribute(k, v) for k, v in event["attributes"].items()],
+                }
+                for event in self.events
+            ],
+            "status": {"code": {"UNSET": 0, "OK": 1, "ERROR": 2}[self.status]},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+# Exporters
+
+class InMemorySpanExporter:
+    """Keeps finished spans in memory for tests"""
+
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+class LoggingSpanExporter:
+    """Logs one line per finished span"""
+
+    def export(self, spans: List[Span]):
+        for span in spans:
+            logger.info(
+                f"span {span.name} {span.duration_ms:.1f}ms trace={span.trace_id} "
+                f"status={span.status} {span.attributes}"
+            )
+
+    def shutdown(self):
+        pass
+
+
+class OTLPHttpSpanExporter:
+    """
+    Buffers spans and POSTs OTLP/JSON batches from a background thread,
+    so exporting never adds latency to the request path
+    """
+
+    def __init__(self, endpoint: str, service_name: str, headers: Optional[Dict[str, str]] = None,
+                 max_batch: int = 256, interval: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.max_batch = max_batch
+        self.interval = interval
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._buffer.extend(spans)
+            full = len(self._buffer) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "maldevta.tracing"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+    def _flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        try:
+            import httpx
+
+            httpx.post(self.url, json=self._payload(spans), headers=self.headers, timeout=5.0)
+        except Exception as e:
+            logger.warning(f"Failed to export {len(spans)} spans: {e}")
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush()
+
+    def shutdown(self):
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5.0)
+        self._flush()
+
+
+# Tracer
+
+class Tracer:
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def _on_end(self, span: Span):
+        if self.exporter is not None and span.context.sampled:
+            try:
+                self.exporter.export([span])
+            except Exception as e:
+                logger.warning(f"Span export failed: {e}")
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[SpanContext] = None, kind: int = SPAN_KIND_INTERNAL):
+        """
+        Start a span as a child of the current span (or of an explicit remote parent)
+
+        Args:
+            name: Span name
+            attributes: Initial attributes
+            parent: Remote parent context (e.g. extracted from a queue payload)
+            kind: OTLP span kind
+        """
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+
+        if parent is not None:
+            context = SpanContext(parent.trace_id, _random_hex(16), parent.sampled)
+            parent_span_id = parent.span_id
+        else:
+            context = SpanContext(_random_hex(32), _random_hex(16))
+            parent_span_id = None
+
+        span = Span(self, name, context, parent_span_id, kind, dict(attributes or {}))
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def inject(self, carrier: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the current trace context to a payload or header dict"""
+        span = _current_span.get()
+        if span is not None:
+            carrier["traceparent"] = span.context.to_traceparent()
+        return carrier
+
+    def extract(self, carrier: Optional[Dict[str, Any]]) -> Optional[SpanContext]:
+        """Read a trace context written by inject()"""
+        if not carrier:
+            return None
+        return SpanContext.from_traceparent(carrier.get("traceparent"))
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def _random_hex(length: int) -> str:
+    return f"{random.getrandbits(length * 4):0{length}x}"
+
+
+def create_exporter_from_env():
+    """Build the exporter selected by OTEL_TRACES_EXPORTER"""
+    kind = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+    if kind == "logging":
+        return LoggingSpanExporter()
+    if kind == "memory":
+        return InMemorySpanExporter()
+    if kind == "otlp":
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+        headers = {}
+        for pair in os.getenv("OTEL_EXPORTER_OTLP_HEADERS", "").split(","):
+            if "=" in pair:
+                key, _, value = pair.partition("=")
+                headers[key.strip()] = value.strip()
+        service_name = os.getenv("OTEL_SERVICE_NAME", "whatsapp-reservation-agent")
+        return OTLPHttpSpanExporter(endpoint, service_name, headers)
+    return None
+
+
+# Singleton instance
+_tracer = None
+
+
+def get_tracer() -> Tracer:
+    """Get singleton instance of Tracer"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(create_exporter_from_env())
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    """Replace the shared tracer (e.g. with an in-memory exporter in tests)"""
+    global _tracer
+    _tracer = tracer
+    return tracer